@@ -33,10 +33,20 @@ from freva_client.utils.types import ZarrOptionsDict
 from .cli_utils import parse_cli_args, print_df, version_callback
 from .zarr_cli import (
     CLIMATOLOGY_HELP,
+    COMPRESSOR_HELP,
+    ISEL_HELP,
+    KEEP_INFORMATION_HELP,
+    KEEPBITS_HELP,
     MIN_COVERAGE_HELP,
     REDUCE_DTYPE_HELP,
+    SPACE_DIM_HELP,
+    SPACE_HELP,
+    SUBSET_BBOX_HELP,
     TIME_FREQ_HELP,
     TIME_METHOD_HELP,
+    VARIABLE_HELP,
+    WEIGHTING_HELP,
+    ZARR_FORMAT_HELP,
     AccessPattern,
     Aggregate,
     AggregationCombine,
@@ -44,8 +54,10 @@ from .zarr_cli import (
     AggregationJoin,
     AggregationOption,
     ReduceDtype,
+    SpaceMethod,
     TimeFrequency,
     TimeMethod,
+    Weighting,
     reduction_options,
 )
 
@@ -396,6 +408,18 @@ def data_search(
         "--chunk-size",
         help="Set the target chunk size in megabytes.",
     ),
+    zarr_format: int = typer.Option(
+        2, "--zarr-format", min=2, max=3, help=ZARR_FORMAT_HELP
+    ),
+    compressor: str = typer.Option(
+        "default", "--compressor", help=COMPRESSOR_HELP
+    ),
+    keepbits: Optional[int] = typer.Option(
+        None, "--keepbits", min=1, max=52, help=KEEPBITS_HELP
+    ),
+    keep_information: Optional[float] = typer.Option(
+        None, "--keep-information", min=0, max=1, help=KEEP_INFORMATION_HELP
+    ),
     reload: bool = typer.Option(
         False,
         "--reload-zarr",
@@ -416,6 +440,22 @@ def data_search(
     dtype: Optional[ReduceDtype] = typer.Option(
         None, "--dtype", help=REDUCE_DTYPE_HELP
     ),
+    variables: Optional[List[str]] = typer.Option(
+        None, "--variable", help=VARIABLE_HELP
+    ),
+    isel: Optional[List[str]] = typer.Option(None, "--isel", help=ISEL_HELP),
+    subset_bbox: Optional[Tuple[float, float, float, float]] = typer.Option(
+        None, "--subset-bbox", help=SUBSET_BBOX_HELP
+    ),
+    space: Optional[SpaceMethod] = typer.Option(
+        None, "--space", help=SPACE_HELP
+    ),
+    space_dims: Optional[List[str]] = typer.Option(
+        None, "--space-dim", help=SPACE_DIM_HELP
+    ),
+    weighting: Optional[Weighting] = typer.Option(
+        None, "--weighting", help=WEIGHTING_HELP
+    ),
     time: Optional[str] = typer.Option(
         None,
         "-t",
@@ -496,11 +536,25 @@ def data_search(
         "access_pattern": access_pattern,
         "map_primary_chunksize": map_primary_chunksize,
         "chunk_size": chunk_size,
+        "zarr_format": zarr_format,
+        "compressor": compressor,
+        "keepbits": keepbits,
+        "keep_information": keep_information,
+        "variables": variables or None,
+        "isel": isel or None,
+        "subset_bbox": list(subset_bbox) if subset_bbox else None,
     }
     zarr_options = {k: v for k, v in zarr_options.items() if v is not None}
     zarr_options.update(
         reduction_options(
-            time_freq, time_method, climatology, min_coverage, dtype
+            time_freq,
+            time_method,
+            climatology,
+            min_coverage,
+            dtype,
+            space=space,
+            space_dims=space_dims,
+            weighting=weighting,
         )
     )
 
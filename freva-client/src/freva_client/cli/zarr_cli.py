@@ -4,7 +4,7 @@ import json
 from dataclasses import asdict, dataclass
 from enum import Enum
 from pathlib import Path
-from typing import Dict, List, Literal, Optional, TypedDict, cast
+from typing import Dict, List, Literal, Optional, Tuple, TypedDict, cast
 
 import typer
 
@@ -96,6 +96,24 @@ class TimeMethod(str, Enum):
     count = "count"  # type: ignore[assignment]
 
 
+class SpaceMethod(str, Enum):
+    """How the spatial dimensions are reduced."""
+
+    mean = "mean"
+    sum = "sum"
+    min = "min"
+    max = "max"
+
+
+class Weighting(str, Enum):
+    """Area weighting of the spatial reduction."""
+
+    auto = "auto"
+    cell_area = "cell_area"
+    cos_lat = "cos_lat"
+    none = "none"
+
+
 class ReduceDtype(str, Enum):
     """Output dtype of reduced variables."""
 
@@ -124,9 +142,50 @@ MIN_COVERAGE_HELP = (
     "time steps were valid. Requires --time-freq."
 )
 REDUCE_DTYPE_HELP = (
-    "Output dtype of reduced variables. Requires --time-freq. "
+    "Output dtype of reduced variables. Requires --time-freq or --space. "
     "Default: float32."
 )
+SPACE_HELP = (
+    "Reduce the horizontal dimensions server side, e.g. to stream the area "
+    "weighted field mean instead of the full fields."
+)
+SPACE_DIM_HELP = (
+    "Dimension that --space reduces. Can be given several times. "
+    "Default: the horizontal dimensions of the grid."
+)
+WEIGHTING_HELP = (
+    "Area weights of --space: a cell-area variable, the cosine of the "
+    "latitude, none, or auto (the first that fits the grid). Default: auto."
+)
+VARIABLE_HELP = (
+    "Serve only this data variable of the files, with its coordinates and "
+    "bounds. Can be given several times. Default: all variables."
+)
+ISEL_HELP = (
+    "Serve only this index range of a dimension, as dim:start:stop[:step], "
+    "e.g. lat:100:200. Can be given for several dimensions."
+)
+SUBSET_BBOX_HELP = (
+    "Serve only this region of the grid: lon_min lon_max lat_min lat_max in "
+    "degrees, e.g. -20 40 30 70."
+)
+ZARR_FORMAT_HELP = (
+    "Zarr format of the store. 3 adds zarr v3 metadata with sharded arrays, "
+    "which need far fewer requests to be read."
+)
+COMPRESSOR_HELP = (
+    "Compressor of the served chunks: default (that of the source), none, "
+    "auto (Blosc LZ4 for big numeric chunks) or one of blosc-<cname>, zstd, "
+    "zlib, gzip with an optional level, e.g. blosc-zstd:3."
+)
+KEEPBITS_HELP = (
+    "Round float data variables to this many mantissa bits before they are "
+    "compressed (lossy)."
+)
+KEEP_INFORMATION_HELP = (
+    "Round float data variables to the mantissa bits that hold this fraction "
+    "of their information, e.g. 0.99 (lossy)."
+)
 
 
 def reduction_options(
@@ -135,25 +194,34 @@ def reduction_options(
     climatology: bool,
     min_coverage: float,
     dtype: Optional[ReduceDtype],
+    space: Optional[SpaceMethod] = None,
+    space_dims: Optional[List[str]] = None,
+    weighting: Optional[Weighting] = None,
 ) -> ZarrOptionsDict:
     """Build the reduction part of the zarr options from cli flags.
 
-    Options that only make sense together with a target frequency are
-    dropped when none was given, so that a request without ``--time-freq``
-    is byte-identical to one from before reduction existed. That matters:
-    the server derives its cache key from the request, so a spurious
-    reduction key would needlessly miss the cache.
+    Options that only make sense together with a target frequency (or a
+    spatial method) are dropped when none was given, so that a request
+    without ``--time-freq`` is byte-identical to one from before reduction
+    existed. That matters: the server derives its cache key from the
+    request, so a spurious reduction key would needlessly miss the cache.
     """
-    if time_freq is None:
-        return {}
-    options: ZarrOptionsDict = {"time_freq": time_freq.value}
-    if time_method is not None:
-        options["time_method"] = time_method.value
-    if climatology:
-        options["climatology"] = True
-    if min_coverage:
-        options["min_coverage"] = min_coverage
-    if dtype is not None:
+    options: ZarrOptionsDict = {}
+    if time_freq is not None:
+        options["time_freq"] = time_freq.value
+        if time_method is not None:
+            options["time_method"] = time_method.value
+        if climatology:
+            options["climatology"] = True
+        if min_coverage:
+            options["min_coverage"] = min_coverage
+    if space is not None:
+        options["space"] = space.value
+        if space_dims:
+            options["space_dims"] = list(space_dims)
+        if weighting is not None:
+            options["weighting"] = weighting.value
+    if options and dtype is not None:
         options["dtype"] = dtype.value
     return options
 
@@ -245,6 +313,18 @@ def zarr_convert(
         "--chunk-size",
         help="Set the target chunk size in megabytes.",
     ),
+    zarr_format: int = typer.Option(
+        2, "--zarr-format", min=2, max=3, help=ZARR_FORMAT_HELP
+    ),
+    compressor: str = typer.Option(
+        "default", "--compressor", help=COMPRESSOR_HELP
+    ),
+    keepbits: Optional[int] = typer.Option(
+        None, "--keepbits", min=1, max=52, help=KEEPBITS_HELP
+    ),
+    keep_information: Optional[float] = typer.Option(
+        None, "--keep-information", min=0, max=1, help=KEEP_INFORMATION_HELP
+    ),
     reload: bool = typer.Option(
         False,
         "--reload-zarr",
@@ -265,6 +345,22 @@ def zarr_convert(
     dtype: Optional[ReduceDtype] = typer.Option(
         None, "--dtype", help=REDUCE_DTYPE_HELP
     ),
+    variables: Optional[List[str]] = typer.Option(
+        None, "--variable", help=VARIABLE_HELP
+    ),
+    isel: Optional[List[str]] = typer.Option(None, "--isel", help=ISEL_HELP),
+    subset_bbox: Optional[Tuple[float, float, float, float]] = typer.Option(
+        None, "--subset-bbox", help=SUBSET_BBOX_HELP
+    ),
+    space: Optional[SpaceMethod] = typer.Option(
+        None, "--space", help=SPACE_HELP
+    ),
+    space_dims: Optional[List[str]] = typer.Option(
+        None, "--space-dim", help=SPACE_DIM_HELP
+    ),
+    weighting: Optional[Weighting] = typer.Option(
+        None, "--weighting", help=WEIGHTING_HELP
+    ),
     token_file: Optional[Path] = typer.Option(
         None,
         "--token-file",
@@ -315,11 +411,25 @@ def zarr_convert(
         "access_pattern": access_pattern,
         "map_primary_chunksize": map_primary_chunksize,
         "chunk_size": chunk_size,
+        "zarr_format": zarr_format,
+        "compressor": compressor,
+        "keepbits": keepbits,
+        "keep_information": keep_information,
+        "variables": variables or None,
+        "isel": isel or None,
+        "subset_bbox": list(subset_bbox) if subset_bbox else None,
     }
     zarr_options = {k: v for k, v in zarr_options.items() if v is not None}
     zarr_options.update(
         reduction_options(
-            time_freq, time_method, climatology, min_coverage, dtype
+            time_freq,
+            time_method,
+            climatology,
+            min_coverage,
+            dtype,
+            space=space,
+            space_dims=space_dims,
+            weighting=weighting,
         )
     )
 
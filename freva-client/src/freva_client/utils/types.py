@@ -1,11 +1,13 @@
 """Definition of special types."""
 
 from dataclasses import dataclass, fields
-from typing import Dict, Literal, Optional, Union
+from typing import Dict, List, Literal, Optional, Union
 
 from typing_extensions import TypeAlias
 
-ZarrOptionsDict: TypeAlias = Dict[str, Optional[Union[str, int, float, bool]]]
+ZarrOptionsDict: TypeAlias = Dict[
+    str, Optional[Union[str, int, float, bool, List[str], List[float]]]
+]
 
 
 @dataclass
@@ -26,7 +28,7 @@ class ZarrOptions:
         urls = convert("/work/data/tas_day.nc",
                        zarr_options={"time_freq": "monthly"})
 
-    The options fall into four groups.
+    The options fall into seven groups.
 
     **URL and lifetime** -- ``public`` decides whether the URL carries its
     own signature and can be handed to someone else, and ``ttl_seconds``
@@ -46,6 +48,26 @@ class ZarrOptions:
     ``climatology``, ``min_coverage`` and ``dtype`` make the service
     collapse the time dimension before serving, so that only the reduced
     data crosses the wire. Reduction is off unless ``time_freq`` is set.
+    ``space``, ``space_dims`` and ``weighting`` likewise collapse the
+    horizontal dimensions, e.g. into an area weighted field mean.
+
+    **Variable selection** -- ``variables`` serves only some data variables
+    of the files. The others are dropped as soon as the files are opened,
+    which makes loading files with many variables much faster.
+
+    **Spatial subset** -- ``isel`` and ``subset_bbox`` cut the store down to a
+    region before it is reduced and served. Values are served as they are
+    stored, a subset on its own doesn't decode them.
+
+    **Store format** -- ``zarr_format=3`` serves zarr v3 metadata next to
+    the v2 metadata. Arrays with many chunks are then bundled into shards,
+    so reading a whole variable takes a handful of requests instead of
+    one per chunk.
+    ``compressor`` trades the CPU time of the server against the
+    transferred bytes, ``keepbits`` and ``keep_information`` round float
+    data before it is compressed.
+    ``short_token`` swaps the long url token, which encodes every input
+    path, for a short hash of it.
 
     Parameters
     ----------
@@ -84,6 +106,40 @@ class ZarrOptions:
     dtype: str, default: "float32"
         Output precision of reduced variables: ``"float32"``,
         ``"float64"``, or ``"keep"`` to leave decoding's own result.
+    variables: list[str] or None, default: None
+        Data variables to serve, e.g. ``["tas"]``. All by default.
+    isel: list[str] or None, default: None
+        Index slices ``"dim:start:stop[:step]"``, e.g. ``["lat:100:200"]``.
+    subset_bbox: list[float] or None, default: None
+        Bounding box ``[lon_min, lon_max, lat_min, lat_max]`` in degrees.
+    space: str or None, default: None
+        Reduce the horizontal dimensions: ``"mean"``, ``"sum"``, ``"min"``
+        or ``"max"``.
+    space_dims: list[str] or None, default: None
+        The dimensions ``space`` reduces, all horizontal ones by default.
+    weighting: str, default: "auto"
+        Area weights of ``space``: ``"cell_area"``, ``"cos_lat"``,
+        ``"none"`` or ``"auto"``.
+    zarr_format: int, default: 2
+        ``3`` to additionally expose zarr v3 metadata with sharded arrays.
+        Clients that understand zarr v3 (``zarr>=3``) pick it up
+        automatically.
+    compressor: str, default: "default"
+        Compressor of the served chunks. ``"default"`` keeps the compressor
+        of the source, ``"none"`` serves raw chunks, ``"auto"`` uses Blosc
+        LZ4 for big numeric chunks. ``"blosc-<cname>"`` (``blosclz``,
+        ``lz4``, ``lz4hc``, ``zlib``, ``zstd``), ``"zstd"``, ``"zlib"`` and
+        ``"gzip"`` take an optional level, e.g. ``"blosc-zstd:3"``.
+    keepbits: int or None, default: None
+        Round float data variables to this many mantissa bits. Lossy, but
+        compressed chunks get several times smaller.
+    keep_information: float or None, default: None
+        Round float data variables to the mantissa bits that hold this
+        fraction of their real information, e.g. ``0.99``. Ignored if
+        ``keepbits`` is set.
+    short_token: bool, default: False
+        Address the store by a short hash instead of a token that encodes
+        every path and plan. Worth it for aggregations of many files.
 
     Examples
     --------
@@ -131,6 +187,26 @@ class ZarrOptions:
             "ttl_seconds": 3600,
         })
 
+    Serve monthly means over Europe only:
+
+    .. code-block:: python
+
+        {"time_freq": "monthly", "subset_bbox": [-20, 40, 30, 70]}
+
+    Stream the yearly global mean instead of the daily fields:
+
+    .. code-block:: python
+
+        {"time_freq": "yearly", "space": "mean"}
+
+    Read a long daily record of maps with few requests:
+
+    .. code-block:: python
+
+        url = convert("/work/data/tas_day.nc",
+                      zarr_options={"zarr_format": 3, "public": True})[0]
+        dset = xr.open_zarr(url, zarr_format=3)
+
     Notes
     -----
     Reduced stores are always CF-decoded: packed integers are unpacked,
@@ -236,7 +312,9 @@ class ZarrOptions:
     """
 
     dtype: Literal["float32", "float64", "keep"] = "float32"
-    """Output dtype of *reduced* variables. Ignored without ``time_freq``.
+    """Output dtype of *reduced* variables.
+
+    Ignored without ``time_freq`` or ``space``.
 
     CF-decoding packed data promotes to ``float64`` whenever
     ``scale_factor`` is stored as a double, which quadruples the transferred
@@ -244,6 +322,103 @@ class ZarrOptions:
     produced.
     """
 
+    variables: Optional[List[str]] = None
+    """Data variables to serve, e.g. ``["tas"]``.
+
+    The coordinates, bounds, grid mappings and cell measures the variables
+    refer to are served with them, every other variable is dropped right
+    after the files are opened. Input files that hold none of the
+    variables are left out. ``None`` (default) serves all variables.
+    """
+
+    isel: Optional[List[str]] = None
+    """Index slices of the served region, ``"dim:start:stop[:step]"``.
+
+    The slices follow Python semantics and can be given for up to eight
+    dimensions, e.g. ``["rlat:100:200", "rlon:50:150"]``.
+    """
+
+    subset_bbox: Optional[List[float]] = None
+    """Bounding box of the served region, ``[lon_min, lon_max, lat_min,
+    lat_max]`` in degrees.
+
+    Longitudes are compared modulo 360: ``[-20, 40, 30, 70]`` selects the
+    same region on a -180 to 180 as on a 0 to 360 grid, and a box with
+    ``lon_min > lon_max`` crosses the date line. Curvilinear and
+    rotated-pole grids are cut to the smallest index box that holds the
+    region, unstructured grids to the cells inside it.
+    """
+
+    space: Optional[Literal["mean", "sum", "min", "max"]] = None
+    """Reduce the horizontal dimensions with this method.
+
+    ``"mean"`` gives the field mean time series of a variable, means and
+    sums are area weighted (see ``weighting``). The spatial reduction is
+    applied after the subset and before the temporal one, so
+    ``{"space": "mean", "time_freq": "yearly"}`` serves a handful of
+    numbers per variable. ``None`` (default) keeps the grid.
+    """
+
+    space_dims: Optional[List[str]] = None
+    """The dimensions ``space`` reduces, e.g. ``["lon"]`` for zonal means.
+
+    Defaults to the horizontal dimensions of the grid.
+    """
+
+    weighting: Literal["auto", "cell_area", "cos_lat", "none"] = "auto"
+    """Area weights of the spatial reduction.
+
+    - ``cell_area``: a cell-area variable of the dataset, as named by CF
+      ``cell_measures`` or called e.g. ``areacella``.
+    - ``cos_lat``: the cosine of the latitude.
+    - ``none``: unweighted, which biases means towards the poles on a
+      regular grid.
+    - ``auto`` (default): the first of ``cell_area`` and ``cos_lat`` that
+      fits the grid. Grids that can't be weighted are refused rather than
+      averaged with a bias.
+    """
+
+    zarr_format: Literal[2, 3] = 2
+    """Zarr format of the served store.
+
+    With ``3`` the store also exposes ``zarr.json`` metadata in which
+    arrays with many chunks are sharded: one shard bundles many chunks
+    and is fetched with a single request.
+    """
+
+    compressor: str = "default"
+    """Compressor of the served chunks.
+
+    On a fast network the CPU time of the server dominates, ``"none"`` or
+    ``"auto"`` serve chunks faster. On slow links a stronger codec such as
+    ``"blosc-zstd:5"`` transfers fewer bytes.
+    """
+
+    keepbits: Optional[int] = None
+    """Mantissa bits float data variables are rounded to.
+
+    Climate fields rarely carry more than 10 to 12 bits of real
+    information, the remaining bits are noise that compresses badly.
+    Coordinates are never rounded.
+    """
+
+    keep_information: Optional[float] = None
+    """Fraction of the real information of float data to keep.
+
+    The server estimates the information of every mantissa bit from the
+    first chunk of a variable and keeps the bits that hold this fraction
+    of it, e.g. ``0.99``. ``keepbits`` takes precedence.
+    """
+
+    short_token: bool = False
+    """Address the store by a short, content-addressed token.
+
+    By default the url token encodes all input paths and plans, which for
+    aggregations of thousands of files makes it kilobytes long - and it is
+    sent with every chunk request. With ``True`` the server stores the
+    token once and hands out a short hash of it instead.
+    """
+
     @classmethod
     def from_dict(
         cls,
@@ -0,0 +1,190 @@
+"""An fsspec file system that fetches zarr chunks in batches.
+
+Zarr clients read a store by issuing one ``GET`` per chunk. The freva data
+portal can serve many keys of one store with a single ``POST`` to
+``<store>.zarr/batch``. :class:`BatchedHTTPFileSystem` collects the chunk
+reads zarr already issues concurrently (``getitems`` in zarr v2, the
+``asyncio.gather`` of the codec pipeline in zarr v3) and turns them into
+such batch requests.
+
+This module needs the optional ``fsspec`` and ``aiohttp`` dependencies.
+"""
+
+import asyncio
+import struct
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, cast
+
+from fsspec.implementations.http import HTTPFileSystem
+
+from . import logger
+
+BATCH_MEDIA_TYPE = "application/vnd.freva.zarr-batch"
+BATCH_FRAME_HEADER = struct.Struct("!HIQ")
+"""Frame header of a batch response: http status, key and payload length."""
+
+
+def split_chunk_url(url: str) -> Optional[Tuple[str, str]]:
+    """Split a chunk url into the store url and the chunk key.
+
+    Parameters
+    ----------
+    url: str
+        The url of a zarr key, e.g. ``https://host/zarr/abc.zarr/tas/0.0.0``
+
+    Returns
+    -------
+    tuple[str, str], None:
+        The url of the store and the key within the store, ``None`` if the
+        url doesn't point to a chunk and should be fetched as is.
+    """
+    root, sep, key = url.partition(".zarr/")
+    if not sep or "?" in url or "#" in url:
+        return None
+    array_path, _, leaf = key.rpartition("/")
+    if not array_path or not leaf.isascii() or "/c/" in f"/{key}":
+        return None
+    if not all(p.isdecimal() for p in leaf.split(".")):
+        return None
+    return f"{root}.zarr", key
+
+
+async def iter_batch_frames(
+    content: Any,
+) -> AsyncIterator[Tuple[str, int, bytes]]:
+    """Parse the frames of a batch response.
+
+    Parameters
+    ----------
+    content:
+        An object with an async ``readexactly`` method, such as the
+        ``content`` stream of an ``aiohttp`` response.
+
+    Yields
+    ------
+    tuple[str, int, bytes]:
+        The key, the http status of the key and the payload.
+    """
+    while True:
+        try:
+            header = await content.readexactly(BATCH_FRAME_HEADER.size)
+        except asyncio.IncompleteReadError as error:
+            if error.partial:
+                raise OSError("Truncated batch response.") from error
+            return
+        status, key_len, payload_len = BATCH_FRAME_HEADER.unpack(header)
+        key = (await content.readexactly(key_len)).decode("utf-8")
+        yield key, status, await content.readexactly(payload_len)
+
+
+class BatchedHTTPFileSystem(HTTPFileSystem):  # type: ignore[misc]
+    """HTTP file system that coalesces concurrent chunk reads.
+
+    Every chunk read is parked for a short moment, to give the other reads
+    that were started at the same time - by zarr's own concurrency or by
+    the dask threads computing neighbouring chunks - a chance to join. All
+    parked reads of a store are then fetched with as few batch requests as
+    possible. Reads
+    that are not chunks, byte range reads and keys the server couldn't
+    serve in a batch take the normal ``GET`` path.
+
+    Parameters
+    ----------
+    batch_size: int, default: 256
+        Maximum number of keys in one batch request.
+    batch_delay: float, default: 0.005
+        Seconds the first read of a batch waits for others to join.
+    **kwargs:
+        Any other arguments are passed to
+        :class:`fsspec.implementations.http.HTTPFileSystem`, for example
+        ``headers`` holding the authorisation.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        batch_size: int = 256,
+        batch_delay: float = 0.005,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.batch_size = max(1, min(batch_size, 1024))
+        self.batch_delay = max(0.0, batch_delay)
+        self._pending: Dict[str, Dict[str, List["asyncio.Future[bytes]"]]] = {}
+
+    async def _cat_file(
+        self,
+        url: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        **kwargs: Any,
+    ) -> bytes:
+        split = split_chunk_url(url)
+        if split is None or start is not None or end is not None or kwargs:
+            return cast(
+                bytes, await super()._cat_file(url, start=start, end=end, **kwargs)
+            )
+        root, key = split
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[bytes]" = loop.create_future()
+        pending = self._pending.setdefault(root, {})
+        if not pending:
+            loop.call_later(
+                self.batch_delay, lambda: asyncio.ensure_future(self._flush(root))
+            )
+        pending.setdefault(key, []).append(future)
+        return await future
+
+    async def _flush(self, root: str) -> None:
+        pending = self._pending.pop(root, {})
+        keys = list(pending)
+        batches = []
+        for start in range(0, len(keys), self.batch_size):
+            end = start + self.batch_size
+            batches.append({k: pending[k] for k in keys[start:end]})
+        await asyncio.gather(*[self._fetch_batch(root, b) for b in batches])
+
+    async def _fetch_batch(
+        self, root: str, futures: Dict[str, List["asyncio.Future[bytes]"]]
+    ) -> None:
+        try:
+            session = await self.set_session()
+            async with session.post(
+                f"{root}/batch", json={"keys": list(futures)}, **self.kwargs
+            ) as res:
+                if res.status in (404, 405):
+                    logger.debug("%s has no batch endpoint.", root)
+                elif res.status == 200:
+                    async for key, status, payload in iter_batch_frames(res.content):
+                        if status not in (200, 404):
+                            continue
+                        for future in futures.pop(key, []):
+                            if future.done():
+                                continue
+                            if status == 200:
+                                future.set_result(payload)
+                            else:
+                                future.set_exception(FileNotFoundError(key))
+        except Exception as error:
+            logger.debug("Batch request to %s failed: %s", root, error)
+        # Whatever wasn't answered goes the normal way, which also takes
+        # care of retries and proper error reporting.
+        await asyncio.gather(
+            *[
+                self._fetch_single(f"{root}/{key}", futs)
+                for key, futs in futures.items()
+            ]
+        )
+
+    async def _fetch_single(
+        self, url: str, futures: List["asyncio.Future[bytes]"]
+    ) -> None:
+        try:
+            data = await super()._cat_file(url)
+        except Exception as error:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(error)
+        else:
+            for future in futures:
+                if not future.done():
+                    future.set_result(data)
@@ -1,13 +1,24 @@
 """Helper functions for zarr utilities."""
 
 from dataclasses import asdict
-from typing import Dict, List, Literal, Optional, TypedDict, Union
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    TypedDict,
+    Union,
+)
 
 from .auth import authenticate
 from .utils import do_request
 from .utils.databrowser_utils import Config
 from .utils.types import ZarrOptions, ZarrOptionsDict
 
+if TYPE_CHECKING:
+    from fsspec.mapping import FSMap
+
 
 class Status(TypedDict):
     """Representation of the status of a zarr store."""
@@ -392,3 +403,49 @@ def status(
     if res:
         stat = res.json()
     return Status(status=stat["status"], reason=stat["reason"])
+
+
+def batch_store(
+    url: str,
+    headers: Optional[Dict[str, str]] = None,
+    batch_size: int = 256,
+) -> "FSMap":
+    """Open a zarr store that fetches concurrent chunk reads in batches.
+
+    Reading many small chunks, for example a time series at a single grid
+    point, is usually dominated by the per request overhead rather than
+    the amount of data. The returned store groups all chunk reads zarr
+    issues at the same time into a few requests to the batch endpoint of
+    the data portal. Servers without a batch endpoint are read chunk by
+    chunk as usual.
+
+    This needs the optional ``fsspec`` and ``aiohttp`` packages.
+
+    Parameters
+    ~~~~~~~~~~
+
+    url: str
+        The url of the zarr store, as returned by :func:`convert`.
+    headers: Dict[str, str], default: None
+        Non-Public zarr stores will need a valid OAuth2 token.
+    batch_size: int, default: 256
+        Maximum number of chunks fetched by one request.
+
+    Example
+    ~~~~~~~
+
+    .. code-block:: python
+
+        import xarray as xr
+        from freva_client import authenticate
+        from freva_client.zarr_utils import batch_store, convert
+
+        token = authenticate()
+        urls = convert("/mnt/data/test1.nc", zarr_options={"access_pattern": "map"})
+        dset = xr.open_zarr(batch_store(urls[0], headers=token["headers"]))
+        ts = dset["tas"].isel(lon=0, lat=0).load()
+    """
+    from .utils.zarr_store import BatchedHTTPFileSystem
+
+    fs = BatchedHTTPFileSystem(batch_size=batch_size, headers=headers or {})
+    return fs.get_mapper(url)
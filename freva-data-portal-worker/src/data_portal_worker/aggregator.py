@@ -12,16 +12,24 @@ from typing import (
     Mapping,
     Optional,
     Protocol,
+    Sequence,
+    Tuple,
     TypedDict,
     cast,
 )
 
+import numpy as np
 import xarray as xr
 from xarray.core.types import ZarrWriteModes
 
+from .reducer import find_time_dim
 from .utils import data_logger
 from .zarr_utils import jsonify_zmetadata
 
+CATALOGUE_TIME_KEY = "catalogue_time"
+"""Dataset encoding key of the ``(start, end)`` time range of a file, as
+recorded in the search catalogue."""
+
 
 class RedisLike(Protocol):
     """
@@ -183,6 +191,68 @@ def _guess_concat_dim(dsets: Iterable[xr.Dataset]) -> Optional[str]:
     return None
 
 
+def parse_time_range(value: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Parse a catalogue time range like ``[2000-01-01T00:00:00Z TO ...]``.
+
+    The bounds are returned as ISO strings without the ``Z``, which sort in
+    time order for any calendar. ``None`` if the range can't be parsed.
+    """
+    start, sep, end = (value or "").strip("[] ").partition(" TO ")
+    bounds = tuple(b.strip().rstrip("Z") for b in (start, end))
+    if not sep or not all(len(b) >= 10 and b[4] == "-" for b in bounds):
+        return None
+    return bounds[0], bounds[1]
+
+
+def _time_order(
+    dsets: Sequence[xr.Dataset], dim: str
+) -> Optional[List[xr.Dataset]]:
+    """Order datasets along their time axis, if they follow each other.
+
+    The order comes from the catalogue time ranges of the datasets if all of
+    them have one, else from the first time step. Only the in-memory time
+    index and the attributes are inspected: every dataset needs the same
+    variables, grid and time units, and its time steps have to lie strictly
+    between those of its neighbours.
+
+    Returns
+    -------
+    list[xr.Dataset], None: The ordered datasets, ``None`` if they don't
+                            form a contiguous time series.
+    """
+    first = dsets[0]
+    other_dims = {d: n for d, n in first.sizes.items() if d != dim}
+    time_attrs = {k: first[dim].attrs.get(k) for k in ("units", "calendar")}
+    for ds in dsets:
+        if (
+            dim not in ds.indexes
+            or set(ds.data_vars) != set(first.data_vars)
+            or {d: n for d, n in ds.sizes.items() if d != dim} != other_dims
+            or {k: ds[dim].attrs.get(k) for k in time_attrs} != time_attrs
+            or not ds.indexes[dim].is_monotonic_increasing
+            or len(ds.indexes[dim]) == 0
+        ):
+            return None
+        for name, index in ds.indexes.items():
+            if name != dim and not np.array_equal(index, first.indexes[name]):
+                return None
+    ranges: List[Tuple[str, str]] = [
+        tuple(ds.encoding.get(CATALOGUE_TIME_KEY) or ()) for ds in dsets
+    ]
+    if all(ranges):
+        order = sorted(range(len(dsets)), key=lambda i: ranges[i])
+        for num, nxt in zip(order, order[1:]):
+            if not ranges[num][1] < ranges[nxt][0]:
+                return None
+    else:
+        order = sorted(range(len(dsets)), key=lambda i: dsets[i].indexes[dim][0])
+    ordered = [dsets[i] for i in order]
+    for prev, this in zip(ordered, ordered[1:]):
+        if not prev.indexes[dim][-1] < this.indexes[dim][0]:
+            return None
+    return ordered
+
+
 def _grid_signature(ds: xr.Dataset) -> str:
     """
     Build a stable-ish signature for grouping datasets.
@@ -366,6 +436,9 @@ class DatasetAggregator:
         )
         try:
             prepped = [self._apply_regrid(ds) for ds in datasets]
+            combined = self._time_concat(prepped, agg_plan)
+            if combined is not None:
+                return {"root": combined}
             if agg_plan.get("mode", "auto") == "auto":
                 combined = self._simple_combine(prepped, agg_plan)
                 if combined:
@@ -478,6 +551,44 @@ class DatasetAggregator:
             ),
         )
 
+    def _time_concat(
+        self, dsets: list[xr.Dataset], plan: AggregationOptions
+    ) -> Optional[xr.Dataset]:
+        """Concatenate the files of a time series without comparing them.
+
+        The files of a search usually are consecutive pieces of one time
+        series. ``combine_by_coords`` finds that out by sorting and comparing
+        the coordinates and variables of all files, which takes long for
+        hundreds of them. Here they are ordered by their catalogue time
+        ranges and checked with :func:`_time_order`. If that fails, the
+        generic planner takes over.
+        """
+        mode = plan.get("mode", "auto")
+        if (
+            len(dsets) < 2
+            or mode not in ("auto", "concat")
+            or plan.get("group_by")
+            or plan.get("compat", "override") != "override"
+        ):
+            return None
+        dim = find_time_dim(dsets[0])
+        if dim is None or plan.get("dim") not in (None, dim):
+            return None
+        ordered = _time_order(dsets, dim)
+        if ordered is None:
+            data_logger.debug("Inputs aren't a contiguous series along %s", dim)
+            return None
+        data_logger.info("Concatenating %i files along %s", len(dsets), dim)
+        return xr.concat(
+            ordered,
+            dim=dim,
+            data_vars=plan.get("data_vars") or "minimal",
+            coords=plan.get("coords") or "minimal",
+            compat="override",
+            join="override",
+            combine_attrs="override",
+        )
+
     def _simple_combine(
         self, dsets: list[xr.Dataset], plan: AggregationOptions
     ) -> Optional[xr.Dataset]:
@@ -1,5 +1,6 @@
 """Load data files."""
 
+from typing import Any
 from urllib.parse import urlparse
 
 import xarray as xr
@@ -7,7 +8,7 @@ import xarray as xr
 from .posix_and_cloud import posix_and_cloud
 
 
-def load_data(inp_path: str) -> xr.Dataset:
+def load_data(inp_path: str, **kwargs: Any) -> xr.Dataset:
     """Open an xarray dataset.
 
     Parameters
@@ -15,6 +16,8 @@ def load_data(inp_path: str) -> xr.Dataset:
 
     inp_path: str
         Uri (Path or URL) to the data object that should be opened.
+    **kwargs:
+        Additional arguments for the backend, e.g. ``chunks``.
 
     Returns
     -------
@@ -32,4 +35,6 @@ def load_data(inp_path: str) -> xr.Dataset:
         "s3": posix_and_cloud,
         "gs": posix_and_cloud,
     }
-    return implemented_methods.get(parsed_url.scheme, posix_and_cloud)(inp_path)
+    return implemented_methods.get(parsed_url.scheme, posix_and_cloud)(
+        inp_path, **kwargs
+    )
@@ -10,15 +10,20 @@ import xarray as xr
 def posix_and_cloud(
     inp_file: Union[str, Path], chunk_size: float = 16.0, **kwargs: Any
 ) -> xr.Dataset:
-    """Open a dataset with xarray."""
+    """Open a dataset with xarray.
+
+    The variables are dask arrays with ``auto`` chunks, unless ``chunks`` is
+    given, ``chunks=None`` opens them as lazily indexed arrays.
+    """
     engine = "prism"
     inp_str = str(inp_file)
     parsed = urlparse(inp_str)
     target: Union[str, Path]
     target = Path(inp_str) if parsed.scheme in ("", "file") else inp_str
-    _ = kwargs.pop("chunks", None)
+    chunks = kwargs.pop("chunks", "auto")
     for key in ("decode_cf", "cache", "decode_coords"):
         kwargs[key] = False
-    kwargs["chunks"] = "auto"
+    kwargs["chunks"] = chunks
     kwargs["engine"] = engine
-    return xr.open_dataset(target, **kwargs).unify_chunks()
+    dset = xr.open_dataset(target, **kwargs)
+    return dset if chunks is None else dset.unify_chunks()
@@ -0,0 +1,280 @@
+"""Compressors of the served stores.
+
+By default a served array keeps the compressor its source was written
+with, or :data:`~.zarr_utils.default_compressor` if it had none. The
+compressor decides both the CPU time the worker spends on every chunk and
+the bytes that cross the wire, which is why clients can choose it with the
+``compressor`` option of the store encoding:
+
+``none``
+    No compression, the cheapest option for the worker.
+``auto``
+    Blosc with LZ4 and byte shuffling for numeric arrays with chunks of at
+    least :data:`AUTO_MIN_BYTES`, other arrays keep their compressor.
+``blosc-<cname>[:<level>]``
+    Blosc with one of :data:`BLOSC_CNAMES`.
+``zstd[:<level>]``, ``zlib[:<level>]``, ``gzip[:<level>]``
+    The stand-alone codecs.
+
+Float data variables can additionally be rounded to fewer mantissa bits
+before compression (:func:`set_bitround`). Rounded mantissas end in long
+runs of zeros, which compress several times better. The number of kept
+bits is either fixed, or derived from the *real information* of the data
+[Klöwer et al., 2021, Nat Comput Sci 1, 713-724]: bits whose value can't be
+told from their neighbours carry noise, not information, and are dropped.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Mapping, Optional, cast
+
+import numcodecs
+import numpy as np
+import xarray as xr
+from numcodecs import blosc
+from numcodecs.abc import Codec
+from xarray.backends.zarr import encode_zarr_variable
+
+from .executor import dask_executor
+from .utils import data_logger, str_to_int
+
+BLOSC_CNAMES = ("blosclz", "lz4", "lz4hc", "zlib", "zstd")
+"""Compressors that can be used within Blosc."""
+LEVELS = {"blosc": (0, 9, 5), "zlib": (0, 9, 1), "gzip": (0, 9, 1), "zstd": (1, 22, 3)}
+"""Lowest, highest and default level of the codecs."""
+AUTO_MIN_BYTES = 64 * 1024
+"""Chunk size from which ``auto`` switches numeric arrays to Blosc."""
+MANTISSA_BITS = {2: 10, 4: 23, 8: 52}
+"""Mantissa bits of the float types, by item size."""
+SAMPLE_SIZE = 2**20
+"""Values from which the information of the bits is estimated."""
+
+
+def compressor_config(spec: str) -> Optional[Dict[str, Any]]:
+    """Get the numcodecs config of a compressor option.
+
+    Parameters
+    ----------
+    spec: str
+        The compressor option, e.g. ``blosc-zstd:3``, but not ``auto``
+        which depends on the array.
+
+    Returns
+    -------
+    dict, None: The codec config, ``None`` for ``none``.
+
+    Raises
+    ------
+    ValueError: If the option isn't valid.
+    """
+    if spec == "none":
+        return None
+    name, _, level_str = spec.partition(":")
+    codec, _, cname = name.partition("-")
+    if codec not in LEVELS or (codec == "blosc") != bool(cname):
+        raise ValueError(f"Unknown compressor {spec!r}.")
+    if cname and cname not in BLOSC_CNAMES:
+        raise ValueError(f"Blosc doesn't support {cname!r}.")
+    low, high, default = LEVELS[codec]
+    if level_str and not level_str.isdigit():
+        raise ValueError(f"Invalid level {level_str!r} of {codec}.")
+    level = int(level_str) if level_str else default
+    if not low <= level <= high:
+        raise ValueError(f"The level of {codec} must be within {low}-{high}.")
+    if codec == "blosc":
+        compressor: Codec = numcodecs.Blosc(
+            cname=cname, clevel=level, shuffle=numcodecs.Blosc.SHUFFLE
+        )
+    elif codec == "zstd":
+        compressor = numcodecs.Zstd(level=level)
+    elif codec == "zlib":
+        compressor = numcodecs.Zlib(level=level)
+    else:
+        compressor = numcodecs.GZip(level=level)
+    return dict(compressor.get_config())
+
+
+def _auto_config(zarray: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Pick the compressor of an array in ``auto`` mode."""
+    dtype = np.dtype(zarray["dtype"])
+    chunk_bytes = int(np.prod(zarray["chunks"])) * dtype.itemsize
+    if dtype.kind not in "biufcmM" or chunk_bytes < AUTO_MIN_BYTES:
+        return zarray.get("compressor")
+    return compressor_config("blosc-lz4:5")
+
+
+def set_compressor(zmetadata: Dict[str, Any], spec: str) -> None:
+    """Set the compressor of all arrays of a consolidated ``.zmetadata``.
+
+    Parameters
+    ----------
+    zmetadata: dict
+        The consolidated metadata, changed in place.
+    spec: str
+        The compressor option, see the module documentation.
+    """
+    for key, zarray in zmetadata["metadata"].items():
+        if key.rpartition("/")[-1] != ".zarray":
+            continue
+        if spec == "auto":
+            zarray["compressor"] = _auto_config(zarray)
+        else:
+            zarray["compressor"] = compressor_config(spec)
+
+
+def configure_blosc() -> None:
+    """Set the Blosc threads from ``API_WORKER_BLOSC_THREADS``.
+
+    Blosc only uses its internal threads under a global lock, chunks of
+    different requests are then compressed one after another. That pays off
+    for big chunks and few concurrent clients, by default every chunk is
+    compressed by a single thread.
+    """
+    threads = str_to_int(os.getenv("API_WORKER_BLOSC_THREADS"), 0)
+    if threads > 0:
+        blosc.set_nthreads(threads)
+        blosc.use_threads = threads > 1
+        data_logger.debug("Compressing Blosc chunks with %i threads", threads)
+
+
+def _binary_entropy(p: float) -> float:
+    return float(-p * np.log2(p) - (1 - p) * np.log2(1 - p))
+
+
+def bit_information(values: np.typing.NDArray[Any]) -> np.typing.NDArray[Any]:
+    """Get the real information of every bit of a float array.
+
+    The information of a bit is the mutual information of the bit in
+    neighbouring elements along the last axis. Information that a random
+    bit would show with 99% confidence is set to zero.
+
+    Returns
+    -------
+    np.ndarray: The information per bit, sign bit first.
+    """
+    nbits = values.dtype.itemsize * 8
+    ints = values.view(f"u{values.dtype.itemsize}")
+    finite = np.isfinite(values)
+    pairs = finite[..., :-1] & finite[..., 1:]
+    first, second = ints[..., :-1][pairs], ints[..., 1:][pairs]
+    info = np.zeros(nbits)
+    if first.size == 0:
+        return info
+    # Mutual information of random bits is only zero for infinite samples.
+    confidence = 0.5 + 2.576 / (2 * np.sqrt(first.size))
+    noise = 1 - _binary_entropy(min(confidence, 1 - 1e-12))
+    for bit in range(nbits):
+        shift = first.dtype.type(nbits - 1 - bit)
+        x = ((first >> shift) & 1).astype(np.int8)
+        y = ((second >> shift) & 1).astype(np.int8)
+        joint = np.bincount(2 * x + y, minlength=4).reshape(2, 2) / first.size
+        marginal = np.outer(joint.sum(axis=1), joint.sum(axis=0))
+        mask = joint > 0
+        mutual = float(np.sum(joint[mask] * np.log2(joint[mask] / marginal[mask])))
+        info[bit] = mutual if mutual > noise else 0.0
+    return info
+
+
+def information_keepbits(values: np.typing.NDArray[Any], level: float) -> int:
+    """Get the mantissa bits that hold ``level`` of the real information.
+
+    Parameters
+    ----------
+    values: np.ndarray
+        A sample of the float data.
+    level: float
+        The fraction of the information to keep, e.g. ``0.99``.
+
+    Returns
+    -------
+    int: The mantissa bits to keep, all of them if the sample has no
+         information to measure.
+    """
+    mantissa = MANTISSA_BITS[values.dtype.itemsize]
+    if values.ndim == 0 or values.shape[-1] < 2:
+        return mantissa
+    rows = max(1, SAMPLE_SIZE // values.shape[-1])
+    info = bit_information(values.reshape(-1, values.shape[-1])[:rows])
+    if info.sum() == 0:
+        return mantissa
+    exponent = len(info) - mantissa - 1
+    needed = int(np.argmax(np.cumsum(info) >= level * info.sum()))
+    return int(min(max(needed - exponent, 1), mantissa))
+
+
+def _sample(var: xr.Variable) -> np.typing.NDArray[Any]:
+    """Get the first block of the encoded data of a variable."""
+    data = encode_zarr_variable(var).data
+    if isinstance(data, np.ndarray):
+        return data
+    block = data.blocks[(0,) * data.ndim]
+    return np.asarray(dask_executor().compute(block)[0])
+
+
+def _round_scalar(value: Any, codec: Codec, dtype: np.dtype[Any]) -> Any:
+    """Round a fill value like the data, so clients still recognise it."""
+    if not isinstance(value, (int, float)) or not np.isfinite(value):
+        return value
+    rounded = codec.encode(np.array([value], dtype=dtype)).view(dtype)[0]
+    return float(rounded)
+
+
+def set_bitround(
+    zmetadata: Dict[str, Any],
+    dsets: Mapping[str, xr.Dataset],
+    keepbits: Optional[int] = None,
+    information: Optional[float] = None,
+) -> Dict[str, int]:
+    """Round the float data variables of a store to fewer mantissa bits.
+
+    A ``bitround`` filter is put in front of the filters in the ``.zarray``
+    of the variables. Coordinates keep their full precision.
+
+    Parameters
+    ----------
+    zmetadata: dict
+        The consolidated metadata, changed in place.
+    dsets: dict[str, xr.Dataset]
+        The datasets of the store by group.
+    keepbits: int, default: None
+        Mantissa bits to keep.
+    information: float, default: None
+        The fraction of the real information to keep, if ``keepbits`` isn't
+        given. The bits are derived from the first chunk of every variable.
+
+    Returns
+    -------
+    dict[str, int]: The kept mantissa bits by variable.
+    """
+    kept: Dict[str, int] = {}
+    if keepbits is None and information is None:
+        return kept
+    for group, dset in dsets.items():
+        prefix = "" if group == "root" else f"{group}/"
+        for name, var in dset.data_vars.items():
+            zarray = zmetadata["metadata"].get(f"{prefix}{name}/.zarray")
+            dtype = np.dtype(zarray["dtype"]) if zarray else None
+            if dtype is None or dtype.kind != "f":
+                continue
+            bits = keepbits
+            if bits is None:
+                level = cast(float, information)
+                try:
+                    bits = information_keepbits(_sample(var.variable), level)
+                except Exception as error:
+                    data_logger.warning("Not rounding %s: %s", name, error)
+                    continue
+            bits = min(bits, MANTISSA_BITS[dtype.itemsize])
+            if bits == MANTISSA_BITS[dtype.itemsize]:
+                continue
+            codec = numcodecs.BitRound(keepbits=bits)
+            zarray["filters"] = [codec.get_config()] + (zarray.get("filters") or [])
+            zarray["fill_value"] = _round_scalar(zarray["fill_value"], codec, dtype)
+            zattrs = zmetadata["metadata"].get(f"{prefix}{name}/.zattrs", {})
+            if "missing_value" in zattrs:
+                zattrs["missing_value"] = _round_scalar(
+                    zattrs["missing_value"], codec, dtype
+                )
+            kept[f"{prefix}{name}"] = bits
+    return kept
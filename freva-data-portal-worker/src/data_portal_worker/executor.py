@@ -0,0 +1,351 @@
+"""Bounded, prioritised execution of broker messages.
+
+Every broker message used to get a thread of its own. A burst of chunk
+requests then created thousands of threads fighting over the GIL, and a slow
+dataset load competed with cheap chunk reads on equal footing. The
+:class:`LaneExecutor` runs the work in a fixed number of threads instead.
+Work is sorted into lanes; a free thread always picks the oldest task of the
+most important lane that hasn't reached its concurrency limit yet.
+
+The dask graphs of the chunks are computed by one :class:`DaskExecutor` per
+process, so that concurrent chunk requests share one bounded pool instead
+of each starting a scheduler of its own.
+"""
+
+from __future__ import annotations
+
+import atexit
+import functools
+import os
+import threading
+from collections import deque
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Mapping,
+    Optional,
+    Tuple,
+    TypeVar,
+    cast,
+)
+
+from dask.base import compute
+from dask.utils import format_bytes, parse_bytes
+
+from .utils import data_logger, str_to_int
+
+SCHEDULERS = ("threads", "processes", "synchronous", "distributed")
+"""The dask schedulers the chunks can be computed with."""
+
+LANES: Dict[str, int] = {
+    "access": 4,
+    "chunk": 16,
+    "shard": 4,
+    "load": 2,
+    "prefetch": 2,
+}
+"""The lanes by priority and the number of tasks each may run at once."""
+
+Task = Tuple[Callable[..., Any], Tuple[Any, ...], Dict[str, Any]]
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def _lanes_from_env(env_var: str = "API_WORKER_LANES") -> Dict[str, int]:
+    """Read lane concurrency limits, e.g. ``chunk=32,load=4``."""
+    lanes = LANES.copy()
+    for entry in os.getenv(env_var, "").split(","):
+        lane, _, limit = entry.partition("=")
+        lane = lane.strip()
+        if lane in lanes and limit.strip().isdigit():
+            lanes[lane] = max(1, int(limit))
+        elif entry.strip():
+            data_logger.warning("Ignoring invalid lane setting %r", entry)
+    return lanes
+
+
+class LaneExecutor:
+    """Run tasks in a bounded pool of threads, lane by lane.
+
+    Parameters
+    ----------
+    lanes: dict[str, int], default: None
+        Concurrency limit of each lane. The order of the lanes is their
+        priority. Defaults to :data:`LANES`, adjusted by the
+        ``API_WORKER_LANES`` environment variable.
+    max_workers: int, default: None
+        Number of threads shared by all lanes. Defaults to
+        ``API_WORKER_THREADS`` or ``cpu_count + 4`` (at most 32).
+    max_queued: int, default: None
+        Number of tasks that may wait for a thread before
+        :meth:`wait_for_capacity` blocks. Defaults to ``API_WORKER_BACKLOG``
+        or 1024.
+    """
+
+    def __init__(
+        self,
+        lanes: Optional[Mapping[str, int]] = None,
+        max_workers: Optional[int] = None,
+        max_queued: Optional[int] = None,
+    ) -> None:
+        self.limits = dict(lanes or _lanes_from_env())
+        self.max_workers = max(
+            1,
+            max_workers
+            or str_to_int(os.getenv("API_WORKER_THREADS"), 0)
+            or min(32, (os.cpu_count() or 1) + 4),
+        )
+        self.max_queued = max(
+            1, max_queued or str_to_int(os.getenv("API_WORKER_BACKLOG"), 1024)
+        )
+        self._queues: Dict[str, Deque[Task]] = {k: deque() for k in self.limits}
+        self._running = dict.fromkeys(self.limits, 0)
+        self._cond = threading.Condition()
+        self._shutdown = False
+        self._threads = [
+            threading.Thread(
+                target=self._work, daemon=True, name=f"data-loader-worker-{num}"
+            )
+            for num in range(self.max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def queued(self) -> int:
+        """Number of tasks that wait for a thread."""
+        with self._cond:
+            return self._queued()
+
+    def _queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def submit(
+        self, lane: str, func: Callable[..., Any], *args: Any, **kwargs: Any
+    ) -> None:
+        """Queue ``func(*args, **kwargs)`` in ``lane``."""
+        with self._cond:
+            self._queues[lane].append((func, args, kwargs))
+            # The broker loop may wait on the same condition, notify
+            # everyone so that a worker is among the woken threads.
+            self._cond.notify_all()
+
+    def wait_for_capacity(self, timeout: Optional[float] = None) -> bool:
+        """Block while the backlog is full.
+
+        Returns
+        -------
+        bool: ``False`` if the backlog was still full after ``timeout``.
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._queued() < self.max_queued, timeout=timeout
+            )
+
+    def shutdown(self, timeout: Optional[float] = 10.0) -> None:
+        """Drop the waiting tasks and wait for the running ones to finish."""
+        with self._cond:
+            self._shutdown = True
+            for queue in self._queues.values():
+                queue.clear()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _next_task(self) -> Optional[Tuple[str, Task]]:
+        for lane, queue in self._queues.items():
+            if queue and self._running[lane] < self.limits[lane]:
+                self._running[lane] += 1
+                return lane, queue.popleft()
+        return None
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    if self._shutdown:
+                        return
+                    self._cond.wait()
+                    task = self._next_task()
+            lane, (func, args, kwargs) = task
+            try:
+                func(*args, **kwargs)
+            except Exception as error:
+                data_logger.exception("Task in lane %s failed: %s", lane, error)
+            finally:
+                with self._cond:
+                    self._running[lane] -= 1
+                    # Wake both idle workers, whose lane may now have room,
+                    # and a broker loop waiting for capacity.
+                    self._cond.notify_all()
+
+
+_DEFAULT_EXECUTOR: Optional[LaneExecutor] = None
+_DEFAULT_EXECUTOR_LOCK = threading.Lock()
+
+
+def default_executor() -> LaneExecutor:
+    """Get the executor shared by all loaders of this process."""
+    global _DEFAULT_EXECUTOR
+    with _DEFAULT_EXECUTOR_LOCK:
+        if _DEFAULT_EXECUTOR is None:
+            _DEFAULT_EXECUTOR = LaneExecutor()
+            # Daemon threads that are still reading files when the
+            # interpreter is torn down can crash it, stop them before.
+            atexit.register(_DEFAULT_EXECUTOR.shutdown)
+        return _DEFAULT_EXECUTOR
+
+
+def lane_task(lane: str) -> Callable[[F], F]:
+    """Run the decorated method in ``lane`` of the instance's ``executor``."""
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(self: Any, *args: Any, **kwargs: Any) -> None:
+            self.executor.submit(lane, func, self, *args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+@dataclass
+class DaskSettings:
+    """How the dask graphs of the chunks are computed.
+
+    Parameters
+    ----------
+    scheduler: str, default: threads
+        One of :data:`SCHEDULERS`. ``distributed`` starts a local cluster and
+        needs the ``distributed`` package.
+    threads: int, default: 0
+        Size of the shared pool, threads per worker for ``distributed``.
+        ``0`` uses one per CPU.
+    workers: int, default: 1
+        Worker processes of the ``distributed`` cluster.
+    memory_limit: int, default: None
+        Bytes a single chunk computation may produce, the memory limit of
+        each worker for ``distributed``.
+    """
+
+    scheduler: str = "threads"
+    threads: int = 0
+    workers: int = 1
+    memory_limit: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "DaskSettings":
+        """Read the settings from the ``API_WORKER_DASK_*`` variables."""
+        scheduler = os.getenv("API_WORKER_DASK_SCHEDULER", "threads").lower()
+        if scheduler not in SCHEDULERS:
+            data_logger.warning("Ignoring invalid dask scheduler %r", scheduler)
+            scheduler = "threads"
+        memory = os.getenv("API_WORKER_DASK_MEMORY")
+        return cls(
+            scheduler=scheduler,
+            threads=max(0, str_to_int(os.getenv("API_WORKER_DASK_THREADS"), 0)),
+            workers=max(1, str_to_int(os.getenv("API_WORKER_DASK_WORKERS"), 1)),
+            memory_limit=parse_bytes(memory) if memory else None,
+        )
+
+
+class DaskExecutor:
+    """Compute dask collections in a pool shared by all chunk requests.
+
+    Parameters
+    ----------
+    settings: DaskSettings, default: None
+        Defaults to :meth:`DaskSettings.from_env`.
+    """
+
+    def __init__(self, settings: Optional[DaskSettings] = None) -> None:
+        self.settings = settings or DaskSettings.from_env()
+        self._lock = threading.Lock()
+        self._pool: Optional[Executor] = None
+        self._client: Any = None
+
+    @property
+    def size(self) -> int:
+        """Number of tasks that run at once (per worker)."""
+        return self.settings.threads or os.cpu_count() or 1
+
+    def _scheduler_kwargs(self) -> Dict[str, Any]:
+        with self._lock:
+            scheduler = self.settings.scheduler
+            if scheduler == "distributed" and self._client is None:
+                try:
+                    from distributed import Client, LocalCluster
+                except ImportError:
+                    data_logger.warning(
+                        "distributed isn't installed, using threads instead."
+                    )
+                    scheduler = self.settings.scheduler = "threads"
+                else:
+                    cluster = LocalCluster(
+                        n_workers=self.settings.workers,
+                        threads_per_worker=self.size,
+                        memory_limit=self.settings.memory_limit or "auto",
+                        dashboard_address=None,
+                    )
+                    self._client = Client(cluster, set_as_default=False)
+            if scheduler == "distributed":
+                return {"scheduler": self._client}
+            if scheduler == "synchronous":
+                return {"scheduler": "synchronous"}
+            if self._pool is None:
+                pool_cls = (
+                    ProcessPoolExecutor
+                    if scheduler == "processes"
+                    else ThreadPoolExecutor
+                )
+                self._pool = pool_cls(self.size)
+            return {"scheduler": scheduler, "pool": self._pool}
+
+    def compute(self, *collections: Any) -> Tuple[Any, ...]:
+        """Compute dask collections, like :func:`dask.compute`.
+
+        Raises
+        ------
+        MemoryError: If a collection is bigger than the memory limit.
+        """
+        limit = self.settings.memory_limit
+        for collection in collections:
+            nbytes = getattr(collection, "nbytes", 0)
+            if limit and nbytes > limit:
+                raise MemoryError(
+                    f"Chunk of {format_bytes(nbytes)} exceeds the limit of "
+                    f"{format_bytes(limit)}."
+                )
+        return cast(Tuple[Any, ...], compute(*collections, **self._scheduler_kwargs()))
+
+    def shutdown(self) -> None:
+        """Stop the pool or cluster."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+            if self._client is not None:
+                self._client.close()
+                self._client.cluster.close()
+                self._client = None
+
+
+_DASK_EXECUTOR: Optional[DaskExecutor] = None
+
+
+def dask_executor() -> DaskExecutor:
+    """Get the dask executor shared by all chunk computations."""
+    global _DASK_EXECUTOR
+    with _DEFAULT_EXECUTOR_LOCK:
+        if _DASK_EXECUTOR is None:
+            _DASK_EXECUTOR = DaskExecutor()
+            atexit.register(_DASK_EXECUTOR.shutdown)
+        return _DASK_EXECUTOR
@@ -6,6 +6,7 @@ import os
 import ssl
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
@@ -15,17 +16,20 @@ from typing import (
     List,
     Literal,
     Optional,
+    Sequence,
     Tuple,
     Type,
     TypedDict,
     Union,
     cast,
 )
+from urllib.parse import urlparse
 
 import cloudpickle
 import numcodecs
 import xarray as xr
-from cachetools import TTLCache
+from dask.utils import parse_bytes
+from numcodecs.abc import Codec
 from redis import BlockingConnectionPool, Connection, SSLConnection
 from redis.backoff import ExponentialBackoff
 from redis.client import Redis
@@ -34,27 +38,87 @@ from redis.retry import Retry
 from xarray.backends.zarr import encode_zarr_variable
 
 from ._cache_manager import CacheScheduler
-from .aggregator import DatasetAggregator, write_grouped_zarr
+from .aggregator import (
+    CATALOGUE_TIME_KEY,
+    DatasetAggregator,
+    parse_time_range,
+    write_grouped_zarr,
+)
 from .backends import load_data
-from .rechunker import ChunkOptimizer
-from .reducer import plan_removes_spatial_dims, reduce_datasets
+from .compression import configure_blosc, set_bitround, set_compressor
+from .executor import LaneExecutor, default_executor, lane_task
+from .materialise import (
+    materialise,
+    materialised_dir,
+    open_materialised,
+    should_materialise,
+)
+from .object_cache import ObjectCache
+from .passthrough import (
+    NATIVE_KEY,
+    NativeRef,
+    native_references,
+    read_native_chunk,
+)
+from .prefetch import CHUNK_PLAN_KEY, Prefetcher, next_chunk_ids
+from .rechunker import ChunkOptimizer, ChunkPlan
+from .reducer import (
+    plan_removes_spatial_dims,
+    reduce_datasets,
+    select_variables,
+)
+from .routing import TokenRouter, member_name
 from .sanitizer import sanitize_message
+from .schema_cache import schema_cache
 from .utils import (
     JSONObject,
-    background_task,
     data_logger,
     str_to_int,
     user_can_read,
     xr_repr_html,
 )
 from .zarr_utils import (
+    assemble_shard,
+    create_v3_metadata,
     encode_chunk,
     get_data_chunk,
+    get_data_chunks,
+    shard_chunk_ids,
 )
 
 ZARR_CONSOLIDATED_FORMAT = 1
 ZARR_FORMAT = 2
 ZARRAY_JSON = ".zarray"
+CHUNK_CACHE_TTL = 360
+"""Seconds an encoded chunk stays in the cache."""
+BROKER_QUEUES = ("access", "chunk", "load")
+"""Suffixes of the per message type queues of a channel, by priority."""
+
+
+def _get_compressor(arr_meta: Dict[str, Any]) -> Optional[Codec]:
+    """Get the compressor of an array from its ``.zarray`` metadata."""
+    if arr_meta.get("compressor"):
+        return numcodecs.get_codec(arr_meta["compressor"])
+    return None
+
+
+def _get_filters(arr_meta: Dict[str, Any]) -> Optional[List[Codec]]:
+    """Get the filters of an array from its ``.zarray`` metadata."""
+    if arr_meta.get("filters"):
+        return [numcodecs.get_codec(f) for f in arr_meta["filters"]]
+    return None
+
+
+def _native_chunk(var: xr.Variable, chunk: str) -> Optional[bytes]:
+    """Read a chunk straight from the input file, if the variable allows."""
+    ref: Optional[NativeRef] = var.encoding.get(NATIVE_KEY)
+    if ref is None:
+        return None
+    try:
+        return read_native_chunk(ref, chunk)
+    except Exception as error:
+        data_logger.debug("Could not read chunk %s from file: %s", chunk, error)
+        return None
 
 
 class StateEnum(Enum):
@@ -85,6 +149,87 @@ class LoadDict(TypedDict, total=False):
     reason: str
     data: Optional[Union[bytes, JSONObject]]
     repr_html: str
+    zarr_json: JSONObject
+
+
+class OpenRecipe(TypedDict):
+    """Everything needed to open the lazy datasets of a store again."""
+
+    paths: List[str]
+    mtimes: List[Optional[float]]
+    assembly: Optional[Dict[str, Optional[str]]]
+    reduce: Optional[Dict[str, Any]]
+    access_pattern: Literal["time_series", "map"]
+    map_primary_chunksize: int
+    chunk_size: float
+    references: Dict[str, NativeRef]
+    time_ranges: Dict[str, str]
+
+
+def _open_input(path: str) -> xr.Dataset:
+    cache = schema_cache()
+    return load_data(path) if cache is None else cache.open(path, load_data)
+
+
+def open_datasets(
+    paths: List[str], max_workers: Optional[int] = None
+) -> List[xr.Dataset]:
+    """Open the input files of a store concurrently.
+
+    Opening a file reads its header and coordinates, which is mostly waiting
+    for the (network) file system. Files are therefore opened by a small
+    pool of threads, a file that is listed twice is opened once. Files
+    whose layout is known to the :func:`schema_cache` aren't touched at all
+    until their data is read. A file that fails doesn't affect the others,
+    every failure is logged and the first one, in the order of ``paths``,
+    is raised once all files were tried.
+
+    Parameters
+    ----------
+    paths: list[str]
+        The input files.
+    max_workers: int, default: None
+        Number of files that are opened at once. Defaults to
+        ``API_WORKER_OPEN_THREADS`` or 16.
+
+    Returns
+    -------
+    list[xr.Dataset]: The datasets in the order of ``paths``.
+    """
+    max_workers = max_workers or str_to_int(os.getenv("API_WORKER_OPEN_THREADS"), 16)
+    unique = list(dict.fromkeys(paths))
+    if len(unique) < 2 or max_workers < 2:
+        opened = {p: _open_input(p) for p in unique}
+        return [opened[p] for p in paths]
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(unique)), thread_name_prefix="open"
+    ) as pool:
+        futures = {p: pool.submit(_open_input, p) for p in unique}
+    errors: List[Exception] = []
+    for path, future in futures.items():
+        error = future.exception()
+        if error is not None:
+            data_logger.warning("Could not open %s: %s", path, error)
+            errors.append(cast(Exception, error))
+    if errors:
+        raise errors[0]
+    return [futures[p].result() for p in paths]
+
+
+def _attach_references(
+    dsets: Dict[str, xr.Dataset], refs: Dict[str, NativeRef]
+) -> None:
+    """Mark the variables whose chunks are read straight from the file."""
+    for name, ref in refs.items():
+        dsets["root"].variables[name].encoding[NATIVE_KEY] = ref
+
+
+def _mtime(path: str) -> Optional[float]:
+    """Get the modification time of a local file, ``None`` for urls."""
+    parsed = urlparse(path)
+    if parsed.scheme not in ("", "file"):
+        return None
+    return os.stat(parsed.path if parsed.scheme else path).st_mtime
 
 
 class RedisKw(TypedDict, total=False):
@@ -246,7 +391,7 @@ class LoadStatus:
     @classmethod
     def from_dict(cls, load_dict: LoadDict) -> "LoadStatus":
         """Create an instance of the class from a normal python dict."""
-        _dict = LoadDict(
+        return cls(
             status=load_dict.get("status") or StateEnum.waiting.value,
             reason=load_dict.get("reason", ""),
             url=load_dict.get("url", ""),
@@ -254,7 +399,6 @@ class LoadStatus:
             data=load_dict.get("data"),
             repr_html=load_dict.get("repr_html", cls.repr_html),
         )
-        return cls(**_dict)
 
 
 class DataLoadFactory:
@@ -284,6 +428,7 @@ class DataLoadFactory:
         ssl_certfile: Optional[str] = None,
     ) -> None:
         self._cache: Optional[Redis] = None
+        self._executor: Optional[LaneExecutor] = None
         # Per-process, per-instance cache: avoids re-deserialising the
         # cloudpickle blob for every concurrent get_zarr_chunk thread.
         self._connection_args: Dict[str, Optional[str]] = {
@@ -293,13 +438,12 @@ class DataLoadFactory:
             "ssl_keyfile": ssl_keyfile,
             "ssl_certfile": ssl_certfile,
         }
-        self._object_cache: TTLCache[
-            str, Optional[Tuple[Dict[str, Any], Dict[str, xr.Dataset]]]
-        ] = TTLCache(
-            maxsize=int(os.environ.get("API_OBJECT_CACHE_SIZE", "32")),
-            ttl=int(os.environ.get("API_CACHE_EXP", "3600")),
-        )
+        self._object_cache = ObjectCache()
+        # Chunks expire from the cache, don't trust them for too long.
+        self.prefetcher = Prefetcher(ttl=CHUNK_CACHE_TTL / 2)
         self._object_cache_lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        configure_blosc()
 
     def _evict_object_cache(self, key: str) -> None:
         """Remove *key* from the in-memory cache (call before a reload)."""
@@ -313,9 +457,10 @@ class DataLoadFactory:
         dsets: Dict[str, xr.Dataset],
         ttl: int = 360,
     ) -> None:
-        """Pre-populate coordinate chunks in the cache."""
+        """Pre-populate coordinate chunks in the cache, one pipeline per group."""
         for group_name, ds in dsets.items():
             group_prefix = "" if group_name == "root" else f"{group_name}/"
+            packages: Dict[str, LoadDict] = {}
             for coord_name in ds.coords:
                 var_key = f"{group_prefix}{coord_name}"
                 arr_meta_key = f"{var_key}/{ZARRAY_JSON}"
@@ -329,7 +474,7 @@ class DataLoadFactory:
                     if arr_meta.get("compressor")
                     else None
                 )
-                filters = arr_meta["filters"]
+                filters = _get_filters(arr_meta)
                 values = encode_zarr_variable(
                     ds.variables[coord_name], name=str(coord_name)
                 ).values
@@ -346,14 +491,14 @@ class DataLoadFactory:
                         )
                         chunk_data = values[slices]
                         raw = encode_chunk(
-                            chunk_data.tobytes(),
+                            chunk_data,
                             filters=filters,
                             compressor=compressor,
+                            out_shape=chunk_shape,
                         )
-                        package = cloudpickle.dumps(
-                            LoadDict(data=raw, status=0, reason="")
+                        packages[f"{token}-{var_key}-{chunk_id}"] = LoadDict(
+                            data=raw, status=0, reason=""
                         )
-                        self.cache.setex(f"{token}-{var_key}-{chunk_id}", ttl, package)
                     except Exception as error:
                         data_logger.warning(
                             "Failed to preload %s chunk %s: %s",
@@ -361,6 +506,98 @@ class DataLoadFactory:
                             chunk_id,
                             error,
                         )
+            if packages:
+                self._cache_chunk_packages(packages, ttl=ttl)
+
+    def _preload_data_chunks(
+        self,
+        token: str,
+        meta: Dict[str, Any],
+        dsets: Dict[str, xr.Dataset],
+        ttl: int = 360,
+    ) -> int:
+        """Pre-populate data chunks in the cache, as the warm-up policy says.
+
+        The first ``API_WORKER_PREWARM_CHUNKS`` chunks of every data variable
+        are cached, all chunks of variables that hold at most
+        ``API_WORKER_PREWARM_BYTES``. Both are off by default.
+
+        Returns
+        -------
+        int: The number of cached chunks.
+        """
+        first = str_to_int(os.getenv("API_WORKER_PREWARM_CHUNKS"), 0)
+        small = parse_bytes(os.getenv("API_WORKER_PREWARM_BYTES") or "0")
+        wanted: List[Tuple[str, str]] = []
+        for group_name, ds in dsets.items():
+            group_prefix = "" if group_name == "root" else f"{group_name}/"
+            for name, var in ds.data_vars.items():
+                var_group = f"{group_prefix}{name}"
+                arr_meta = meta["metadata"].get(f"{var_group}/{ZARRAY_JSON}")
+                if arr_meta is None:
+                    continue
+                ranges = [
+                    range(-(-s // c))
+                    for s, c in zip(arr_meta["shape"], arr_meta["chunks"])
+                ]
+                limit = None if var.nbytes <= small else first
+                chunk_ids = itertools.islice(itertools.product(*ranges), limit)
+                wanted += [
+                    (var_group, ".".join(map(str, i)) or "0") for i in chunk_ids
+                ]
+        cached = 0
+        batch_size = str_to_int(os.getenv("API_WORKER_PREWARM_BATCH"), 32)
+        for num in range(0, len(wanted), batch_size):
+            packages = self._encode_chunks(token, wanted[num : num + batch_size])
+            ok = {k: p for k, p in packages.items() if p["status"] == 0}
+            self._cache_chunk_packages(ok, ttl=ttl)
+            cached += len(ok)
+        return cached
+
+    @lane_task("prefetch")
+    def prewarm_store(self, key: str, ttl: int = 360) -> None:
+        """Warm the chunk cache of a freshly created store.
+
+        Parameters
+        ----------
+        key: str
+            The token of the zarr store.
+        ttl: int, default: 360
+            Seconds the warmed chunks are kept.
+        """
+        start = time.time()
+        try:
+            meta, dsets = self.load_object(key)
+            self._preload_coordinate_chunks(key, meta, dsets, ttl=ttl)
+            cached = self._preload_data_chunks(key, meta, dsets, ttl=ttl)
+            data_logger.debug(
+                "Warmed %s (%i data chunks) within %.2f sec",
+                key,
+                cached,
+                time.time() - start,
+            )
+        except Exception as error:
+            data_logger.warning("Couldn't warm the chunks of %s: %s", key, error)
+
+    def report_cache_stats(self, key: str, ttl: int) -> None:
+        """Trim the object cache and publish its statistics to ``key``.
+
+        Parameters
+        ----------
+        key: str
+            The broker key holding the statistics of this process.
+        ttl: int
+            Seconds the statistics are kept.
+        """
+        with self._object_cache_lock:
+            self._object_cache.trim()
+            stats = self._object_cache.stats()
+        self._object_cache.collect()
+        data_logger.info("Object cache: %s", json.dumps(stats))
+        try:
+            self.cache.setex(key, ttl, json.dumps(stats))
+        except RedisError as error:  # pragma: no cover
+            data_logger.warning("Could not publish the cache stats: %s", error)
 
     @property
     def cache(self) -> Redis:
@@ -375,7 +612,63 @@ class DataLoadFactory:
             )
         return self._cache
 
-    @background_task
+    @property
+    def executor(self) -> LaneExecutor:
+        """The executor that runs the broker messages."""
+        if self._executor is None:
+            self._executor = default_executor()
+        return self._executor
+
+    @staticmethod
+    def open_recipe(recipe: OpenRecipe, path_id: str) -> Dict[str, xr.Dataset]:
+        """Open the lazy datasets of a store.
+
+        Parameters
+        ----------
+        recipe: OpenRecipe
+            The input paths and the plans of the store.
+        path_id: str
+            The token of the store.
+
+        Returns
+        -------
+        dict[str, xr.Dataset]: The chunked datasets by group.
+        """
+        opened = open_datasets(recipe["paths"])
+        time_ranges = recipe.get("time_ranges", {})
+        for num, path in enumerate(recipe["paths"]):
+            time_range = parse_time_range(time_ranges.get(path))
+            if time_range:
+                opened[num] = opened[num].copy()
+                opened[num].encoding[CATALOGUE_TIME_KEY] = time_range
+        # Drop unwanted variables first, aggregating, reducing and
+        # chunking them would only be thrown away.
+        opened = select_variables(
+            opened, (recipe["reduce"] or {}).get("variables")
+        )
+        aggregated = DatasetAggregator().aggregate(
+            opened,
+            job_id=path_id,
+            plan=recipe["assembly"],
+        )
+        # Reduce before chunking: the chunk plan must be computed for the
+        # shape the client will actually see, not for the source.
+        reduced = reduce_datasets(aggregated, recipe["reduce"])
+        # A reduction that collapses the spatial dimensions leaves a bare
+        # time series.  Chunking that for `map` access pins the primary
+        # axis to 1 and yields one chunk of a handful of bytes per step,
+        # i.e. one HTTP round-trip per time step.
+        pattern = recipe["access_pattern"]
+        if plan_removes_spatial_dims(aggregated, recipe["reduce"]):
+            pattern = "time_series"
+        opt = ChunkOptimizer(
+            access_pattern=pattern,
+            target=f"{recipe['chunk_size']}MiB",
+            map_primary_chunksize=recipe["map_primary_chunksize"],
+        )
+        return {k: opt.apply(d) for k, d in reduced.items()}
+
+    @lane_task("load")
     def from_object_path(
         self,
         input_paths: List[str],
@@ -386,12 +679,12 @@ class DataLoadFactory:
         access_pattern: Literal["time_series", "map"] = "map",
         chunk_size: float = 16.0,
         username: Optional[str] = None,
+        encoding: Optional[Dict[str, Any]] = None,
+        time_ranges: Optional[Dict[str, str]] = None,
     ) -> None:
         """Create a zarr object from an input path."""
         start = time.time()
         data_logger.info("Registering serialisation task ...")
-        agg = DatasetAggregator()
-
         data = cast(
             LoadDict,
             cloudpickle.loads(self.cache.get(path_id) or b"\x80\x05}\x94."),
@@ -407,55 +700,67 @@ class DataLoadFactory:
         data_logger.info("%s", ",".join(input_paths))
         try:
             ProcessQueue.check_for_access_permissions(username, input_paths)
-            aggregated = agg.aggregate(
-                [load_data(p) for p in input_paths],
-                job_id=path_id,
-                plan=assembly,
-            )
-            # Reduce before chunking: the chunk plan must be computed for the
-            # shape the client will actually see, not for the source.
-            reduced = reduce_datasets(aggregated, reduce)
-            # A reduction that collapses the spatial dimensions leaves a bare
-            # time series.  Chunking that for `map` access pins the primary
-            # axis to 1 and yields one chunk of a handful of bytes per step,
-            # i.e. one HTTP round-trip per time step.
-            pattern: Literal["time_series", "map"] = access_pattern
-            if plan_removes_spatial_dims(aggregated, reduce):
-                pattern = "time_series"
-            opt = ChunkOptimizer(
-                access_pattern=pattern,
-                target=f"{chunk_size}MiB",
+            recipe = OpenRecipe(
+                paths=input_paths,
+                mtimes=[_mtime(p) for p in input_paths],
+                assembly=assembly,
+                reduce=reduce,
+                access_pattern=access_pattern,
                 map_primary_chunksize=map_primary_chunksize,
+                chunk_size=chunk_size,
+                references={},
+                time_ranges=time_ranges or {},
             )
-            dsets = {k: opt.apply(d) for k, d in reduced.items()}
+            dsets = self.open_recipe(recipe, path_id)
             step = time.time()
             data_logger.info("Reading done within %.2f sec", step - start)
             data_logger.info("Serialising data")
             combined_meta = write_grouped_zarr(dsets)
+            compressor = (encoding or {}).get("compressor")
+            if compressor:
+                set_compressor(combined_meta, compressor)
+            rounded = set_bitround(
+                combined_meta,
+                dsets,
+                keepbits=(encoding or {}).get("keepbits"),
+                information=(encoding or {}).get("keep_information"),
+            )
+            if rounded:
+                data_logger.info("Rounding to mantissa bits %s", rounded)
+            # Zarr v3 has no standard codec for the zlib streams of HDF5.
+            # In auto mode shipping the stored chunks beats any compressor.
+            if (
+                len(set(input_paths)) == 1
+                and not {k for k in reduce or {} if k != "variables"}
+                and list(dsets) == ["root"]
+                and (encoding or {}).get("zarr_format") != 3
+                and compressor in (None, "auto")
+                and not rounded
+            ):
+                recipe["references"] = native_references(
+                    input_paths[0], dsets["root"], combined_meta
+                )
+                _attach_references(dsets, recipe["references"])
             status_dict["data"] = combined_meta
+            if (encoding or {}).get("zarr_format") == 3:
+                try:
+                    status_dict["zarr_json"] = create_v3_metadata(combined_meta)
+                except ValueError as error:
+                    data_logger.warning("Serving %s as v2 only: %s", path_id, error)
             status_dict["repr_html"] = xr_repr_html(dsets)
-            try:
-                self._preload_coordinate_chunks(
-                    path_id, combined_meta, dsets, ttl=expires_in
-                )
-            except Exception as error:
-                data_logger.warning("Couldn't preload coords: %s", error)
-            pkls = cloudpickle.dumps(dsets)
-            step2 = time.time()
-            data_logger.info("Serialisation data done within %.2f sec", step2 - step)
             step = time.time()
-            data_logger.info("Ceching data")
-            # We need to add the xr dataset to an extra cache entry because
-            # the status_dict will be loaded by the rest-api, if the xarray
-            # dataset would be present in the status_dict the rest-api
-            # code would attempt to instantiate the pickled dataset object
-            # and that might fail because we might or might not have xarray
-            # and all the backends instantiated. Since the xarray dataset
-            # object isn't needed anyway but the rest-api we simply add it
-            # to a cache entry of its own.
+            data_logger.info("Caching data")
+            # Only the recipe is stored: pickled dask graphs are slow to
+            # (de)serialise and big, any process can open the lazy datasets
+            # from the recipe much faster.
             status_dict["status"] = StateEnum.finished_ok.value
-            self.cache.setex(f"{path_id}-dset", expires_in, pkls)
+            self.cache.setex(f"{path_id}-recipe", expires_in, json.dumps(recipe))
+            with self._object_cache_lock:
+                self._object_cache[path_id] = (combined_meta, dsets)
+            self._object_cache.collect()
             data_logger.info("Caching done within %.2f sec", time.time() - step)
+            if should_materialise(reduce):
+                self.materialise_object(path_id)
         except Exception as error:
             data_logger.exception("Could not process %s: %s", path_id, error)
             status_dict["status"] = StateEnum.from_exception(error)
@@ -466,8 +771,41 @@ class DataLoadFactory:
             cloudpickle.dumps(status_dict),
         )
         data_logger.info("Task done within %.2f sec", time.time() - start)
+        if status_dict["status"] == StateEnum.finished_ok.value:
+            self.prewarm_store(path_id, ttl=expires_in)
+
+    @lane_task("load")
+    def materialise_object(self, key: str) -> None:
+        """Compute the data of a reduced store once, onto local disk.
 
-    @background_task
+        Parameters
+        ----------
+        key: str
+            The token of the zarr store.
+        """
+        start = time.time()
+        try:
+            recipe_cache = cast(Optional[bytes], self.cache.get(f"{key}-recipe"))
+            if recipe_cache is None:
+                raise KeyError(f"{key} uuid does not exist (anymore).")
+            recipe = cast(OpenRecipe, json.loads(recipe_cache))
+            meta, dsets = self.load_object(key)
+            target = materialised_dir(key, recipe["mtimes"])
+            data_logger.info("Materialising %s ...", key)
+            materialise(dsets, target)
+            opened = open_materialised(dsets, target)
+            if opened is not None:
+                with self._object_cache_lock:
+                    self._object_cache[key] = (meta, opened)
+                self._object_cache.collect()
+            data_logger.info(
+                "Materialising %s ... done within %.2f sec", key, time.time() - start
+            )
+        except Exception as error:
+            # Chunks are still computed from the source, just slower.
+            data_logger.warning("Could not materialise %s: %s", key, error)
+
+    @lane_task("chunk")
     def get_zarr_chunk(
         self,
         key: str,
@@ -477,41 +815,242 @@ class DataLoadFactory:
         """Read the zarr metadata from the cache."""
         group, _, variable = var_group.rpartition("/")
         group = group or "root"
+        cache_key = f"{key}-{var_group}-{chunk}"
+        prefetched = self.prefetcher.read(key, (var_group, chunk))
         try:
             meta, dsets = self.load_object(key)
+            self._read_ahead(key, meta, dsets, var_group, chunk)
+            if prefetched and self.cache.exists(cache_key):
+                return
             arr_meta = meta["metadata"][f"{var_group}/{ZARRAY_JSON}"]
             data_logger.debug("Encoding data for variable %s  ... ", variable)
-            data = encode_chunk(
-                get_data_chunk(
-                    encode_zarr_variable(
-                        dsets[group].variables[variable], name=variable
-                    ).data,
-                    chunk,
+            data = _native_chunk(dsets[group].variables[variable], chunk)
+            if data is None:
+                data = encode_chunk(
+                    get_data_chunk(
+                        encode_zarr_variable(
+                            dsets[group].variables[variable], name=variable
+                        ).data,
+                        chunk,
+                        out_shape=None,
+                    ),
+                    filters=_get_filters(arr_meta),
+                    compressor=_get_compressor(arr_meta),
                     out_shape=arr_meta["chunks"],
-                ).tobytes(),
-                filters=arr_meta["filters"],
-                compressor=numcodecs.get_codec(arr_meta["compressor"]),
-            )
+                )
             package = LoadDict(data=data, status=0, reason="")
             data_logger.debug("Encoding data for variable %s ... done", variable)
         except Exception as error:
             data_logger.exception(error)
             package = dict(reason=str(error), status=StateEnum.from_exception(error))
-        self.cache.setex(f"{key}-{var_group}-{chunk}", 360, cloudpickle.dumps(package))
+        self.cache.setex(cache_key, CHUNK_CACHE_TTL, cloudpickle.dumps(package))
+
+    @lane_task("chunk")
+    def get_zarr_chunks(
+        self,
+        key: str,
+        chunks: List[Tuple[str, str]],
+    ) -> None:
+        """Encode a batch of chunks of one store.
+
+        All lazy blocks are computed together and the encoded results are
+        written back in a single pipelined round-trip.
+
+        Parameters
+        ----------
+        key: str
+            The token of the zarr store.
+        chunks: list[tuple[str, str]]
+            ``(var_group, chunk)`` pairs that should be encoded.
+        """
+        self._cache_chunk_packages(self._encode_chunks(key, chunks))
+
+    def _encode_chunks(
+        self, key: str, chunks: Sequence[Tuple[str, str]]
+    ) -> Dict[str, LoadDict]:
+        """Encode chunks of one store, by their cache keys."""
+        packages: Dict[str, LoadDict] = {}
+        requests: List[Tuple[str, Dict[str, Any], Any, str]] = []
+        try:
+            meta, dsets = self.load_object(key)
+        except Exception as error:
+            data_logger.exception(error)
+            failed = LoadDict(reason=str(error), status=StateEnum.from_exception(error))
+            return {f"{key}-{v}-{c}": failed for (v, c) in chunks}
+        for var_group, chunk in chunks:
+            group, _, variable = var_group.rpartition("/")
+            try:
+                arr_meta = meta["metadata"][f"{var_group}/{ZARRAY_JSON}"]
+                var = dsets[group or "root"].variables[variable]
+                native = _native_chunk(var, chunk)
+                if native is not None:
+                    packages[f"{key}-{var_group}-{chunk}"] = LoadDict(
+                        data=native, status=0, reason=""
+                    )
+                    continue
+                data = encode_zarr_variable(var, name=variable).data
+                requests.append((f"{key}-{var_group}-{chunk}", arr_meta, data, chunk))
+            except Exception as error:
+                packages[f"{key}-{var_group}-{chunk}"] = LoadDict(
+                    reason=str(error), status=StateEnum.from_exception(error)
+                )
+        data_logger.debug("Encoding %i chunks of %s ... ", len(requests), key)
+        results = get_data_chunks([(d, c, None) for (_, _, d, c) in requests])
+        for (cache_key, arr_meta, _, _), result in zip(requests, results):
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                packages[cache_key] = LoadDict(
+                    data=encode_chunk(
+                        result,
+                        filters=_get_filters(arr_meta),
+                        compressor=_get_compressor(arr_meta),
+                        out_shape=arr_meta["chunks"],
+                    ),
+                    status=0,
+                    reason="",
+                )
+            except Exception as error:
+                data_logger.warning("Could not encode %s: %s", cache_key, error)
+                packages[cache_key] = LoadDict(
+                    reason=str(error), status=StateEnum.from_exception(error)
+                )
+        data_logger.debug("Encoding %i chunks of %s ... done", len(requests), key)
+        return packages
+
+    def _read_ahead(
+        self,
+        key: str,
+        meta: Dict[str, Any],
+        dsets: Dict[str, xr.Dataset],
+        var_group: str,
+        chunk: str,
+    ) -> None:
+        """Book the chunks that follow ``chunk`` for the read-ahead."""
+        group, _, variable = var_group.rpartition("/")
+        dset = dsets[group or "root"]
+        plan: Optional[ChunkPlan] = dset.encoding.get(CHUNK_PLAN_KEY)
+        if not self.prefetcher.depth or plan is None:
+            return
+        arr_meta = meta["metadata"][f"{var_group}/{ZARRAY_JSON}"]
+        ahead = next_chunk_ids(
+            chunk,
+            arr_meta["shape"],
+            arr_meta["chunks"],
+            [str(d) for d in dset.variables[variable].dims],
+            plan.access_pattern,
+            plan.primary_axis,
+            self.prefetcher.depth,
+        )
+        booked = self.prefetcher.book(key, [(var_group, c) for c in ahead])
+        if booked:
+            self.prefetch_chunks(key, booked)
+
+    @lane_task("prefetch")
+    def prefetch_chunks(self, key: str, chunks: List[Tuple[str, str]]) -> None:
+        """Compute chunks a client is likely to request next.
+
+        Nothing is computed if the client stopped reading in the meantime.
+        Only successfully encoded chunks are cached.
+
+        Parameters
+        ----------
+        key: str
+            The token of the zarr store.
+        chunks: list[tuple[str, str]]
+            ``(var_group, chunk)`` pairs that should be encoded.
+        """
+        if not self.prefetcher.active(key):
+            return
+        packages = self._encode_chunks(key, chunks)
+        ready = [
+            (v, c) for (v, c) in chunks if packages[f"{key}-{v}-{c}"]["status"] == 0
+        ]
+        self._cache_chunk_packages(
+            {f"{key}-{v}-{c}": packages[f"{key}-{v}-{c}"] for (v, c) in ready}
+        )
+        failed = [c for c in chunks if c not in ready]
+        self.prefetcher.done(key, ready, failed)
+
+    @lane_task("shard")
+    def get_zarr_shard(self, key: str, shard: str, var_group: str) -> None:
+        """Assemble a zarr v3 shard out of the encoded v2 chunks it bundles.
+
+        Parameters
+        ----------
+        key: str
+            The token of the zarr store.
+        shard: str
+            The dot separated index of the shard, e.g. ``3.0.0``.
+        var_group: str
+            The path of the array within the store.
+        """
+        group, _, variable = var_group.rpartition("/")
+        cache_key = f"{key}-{var_group}/c/{shard.replace('.', '/')}"
+        if self.cache.exists(cache_key):
+            # Range requests of one shard each ask for it.
+            return
+        try:
+            meta, dsets = self.load_object(key)
+            arr_meta = meta["metadata"][f"{var_group}/{ZARRAY_JSON}"]
+            chunk_ids = shard_chunk_ids(arr_meta, shard)
+            data = encode_zarr_variable(
+                dsets[group or "root"].variables[variable], name=variable
+            ).data
+            present = [c for c in chunk_ids if c is not None]
+            data_logger.debug("Assembling shard %s of %s ...", shard, var_group)
+            results = get_data_chunks([(data, c, None) for c in present])
+            encoded: Dict[str, bytes] = {}
+            for chunk_id, result in zip(present, results):
+                if isinstance(result, Exception):
+                    raise result
+                encoded[chunk_id] = encode_chunk(
+                    result,
+                    filters=_get_filters(arr_meta),
+                    compressor=_get_compressor(arr_meta),
+                    out_shape=arr_meta["chunks"],
+                )
+            package = LoadDict(
+                data=assemble_shard([encoded[c] if c else None for c in chunk_ids]),
+                status=0,
+                reason="",
+            )
+            data_logger.debug("Assembling shard %s of %s ... done", shard, var_group)
+        except Exception as error:
+            data_logger.exception(error)
+            package = LoadDict(
+                reason=str(error), status=StateEnum.from_exception(error)
+            )
+        self.cache.setex(cache_key, CHUNK_CACHE_TTL, cloudpickle.dumps(package))
+
+    def _cache_chunk_packages(
+        self, packages: Dict[str, LoadDict], ttl: int = CHUNK_CACHE_TTL
+    ) -> None:
+        """Write encoded chunks to the cache in one round-trip."""
+        pipe = self.cache.pipeline(transaction=False)
+        for cache_key, package in packages.items():
+            pipe.setex(cache_key, ttl, cloudpickle.dumps(package))
+        pipe.execute()
 
     def _cache_lookup(
-        self, key: str
+        self, key: str, count: bool = True
     ) -> Optional[Tuple[Dict[str, Any], Dict[str, xr.Dataset]]]:
-        for _ in range(2):
-            with self._object_cache_lock:
-                cached = self._object_cache.get(key)
-                if cached is not None:
-                    return cached
-        return None
+        with self._object_cache_lock:
+            return cast(
+                Optional[Tuple[Dict[str, Any], Dict[str, xr.Dataset]]],
+                (
+                    self._object_cache.get(key)
+                    if count
+                    else self._object_cache.peek(key)
+                ),
+            )
 
     def load_object(self, key: str) -> Tuple[Dict[str, Any], Dict[str, xr.Dataset]]:
         """Load a cached dataset.
 
+        The datasets are opened from the recipe of the store and kept in
+        memory for further requests.
+
         Parameters
         ----------
         key: str, The cache key.
@@ -523,23 +1062,54 @@ class DataLoadFactory:
         Raises
         ------
         RuntimeError: If the cache key exists but the data could not be loaded,
-                      which means that there is a load status != 0
+                      which means that there is a load status != 0, or if
+                      the input files changed since the store was created.
         KeyError: If the key doesn't exist in the cache (anymore).
         """
         result = self._cache_lookup(key)
         if result is not None:
             return result
         with self._object_cache_lock:
-            data_logger.debug("Loading %s ...", key)
-            metadata_cache = cast(Optional[bytes], self.cache.get(key))
-            dset_cache = self.cache.get(f"{key}-dset")
-            if metadata_cache is None or dset_cache is None:
-                raise KeyError(f"{key} uuid does not exist (anymore).")
-            load_dict: LoadDict = cloudpickle.loads(metadata_cache)
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        # Stores are opened one at a time per token, chunks of stores that
+        # are already open can be served meanwhile.
+        try:
+            with build_lock:
+                # The miss was counted by the first lookup.
+                result = self._cache_lookup(key, count=False)
+                if result is None:
+                    result = self._open_object(key)
+        finally:
+            with self._object_cache_lock:
+                self._build_locks.pop(key, None)
+        return result
+
+    def _open_object(self, key: str) -> Tuple[Dict[str, Any], Dict[str, xr.Dataset]]:
+        data_logger.debug("Loading %s ...", key)
+        metadata_cache = cast(Optional[bytes], self.cache.get(key))
+        recipe_cache = cast(Optional[bytes], self.cache.get(f"{key}-recipe"))
+        # Stores created by older data-loaders only have the pickle.
+        dset_cache = None if recipe_cache else self.cache.get(f"{key}-dset")
+        if metadata_cache is None or (recipe_cache or dset_cache) is None:
+            raise KeyError(f"{key} uuid does not exist (anymore).")
+        load_dict: LoadDict = cloudpickle.loads(metadata_cache)
+        if recipe_cache is not None:
+            recipe = cast(OpenRecipe, json.loads(recipe_cache))
+            for path, mtime in zip(recipe["paths"], recipe["mtimes"]):
+                if _mtime(path) != mtime:
+                    raise RuntimeError(f"{path} has changed, reload the data.")
+            dsets = self.open_recipe(recipe, key)
+            _attach_references(dsets, recipe.get("references", {}))
+            if should_materialise(recipe["reduce"]):
+                target = materialised_dir(key, recipe["mtimes"])
+                dsets = open_materialised(dsets, target) or dsets
+        else:
             dsets = cast(Dict[str, xr.Dataset], cloudpickle.loads(dset_cache))
-            data_logger.debug("Loading %s ... done", key)
-            result = cast(Dict[str, Any], load_dict["data"]), dsets
+        data_logger.debug("Loading %s ... done", key)
+        result = cast(Dict[str, Any], load_dict["data"]), dsets
+        with self._object_cache_lock:
             self._object_cache[key] = result
+        self._object_cache.collect()
         return result
 
 
@@ -592,6 +1162,7 @@ class ProcessQueue(DataLoadFactory):
             _paths = " ,".join(paths)
             raise PermissionError(f"Permission denied for{_paths}")
 
+    @lane_task("access")
     def _handle_access_check(self, data: Dict[str, Any]) -> None:
         """Publish the result of a fs access check for a user."""
         try:
@@ -608,19 +1179,51 @@ class ProcessQueue(DataLoadFactory):
         self.cache.expire(f"access-reply:{data['request_id']}", 30)
 
     def run_for_ever(self, channel: str) -> None:
-        """Start the listener daemon."""
+        """Start the listener daemon.
+
+        Messages are popped from the dedicated queues of ``channel``, e.g.
+        ``data-portal:access``, in the order of :data:`BROKER_QUEUES`, so a
+        permission check never waits behind a pile of load instructions. The
+        plain ``channel`` list is consumed last, for APIs that still publish
+        everything to one queue.
+
+        Unless ``API_WORKER_AFFINITY`` is ``0``, chunk requests are handled
+        by the process that owns their token (see :class:`TokenRouter`),
+        whose private queue comes right after the access checks.
+        """
         data_logger.info("Starting data-loading daemon")
+        router: Optional[TokenRouter] = None
+        queues = [f"{channel}:{suffix}" for suffix in BROKER_QUEUES] + [channel]
+        if os.getenv("API_WORKER_AFFINITY", "1") != "0":
+            router = TokenRouter(self.cache, channel)
+            queues.insert(1, router.queue)
         cache_scheduler = CacheScheduler()
+        stats_key = f"{channel}:stats:{router.member if router else member_name()}"
+        stats_interval = str_to_int(os.getenv("API_WORKER_STATS_INTERVAL"), 60)
+        last_stats = 0.0
         data_logger.info("Broker will listen for messages now")
         while True:
             try:
                 cache_scheduler.tick()
+                if time.monotonic() - last_stats >= stats_interval:
+                    last_stats = time.monotonic()
+                    self.report_cache_stats(stats_key, 3 * stats_interval)
+                if router is not None:
+                    router.tick()
+                # Back pressure: leave messages in the broker while the
+                # workers can't keep up, another loader may pick them up.
+                if not self.executor.wait_for_capacity(timeout=1):
+                    continue
                 result = cast(
-                    Optional[Tuple[str, bytes]],
-                    self.cache.brpop(channel, timeout=1),
+                    Optional[Tuple[Union[str, bytes], bytes]],
+                    self.cache.brpop(queues, timeout=1),
                 )
                 if result:
-                    _, body = result
+                    queue, body = result
+                    if isinstance(queue, bytes):
+                        queue = queue.decode()
+                    if router and queue != router.queue and router.forward(body):
+                        continue
                     self.redis_callback(body)
             except KeyboardInterrupt:
                 break
@@ -628,6 +1231,11 @@ class ProcessQueue(DataLoadFactory):
                 time.sleep(1)  # back off and retry
             except Exception as error:
                 data_logger.exception(error)
+        if router is not None:
+            try:
+                router.leave()
+            except RedisError as error:  # pragma: no cover
+                data_logger.warning("Could not leave the routing ring: %s", error)
 
     def redis_callback(
         self,
@@ -651,6 +1259,8 @@ class ProcessQueue(DataLoadFactory):
                 map_primary_chunksize=message["uri"].get("map_primary_chunksize", 1),
                 reload=message["uri"].get("reload", False),
                 chunk_size=message["uri"].get("chunk_size", 16.0),
+                encoding=message["uri"].get("encoding"),
+                time_ranges=message["uri"].get("time_ranges"),
             )
         elif "chunk" in message:
             self.get_zarr_chunk(
@@ -658,6 +1268,17 @@ class ProcessQueue(DataLoadFactory):
                 message["chunk"]["chunk"],
                 message["chunk"]["variable"],
             )
+        elif "chunks" in message:
+            self.get_zarr_chunks(
+                message["chunks"]["uuid"],
+                [(c["variable"], c["chunk"]) for c in message["chunks"]["keys"]],
+            )
+        elif "shard" in message:
+            self.get_zarr_shard(
+                message["shard"]["uuid"],
+                message["shard"]["shard"],
+                message["shard"]["variable"],
+            )
         elif "access_check" in message:
             self._handle_access_check(message["access_check"])
 
@@ -672,6 +1293,8 @@ class ProcessQueue(DataLoadFactory):
         map_primary_chunksize: int = 1,
         reload: bool = False,
         chunk_size: float = 16.0,
+        encoding: Optional[Dict[str, Any]] = None,
+        time_ranges: Optional[Dict[str, str]] = None,
     ) -> None:
         """Submit a new data loading task to the process pool."""
         data_logger.debug("Assigning %s to %s for future processing", inp_objs, uuid5)
@@ -689,4 +1312,6 @@ class ProcessQueue(DataLoadFactory):
                 map_primary_chunksize=map_primary_chunksize,
                 chunk_size=chunk_size,
                 username=username,
+                encoding=encoding,
+                time_ranges=time_ranges,
             )
@@ -0,0 +1,223 @@
+"""Materialised results of reduced stores.
+
+A store with a temporal reduction is a lazy ``resample``/``groupby`` graph
+over its source, every chunk request recomputes its slice from the input
+files. For a climatology every chunk of the result depends on the whole
+record, so each chunk request reads decades of data again.
+:func:`materialise` computes the data variables of such a store once, a few
+blocks at a time, into ``.npy`` files on local disk.
+:func:`open_materialised` swaps the lazy graphs of a store for these files,
+the chunks are then read from disk.
+
+Results are kept per store token and modification time of the input files,
+a reloaded store whose files have changed is materialised anew.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import dask.array as da
+import numpy as np
+import platformdirs
+import xarray as xr
+from dask.utils import parse_bytes
+
+from .executor import dask_executor
+from .utils import data_logger, str_to_int
+
+MATERIALISE_MODES = ("none", "climatology", "all")
+"""Stores that are materialised: none, climatologies or all temporal
+reductions."""
+DONE_FILE = "done.json"
+
+
+def materialise_mode() -> str:
+    """Get the materialisation mode from ``API_WORKER_MATERIALISE``."""
+    mode = os.getenv("API_WORKER_MATERIALISE", "climatology").lower()
+    if mode not in MATERIALISE_MODES:
+        data_logger.warning("Invalid materialisation mode %r", mode)
+        return "climatology"
+    return mode
+
+
+def should_materialise(reduce: Optional[Mapping[str, Any]]) -> bool:
+    """Check if the result of a reduction should be materialised."""
+    if not reduce or not reduce.get("time_freq"):
+        return False
+    mode = materialise_mode()
+    return mode == "all" or (mode == "climatology" and bool(reduce.get("climatology")))
+
+
+def materialised_dir(
+    token: str, mtimes: Sequence[Optional[float]], root: Optional[str] = None
+) -> Path:
+    """Get the directory holding the materialised result of a store.
+
+    Parameters
+    ----------
+    token: str
+        The token of the store.
+    mtimes: list[float]
+        The modification times of the input files.
+    root: str, default: None
+        The parent directory, defaults to ``API_WORKER_MATERIALISE_DIR`` or
+        ``data-portal-results`` in the user cache dir.
+    """
+    # Tokens of aggregated stores are longer than a file name may be.
+    digest = hashlib.blake2b(
+        json.dumps([token, list(mtimes)]).encode(), digest_size=16
+    )
+    parent = Path(
+        root
+        or os.getenv("API_WORKER_MATERIALISE_DIR")
+        or Path(platformdirs.user_cache_dir("freva")) / "data-portal-results"
+    )
+    return parent / digest.hexdigest()
+
+
+def _blocks(arr: da.Array) -> Iterator[Tuple[Tuple[int, ...], Tuple[slice, ...]]]:
+    """Iterate over the block indices of a dask array and their slices."""
+    bounds = [np.cumsum((0,) + c) for c in arr.chunks]
+    for idx in np.ndindex(*arr.numblocks):
+        yield idx, tuple(
+            slice(int(b[i]), int(b[i + 1])) for b, i in zip(bounds, idx)
+        )
+
+
+def _store(arr: da.Array, out: np.ndarray, budget: int) -> None:
+    """Compute ``arr`` into ``out``, holding at most ``budget`` bytes of it.
+
+    Blocks are computed in batches, the blocks of a batch share the reads of
+    their common source data.
+    """
+    batch: List[Tuple[Tuple[int, ...], Tuple[slice, ...]]] = []
+    nbytes = 0
+
+    def _flush() -> None:
+        results = dask_executor().compute(*(arr.blocks[idx] for idx, _ in batch))
+        for (_, slices), result in zip(batch, results):
+            out[slices] = result
+        batch.clear()
+
+    for idx, slices in _blocks(arr):
+        size = int(np.prod([s.stop - s.start for s in slices])) * arr.itemsize
+        if batch and nbytes + size > budget:
+            _flush()
+            nbytes = 0
+        batch.append((idx, slices))
+        nbytes += size
+    if batch:
+        _flush()
+
+
+def _prune(parent: Path, max_age: float) -> None:
+    """Remove results that weren't used for ``max_age`` seconds."""
+    for path in parent.glob("*"):
+        try:
+            used = (path / DONE_FILE).stat().st_mtime
+        except OSError:
+            # Unfinished results of crashed processes.
+            used = path.stat().st_mtime
+        if time.time() - used > max_age:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def materialise(
+    dsets: Mapping[str, xr.Dataset], target: Path, budget: Optional[int] = None
+) -> None:
+    """Compute the data variables of a store into ``target``.
+
+    Parameters
+    ----------
+    dsets: dict[str, xr.Dataset]
+        The lazy datasets of the store by group.
+    target: Path
+        The result directory, see :func:`materialised_dir`.
+    budget: int, default: None
+        Bytes of the result that are computed at once. Defaults to
+        ``API_WORKER_MATERIALISE_MEMORY`` or 256 MiB.
+    """
+    if (target / DONE_FILE).exists():
+        return
+    budget = budget or parse_bytes(
+        os.getenv("API_WORKER_MATERIALISE_MEMORY", "256MiB")
+    )
+    days = str_to_int(os.getenv("API_WORKER_MATERIALISE_DAYS"), 7)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    _prune(target.parent, days * 24 * 3600)
+    tmp = target.with_name(
+        f".{target.name}-{os.getpid()}-{threading.get_ident()}"
+    )
+    try:
+        for group, dset in dsets.items():
+            (tmp / group).mkdir(parents=True, exist_ok=True)
+            for name, var in dset.data_vars.items():
+                if not isinstance(var.data, da.Array):
+                    continue
+                out = np.lib.format.open_memmap(
+                    tmp / group / f"{name}.npy",
+                    mode="w+",
+                    dtype=var.dtype,
+                    shape=var.shape,
+                )
+                _store(var.data, out, budget)
+                out.flush()
+                del out
+        (tmp / DONE_FILE).write_text(json.dumps({"created": time.time()}))
+        try:
+            tmp.rename(target)
+        except OSError:
+            # Another process was faster.
+            shutil.rmtree(tmp, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def open_materialised(
+    dsets: Mapping[str, xr.Dataset], target: Path
+) -> Optional[Dict[str, xr.Dataset]]:
+    """Read the data variables of a store from its materialised result.
+
+    Returns
+    -------
+    dict[str, xr.Dataset], None: The datasets by group, ``None`` if there is
+                                 no (matching) result.
+    """
+    if not (target / DONE_FILE).exists():
+        return None
+    out: Dict[str, xr.Dataset] = {}
+    for group, dset in dsets.items():
+        data_vars: Dict[Any, xr.DataArray] = {}
+        for name, var in dset.data_vars.items():
+            path = target / group / f"{name}.npy"
+            if not isinstance(var.data, da.Array) or not path.exists():
+                continue
+            values = np.load(path, mmap_mode="r")
+            if values.shape != var.shape or values.dtype != var.dtype:
+                return None
+            data_vars[name] = var.copy(
+                data=da.from_array(
+                    values, chunks=var.chunks, name=f"materialised-{path}"
+                )
+            )
+        out[group] = dset.assign(data_vars)
+    os.utime(target / DONE_FILE)
+    return out
@@ -0,0 +1,228 @@
+"""A byte-budgeted in-memory cache of the opened stores.
+
+The data-loader keeps the metadata and the lazy datasets of the stores it
+serves in memory. The size of such an entry varies a lot: a single file
+store holds a few coordinates and a tiny dask graph, an aggregated store
+can hold a graph with hundreds of thousands of tasks. The
+:class:`ObjectCache` is therefore bounded by the estimated footprint of its
+entries in bytes instead of their number. On top of that it evicts entries
+while the resident memory of the process is above a high watermark, as many
+as it takes to get back to a low watermark.
+"""
+
+from __future__ import annotations
+
+import gc
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import dask.array as da
+import xarray as xr
+from cachetools import TTLCache
+from dask.utils import parse_bytes
+
+from .utils import data_logger, str_to_int
+
+CacheEntry = Tuple[Dict[str, Any], Dict[str, xr.Dataset]]
+
+TASK_BYTES = 2048
+"""Rough memory held by one task of a dask graph."""
+
+
+def estimate_footprint(entry: CacheEntry) -> int:
+    """Estimate the memory held by a cached store.
+
+    The estimate counts the serialised metadata, the in-memory variables
+    (usually the coordinates) and :data:`TASK_BYTES` for every task of the
+    dask graphs.
+    """
+    meta, dsets = entry
+    size = len(json.dumps(meta, default=str))
+    layers: Dict[str, int] = {}
+    for dset in dsets.values():
+        for var in dset.variables.values():
+            if isinstance(var.data, da.Array):
+                for name, layer in var.data.dask.layers.items():
+                    layers[name] = len(layer)
+            else:
+                size += int(var.nbytes)
+    return max(1, size + TASK_BYTES * sum(layers.values()))
+
+
+def _memory_limit() -> Optional[int]:
+    """Get the memory limit of the process: cgroup limit or physical memory."""
+    limits = []
+    for path in (
+        "/sys/fs/cgroup/memory.max",
+        "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+    ):
+        try:
+            with open(path) as stream:
+                limits.append(int(stream.read().strip()))
+        except (OSError, ValueError):
+            pass
+    try:
+        limits.append(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES"))
+    except (AttributeError, OSError, ValueError):
+        pass
+    return min(limits) if limits else None
+
+
+def process_rss() -> Optional[int]:
+    """Get the resident memory of this process in bytes, if known."""
+    try:
+        with open("/proc/self/statm") as stream:
+            pages = int(stream.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _watermark(value: Optional[str]) -> Optional[int]:
+    """Convert ``80%`` (of the memory limit) or ``6GiB`` to bytes."""
+    if not value:
+        return None
+    if value.endswith("%"):
+        limit = _memory_limit()
+        return int(limit * float(value[:-1]) / 100) if limit else None
+    return parse_bytes(value)
+
+
+class ObjectCache(TTLCache):  # type: ignore[type-arg]
+    """TTL cache of opened stores, bounded in bytes and by the process RSS.
+
+    Parameters
+    ----------
+    maxsize: int, default: None
+        Bytes the entries may hold, defaults to ``API_OBJECT_CACHE_BYTES``
+        or 4 GiB.
+    ttl: int, default: None
+        Seconds an entry is kept, defaults to ``API_CACHE_EXP`` or 3600.
+    rss_high: int, default: None
+        Resident memory above which entries are evicted. Defaults to
+        ``API_OBJECT_CACHE_RSS_HIGH`` or 85% of the memory limit.
+    rss_low: int, default: None
+        Resident memory at which the eviction stops. Defaults to
+        ``API_OBJECT_CACHE_RSS_LOW`` or 70% of the memory limit.
+    """
+
+    def __init__(
+        self,
+        maxsize: Optional[int] = None,
+        ttl: Optional[int] = None,
+        rss_high: Optional[int] = None,
+        rss_low: Optional[int] = None,
+    ) -> None:
+        super().__init__(
+            maxsize=maxsize
+            or parse_bytes(os.getenv("API_OBJECT_CACHE_BYTES", "4GiB")),
+            ttl=ttl or str_to_int(os.getenv("API_CACHE_EXP"), 3600),
+            getsizeof=estimate_footprint,
+        )
+        self.rss_high = rss_high or _watermark(
+            os.getenv("API_OBJECT_CACHE_RSS_HIGH", "85%")
+        )
+        self.rss_low = rss_low or _watermark(
+            os.getenv("API_OBJECT_CACHE_RSS_LOW", "70%")
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.pressure_evictions = 0
+        self.rejections = 0
+        self._plateau: Optional[int] = None
+        self._collect = False
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Get an entry and count the hit or miss."""
+        value = super().get(key, default)
+        if value is default:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def peek(self, key: Any, default: Any = None) -> Any:
+        """Get an entry without counting a hit or miss."""
+        return super().get(key, default)
+
+    def popitem(self) -> Tuple[Any, Any]:
+        """Evict the least recently used entry."""
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        try:
+            super().__setitem__(key, value)
+        except ValueError:
+            # Bigger than the whole budget, it's opened again when needed.
+            self.rejections += 1
+            data_logger.warning("%s is too big for the object cache", key)
+        self.trim(keep=key)
+
+    def trim(self, keep: Any = None) -> int:
+        """Evict entries while the process uses more memory than allowed.
+
+        The least recently used entries are evicted until their footprint
+        covers the excess of the RSS over the low watermark. Memory that
+        was freed is often not given back to the system, the eviction
+        therefore stops once it doesn't lower the RSS, and starts again
+        only once the RSS has grown beyond that level. Garbage is left to
+        :meth:`collect`, which shouldn't be called under a lock.
+
+        Parameters
+        ----------
+        keep: default: None
+            Key of the entry that was just stored, it isn't evicted.
+
+        Returns
+        -------
+        int: The number of evicted entries.
+        """
+        rss = process_rss()
+        if not self.rss_high or rss is None or rss <= self.rss_high:
+            self._plateau = None
+            return 0
+        if self._plateau is not None and rss <= self._plateau:
+            return 0
+        excess = rss - min(self.rss_low or self.rss_high, self.rss_high)
+        evicted = freed = 0
+        # The entry just stored is the most recently used, it goes last.
+        while len(self) > int(keep in self) and freed < excess:
+            _, value = self.popitem()
+            freed += int(self.getsizeof(value))
+            evicted += 1
+            del value
+            current = process_rss()
+            if current is None or current >= rss:
+                self._plateau = rss
+                break
+            rss = current
+        self.pressure_evictions += evicted
+        self._collect = self._collect or evicted > 0
+        data_logger.info("Evicted %i stores, RSS at %s bytes", evicted, rss)
+        return evicted
+
+    def collect(self) -> None:
+        """Collect the garbage of evicted entries, if there is any."""
+        if self._collect:
+            self._collect = False
+            gc.collect()
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        """Get the size, hit and eviction statistics of the cache."""
+        self.expire()
+        return {
+            "entries": len(self),
+            "bytes": int(self.currsize),
+            "max_bytes": int(self.maxsize),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "pressure_evictions": self.pressure_evictions,
+            "rejections": self.rejections,
+            "rss": process_rss(),
+            "rss_high": self.rss_high,
+        }
@@ -0,0 +1,149 @@
+"""Serve the chunks of netCDF4/HDF5 files as they are stored on disk.
+
+A zarr v2 chunk compressed with zlib, optionally after a byte shuffle, is
+byte for byte what HDF5 stores for a chunk written with the deflate and
+shuffle filters. If a store serves a variable of a single file unchanged
+and with the chunking of the file, its chunks can therefore be read from
+the file with a single ``pread`` instead of being decompressed, assembled
+by dask and compressed again.
+
+At load time :func:`native_references` finds the variables that qualify,
+much like a kerchunk reference index, and describes their codecs in the
+``.zarray`` metadata. :func:`read_native_chunk` reads a chunk at serving
+time. Chunks HDF5 didn't store as usual - chunks that were never written
+or whose filters were skipped - are left to the normal chunk encoding.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
+from urllib.parse import urlparse
+
+import h5py
+import xarray as xr
+
+from .utils import data_logger
+
+H5Z_FILTER_DEFLATE = 1
+H5Z_FILTER_SHUFFLE = 2
+NATIVE_KEY = "native_chunks"
+"""Encoding key of the variables whose chunks are served from the file."""
+
+
+class NativeRef(TypedDict):
+    """Where the chunks of a variable are found."""
+
+    path: str
+    name: str
+    mtime: float
+
+
+def _native_codecs(
+    dset: h5py.Dataset,
+) -> Optional[Tuple[Optional[Dict[str, Any]], Optional[List[Dict[str, Any]]]]]:
+    """Get the zarr compressor and filters matching the HDF5 filters."""
+    plist = dset.id.get_create_plist()
+    pipeline = [plist.get_filter(i) for i in range(plist.get_nfilters())]
+    codes = [f[0] for f in pipeline]
+    if codes == []:
+        return None, None
+    if codes == [H5Z_FILTER_DEFLATE]:
+        return {"id": "zlib", "level": int(pipeline[0][2][0])}, None
+    if codes == [H5Z_FILTER_SHUFFLE, H5Z_FILTER_DEFLATE]:
+        return (
+            {"id": "zlib", "level": int(pipeline[1][2][0])},
+            [{"id": "shuffle", "elementsize": dset.dtype.itemsize}],
+        )
+    return None
+
+
+def native_references(
+    path: str, dset: xr.Dataset, metadata: Dict[str, Any]
+) -> Dict[str, NativeRef]:
+    """Find the variables whose chunks can be read from the file as they are.
+
+    The ``.zarray`` metadata of these variables is changed to the codecs of
+    the file.
+
+    Parameters
+    ----------
+    path: str
+        The input file of the store.
+    dset: xr.Dataset
+        The dataset served from the root of the store.
+    metadata: dict
+        The consolidated metadata of the store.
+
+    Returns
+    -------
+    dict[str, NativeRef]: The references by variable name.
+    """
+    parsed = urlparse(path)
+    if parsed.scheme not in ("", "file"):
+        return {}
+    local = parsed.path if parsed.scheme else path
+    refs: Dict[str, NativeRef] = {}
+    try:
+        if not h5py.is_hdf5(local):
+            return refs
+        mtime = os.stat(local).st_mtime
+        with h5py.File(local, "r") as h5f:
+            for name in map(str, dset.data_vars):
+                zarray = metadata["metadata"].get(f"{name}/.zarray")
+                h5var = h5f.get(name)
+                if (
+                    zarray is None
+                    or not isinstance(h5var, h5py.Dataset)
+                    or h5var.chunks is None
+                    or h5var.dtype.kind not in "biuf"
+                    or h5var.dtype.str != zarray["dtype"]
+                    or list(h5var.shape) != zarray["shape"]
+                    or list(h5var.chunks) != zarray["chunks"]
+                ):
+                    continue
+                codecs = _native_codecs(h5var)
+                if codecs is None:
+                    continue
+                zarray["compressor"], zarray["filters"] = codecs
+                refs[name] = NativeRef(path=local, name=name, mtime=mtime)
+    except Exception as error:
+        data_logger.warning("Could not index the chunks of %s: %s", path, error)
+    return refs
+
+
+class _NativeFile:
+    """An HDF5 file, opened for chunk lookups and for plain reads."""
+
+    def __init__(self, path: str) -> None:
+        self.h5f = h5py.File(path, "r")
+        self.fd = os.open(path, os.O_RDONLY)
+
+    def __del__(self) -> None:
+        os.close(self.fd)
+        self.h5f.close()
+
+
+@functools.lru_cache(maxsize=64)
+def _native_file(path: str, mtime: float) -> _NativeFile:
+    return _NativeFile(path)
+
+
+def read_native_chunk(ref: NativeRef, chunk_id: str) -> Optional[bytes]:
+    """Read a chunk from the file as it is stored.
+
+    Returns
+    -------
+    bytes, None: The encoded chunk, ``None`` if the chunk has to be encoded
+                 the normal way.
+    """
+    native = _native_file(ref["path"], ref["mtime"])
+    h5var = native.h5f[ref["name"]]
+    offset = tuple(
+        int(i) * c for i, c in zip(chunk_id.split("."), h5var.chunks or ())
+    )
+    info = h5var.id.get_chunk_info_by_coord(offset)
+    if info.byte_offset is None or info.filter_mask != 0:
+        return None
+    return os.pread(native.fd, info.size, info.byte_offset)
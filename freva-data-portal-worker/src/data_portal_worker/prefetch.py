@@ -0,0 +1,199 @@
+"""Read-ahead of the chunks a client is about to request.
+
+Clients read stores in a predictable order: a reader of a ``map`` store
+that fetched chunk ``t.0.0`` wants ``t+1.0.0`` next, a ``time_series``
+reader walks the spatial tiles one after another. The :class:`Prefetcher`
+predicts the next chunks from the :class:`~.rechunker.ChunkPlan` of the
+store and books them for computation in the low priority ``prefetch`` lane,
+so that a sequential scan doesn't wait for every chunk to be computed.
+
+Each token may have a limited number of chunks booked. A token whose client
+hasn't requested a chunk for a while counts as abandoned, its bookings are
+dropped and booked work isn't started anymore.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .utils import str_to_int
+
+CHUNK_PLAN_KEY = "chunk_plan"
+"""Dataset encoding key of the :class:`~.rechunker.ChunkPlan` of a store."""
+
+ChunkRef = Tuple[str, str]
+"""A chunk of a store: ``(var_group, chunk_id)``."""
+
+
+def next_chunk_ids(
+    chunk: str,
+    shape: Sequence[int],
+    chunks: Sequence[int],
+    dims: Sequence[str],
+    access_pattern: str,
+    primary_axis: Optional[str],
+    depth: int,
+) -> List[str]:
+    """Get the ids of the chunks that are likely read after ``chunk``.
+
+    Parameters
+    ----------
+    chunk: str
+        The dot separated id of the chunk that was read.
+    shape: list[int]
+        The shape of the array.
+    chunks: list[int]
+        The chunk shape of the array.
+    dims: list[str]
+        The dimensions of the array.
+    access_pattern: str
+        ``map`` walks along the primary axis, anything else walks the chunks
+        in C order.
+    primary_axis: str, None
+        The primary axis of the store.
+    depth: int
+        Number of chunks to look ahead.
+
+    Returns
+    -------
+    list[str]: The chunk ids, nearest first.
+    """
+    if not shape or depth < 1:
+        return []
+    idx = [int(i) for i in chunk.split(".")]
+    nchunks = [-(-int(s) // int(c)) for s, c in zip(shape, chunks)]
+    if len(idx) != len(nchunks) or not all(0 <= i < n for i, n in zip(idx, nchunks)):
+        return []
+    if access_pattern == "map" and primary_axis is not None and primary_axis in dims:
+        axis = list(dims).index(primary_axis)
+        stop = min(idx[axis] + depth, nchunks[axis] - 1)
+        ahead = [
+            idx[:axis] + [num] + idx[axis + 1 :]
+            for num in range(idx[axis] + 1, stop + 1)
+        ]
+    else:
+        flat = int(np.ravel_multi_index(idx, nchunks))
+        stop = min(flat + depth, math.prod(nchunks) - 1)
+        ahead = [
+            [int(i) for i in np.unravel_index(num, nchunks)]
+            for num in range(flat + 1, stop + 1)
+        ]
+    return [".".join(map(str, i)) for i in ahead]
+
+
+class _TokenState:
+    def __init__(self) -> None:
+        self.last_read = time.monotonic()
+        self.booked: Set[ChunkRef] = set()
+        self.ready: Dict[ChunkRef, float] = {}
+
+
+class Prefetcher:
+    """Book keeping of the chunks that are read ahead, per token.
+
+    Parameters
+    ----------
+    depth: int, default: None
+        Chunks to read ahead of every request, ``0`` switches the read-ahead
+        off. Defaults to ``API_WORKER_PREFETCH`` or 0.
+    budget: int, default: None
+        Chunks a token may have booked or ready at once. Defaults to
+        ``API_WORKER_PREFETCH_BUDGET`` or 32.
+    idle: float, default: None
+        Seconds without a request after which a client counts as gone.
+        Defaults to ``API_WORKER_PREFETCH_IDLE`` or 10.
+    ttl: float, default: 60
+        Seconds a read-ahead chunk is trusted to be in the cache.
+    """
+
+    def __init__(
+        self,
+        depth: Optional[int] = None,
+        budget: Optional[int] = None,
+        idle: Optional[float] = None,
+        ttl: float = 60.0,
+    ) -> None:
+        self.depth = (
+            str_to_int(os.getenv("API_WORKER_PREFETCH"), 0)
+            if depth is None
+            else depth
+        )
+        self.budget = budget or str_to_int(
+            os.getenv("API_WORKER_PREFETCH_BUDGET"), 32
+        )
+        self.idle = idle or str_to_int(os.getenv("API_WORKER_PREFETCH_IDLE"), 10)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tokens: Dict[str, _TokenState] = {}
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for token in [
+            t for t, s in self._tokens.items() if now - s.last_read > self.idle
+        ]:
+            del self._tokens[token]
+
+    def read(self, token: str, chunk: ChunkRef) -> bool:
+        """Register a chunk request of a client.
+
+        Returns
+        -------
+        bool: ``True`` if the chunk was read ahead and should be in the cache.
+        """
+        with self._lock:
+            self._prune()
+            state = self._tokens.setdefault(token, _TokenState())
+            state.last_read = time.monotonic()
+            ready = state.ready.pop(chunk, None)
+            return ready is not None and time.monotonic() - ready < self.ttl
+
+    def book(self, token: str, chunks: Sequence[ChunkRef]) -> List[ChunkRef]:
+        """Book chunks for read-ahead, as far as the budget of the token allows.
+
+        Returns
+        -------
+        list[tuple[str, str]]: The chunks that were booked.
+        """
+        with self._lock:
+            state = self._tokens.get(token)
+            if state is None:
+                return []
+            now = time.monotonic()
+            state.ready = {
+                c: t for c, t in state.ready.items() if now - t < self.ttl
+            }
+            booked = []
+            for chunk in chunks:
+                if len(state.booked) + len(state.ready) >= self.budget:
+                    break
+                if chunk not in state.booked and chunk not in state.ready:
+                    state.booked.add(chunk)
+                    booked.append(chunk)
+            return booked
+
+    def active(self, token: str) -> bool:
+        """Check if the client of a token is still reading."""
+        with self._lock:
+            self._prune()
+            return token in self._tokens
+
+    def done(
+        self, token: str, ready: Sequence[ChunkRef], failed: Sequence[ChunkRef] = ()
+    ) -> None:
+        """Mark booked chunks as computed (``ready``) or given up."""
+        with self._lock:
+            state = self._tokens.get(token)
+            if state is None:
+                return
+            now = time.monotonic()
+            for chunk in ready:
+                state.booked.discard(chunk)
+                state.ready[chunk] = now
+            for chunk in failed:
+                state.booked.discard(chunk)
@@ -1,10 +1,13 @@
+import math
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Literal, Optional, Tuple, cast
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple, cast
 
 import numpy as np
 import xarray as xr
 from dask.utils import parse_bytes
 
+from .prefetch import CHUNK_PLAN_KEY
+
 AccessPattern = Literal["map", "time_series"]
 
 
@@ -16,6 +19,12 @@ class ChunkPlan:
     primary_axis: Optional[str]
     groups: Tuple["VarGroup", ...]  # diagnostic
     estimated_bytes_per_chunk_by_group: Dict[str, int]  # group_key -> bytes
+    # dim -> chunk size of the source (on disk or dask)
+    source_chunks: Dict[str, int] = field(default_factory=dict)
+    # dim -> "multiple", "divisor" or "unaligned" w.r.t. the source chunks
+    alignment: Dict[str, str] = field(default_factory=dict)
+    # source bytes decoded per served byte, worst group
+    read_amplification: float = 1.0
 
 
 @dataclass(frozen=True)
@@ -38,6 +47,45 @@ def _dtype_itemsize(dtype: Any) -> int:
     return cast(int, dt.itemsize)
 
 
+def _source_chunks(ds: xr.Dataset) -> Dict[str, int]:
+    """
+    Chunk size per dim of the source: the on-disk chunks of unmodified
+    variables, otherwise the dask chunks. The first variable wins.
+    """
+    out: Dict[str, int] = {}
+    for da in ds.data_vars.values():
+        enc = da.encoding
+        sizes: Tuple[int, ...] = ()
+        if tuple(enc.get("original_shape") or ()) == da.shape:
+            sizes = tuple(enc.get("chunksizes") or ())
+        if len(sizes) != da.ndim and da.chunks is not None:
+            sizes = tuple(int(c[0]) for c in da.chunks if c)
+        if len(sizes) != da.ndim:
+            continue
+        for dim, size in zip(map(str, da.dims), sizes):
+            out.setdefault(dim, max(1, min(int(size), int(ds.sizes[dim]))))
+    return out
+
+
+def _read_amplification(chunk: int, source: int) -> float:
+    """
+    Expected source elements decoded per served element along one axis.
+    A chunk of size c spans (c - gcd(c, s)) / s + 1 source chunks of size s
+    on average, aligned chunks (multiples or divisors of s) are the best
+    possible for their size.
+    """
+    blocks = (chunk - math.gcd(chunk, source)) / source + 1
+    return blocks * source / chunk
+
+
+def _alignment(chunk: int, source: int) -> str:
+    if chunk % source == 0:
+        return "multiple"
+    if source % chunk == 0:
+        return "divisor"
+    return "unaligned"
+
+
 def _group_vars_by_dims(ds: xr.Dataset) -> Tuple[VarGroup, ...]:
     groups: Dict[Tuple[str, ...], List[str]] = {}
     itemsize_max: Dict[Tuple[str, ...], int] = {}
@@ -115,6 +163,9 @@ class ChunkOptimizer:
     growth_factor: int = 2
     overshoot_ratio: float = 1.25
 
+    # Snap chunks to multiples/divisors of the source chunks
+    align_to_source: bool = True
+
     def _target_bytes(self) -> int:
         return (
             parse_bytes(self.target)
@@ -194,6 +245,46 @@ class ChunkOptimizer:
                 n *= int(chunks[d])
         return n * int(group.max_itemsize)
 
+    def _align_candidates(self, dim: str, cur: int, source: int) -> List[int]:
+        """Chunk sizes along ``dim`` that are aligned with ``source``."""
+        if cur >= source:
+            down = cur // source * source
+            cands = [down, down + source]
+        else:
+            cands = [d for d in range(cur, 0, -1) if source % d == 0][:1]
+            cands.append(source)
+        lo = int(self.min_chunks.get(dim, 1))
+        hi = int(self.max_chunks.get(dim, max(cands)))
+        return [c for c in cands if lo <= c <= hi]
+
+    def _align(
+        self,
+        ds: xr.Dataset,
+        chunks: Dict[str, int],
+        prio: Tuple[str, ...],
+        source: Dict[str, int],
+        fits: Callable[[], bool],
+    ) -> None:
+        """Snap the planned chunks to the source chunks where it pays off."""
+        for dim in prio:
+            if dim not in source:
+                continue
+            cur, src = int(chunks[dim]), source[dim]
+            dim_len = int(ds.sizes[dim])
+            best = cur
+            best_key = (_read_amplification(cur, src), 0.0)
+            for cand in self._align_candidates(dim, cur, src):
+                cand = min(cand, dim_len)
+                chunks[dim] = cand
+                ok = fits()
+                chunks[dim] = cur
+                if not ok:
+                    continue
+                key = (_read_amplification(cand, src), abs(math.log(cand / cur)))
+                if key < best_key:
+                    best, best_key = cand, key
+            chunks[dim] = best
+
     def plan(self, ds: xr.Dataset) -> ChunkPlan:
 
         target_bytes = self._target_bytes()
@@ -263,6 +354,18 @@ class ChunkOptimizer:
             if worst_bytes() >= target_bytes:
                 break
 
+        source = _source_chunks(ds)
+        if self.align_to_source:
+            before_align = worst_bytes()
+            pinned = primary_axis if self.access_pattern == "map" else None
+            self._align(
+                ds,
+                chunks,
+                tuple(d for d in prio if d != pinned),
+                source,
+                lambda: worst_bytes() <= max(limit, before_align),
+            )
+
         for d in list(chunks):
             if d in self.min_chunks:
                 chunks[d] = max(int(chunks[d]), int(self.min_chunks[d]))
@@ -273,6 +376,17 @@ class ChunkOptimizer:
         est_by_group = {
             g.key: self._est_bytes_for_group(g, chunks) for g in groups
         }
+        amplification = max(
+            (
+                math.prod(
+                    _read_amplification(chunks[d], source[d])
+                    for d in g.dims
+                    if d in source
+                )
+                for g in groups
+            ),
+            default=1.0,
+        )
 
         return ChunkPlan(
             chunks=dict(chunks),
@@ -281,8 +395,13 @@ class ChunkOptimizer:
             primary_axis=primary_axis,
             groups=groups,
             estimated_bytes_per_chunk_by_group=est_by_group,
+            source_chunks=source,
+            alignment={d: _alignment(chunks[d], s) for d, s in source.items()},
+            read_amplification=float(amplification),
         )
 
     def apply(self, ds: xr.Dataset) -> xr.Dataset:
         plan = self.plan(ds)
-        return ds.chunk(plan.chunks).unify_chunks()
+        out = ds.chunk(plan.chunks).unify_chunks()
+        out.encoding[CHUNK_PLAN_KEY] = plan
+        return out
@@ -31,15 +31,34 @@ nonsense.  Reduction therefore decodes the dataset first.  This is a
 deliberate, documented deviation -- a reduced store is always CF-decoded and
 floating point, while a pass-through store is not.
 
+Spatial subsetting
+------------------
+A store can be cut down to a region with the ``isel`` (index slices, e.g.
+``"lat:100:200"``) and ``subset_bbox`` (``[lon_min, lon_max, lat_min,
+lat_max]``)
+options.  Planning resolves both into plain index selections, which makes
+the subset independent of the grid type: regular grids select along the
+latitude and longitude dimensions, curvilinear and rotated-pole grids
+select the smallest index box around the matching cells of their 2D
+coordinates, and unstructured grids select the matching cells.  A subset
+alone needs no decoding, so the selected values still pass through raw.
+
 Spatial reduction
 -----------------
-Spatial reduction is *specified* here (see :class:`SpaceReduction` and the
-``space``/``space_dims``/``weighting`` options) so that the wire format, the
-cache-token identity and the sanitiser contract are already final, but it is
-not implemented yet: planning raises :class:`ReductionError` if it is
-requested.  Implementing it means filling in :func:`_resolve_weights` and
-the corresponding branch of :func:`apply_reduction`; nothing else in the
-pipeline needs to change.
+The ``space`` option collapses the spatial dimensions (``space_dims``, by
+default every dimension :func:`find_spatial_dims` finds) into a field
+mean, sum, minimum or maximum -- typically a global-mean time series.
+Means and sums are area-weighted (see :func:`_resolve_weights`): by a
+cell-area variable, by the cosine of the latitude, or not at all on
+equal-area grids.  Spatial reduction is applied before temporal reduction,
+so that resampling works on the already collapsed series.
+
+Variable selection
+------------------
+The ``variables`` option is not part of the plan: :func:`select_variables`
+applies it to the opened input files, before they are aggregated.  Every
+other step then only deals with the requested variables and the
+coordinates, bounds and cell measures that describe them.
 """
 
 from __future__ import annotations
@@ -66,15 +85,18 @@ from .utils import data_logger
 __all__ = [
     "FREQUENCIES",
     "METHODS",
+    "SPACE_METHODS",
     "WEIGHTINGS",
     "ReductionError",
     "ReductionOptions",
     "ReductionPlan",
     "SpaceReduction",
+    "SpatialSubset",
     "TimeReduction",
     "apply_reduction",
     "plan_reduction",
     "reduce_datasets",
+    "select_variables",
 ]
 
 
@@ -159,7 +181,10 @@ METHODS: Tuple[str, ...] = (
     "count",
 )
 
-#: Area-weighting strategies for spatial reduction (reserved).
+#: Spatial reduction methods.  Weights only affect ``mean`` and ``sum``.
+SPACE_METHODS: Tuple[str, ...] = ("mean", "sum", "min", "max")
+
+#: Area-weighting strategies for spatial reduction.
 WEIGHTINGS: Tuple[str, ...] = ("auto", "cell_area", "cos_lat", "none")
 
 #: Output dtype policy.
@@ -176,6 +201,11 @@ _CELL_AREA_CANDIDATES: Tuple[str, ...] = (
     "area",
 )
 
+#: Candidate names for latitude and longitude variables, used by the
+#: bounding box when no CF ``standard_name``/``units`` identify them.
+_LAT_CANDIDATES: Tuple[str, ...] = ("lat", "latitude", "nav_lat", "xlat")
+_LON_CANDIDATES: Tuple[str, ...] = ("lon", "longitude", "nav_lon", "xlong")
+
 #: Dimension names that indicate an equal-area (HEALPix-like) grid, where an
 #: unweighted spatial mean is already correct.
 _EQUAL_AREA_DIMS: Tuple[str, ...] = ("cell", "cells", "values", "ncells")
@@ -221,11 +251,13 @@ class ReductionOptions(TypedDict, total=False):
     climatology: Optional[bool]
     min_coverage: Optional[float]
     dtype: Optional[str]
-    # Reserved for spatial reduction -- accepted by the sanitiser so the wire
-    # format is stable, rejected during planning until implemented.
+    isel: Optional[List[str]]
+    subset_bbox: Optional[List[float]]
     space: Optional[str]
     space_dims: Optional[List[str]]
     weighting: Optional[str]
+    # Applied when the inputs are opened, see :func:`select_variables`.
+    variables: Optional[List[str]]
 
 
 @dataclass(frozen=True)
@@ -276,22 +308,18 @@ class TimeReduction:
 class SpaceReduction:
     """A fully resolved spatial reduction.
 
-    Reserved.  Planning currently rejects any request that would produce
-    one of these; the dataclass exists so that :class:`ReductionPlan`, the
-    wire format and the cache token do not have to change when spatial
-    reduction is implemented.
-
     Parameters
     ----------
     method:
-        Reduction method from :data:`METHODS`.
+        Reduction method from :data:`SPACE_METHODS`.
     dims:
         Dimensions to collapse.
     weighting:
         Resolved weighting strategy (never ``"auto"`` -- planning resolves
         it against the grid).
     weight_var:
-        Name of the cell-area variable when ``weighting == "cell_area"``.
+        Name of the cell-area variable when ``weighting == "cell_area"``,
+        of the latitude when ``weighting == "cos_lat"``.
     """
 
     method: str
@@ -305,6 +333,33 @@ class SpaceReduction:
         return f"area: {self.method}"
 
 
+@dataclass(frozen=True)
+class SpatialSubset:
+    """A fully resolved spatial subset.
+
+    Parameters
+    ----------
+    indexers:
+        ``(dim, indexer)`` pairs for :meth:`xarray.Dataset.isel`.  The
+        indexer is a slice, or the selected positions where they don't form
+        a regular range -- a bounding box across the longitude seam, or the
+        cells of an unstructured grid.
+    """
+
+    indexers: Tuple[Tuple[str, Any], ...]
+
+    def describe(self) -> str:
+        """Short human-readable summary, used for logging."""
+        parts: List[str] = []
+        for dim, indexer in self.indexers:
+            if isinstance(indexer, slice):
+                step = f":{indexer.step}" if indexer.step else ""
+                parts.append(f"{dim}[{indexer.start}:{indexer.stop}{step}]")
+            else:
+                parts.append(f"{dim}[{len(indexer)} points]")
+        return ", ".join(parts)
+
+
 @dataclass(frozen=True)
 class ReductionPlan:
     """A fully resolved reduction, ready to be applied.
@@ -314,20 +369,28 @@ class ReductionPlan:
     time:
         Temporal reduction, if any.
     space:
-        Spatial reduction, if any (reserved).
+        Spatial reduction, if any.
     dtype:
         Output dtype for floating-point data variables, or ``None`` to keep
         whatever decoding produced.
+    subset:
+        Spatial subset, applied before any reduction.
     """
 
     time: Optional[TimeReduction] = None
     space: Optional[SpaceReduction] = None
     dtype: Optional[str] = None
+    subset: Optional[SpatialSubset] = None
 
     @property
     def is_noop(self) -> bool:
         """Whether applying this plan would leave the dataset unchanged."""
-        return self.time is None and self.space is None
+        return self.time is None and self.space is None and self.subset is None
+
+    @property
+    def needs_decoding(self) -> bool:
+        """Whether the plan reduces values and so has to CF-decode first."""
+        return self.time is not None or self.space is not None
 
     @property
     def removes_spatial_dims(self) -> bool:
@@ -342,14 +405,16 @@ class ReductionPlan:
     def describe(self) -> str:
         """Short human-readable summary, used for logging."""
         parts: List[str] = []
-        if self.time is not None:
-            kind = "climatology" if self.time.is_climatology else "resample"
-            parts.append(f"{kind} {self.time.freq}/{self.time.method}")
+        if self.subset is not None:
+            parts.append(f"subset {self.subset.describe()}")
         if self.space is not None:
             parts.append(
                 f"space {self.space.method} over "
                 f"{','.join(self.space.dims)} ({self.space.weighting})"
             )
+        if self.time is not None:
+            kind = "climatology" if self.time.is_climatology else "resample"
+            parts.append(f"{kind} {self.time.freq}/{self.time.method}")
         if self.dtype is not None:
             parts.append(f"cast {self.dtype}")
         return "; ".join(parts) or "no-op"
@@ -428,39 +493,88 @@ def find_spatial_dims(ds: xr.Dataset, time_dim: Optional[str]) -> Tuple[str, ...
     )
 
 
+def _cell_area(ds: xr.Dataset, dims: Sequence[str]) -> Optional[str]:
+    """Find a cell-area variable on the reduced dimensions.
+
+    A CF ``cell_measures = "area: <name>"`` reference wins over the
+    conventional names in :data:`_CELL_AREA_CANDIDATES`.
+    """
+    candidates: List[str] = []
+    for var in ds.data_vars.values():
+        measures = str(var.attrs.get("cell_measures", "")).split()
+        if "area:" in measures[:-1]:
+            candidates.append(measures[measures.index("area:") + 1])
+    candidates.extend(_CELL_AREA_CANDIDATES)
+    for cand in candidates:
+        if cand in ds.variables and ds[cand].dims and set(ds[cand].dims) <= set(
+            dims
+        ):
+            return cand
+    return None
+
+
+def _latitude(
+    ds: xr.Dataset, dims: Sequence[str], ndim: Optional[int] = None
+) -> Optional[str]:
+    """Find the latitude on the reduced dimensions, for ``cos_lat``."""
+    name = _find_coordinate(ds, "latitude")
+    if name is None or not set(ds[name].dims) <= set(dims):
+        return None
+    if ndim is not None and ds[name].ndim != ndim:
+        return None
+    return name
+
+
 def _resolve_weights(
     ds: xr.Dataset, dims: Sequence[str], weighting: str
 ) -> Tuple[str, Optional[str]]:
     """Resolve the ``auto`` weighting strategy against a concrete grid.
 
-    Returns the resolved strategy and, for ``cell_area``, the name of the
-    area variable.
+    Returns the resolved strategy and the name of the variable the weights
+    are derived from: the area variable for ``cell_area``, the latitude for
+    ``cos_lat``.
 
     The resolution order is deliberately fail-loud: an unweighted mean over
     a regular lat/lon grid is wrong by several kelvin for a global field and
     looks entirely plausible in a plot, so a grid we cannot weight is an
-    error rather than a guess.
-
-    Reserved -- called only once spatial reduction is implemented.
+    error rather than a guess.  ``auto`` only falls back to ``cos_lat`` on
+    a latitude axis independent of the longitude; on curvilinear and
+    unstructured grids the cell area does not follow from the latitude
+    alone.
     """
-    if weighting != "auto":
-        if weighting == "cell_area":
-            for cand in _CELL_AREA_CANDIDATES:
-                if cand in ds.variables:
-                    return "cell_area", cand
+    if weighting == "cell_area":
+        area = _cell_area(ds, dims)
+        if area is None:
             raise ReductionError(
                 "No cell-area variable found for weighting='cell_area'.",
                 {"looked_for": ", ".join(_CELL_AREA_CANDIDATES)},
             )
+        return "cell_area", area
+    if weighting == "cos_lat":
+        lat = _latitude(ds, dims)
+        if lat is None:
+            raise ReductionError(
+                "No latitude found for weighting='cos_lat'.",
+                {"dims": ", ".join(dims)},
+            )
+        return "cos_lat", lat
+    if weighting != "auto":
         return weighting, None
 
-    for cand in _CELL_AREA_CANDIDATES:
-        if cand in ds.variables:
-            return "cell_area", cand
+    area = _cell_area(ds, dims)
+    if area is not None:
+        return "cell_area", area
 
-    for lat_name in ("lat", "latitude"):
-        if lat_name in ds.coords and ds[lat_name].ndim == 1:
-            return "cos_lat", None
+    lat = _latitude(ds, dims, ndim=1)
+    lon = _find_coordinate(ds, "longitude")
+    if lat is not None and not set(ds[lat].dims) & set(ds[lon].dims if lon else ()):
+        # A latitude axis of its own; on unstructured grids the latitude of
+        # every cell shares the dimension of the longitude.
+        return "cos_lat", lat
+
+    if lon is not None and ds[lon].dims == tuple(dims) == (lon,):
+        # Zonal statistics: cells along a latitude circle are equal-area.
+        return "none", None
 
     if any(d in _EQUAL_AREA_DIMS for d in dims):
         # HEALPix and friends: cells are equal-area, unweighted is correct.
@@ -560,6 +674,241 @@ def _check_not_inflating(ds: xr.Dataset, dim: str, freq: str) -> None:
     )
 
 
+def _parse_isel(
+    specs: Iterable[str], ds: xr.Dataset
+) -> Dict[str, np.ndarray]:
+    """Resolve ``"dim:start:stop[:step]"`` slices to selected positions.
+
+    The slices follow Python semantics, empty bounds and negative starts or
+    stops included; only positive steps are allowed, so that the order of
+    the data is kept.
+    """
+    positions: Dict[str, np.ndarray] = {}
+    for spec in specs:
+        dim, *bounds = str(spec).split(":")
+        try:
+            if not 2 <= len(bounds) <= 3:
+                raise ValueError(spec)
+            start, stop, step = (
+                int(b) if b else None for b in (bounds + [""])[:3]
+            )
+        except ValueError:
+            raise ReductionError(
+                f"Invalid index slice {spec!r}.",
+                {"expected": "dim:start:stop[:step], e.g. lat:100:200"},
+            ) from None
+        if dim not in ds.dims:
+            raise ReductionError(
+                f"Cannot slice {dim!r}: the dataset has no such dimension.",
+                {"available_dims": ", ".join(sorted(map(str, ds.dims)))},
+            )
+        if dim in positions:
+            raise ReductionError(f"The dimension {dim!r} is sliced twice.")
+        if step is not None and step < 1:
+            raise ReductionError(
+                f"The step of {spec!r} must be positive, got {step}."
+            )
+        positions[dim] = np.arange(ds.sizes[dim])[slice(start, stop, step)]
+    return positions
+
+
+def _find_coordinate(ds: xr.Dataset, axis: str) -> Optional[str]:
+    """Find the latitude (``axis="latitude"``) or longitude variable.
+
+    CF ``standard_name`` first, then ``units`` (``degrees_north``/
+    ``degrees_east``), then the conventional names.  The ``grid_latitude``
+    and ``grid_longitude`` axes of a rotated pole grid match none of these,
+    their 2D geographic coordinates are found instead.
+    """
+    suffix = "north" if axis == "latitude" else "east"
+    names = _LAT_CANDIDATES if axis == "latitude" else _LON_CANDIDATES
+    candidates = [
+        (str(name), var)
+        for name, var in ds.variables.items()
+        if var.ndim and np.issubdtype(var.dtype, np.number)
+    ]
+    for name, var in candidates:
+        if var.attrs.get("standard_name") == axis:
+            return name
+    for name, var in candidates:
+        units = str(var.attrs.get("units", "")).lower().replace("_", "")
+        if units in (f"degrees{suffix}", f"degree{suffix}", f"degree{suffix[0]}"):
+            return name
+    for name, var in candidates:
+        if name.lower() in names:
+            return name
+    return None
+
+
+def _in_degrees(var: xr.DataArray) -> xr.DataArray:
+    """A latitude or longitude in degrees.
+
+    ICON grids, among others, store ``clat``/``clon`` in radians.
+    """
+    units = str(var.attrs.get("units", "")).lower()
+    if units in ("rad", "radian", "radians"):
+        return cast(xr.DataArray, np.rad2deg(var))
+    return var
+
+
+def _bbox_positions(
+    ds: xr.Dataset, bbox: Sequence[float]
+) -> Dict[str, np.ndarray]:
+    """Resolve a ``[lon_min, lon_max, lat_min, lat_max]`` box to positions.
+
+    Longitudes are compared modulo 360, so the box can be given in either
+    convention and can cross the seam of the grid (``lon_min > lon_max``).
+    Positions across the seam are ordered to run eastwards from
+    ``lon_min``.  For 2D coordinates the smallest index box around the
+    matching cells is selected; the cells of that box outside the bounding
+    box are kept as they are.
+
+    This reads the latitude and longitude values, which for curvilinear
+    grids means loading their 2D coordinates.
+    """
+    if len(bbox) != 4:
+        raise ReductionError(
+            "A bounding box needs four values.",
+            {"expected": "lon_min, lon_max, lat_min, lat_max"},
+        )
+    lon_min, lon_max, lat_min, lat_max = map(float, bbox)
+    if lat_min > lat_max:
+        raise ReductionError(
+            f"lat_min ({lat_min}) must not be larger than lat_max ({lat_max})."
+        )
+    lat_name = _find_coordinate(ds, "latitude")
+    lon_name = _find_coordinate(ds, "longitude")
+    if lat_name is None or lon_name is None:
+        raise ReductionError(
+            "Cannot select a bounding box: no latitude/longitude found.",
+            {"hint": "Use 'isel' to select index ranges instead."},
+        )
+    lat, lon = _in_degrees(ds[lat_name]), _in_degrees(ds[lon_name])
+    width = lon_max - lon_min
+    with np.errstate(invalid="ignore"):
+        lat_mask = (lat.values >= lat_min) & (lat.values <= lat_max)
+        lon_mask = (
+            np.isfinite(lon.values)
+            if width >= 360
+            else np.mod(lon.values - lon_min, 360.0) <= np.mod(width, 360.0)
+        )
+    if lat.ndim == lon.ndim == 1 and lat.dims != lon.dims:
+        # Regular grid: latitude and longitude are independent axes.
+        positions = {
+            str(lat.dims[0]): np.flatnonzero(lat_mask),
+            str(lon.dims[0]): _wrapped(lon_mask),
+        }
+    elif lat.dims == lon.dims and lat.ndim == 1:
+        # Unstructured grid: latitude and longitude of every cell.
+        positions = {str(lat.dims[0]): np.flatnonzero(lat_mask & lon_mask)}
+    elif lat.dims == lon.dims:
+        # Curvilinear or rotated-pole grid: 2D geographic coordinates.
+        mask = lat_mask & lon_mask
+        positions = {}
+        for axis, dim in enumerate(map(str, lat.dims)):
+            others = tuple(a for a in range(mask.ndim) if a != axis)
+            hits = np.flatnonzero(mask.any(axis=others))
+            positions[dim] = (
+                np.arange(hits[0], hits[-1] + 1) if hits.size else hits
+            )
+    else:
+        raise ReductionError(
+            "Cannot select a bounding box on this grid.",
+            {
+                "latitude": f"{lat_name}{lat.dims}",
+                "longitude": f"{lon_name}{lon.dims}",
+            },
+        )
+    return positions
+
+
+def _wrapped(mask: np.ndarray) -> np.ndarray:
+    """Positions of ``mask``, rotated if the selection wraps around."""
+    positions = np.flatnonzero(mask)
+    if positions.size and mask[0] and mask[-1] and not mask.all():
+        gap = int(np.argmin(mask))
+        positions = np.concatenate(
+            [positions[positions >= gap], positions[positions < gap]]
+        )
+    return positions
+
+
+def _as_indexer(positions: np.ndarray) -> Any:
+    """A slice for regularly spaced positions, else the positions."""
+    if positions.size == 1:
+        return slice(int(positions[0]), int(positions[0]) + 1)
+    steps = np.diff(positions)
+    if steps[0] > 0 and (steps == steps[0]).all():
+        step = int(steps[0])
+        return slice(
+            int(positions[0]), int(positions[-1]) + 1, step if step > 1 else None
+        )
+    return tuple(int(p) for p in positions)
+
+
+def _plan_subset(
+    ds: xr.Dataset,
+    isel: Optional[Sequence[str]],
+    bbox: Optional[Sequence[float]],
+) -> SpatialSubset:
+    """Resolve the ``isel`` and ``subset_bbox`` options into one index selection.
+
+    The slices are applied first, the bounding box is looked up in what
+    they leave.
+    """
+    positions = _parse_isel(isel or [], ds)
+    if bbox:
+        sliced = ds.isel({dim: pos for dim, pos in positions.items()})
+        for dim, pos in _bbox_positions(sliced, bbox).items():
+            positions[dim] = positions.get(dim, np.arange(ds.sizes[dim]))[pos]
+    empty = sorted(dim for dim, pos in positions.items() if not pos.size)
+    if empty:
+        raise ReductionError(
+            "The subset selects no data.",
+            {"empty_dims": ", ".join(empty)},
+        )
+    return SpatialSubset(
+        tuple(
+            (dim, _as_indexer(pos))
+            for dim, pos in positions.items()
+            if not np.array_equal(pos, np.arange(ds.sizes[dim]))
+        )
+    )
+
+
+def _plan_space(
+    ds: xr.Dataset, opts: ReductionOptions
+) -> Optional[SpaceReduction]:
+    """Resolve the ``space``/``space_dims``/``weighting`` options."""
+    method = opts.get("space")
+    if not method:
+        if opts.get("space_dims") or opts.get("weighting"):
+            raise ReductionError(
+                "'space_dims'/'weighting' require 'space' to be set."
+            )
+        return None
+    method = _require_choice(method, "space", SPACE_METHODS)
+    weighting = _require_choice(
+        opts.get("weighting") or "auto", "weighting", WEIGHTINGS
+    )
+    dims = tuple(opts.get("space_dims") or find_spatial_dims(ds, find_time_dim(ds)))
+    missing = [d for d in dims if d not in ds.dims]
+    if missing or not dims:
+        raise ReductionError(
+            "Cannot reduce in space: "
+            + (
+                f"unknown dimensions {', '.join(missing)}."
+                if missing
+                else "the dataset has no spatial dimension."
+            ),
+            {"available_dims": ", ".join(sorted(map(str, ds.dims)))},
+        )
+    resolved, weight_var = _resolve_weights(ds, dims, weighting)
+    return SpaceReduction(
+        method=method, dims=dims, weighting=resolved, weight_var=weight_var
+    )
+
+
 def plan_reduction(
     ds: xr.Dataset, options: Optional[Mapping[str, Any]] = None
 ) -> ReductionPlan:
@@ -574,7 +923,8 @@ def plan_reduction(
     ----------
     ds:
         The dataset the plan will be applied to.  Only its structure is
-        inspected; no data is read.
+        inspected; no data is read, apart from the latitude and longitude
+        of a bounding box.
     options:
         Raw option mapping as received over the broker.  ``None`` or an
         empty mapping yields a no-op plan.
@@ -594,14 +944,14 @@ def plan_reduction(
     if not opts:
         return ReductionPlan()
 
-    if opts.get("space") or opts.get("space_dims") or opts.get("weighting"):
-        raise ReductionError(
-            "Spatial reduction is not implemented yet.",
-            {"hint": "Only temporal reduction is currently supported."},
-        )
+    subset: Optional[SpatialSubset] = None
+    if opts.get("isel") or opts.get("subset_bbox"):
+        subset = _plan_subset(ds, opts.get("isel"), opts.get("subset_bbox"))
+        # Everything below is planned against what the subset leaves.
+        ds = _subset(ds, subset)
 
     dtype: Optional[str] = None
-    if opts.get("time_freq"):
+    if opts.get("time_freq") or opts.get("space"):
         # Default to float32 here as well as in the REST schema.  A broker
         # message that omits the key must not silently fall back to the
         # float64 that CF-decoding packed data produces.
@@ -654,7 +1004,9 @@ def plan_reduction(
             "'time_method'/'climatology' require 'time_freq' to be set."
         )
 
-    return ReductionPlan(time=time, space=None, dtype=dtype)
+    return ReductionPlan(
+        time=time, space=_plan_space(ds, opts), dtype=dtype, subset=subset
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -679,6 +1031,16 @@ def _bounds_variables(ds: xr.Dataset) -> List[str]:
     return sorted(names)
 
 
+def _subset(ds: xr.Dataset, subset: SpatialSubset) -> xr.Dataset:
+    """Select a spatial subset, lazily."""
+    return ds.isel(
+        {
+            dim: indexer if isinstance(indexer, slice) else np.array(indexer)
+            for dim, indexer in subset.indexers
+        }
+    )
+
+
 def _decode(ds: xr.Dataset) -> xr.Dataset:
     """CF-decode a dataset for reduction.
 
@@ -775,6 +1137,78 @@ def _reduce_time(ds: xr.Dataset, time: TimeReduction) -> xr.Dataset:
     return reduced
 
 
+def _auxiliary_variables(ds: xr.Dataset) -> List[str]:
+    """Collect the auxiliary coordinates that are stored as data variables.
+
+    With ``decode_coords=False`` the 2D latitude and longitude of a
+    curvilinear grid, and anything else listed in CF ``coordinates``
+    attributes, are data variables.  They span the spatial dimensions but
+    averaging them is meaningless, so they are dropped before a spatial
+    reduction.
+    """
+    names: set[str] = set()
+    for var in ds.data_vars.values():
+        names.update(str(var.attrs.get("coordinates", "")).split())
+    names.update(
+        str(_find_coordinate(ds, axis)) for axis in ("latitude", "longitude")
+    )
+    return sorted(names & set(map(str, ds.data_vars)))
+
+
+def _area_weights(ds: xr.Dataset, space: SpaceReduction) -> Optional[xr.DataArray]:
+    """The area weights of a spatial reduction, ``None`` for unweighted."""
+    if space.weight_var is None or space.method not in ("mean", "sum"):
+        return None
+    weights = ds[space.weight_var]
+    if space.weighting == "cos_lat":
+        weights = cast(xr.DataArray, np.cos(np.deg2rad(_in_degrees(weights))))
+    # Missing areas (land cells of an ocean grid) must not poison the mean.
+    return weights.fillna(0.0).clip(min=0.0)
+
+
+def _reduce_space(ds: xr.Dataset, space: SpaceReduction) -> xr.Dataset:
+    """Collapse the spatial dimensions of every variable carrying them.
+
+    Variables without any of the dimensions ride along unchanged, the
+    weights and auxiliary coordinates are dropped.
+    """
+    weights = _area_weights(ds, space)
+    skip = set(_auxiliary_variables(ds))
+    if space.weight_var is not None:
+        skip.add(space.weight_var)
+    to_reduce: List[str] = []
+    to_keep: List[str] = []
+    for name, var in ds.data_vars.items():
+        numeric = np.issubdtype(var.dtype, np.number) or var.dtype == np.bool_
+        if str(name) in skip:
+            continue
+        if not set(space.dims) & set(map(str, var.dims)):
+            to_keep.append(str(name))
+        elif numeric:
+            to_reduce.append(str(name))
+        else:
+            data_logger.debug(
+                "Dropping non-numeric spatial variable %s (%s)", name, var.dtype
+            )
+    if not to_reduce:
+        raise ReductionError(
+            "No numeric variable spans the spatial dimensions.",
+            {"dims": ", ".join(space.dims), "variables": ", ".join(map(str, ds))},
+        )
+    source: Any = ds[to_reduce]
+    if weights is not None:
+        source = source.weighted(weights)
+    reduced = cast(
+        xr.Dataset,
+        getattr(source, space.method)(dim=list(space.dims), keep_attrs=True),
+    )
+    for name in to_reduce:
+        reduced[name].attrs = dict(ds[name].attrs)
+    for name in to_keep:
+        reduced[name] = ds[name]
+    return reduced
+
+
 def _tag_cell_methods(ds: xr.Dataset, fragments: Iterable[str]) -> xr.Dataset:
     """Append CF ``cell_methods`` fragments to every data variable."""
     suffix = " ".join(fragments)
@@ -804,8 +1238,9 @@ def _cast(ds: xr.Dataset, dtype: str) -> xr.Dataset:
 def apply_reduction(ds: xr.Dataset, plan: ReductionPlan) -> xr.Dataset:
     """Execute a reduction plan against a dataset.
 
-    The dataset is CF-decoded first (see the module docstring).  Bounds
-    variables are dropped, the requested reductions are applied lazily, CF
+    The spatial subset is selected first.  If anything is to be reduced the
+    dataset is then CF-decoded (see the module docstring), bounds variables
+    are dropped, the requested reductions are applied lazily, CF
     ``cell_methods`` are updated, and floating-point variables are cast to
     the requested dtype.
 
@@ -826,6 +1261,11 @@ def apply_reduction(ds: xr.Dataset, plan: ReductionPlan) -> xr.Dataset:
     if plan.is_noop:
         return ds
 
+    if plan.subset is not None:
+        ds = _subset(ds, plan.subset)
+    if not plan.needs_decoding:
+        return ds
+
     out = _decode(ds)
     drop = _bounds_variables(out)
     if drop:
@@ -833,11 +1273,13 @@ def apply_reduction(ds: xr.Dataset, plan: ReductionPlan) -> xr.Dataset:
         out = out.drop_vars(drop, errors="ignore")
 
     fragments: List[str] = []
+    if plan.space is not None:
+        # Space first: resampling the collapsed series is all but free.
+        out = _reduce_space(out, plan.space)
+        fragments.append(plan.space.cell_method)
     if plan.time is not None:
         out = _reduce_time(out, plan.time)
         fragments.append(plan.time.cell_method)
-    if plan.space is not None:  # pragma: no cover - reserved
-        raise ReductionError("Spatial reduction is not implemented yet.")
 
     out = _tag_cell_methods(out, fragments)
     if plan.dtype is not None:
@@ -902,9 +1344,6 @@ def plan_removes_spatial_dims(
     Used by the caller to pick a chunking strategy: a dataset that has lost
     its spatial dimensions is a plain time series and must not be chunked
     for ``map`` access, or it degenerates into one tiny chunk per time step.
-
-    Always ``False`` while spatial reduction is unimplemented; the hook is
-    wired up now so the chunking behaviour does not have to be revisited.
     """
     if not options:
         return False
@@ -912,3 +1351,88 @@ def plan_removes_spatial_dims(
         plan_reduction(ds, options).removes_spatial_dims
         for ds in datasets.values()
     )
+
+
+#: Attributes through which CF variables refer to other variables.
+_REFERENCE_ATTRS = (
+    "coordinates",
+    "bounds",
+    "climatology",
+    "grid_mapping",
+    "cell_measures",
+    "ancillary_variables",
+    "formula_terms",
+)
+
+
+def _referenced_variables(var: xr.Variable) -> List[str]:
+    """Names a variable refers to through its CF attributes.
+
+    Keys like ``area:`` in ``cell_measures`` or ``grid_mapping`` are skipped,
+    only the variable names are returned.
+    """
+    names: List[str] = []
+    for attr in _REFERENCE_ATTRS:
+        value = var.attrs.get(attr)
+        if isinstance(value, str):
+            names.extend(w for w in value.split() if not w.endswith(":"))
+    return names
+
+
+def _keep_variables(ds: xr.Dataset, wanted: Sequence[str]) -> xr.Dataset:
+    """Drop the data variables that neither are wanted nor describe them."""
+    todo = [n for n in wanted if n in ds.data_vars] + list(map(str, ds.coords))
+    needed: set[str] = set()
+    while todo:
+        name = todo.pop()
+        if name in needed or name not in ds.variables:
+            continue
+        needed.add(name)
+        todo.extend(_referenced_variables(ds.variables[name]))
+    return ds.drop_vars([n for n in map(str, ds.data_vars) if n not in needed])
+
+
+def select_variables(
+    datasets: Sequence[xr.Dataset], variables: Optional[Sequence[str]] = None
+) -> List[xr.Dataset]:
+    """Reduce opened input files to the requested variables.
+
+    Besides the requested data variables, everything they refer to through
+    CF attributes is kept: auxiliary coordinates, bounds, grid mappings and
+    cell measures.  Files that hold none of the requested variables are
+    left out, so that e.g. the ``pr`` files of a search don't take part in
+    the aggregation of ``tas``.
+
+    Parameters
+    ----------
+    datasets:
+        The opened input files.
+    variables:
+        Names of the data variables to keep.  ``None`` or an empty list
+        keeps everything.
+
+    Returns
+    -------
+    list[xarray.Dataset]
+        The datasets that hold any of the variables, in their input order.
+
+    Raises
+    ------
+    ReductionError
+        If a variable is in none of the datasets.
+    """
+    if not variables:
+        return list(datasets)
+    wanted = list(dict.fromkeys(variables))
+    available = {str(n) for ds in datasets for n in ds.data_vars}
+    missing = [n for n in wanted if n not in available]
+    if missing:
+        raise ReductionError(
+            "Variables not found in the input files.",
+            {"missing": ", ".join(missing), "available": ", ".join(sorted(available))},
+        )
+    return [
+        _keep_variables(ds, wanted)
+        for ds in datasets
+        if any(n in ds.data_vars for n in wanted)
+    ]
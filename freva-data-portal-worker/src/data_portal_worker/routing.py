@@ -0,0 +1,160 @@
+"""Token affinity of chunk requests across data-loader processes.
+
+Every data-loader process keeps the datasets it has unpickled in memory.
+When any process may pick up a chunk request, a store that is read by many
+clients ends up unpickled - and held - by every single process. The
+:class:`TokenRouter` assigns each store token to one process with a
+consistent hash ring over all live processes instead. A process that pops a
+chunk request of a token it doesn't own forwards the request to the private
+queue of the owner.
+
+Processes announce themselves with a heartbeat in a sorted set. A process
+that stops its heartbeat drops out of the ring, one that (re)starts joins
+it; in both cases only the tokens of that process change their owner.
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import json
+import os
+import socket
+import time
+from multiprocessing import current_process
+from typing import Any, Dict, List, Optional, Sequence
+
+from redis.client import Redis
+
+from .utils import data_logger, str_to_int
+
+ROUTED_MESSAGES = ("chunk", "chunks", "shard")
+"""Broker messages that are routed to the process owning the token."""
+
+
+def member_name() -> str:
+    """Get the name of this process, ``<hostname>:<process name>``."""
+    return f"{socket.gethostname()}:{current_process().name}"
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """A consistent hash ring.
+
+    Parameters
+    ----------
+    members: Sequence[str]
+        The members of the ring.
+    replicas: int, default: 64
+        Points per member on the ring, more points spread the keys more
+        evenly.
+    """
+
+    def __init__(self, members: Sequence[str], replicas: int = 64) -> None:
+        self.members = sorted(set(members))
+        points = sorted(
+            (_hash(f"{member}#{num}"), member)
+            for member in self.members
+            for num in range(replicas)
+        )
+        self._hashes = [p[0] for p in points]
+        self._owners = [p[1] for p in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        """Get the member that owns ``key``, ``None`` for an empty ring."""
+        if not self._hashes:
+            return None
+        idx = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[idx]
+
+
+class TokenRouter:
+    """Route chunk requests to the process that owns their token.
+
+    Parameters
+    ----------
+    cache: redis.Redis
+        The broker connection.
+    channel: str
+        The broker channel, e.g. ``data-portal``.
+    member: str, default: None
+        Name of this process in the ring. It should survive a restart of the
+        process, so that the restarted process takes over its old tokens
+        and queue. Defaults to ``<hostname>:<process name>``.
+    ttl: float, default: 15
+        Seconds without heartbeat after which a process leaves the ring.
+    """
+
+    def __init__(
+        self,
+        cache: Redis,
+        channel: str,
+        member: Optional[str] = None,
+        ttl: float = 15.0,
+    ) -> None:
+        self.cache = cache
+        self.channel = channel
+        self.member = member or member_name()
+        self.ttl = ttl
+        self.registry = f"{channel}:workers"
+        self.queue = f"{channel}:chunk:{self.member}"
+        self.ring = HashRing([self.member])
+        self.routed_ttl = str_to_int(os.getenv("API_WORKER_ROUTED_TTL"), 60)
+        self._last_beat = 0.0
+
+    @staticmethod
+    def _token(message: Dict[str, Any]) -> Optional[str]:
+        for key in ROUTED_MESSAGES:
+            if isinstance(message.get(key), dict):
+                token = message[key].get("uuid")
+                return token if isinstance(token, str) else None
+        return None
+
+    def tick(self) -> None:
+        """Renew the heartbeat and refresh the ring, if due."""
+        now = time.time()
+        if now - self._last_beat < self.ttl / 3:
+            return
+        self._last_beat = now
+        pipe = self.cache.pipeline()
+        pipe.zadd(self.registry, {self.member: now})
+        pipe.zremrangebyscore(self.registry, "-inf", now - self.ttl)
+        pipe.zrange(self.registry, 0, -1)
+        members: List[Any] = pipe.execute()[-1]
+        names = [m.decode() if isinstance(m, bytes) else m for m in members]
+        if sorted(set(names)) != self.ring.members:
+            data_logger.info("Data-loader processes: %s", ", ".join(sorted(names)))
+            self.ring = HashRing(names)
+
+    def forward(self, body: bytes) -> bool:
+        """Push a message to the queue of its owner, if that's not us.
+
+        Returns
+        -------
+        bool: ``True`` if the message was forwarded.
+        """
+        try:
+            token = self._token(json.loads(body))
+        except (ValueError, AttributeError):
+            return False
+        owner = self.ring.owner(token) if token else None
+        if owner is None or owner == self.member:
+            return False
+        queue = f"{self.channel}:chunk:{owner}"
+        pipe = self.cache.pipeline()
+        pipe.lpush(queue, body)
+        # Nobody waits for a chunk much longer, don't let the requests of a
+        # process that is gone for good pile up.
+        pipe.expire(queue, self.routed_ttl)
+        pipe.execute()
+        return True
+
+    def leave(self) -> None:
+        """Leave the ring and hand back the requests that are still queued."""
+        self.cache.zrem(self.registry, self.member)
+        shared = f"{self.channel}:chunk"
+        while self.cache.rpoplpush(self.queue, shared) is not None:
+            pass
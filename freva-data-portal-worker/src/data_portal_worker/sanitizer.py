@@ -33,6 +33,7 @@ JSON decoding::
 
 from __future__ import annotations
 
+import math
 from pathlib import PurePosixPath
 from typing import Any, Dict, List, Optional
 from urllib.parse import urlparse
@@ -44,6 +45,24 @@ from urllib.parse import urlparse
 #: Only "map" and "time_series" are valid access patterns.
 _VALID_ACCESS_PATTERNS = frozenset({"map", "time_series"})
 
+#: Store compressors: ``none``, ``auto`` or a codec with an optional level.
+_COMPRESSORS: frozenset[str] = frozenset(
+    ["none", "auto"]
+    + [
+        f"{codec}{level}"
+        for codec, low, high in (
+            *(
+                (f"blosc-{cname}", 0, 9)
+                for cname in ("blosclz", "lz4", "lz4hc", "zlib", "zstd")
+            ),
+            ("zlib", 0, 9),
+            ("gzip", 0, 9),
+            ("zstd", 1, 22),
+        )
+        for level in ["", *(f":{i}" for i in range(low, high + 1))]
+    ]
+)
+
 #: URL schemes accepted in path fields.  POSIX paths (starting with ``/``)
 #: are always accepted regardless of this set.
 #: Add new schemes here as new storage backends are integrated.
@@ -88,6 +107,10 @@ _VARIABLE_STRIP = str.maketrans(
 _TOKEN_STRIP = str.maketrans(
     "", "", "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_"
 )
+#: Variable names additionally may contain dots and dashes.
+_NAME_STRIP = str.maketrans(
+    "", "", "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-"
+)
 
 #: RFC 3986 scheme characters: ALPHA / DIGIT / "+" / "-" / "."
 #: Used in _has_url_scheme; frozenset lookup is O(1) and avoids re.match overhead.
@@ -100,6 +123,10 @@ _MIN_CHUNK_SIZE_MIB: float = 0.5
 _MAX_CHUNK_SIZE_MIB: float = 512.0
 _MIN_MAP_PRIMARY: int = 1
 _MAX_MAP_PRIMARY: int = 1024
+#: Upper bound of chunk keys in a single batched ``chunks`` request.
+_MAX_BATCH_CHUNKS: int = 1024
+#: Upper bound of the length of a catalogue time range.
+_MAX_TIME_RANGE_LEN: int = 128
 
 
 # ---------------------------------------------------------------------------
@@ -126,6 +153,31 @@ def _require_list_of_str(value: Any, field: str) -> List[str]:
     return value
 
 
+def _is_finite_number(value: Any) -> bool:
+    """Whether *value* is a real, finite JSON number (not a bool)."""
+    return (
+        isinstance(value, (int, float))
+        and not isinstance(value, bool)
+        and math.isfinite(value)
+    )
+
+
+def _is_index_slice(value: Any) -> bool:
+    """Whether *value* has the form ``dim:start:stop[:step]``.
+
+    The bounds are optional integers, the dimension a plain identifier.
+    """
+    if not isinstance(value, str) or len(value) > 96:
+        return False
+    dim, *bounds = value.split(":")
+    return (
+        bool(dim)
+        and not dim.translate(_TOKEN_STRIP)
+        and 2 <= len(bounds) <= 3
+        and all(not b or b.removeprefix("-").isdigit() for b in bounds)
+    )
+
+
 def _has_url_scheme(raw: str) -> bool:
     """Return True when *raw* starts with a valid ``<scheme>://`` prefix.
 
@@ -232,6 +284,32 @@ def _sanitize_paths(raw: Any, field: str) -> List[str]:
     return [_sanitize_path(p, field) for p in paths]
 
 
+def _sanitize_time_ranges(raw: Any, paths: List[str]) -> Dict[str, str]:
+    """Validate the catalogue time ranges of the input files.
+
+    The ranges are only a hint for ordering the files, but they are keyed
+    by path, so every key must be one of the input ``paths``.
+    """
+    if raw is None:
+        return {}
+    if not isinstance(raw, dict):
+        raise ValueError(
+            f"'time_ranges' must be a dict or null, got {type(raw).__name__}"
+        )
+    out: Dict[str, str] = {}
+    for key, value in raw.items():
+        path = _sanitize_path(_require_str(key, "time_ranges"), "time_ranges")
+        if path not in paths:
+            raise ValueError(f"'time_ranges' contains unknown path {path!r}")
+        if not isinstance(value, str) or len(value) > _MAX_TIME_RANGE_LEN:
+            raise ValueError(
+                f"'time_ranges' values must be strings of at most "
+                f"{_MAX_TIME_RANGE_LEN} characters, got {value!r}"
+            )
+        out[path] = value
+    return out
+
+
 def _sanitize_username(raw: Any) -> Optional[str]:
     """Return a validated username or ``None`` for guest access.
 
@@ -375,19 +453,14 @@ def _sanitize_reduction(raw: Any) -> Optional[Dict[str, Any]]:
     """Validate the optional dimension-reduction plan dict.
 
     Unlike ``assembly`` the reduction plan is not flat ``str | None``: it
-    mixes strings, booleans, a float and a list of dimension names, so it
-    gets its own validator.
+    mixes strings, booleans, a float, lists of variable names, dimension
+    names and index slices and a bounding box, so it gets its own validator.
 
     Only the *shape* of the payload is checked here.  Whether a frequency is
     known, whether a climatology is meaningful, and whether the dataset even
     has a time axis are decided by ``reducer.plan_reduction`` against the
     concrete dataset -- the sanitiser's job is only to guarantee that
     nothing dangerous or structurally broken reaches it.
-
-    The spatial keys (``space``, ``space_dims``, ``weighting``) are accepted
-    here even though the reducer rejects them, so that the wire format is
-    already final and enabling spatial reduction later needs no change on
-    the broker contract.
     """
     if raw is None or raw == {}:
         return None
@@ -399,7 +472,18 @@ def _sanitize_reduction(raw: Any) -> Optional[Dict[str, Any]]:
     _bool_keys = {"climatology"}
     _float_keys = {"min_coverage"}
     _list_keys = {"space_dims"}
-    _allowed_keys = _str_keys | _bool_keys | _float_keys | _list_keys
+    _slice_keys = {"isel"}
+    _bbox_keys = {"subset_bbox"}
+    _name_keys = {"variables"}
+    _allowed_keys = (
+        _str_keys
+        | _bool_keys
+        | _float_keys
+        | _list_keys
+        | _slice_keys
+        | _bbox_keys
+        | _name_keys
+    )
     out: Dict[str, Any] = {}
     for k, v in raw.items():
         if not isinstance(k, str):
@@ -429,6 +513,44 @@ def _sanitize_reduction(raw: Any) -> Optional[Dict[str, Any]]:
             if not (0.0 <= float(v) <= 1.0):
                 raise ValueError(f"'reduce[{k!r}]' must be within [0, 1], got {v}")
             v = float(v)
+        elif k in _slice_keys:
+            if not isinstance(v, list) or len(v) > 8:
+                raise ValueError(
+                    f"'reduce[{k!r}]' must be a list of at most 8 index slices"
+                )
+            for item in v:
+                if not _is_index_slice(item):
+                    raise ValueError(
+                        f"'reduce[{k!r}]' contains an invalid index slice: "
+                        f"{item!r}"
+                    )
+        elif k in _bbox_keys:
+            if (
+                not isinstance(v, list)
+                or len(v) != 4
+                or not all(_is_finite_number(item) for item in v)
+            ):
+                raise ValueError(
+                    f"'reduce[{k!r}]' must be four numbers: "
+                    "lon_min, lon_max, lat_min, lat_max"
+                )
+            v = [float(item) for item in v]
+        elif k in _name_keys:
+            if not isinstance(v, list) or len(v) > 64:
+                raise ValueError(
+                    f"'reduce[{k!r}]' must be a list of at most 64 variable names"
+                )
+            for item in v:
+                if (
+                    not isinstance(item, str)
+                    or not item
+                    or len(item) > 128
+                    or item.translate(_NAME_STRIP)
+                ):
+                    raise ValueError(
+                        f"'reduce[{k!r}]' contains an invalid variable name: "
+                        f"{item!r}"
+                    )
         else:  # _list_keys
             if not isinstance(v, list) or len(v) > 8:
                 raise ValueError(
@@ -449,6 +571,53 @@ def _sanitize_reduction(raw: Any) -> Optional[Dict[str, Any]]:
     return out or None
 
 
+def _sanitize_encoding(raw: Any) -> Optional[Dict[str, Any]]:
+    """Validate the optional store encoding dict.
+
+    The encoding only selects between layouts the worker knows how to
+    write, so every key is checked against a closed set of values.
+    """
+    if raw is None or raw == {}:
+        return None
+    if not isinstance(raw, dict):
+        raise ValueError(f"'encoding' must be a dict or null, got {type(raw).__name__}")
+    _allowed_values: Dict[str, frozenset[Any]] = {
+        "zarr_format": frozenset({2, 3}),
+        "compressor": _COMPRESSORS,
+        "keepbits": frozenset(range(1, 53)),
+    }
+    _ranges = {"keep_information": (0.0, 1.0)}
+    out: Dict[str, Any] = {}
+    for k, v in raw.items():
+        if k not in _allowed_values and k not in _ranges:
+            raise ValueError(
+                f"'encoding' contains unexpected key {k!r}; "
+                f"allowed: {sorted([*_allowed_values, *_ranges])}"
+            )
+        if v is None:
+            continue
+        if k in _ranges:
+            low, high = _ranges[k]
+            if (
+                isinstance(v, bool)
+                or not isinstance(v, (int, float))
+                or not low < v < high
+            ):
+                raise ValueError(
+                    f"'encoding[{k!r}]' must be a number between {low} and "
+                    f"{high}, got {v!r}"
+                )
+            out[k] = float(v)
+            continue
+        if isinstance(v, bool) or v not in _allowed_values[k]:
+            raise ValueError(
+                f"'encoding[{k!r}]' must be one of "
+                f"{sorted(_allowed_values[k])}, got {v!r}"
+            )
+        out[k] = v
+    return out or None
+
+
 # ---------------------------------------------------------------------------
 # Per-message-type sanitisers
 # ---------------------------------------------------------------------------
@@ -457,8 +626,10 @@ def _sanitize_reduction(raw: Any) -> Optional[Dict[str, Any]]:
 def _sanitize_uri(payload: Any) -> Dict[str, Any]:
     if not isinstance(payload, dict):
         raise ValueError("'uri' must be a JSON object")
+    paths = _sanitize_paths(payload.get("path"), "uri.path")
     return {
-        "path": _sanitize_paths(payload.get("path"), "uri.path"),
+        "path": paths,
+        "time_ranges": _sanitize_time_ranges(payload.get("time_ranges"), paths),
         "uuid": _require_str(payload.get("uuid", ""), "uri.uuid"),
         "username": _sanitize_username(payload.get("username")),
         "assembly": _sanitize_assembly(payload.get("assembly")),
@@ -471,6 +642,7 @@ def _sanitize_uri(payload: Any) -> Dict[str, Any]:
         ),
         "reload": bool(payload.get("reload", False)),
         "chunk_size": _sanitize_chunk_size(payload.get("chunk_size", 16.0)),
+        "encoding": _sanitize_encoding(payload.get("encoding")),
     }
 
 
@@ -484,6 +656,52 @@ def _sanitize_chunk(payload: Any) -> Dict[str, Any]:
     }
 
 
+def _sanitize_shard(payload: Any) -> Dict[str, Any]:
+    """Validate a shard request; shards are addressed like chunks."""
+    if not isinstance(payload, dict):
+        raise ValueError("'shard' must be a JSON object")
+    return {
+        "uuid": _require_str(payload.get("uuid", ""), "shard.uuid"),
+        "shard": _sanitize_chunk_id(payload.get("shard")),
+        "variable": _sanitize_variable(payload.get("variable")),
+    }
+
+
+def _sanitize_chunks(payload: Any) -> Dict[str, Any]:
+    """Validate a batched chunk request.
+
+    The batch carries one store token and a list of
+    ``{"variable": ..., "chunk": ...}`` entries, each validated exactly
+    like a single ``chunk`` message.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("'chunks' must be a JSON object")
+    keys = payload.get("keys")
+    if not isinstance(keys, list) or not keys:
+        raise ValueError(f"'chunks.keys' must be a non-empty list, got {keys!r}")
+    if len(keys) > _MAX_BATCH_CHUNKS:
+        raise ValueError(
+            f"'chunks.keys' must not exceed {_MAX_BATCH_CHUNKS} entries, "
+            f"got {len(keys)}"
+        )
+    out: List[Dict[str, str]] = []
+    for item in keys:
+        if not isinstance(item, dict):
+            raise ValueError(
+                f"'chunks.keys' entries must be JSON objects, got {item!r}"
+            )
+        out.append(
+            {
+                "variable": _sanitize_variable(item.get("variable")),
+                "chunk": _sanitize_chunk_id(item.get("chunk")),
+            }
+        )
+    return {
+        "uuid": _require_str(payload.get("uuid", ""), "chunks.uuid"),
+        "keys": out,
+    }
+
+
 def _sanitize_access_check(payload: Any) -> Dict[str, Any]:
     if not isinstance(payload, dict):
         raise ValueError("'access_check' must be a JSON object")
@@ -517,9 +735,9 @@ def sanitize_message(message: Any) -> Dict[str, Any]:
     """Validate and return a sanitised broker message dict.
 
     The returned dict uses the same top-level key as the input (``"uri"``,
-    ``"chunk"``, ``"access_check"``, or ``"shutdown"``) so that
-    ``redis_callback`` can continue to dispatch on the key without any
-    other changes.
+    ``"chunk"``, ``"chunks"``, ``"shard"``, ``"access_check"``, or
+    ``"shutdown"``) so that ``redis_callback`` can continue to dispatch on
+    the key without any other changes.
 
     Parameters
     ----------
@@ -543,6 +761,12 @@ def sanitize_message(message: Any) -> Dict[str, Any]:
     if "chunk" in message:
         return {"chunk": _sanitize_chunk(message["chunk"])}
 
+    if "chunks" in message:
+        return {"chunks": _sanitize_chunks(message["chunks"])}
+
+    if "shard" in message:
+        return {"shard": _sanitize_shard(message["shard"])}
+
     if "access_check" in message:
         return {"access_check": _sanitize_access_check(message["access_check"])}
 
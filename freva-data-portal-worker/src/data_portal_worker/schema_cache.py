@@ -0,0 +1,260 @@
+"""A persistent cache of the layout of input files.
+
+Opening an input file reads its header and coordinates, on a network file
+system that's the bulk of the time it takes to create a store. The same
+files are opened again for every new store and whenever a store has to be
+recreated. The :class:`SchemaCache` keeps the layout of every opened file -
+dimensions, attributes, coordinate values and the dask chunks of the data
+variables - in a small SQLite database. A file whose modification time and
+size are unchanged is then turned into a lazy dataset without touching it,
+the file is only opened once a chunk of it is actually read.
+
+The layouts are pickled, reading the database runs whatever its writer put
+into it. The database is therefore created readable and writable for the
+user of the data-loader only, a database owned by somebody else or writable
+by others is never opened.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import dask.array as da
+import numpy as np
+import platformdirs
+import xarray as xr
+
+from .backends import load_data
+from .utils import data_logger, str_to_int
+
+SCHEMA_VERSION = 1
+"""Version of the cached layouts, layouts of other versions are ignored."""
+MAX_COORD_BYTES = 64 * 1024**2
+"""Files with bigger coordinates aren't cached."""
+
+Schema = Dict[str, Any]
+
+
+def _stat(path: str) -> Optional[Tuple[float, int]]:
+    """Get the modification time and size of a local file."""
+    parsed = urlparse(path)
+    if parsed.scheme not in ("", "file"):
+        return None
+    try:
+        stat = os.stat(parsed.path if parsed.scheme else path)
+    except OSError:
+        return None
+    return stat.st_mtime, stat.st_size
+
+
+@functools.lru_cache(maxsize=128)
+def _open_raw(path: str, mtime: float) -> xr.Dataset:
+    """Open a file without dask, the handle is shared by all chunk reads."""
+    return load_data(path, chunks=None)
+
+
+class _LazyFileArray:
+    """A variable of a file that is only opened once it is read."""
+
+    def __init__(
+        self, path: str, mtime: float, name: str, shape: Tuple[int, ...], dtype: Any
+    ) -> None:
+        self.path = path
+        self.mtime = mtime
+        self.name = name
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+        self.ndim = len(shape)
+
+    def __getitem__(self, key: Any) -> np.ndarray:
+        var = _open_raw(self.path, self.mtime).variables[self.name]
+        return np.asarray(var[key].values)
+
+
+def dataset_schema(dset: xr.Dataset) -> Optional[Schema]:
+    """Get the layout of a freshly opened file.
+
+    Parameters
+    ----------
+    dset: xr.Dataset
+        The dataset as opened by :func:`load_data`.
+
+    Returns
+    -------
+    dict, None: The layout, ``None`` if the dataset can't be cached, for
+                example if its data variables aren't dask arrays.
+    """
+    if not all(isinstance(v.data, da.Array) for v in dset.data_vars.values()):
+        return None
+    if sum(v.nbytes for v in dset.coords.values()) > MAX_COORD_BYTES:
+        return None
+    return {
+        "version": SCHEMA_VERSION,
+        "attrs": dset.attrs,
+        "encoding": dset.encoding,
+        "coords": {k: v.variable.compute() for k, v in dset.coords.items()},
+        "data_vars": {
+            k: {
+                "dims": v.dims,
+                "shape": v.shape,
+                "dtype": v.dtype.str,
+                "chunks": v.chunks,
+                "attrs": v.attrs,
+                "encoding": v.encoding,
+            }
+            for k, v in dset.data_vars.items()
+        },
+    }
+
+
+def dataset_from_schema(path: str, mtime: float, schema: Schema) -> xr.Dataset:
+    """Create the lazy dataset of a file from its layout."""
+    data_vars = {}
+    for name, var in schema["data_vars"].items():
+        shape = tuple(var["shape"])
+        array = da.from_array(
+            _LazyFileArray(path, mtime, name, shape, var["dtype"]),
+            chunks=var["chunks"],
+            name=f"open-{path}-{mtime}-{name}",
+            meta=np.empty((0,) * len(shape), dtype=var["dtype"]),
+        )
+        data_vars[name] = xr.Variable(
+            var["dims"], array, attrs=var["attrs"], encoding=var["encoding"]
+        )
+    dset = xr.Dataset(data_vars, coords=schema["coords"], attrs=schema["attrs"])
+    dset.encoding = schema["encoding"]
+    return dset
+
+
+class SchemaCache:
+    """SQLite backed cache of file layouts.
+
+    Parameters
+    ----------
+    path: str, default: None
+        The database file. Defaults to ``API_SCHEMA_CACHE`` or
+        ``data-portal-schemas.sqlite`` in the user cache dir.
+    max_age: int, default: None
+        Days after which a layout is read again from its file. Defaults to
+        ``API_SCHEMA_CACHE_DAYS`` or 30.
+
+    The database must belong to the user of the process and must not be
+    writable by others, the cache is switched off otherwise.
+    """
+
+    def __init__(
+        self, path: Optional[str] = None, max_age: Optional[int] = None
+    ) -> None:
+        self.path = Path(
+            path
+            or os.getenv("API_SCHEMA_CACHE")
+            or Path(platformdirs.user_cache_dir("freva"))
+            / "data-portal-schemas.sqlite"
+        )
+        days = max_age or str_to_int(os.getenv("API_SCHEMA_CACHE_DAYS"), 30)
+        self.max_age = days * 24 * 3600
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._refused = False
+
+    def _check_owner(self) -> None:
+        """Create the database for this user only, refuse anybody else's."""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            stat = os.fstat(fd)
+        finally:
+            os.close(fd)
+        if stat.st_uid != os.getuid() or stat.st_mode & 0o022:
+            self._refused = True
+            raise PermissionError(
+                f"{self.path} must belong to this user and must not be "
+                "writable by others, the layout cache is switched off."
+            )
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """The database connection, created on first use."""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._check_owner()
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, "
+                "mtime REAL, size INTEGER, created REAL, schema BLOB)"
+            )
+            conn.execute(
+                "DELETE FROM files WHERE created < ?", (time.time() - self.max_age,)
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, path: str, stat: Tuple[float, int]) -> Optional[Schema]:
+        """Get the layout of a file, if it hasn't changed since."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT schema FROM files WHERE path = ? AND mtime = ? AND size = ?",
+                (path, *stat),
+            ).fetchone()
+        if row is None:
+            return None
+        schema: Schema = pickle.loads(row[0])
+        return schema if schema.get("version") == SCHEMA_VERSION else None
+
+    def put(self, path: str, stat: Tuple[float, int], schema: Schema) -> None:
+        """Store the layout of a file."""
+        blob = pickle.dumps(schema, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                (path, *stat, time.time(), blob),
+            )
+            self.conn.commit()
+
+    def open(self, path: str, opener: Callable[[str], xr.Dataset]) -> xr.Dataset:
+        """Open a file from its cached layout, or with ``opener``.
+
+        Failures of the cache are logged and otherwise ignored.
+        """
+        stat = None if self._refused else _stat(path)
+        if stat is None:
+            return opener(path)
+        try:
+            schema = self.get(path, stat)
+            if schema is not None:
+                return dataset_from_schema(path, stat[0], schema)
+        except Exception as error:
+            data_logger.warning("Could not read the layout of %s: %s", path, error)
+        dset = opener(path)
+        try:
+            schema = dataset_schema(dset)
+            if schema is not None:
+                self.put(path, stat, schema)
+        except Exception as error:
+            data_logger.warning("Could not cache the layout of %s: %s", path, error)
+        return dset
+
+
+_SCHEMA_CACHE: Optional[SchemaCache] = None
+
+
+def schema_cache() -> Optional[SchemaCache]:
+    """Get the layout cache of this process, ``None`` if it's switched off.
+
+    Set ``API_SCHEMA_CACHE`` to ``0`` to switch the cache off.
+    """
+    global _SCHEMA_CACHE
+    if os.getenv("API_SCHEMA_CACHE") == "0":
+        return None
+    if _SCHEMA_CACHE is None:
+        _SCHEMA_CACHE = SchemaCache()
+    return _SCHEMA_CACHE
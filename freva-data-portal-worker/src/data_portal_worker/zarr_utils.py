@@ -1,7 +1,9 @@
 """Utilities for working with zarr storages."""
 
 import base64
-from typing import Any, Dict, Optional, Tuple, Union, cast
+import itertools
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union, cast
 
 import dask.array
 import numpy as np
@@ -11,6 +13,7 @@ from numcodecs.compat import ensure_ndarray
 from packaging.version import Version
 from xarray.backends.zarr import (
     DIMENSION_KEY,
+    FillValueCoder,
     encode_zarr_attr_value,
     encode_zarr_variable,
     extract_zarr_variable_encoding,
@@ -29,6 +32,7 @@ except ImportError:  # pragma: no cover
     except ImportError:
         default_compressor = None
 
+from .executor import dask_executor
 from .utils import data_logger
 
 DaskArrayType = dask.array.Array
@@ -38,6 +42,13 @@ ZARR_METADATA_KEY = ".zmetadata"
 ZARRAY_JSON = ".zarray"
 ZATTRS_JSON = ".zattrs"
 ZGROUP_JSON = ".zgroup"
+SHARD_TARGET_BYTES = 64 * 1024**2
+"""Uncompressed size up to which chunks are bundled into one v3 shard."""
+_SHARD_INDEX_MISSING = 2**64 - 1
+_BLOSC_SHUFFLE = {0: "noshuffle", 1: "shuffle", 2: "bitshuffle"}
+PAD_BUFFER_BYTES = 64 * 1024**2
+"""Size up to which edge chunks are padded in a reused per-thread buffer."""
+_pad_buffers = threading.local()
 
 
 def extract_dataarray_zattrs(da: xr.DataArray) -> Dict[str, Any]:
@@ -172,12 +183,45 @@ def jsonify_zmetadata(
     return zjson
 
 
+def _padding_buffer(
+    shape: Sequence[int], dtype: np.dtype[Any]
+) -> np.typing.NDArray[Any]:
+    """Get a zeroed array from the padding buffer of this thread.
+
+    The buffer is reused for every edge chunk up to ``PAD_BUFFER_BYTES``,
+    bigger chunks get their own array.
+    """
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    if nbytes > PAD_BUFFER_BYTES:
+        return np.zeros(shape, dtype=dtype)
+    buffer = getattr(_pad_buffers, "buffer", None)
+    if buffer is None or buffer.nbytes < nbytes:
+        buffer = _pad_buffers.buffer = np.empty(nbytes, dtype="u1")
+    out = buffer[:nbytes].view(dtype).reshape(shape)
+    out[...] = 0
+    return out
+
+
 def encode_chunk(
     chunk: np.typing.ArrayLike,
     filters: Optional[list[Codec]] = None,
     compressor: Optional[Codec] = None,
+    out_shape: Optional[Sequence[int]] = None,
 ) -> bytes:
-    """helper function largely copied from zarr.Array"""
+    """helper function largely copied from zarr.Array
+
+    Arrays are handed to the codecs as they are, without a copy to
+    ``bytes``. Incomplete edge chunks are padded to ``out_shape`` in the
+    padding buffer of the thread, the returned bytes never share memory
+    with it.
+    """
+    if isinstance(chunk, np.ndarray) and chunk.dtype != object:
+        if out_shape is not None and chunk.shape != tuple(out_shape):
+            padded = _padding_buffer(out_shape, chunk.dtype)
+            padded[tuple(slice(0, s) for s in chunk.shape)] = chunk
+            chunk = padded
+        chunk = np.ascontiguousarray(chunk)
+
     # apply filters
     if filters:
         for f in filters:
@@ -196,41 +240,105 @@ def encode_chunk(
     return cast(bytes, cdata)
 
 
-def get_data_chunk(
-    da: Union[xr.DataArray, DaskArrayType],
-    chunk_id: str,
-    out_shape: tuple[int, ...],
-) -> np.typing.NDArray[Any]:
-    """Get one chunk of data from this DataArray (da).
-
-    If this is an incomplete edge chunk, pad the returned array to match out_shape.
-    """
+def _select_chunk(
+    da: Union[xr.DataArray, DaskArrayType], chunk_id: str
+) -> Union[np.typing.NDArray[Any], DaskArrayType]:
+    """Pick the (possibly still lazy) block addressed by ``chunk_id``."""
     ikeys = tuple(map(int, chunk_id.split(".")))
     if isinstance(da, DaskArrayType):
-        chunk_data = da.blocks[ikeys]
-    else:
-        if da.ndim > 0 and ikeys != ((0,) * da.ndim):
-            raise ValueError(
-                "Invalid chunk_id for numpy array: %s. Should have been: %s"
-                % (chunk_id, ((0,) * da.ndim))
-            )
-        chunk_data = np.asarray(da)
+        return cast(DaskArrayType, da.blocks[ikeys])
+    if da.ndim > 0 and ikeys != ((0,) * da.ndim):
+        raise ValueError(
+            "Invalid chunk_id for numpy array: %s. Should have been: %s"
+            % (chunk_id, ((0,) * da.ndim))
+        )
+    return np.asarray(da)
+
 
+def _pad_chunk(
+    chunk_data: np.typing.NDArray[Any], out_shape: Optional[Sequence[int]]
+) -> np.typing.NDArray[Any]:
+    """Pad an incomplete edge chunk to the full chunk shape."""
+    if out_shape is None:
+        return chunk_data
     data_logger.debug(
         "checking chunk output size, %s == %s" % (chunk_data.shape, out_shape)
     )
-
-    if isinstance(chunk_data, DaskArrayType):
-        chunk_data = chunk_data.compute()
-
     # zarr expects full edge chunks, contents out of bounds for the array are undefined
     if chunk_data.shape != tuple(out_shape):
         new_chunk = np.empty_like(chunk_data, shape=out_shape)
         write_slice = tuple([slice(0, s) for s in chunk_data.shape])
         new_chunk[write_slice] = chunk_data
-        return cast(np.typing.NDArray[Any], new_chunk)
-    else:
-        return cast(np.typing.NDArray[Any], chunk_data)
+        return new_chunk
+    return chunk_data
+
+
+def get_data_chunk(
+    da: Union[xr.DataArray, DaskArrayType],
+    chunk_id: str,
+    out_shape: Optional[Sequence[int]],
+) -> np.typing.NDArray[Any]:
+    """Get one chunk of data from this DataArray (da).
+
+    If this is an incomplete edge chunk, pad the returned array to match out_shape.
+    With ``out_shape=None`` the block is returned as is, for
+    :func:`encode_chunk` to pad it without an extra copy.
+    """
+    chunk_data = _select_chunk(da, chunk_id)
+    if isinstance(chunk_data, DaskArrayType):
+        chunk_data = dask_executor().compute(chunk_data)[0]
+    return _pad_chunk(cast(np.typing.NDArray[Any], chunk_data), out_shape)
+
+
+def get_data_chunks(
+    requests: Sequence[
+        Tuple[Union[xr.DataArray, DaskArrayType], str, Optional[Sequence[int]]]
+    ],
+) -> List[Union[np.typing.NDArray[Any], Exception]]:
+    """Get several chunks at once, computing all lazy blocks in one go.
+
+    Parameters
+    ----------
+    requests:
+        ``(array, chunk_id, out_shape)`` triplets, as they would be passed
+        to :func:`get_data_chunk`.
+
+    Returns
+    -------
+    list:
+        One entry per request, in order. Requests that could not be served
+        carry the exception instead of the data, so a single bad key does
+        not fail the whole batch.
+    """
+    blocks: List[Union[np.typing.NDArray[Any], DaskArrayType, Exception]] = []
+    for da, chunk_id, _ in requests:
+        try:
+            blocks.append(_select_chunk(da, chunk_id))
+        except Exception as error:
+            blocks.append(error)
+    lazy = [i for i, b in enumerate(blocks) if isinstance(b, DaskArrayType)]
+    try:
+        # Blocks of one store share most of their graph (the open and
+        # rechunk tasks), computing them together reads each source
+        # block only once.
+        computed = list(dask_executor().compute(*[blocks[i] for i in lazy]))
+    except Exception:
+        # Fall back to one computation per block to find the culprit.
+        computed = []
+        for i in lazy:
+            try:
+                computed.append(dask_executor().compute(blocks[i])[0])
+            except Exception as error:
+                computed.append(error)
+    for i, value in zip(lazy, computed):
+        blocks[i] = value
+    out: List[Union[np.typing.NDArray[Any], Exception]] = []
+    for block, (_, _, out_shape) in zip(blocks, requests):
+        if isinstance(block, Exception):
+            out.append(block)
+        else:
+            out.append(_pad_chunk(np.asarray(block), out_shape))
+    return out
 
 
 def encode_fill_value(v: Any, dtype: np.dtype[Any], object_codec: Any = None) -> Any:
@@ -288,3 +396,213 @@ def normalize_shape(shape: Union[int, Tuple[int, ...], None]) -> Tuple[int, ...]
     # normalize
     shape = tuple(int(s) for s in shape)
     return shape
+
+
+def shard_shape(zarray: Dict[str, Any]) -> List[int]:
+    """Pick the v3 shard shape for an array described by its ``.zarray``.
+
+    Chunks are bundled along the axis with the most chunks, which is the
+    primary axis of ``map`` stores, until the shard reaches
+    ``SHARD_TARGET_BYTES``. The result is always a multiple of the chunks.
+    """
+    chunks = [max(int(c), 1) for c in zarray["chunks"]]
+    if not chunks:
+        return []
+    nchunks = [-(-int(s) // c) for s, c in zip(zarray["shape"], chunks)]
+    axis = nchunks.index(max(nchunks))
+    chunk_bytes = int(np.prod(chunks)) * np.dtype(zarray["dtype"]).itemsize
+    per_shard = max(1, min(nchunks[axis], SHARD_TARGET_BYTES // max(chunk_bytes, 1)))
+    chunks[axis] *= per_shard
+    return chunks
+
+
+def shard_chunk_ids(zarray: Dict[str, Any], shard_id: str) -> List[Optional[str]]:
+    """List the v2 chunk ids that make up a shard, in shard index order.
+
+    Positions of the shard that lie beyond the edge of the array are
+    ``None``.
+
+    Raises
+    ------
+    KeyError:
+        If the shard doesn't exist.
+    """
+    chunks = [max(int(c), 1) for c in zarray["chunks"]]
+    shape = [int(s) for s in zarray["shape"]]
+    per_shard = [s // c for s, c in zip(shard_shape(zarray), chunks)]
+    nchunks = [-(-s // c) for s, c in zip(shape, chunks)]
+    index = tuple(map(int, shard_id.split(".")))
+    if len(index) != len(shape) or any(
+        i * n >= max(t, 1) for i, n, t in zip(index, per_shard, nchunks)
+    ):
+        raise KeyError(f"Shard {shard_id} does not exist.")
+    out: List[Optional[str]] = []
+    for inner in itertools.product(*[range(n) for n in per_shard]):
+        ids = [i * n + j for i, n, j in zip(index, per_shard, inner)]
+        if any(i >= t for i, t in zip(ids, nchunks)):
+            out.append(None)
+        else:
+            out.append(".".join(map(str, ids)))
+    return out
+
+
+def assemble_shard(chunks: Sequence[Optional[bytes]]) -> bytes:
+    """Concatenate encoded chunks into a v3 shard with the index at the end.
+
+    Parameters
+    ----------
+    chunks:
+        The encoded chunks in C order of the shard's chunk grid, ``None``
+        for chunks that don't exist.
+    """
+    index = np.full((len(chunks), 2), _SHARD_INDEX_MISSING, dtype="<u8")
+    offset = 0
+    for num, chunk in enumerate(chunks):
+        if chunk is not None:
+            index[num] = (offset, len(chunk))
+            offset += len(chunk)
+    return b"".join(c for c in chunks if c is not None) + index.tobytes()
+
+
+def _v3_compressors(
+    config: Optional[Dict[str, Any]], dtype: np.dtype[Any]
+) -> List[Dict[str, Any]]:
+    """Translate a v2 compressor config into v3 codecs."""
+    if not config:
+        return []
+    if config["id"] == "blosc":
+        shuffle = config.get("shuffle", 1)
+        if shuffle == -1:
+            shuffle = 2 if dtype.itemsize == 1 else 1
+        return [
+            {
+                "name": "blosc",
+                "configuration": {
+                    "cname": config.get("cname", "lz4"),
+                    "clevel": config.get("clevel", 5),
+                    "shuffle": _BLOSC_SHUFFLE[shuffle],
+                    "typesize": dtype.itemsize,
+                    "blocksize": config.get("blocksize", 0),
+                },
+            }
+        ]
+    if config["id"] == "zstd":
+        return [
+            {
+                "name": "zstd",
+                "configuration": {
+                    "level": config.get("level", 0),
+                    "checksum": config.get("checksum", False),
+                },
+            }
+        ]
+    if config["id"] == "gzip":
+        return [{"name": "gzip", "configuration": {"level": config.get("level", 1)}}]
+    raise ValueError(f"Compressor {config['id']} has no zarr v3 equivalent.")
+
+
+def create_v3_array_metadata(
+    zarray: Dict[str, Any], zattrs: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Translate the v2 metadata of an array into its v3 ``zarr.json``.
+
+    The inner chunks of a sharded array are byte for byte the v2 chunks,
+    which is why only plain numerical arrays without filters qualify.
+
+    Raises
+    ------
+    ValueError:
+        If the array can't be expressed in zarr v3.
+    """
+    dtype = np.dtype(zarray["dtype"])
+    if dtype.kind not in "biufc" or zarray.get("filters"):
+        raise ValueError(f"dtype {dtype} has no zarr v3 equivalent.")
+    if zarray.get("order", "C") != "C":
+        raise ValueError("Only C ordered arrays can be served as zarr v3.")
+    attrs = dict(zattrs)
+    dimension_names = attrs.pop(DIMENSION_KEY, None)
+    fill_value = zarray.get("fill_value")
+    if fill_value is None:
+        fill_value = [0.0, 0.0] if dtype.kind == "c" else dtype.type(0).item()
+    else:
+        # v3 readers take the missing value from the attributes, not from
+        # the array's fill_value (see xarray's use_zarr_fill_value_as_mask).
+        value = (
+            complex(float(fill_value[0]), float(fill_value[1]))
+            if dtype.kind == "c"
+            else float(fill_value) if dtype.kind == "f" else fill_value
+        )
+        attrs["_FillValue"] = FillValueCoder.encode(value, dtype)
+    codecs: List[Dict[str, Any]] = [{"name": "bytes"}]
+    if dtype.itemsize > 1:
+        endian = "big" if dtype.byteorder == ">" else "little"
+        codecs[0]["configuration"] = {"endian": endian}
+    codecs += _v3_compressors(zarray.get("compressor"), dtype)
+    chunk_shape = list(zarray["chunks"])
+    grid_shape = shard_shape(zarray)
+    if grid_shape != chunk_shape:
+        codecs = [
+            {
+                "name": "sharding_indexed",
+                "configuration": {
+                    "chunk_shape": chunk_shape,
+                    "codecs": codecs,
+                    "index_codecs": [
+                        {"name": "bytes", "configuration": {"endian": "little"}}
+                    ],
+                    "index_location": "end",
+                },
+            }
+        ]
+    meta: Dict[str, Any] = {
+        "zarr_format": 3,
+        "node_type": "array",
+        "shape": list(zarray["shape"]),
+        "data_type": dtype.name,
+        "chunk_grid": {
+            "name": "regular",
+            "configuration": {"chunk_shape": grid_shape},
+        },
+        "chunk_key_encoding": {
+            "name": "default",
+            "configuration": {"separator": "/"},
+        },
+        "fill_value": fill_value,
+        "codecs": codecs,
+        "attributes": attrs,
+    }
+    if dimension_names is not None:
+        meta["dimension_names"] = dimension_names
+    return meta
+
+
+def create_v3_metadata(zmetadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Create the root v3 ``zarr.json`` from consolidated v2 metadata.
+
+    The metadata of all groups and arrays is inlined as consolidated
+    metadata, so a client needs a single request to open the store.
+
+    Raises
+    ------
+    ValueError:
+        If any of the arrays can't be expressed in zarr v3.
+    """
+    metadata = zmetadata["metadata"]
+    nodes: Dict[str, Any] = {}
+    for key, value in metadata.items():
+        path, _, leaf = key.rpartition("/")
+        attrs = metadata.get(f"{path}/{ZATTRS_JSON}", {})
+        if leaf == ZARRAY_JSON:
+            nodes[path] = create_v3_array_metadata(value, attrs)
+        elif leaf == ZGROUP_JSON and path:
+            nodes[path] = {"zarr_format": 3, "node_type": "group", "attributes": attrs}
+    return {
+        "zarr_format": 3,
+        "node_type": "group",
+        "attributes": metadata.get(ZATTRS_JSON, {}),
+        "consolidated_metadata": {
+            "kind": "inline",
+            "must_understand": False,
+            "metadata": dict(sorted(nodes.items())),
+        },
+    }
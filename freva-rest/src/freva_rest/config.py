@@ -217,6 +217,16 @@ class ServerConfig(BaseModel):
             description=("The expiration time in sec of the data loading cache."),
         ),
     ] = env_to_int("API_CACHE_EXP", 3600)
+    broker_queues: Annotated[
+        str,
+        Field(
+            title="Broker queues",
+            description=(
+                "Publish data-loader messages to one queue per message type "
+                "(split) or to a single queue (single)."
+            ),
+        ),
+    ] = os.getenv("API_BROKER_QUEUES", "")
     services: Annotated[
         List[str],
         Field(
@@ -435,6 +445,9 @@ class ServerConfig(BaseModel):
             "cache", "password"
         )
         self.cache_exp = self.cache_exp or self._read_config("cache", "exp")
+        self.broker_queues = (
+            self.broker_queues or self._read_config("cache", "broker_queues") or "split"
+        ).lower()
         self.redis_ssl_keyfile = self.redis_ssl_keyfile or self._read_config(
             "cache", "key_file"
         )
@@ -501,6 +514,11 @@ class ServerConfig(BaseModel):
         """Define the mongoDB collection zarr shared keys."""
         return self.mongo_client[self.mongo_db]["zarr_shared_keys"]
 
+    @property
+    def mongo_collection_cache_token(self) -> AsyncCollection[Any]:
+        """Define the mongoDB collection for content-addressed zarr tokens."""
+        return self.mongo_client[self.mongo_db]["zarr_cache_tokens"]
+
     @property
     def mongo_collection_userdata(self) -> AsyncCollection[Any]:
         """Define the mongoDB collection for user data information."""
@@ -199,6 +199,65 @@ class Solr:
         self.fs_type: str = "posix"
         self._cache: AsyncTTLCache[Tuple[int, Dict[str, Any]]] = AsyncTTLCache()
 
+    def _escape_special_chars(self, value: str) -> str:
+        """Escape a value for a quoted Lucene (solr) query term."""
+        for char in self.escape_chars:
+            if char in value:
+                value = value.replace(char, f"\\{char}")
+        return value.replace('"', '\\"')
+
+    async def time_ranges(self, paths: List[str]) -> Dict[str, str]:
+        """Look up the catalogue time ranges of files.
+
+        The paths are sent in batches as form data of a POST request, a
+        batch of long paths doesn't fit into the URL of a GET request.
+
+        Parameters
+        ----------
+        paths: list[str]
+            The paths of the files, ``file:///`` urls are looked up as
+            their paths.
+
+        Returns
+        -------
+        dict[str, str]:
+            The time range like ``[2000-01-01T00:00:00Z TO ...]`` by the
+            given path, files without a catalogue entry are left out.
+        """
+        url = f"{self._config.get_core_url(self._config.solr_cores[-1])}/select"
+        files = {p.replace("file:///", "/"): p for p in paths}
+        unique = list(files)
+        ranges: Dict[str, str] = {}
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            for num in range(0, len(unique), self.batch_size):
+                batch = unique[num : num + self.batch_size]
+                terms = " OR ".join(
+                    f'"{self._escape_special_chars(p)}"' for p in batch
+                )
+                response = await client.post(
+                    url,
+                    data={
+                        "q": f"file:({terms})",
+                        "fl": "file,time",
+                        "rows": str(len(batch)),
+                        "wt": "json",
+                    },
+                )
+                if response.status_code != 200:
+                    logger.warning(
+                        "Time range lookup failed with %i: %s",
+                        response.status_code,
+                        response.text,
+                    )
+                    continue
+                for doc in response.json().get("response", {}).get("docs", []):
+                    time_range = doc.get("time")
+                    if isinstance(time_range, list):
+                        time_range = time_range[0] if time_range else None
+                    if isinstance(time_range, str) and doc.get("file") in files:
+                        ranges[files[doc["file"]]] = time_range
+        return ranges
+
     async def _is_query_duplicate(self, uri: str, file_path: str) -> bool:
         """
         Check if a document with the given URI or file path already exists in Solr.
@@ -220,16 +279,8 @@ class Solr:
         try:
             core_url = self._config.get_core_url(self._config.solr_cores[-1])
             self.url = f"{core_url}/select"
-
-            def escape_special_chars(value: str) -> str:
-                for char in self.escape_chars:
-                    if char in value:
-                        value = value.replace(char, f"\\{char}")
-                value = value.replace('"', '\\"')
-                return value
-
-            escaped_uri = escape_special_chars(str(uri))
-            escaped_file = escape_special_chars(str(file_path))
+            escaped_uri = self._escape_special_chars(str(uri))
+            escaped_file = self._escape_special_chars(str(file_path))
 
             query_parts = [f'uri:"{escaped_uri}"', f'file:"{escaped_file}"']
             query_str = " OR ".join(query_parts)
@@ -19,12 +19,19 @@ from fastapi.responses import (
 )
 from py_oidc_auth import IDToken as TokenPayload
 from py_oidc_auth.utils import get_username
+from pydantic import StringConstraints
 
 from freva_rest.auth import auth, get_system_username
 from freva_rest.logger import logger
 from freva_rest.rest import app, server_config
 
-from ..utils.base_utils import ReductionDict
+from ..utils.base_utils import (
+    COMPRESSOR_PATTERN,
+    ISEL_PATTERN,
+    VARIABLE_PATTERN,
+    EncodingDict,
+    ReductionDict,
+)
 from ..utils.presign_utils import MAX_TTL_SECONDS, MIN_TTL_SECONDS
 from .core import Solr
 from .schema import (
@@ -504,13 +511,159 @@ async def load_data(
         Query(
             title="Output dtype of reduced variables",
             description=(
-                "Only applied when ``time_freq`` is set. CF-decoding packed "
+                "Only applied when ``time_freq`` or ``space`` is set. "
+                "CF-decoding packed "
                 "data promotes to ``float64``, which quadruples the "
                 "transferred bytes for no gain in precision."
             ),
             examples=["float32"],
         ),
     ] = "float32",
+    variables: Annotated[
+        Optional[List[Annotated[str, StringConstraints(pattern=VARIABLE_PATTERN)]]],
+        Query(
+            title="Variables to serve",
+            description=(
+                "Serve only these data variables of the files, together with "
+                "their coordinates, bounds and cell measures. The other "
+                "variables are dropped right after the files are opened, "
+                "which makes loading multi-variable files much faster."
+            ),
+            max_length=64,
+            examples=[["tas"]],
+        ),
+    ] = None,
+    isel: Annotated[
+        Optional[List[Annotated[str, StringConstraints(pattern=ISEL_PATTERN)]]],
+        Query(
+            title="Index slices",
+            description=(
+                "Cut the streamed stores down to index ranges, given as "
+                "``dim:start:stop[:step]``, e.g. ``lat:100:200``. Can be "
+                "given for several dimensions."
+            ),
+            max_length=8,
+            examples=[["rlat:100:200", "rlon:50:150"]],
+        ),
+    ] = None,
+    subset_bbox: Annotated[
+        Optional[List[float]],
+        Query(
+            title="Subset bounding box",
+            description=(
+                "Cut the streamed stores down to a region, given as "
+                "``lon_min, lon_max, lat_min, lat_max`` in degrees. Unlike "
+                "``bbox``, which selects the datasets, this selects the "
+                "grid cells within them. Works on regular, curvilinear, "
+                "rotated-pole and unstructured grids; boxes may cross the "
+                "date line."
+            ),
+            min_length=4,
+            max_length=4,
+            examples=[[-20.0, 40.0, 30.0, 70.0]],
+        ),
+    ] = None,
+    space: Annotated[
+        Optional[Literal["mean", "sum", "min", "max"]],
+        Query(
+            title="Spatial reduction method",
+            description=(
+                "Collapse the horizontal dimensions, for example to stream "
+                "a global mean time series instead of the full fields. "
+                "Applied after the subset and before ``time_freq``."
+            ),
+            examples=["mean"],
+        ),
+    ] = None,
+    space_dims: Annotated[
+        Optional[List[str]],
+        Query(
+            title="Spatial dimensions to reduce",
+            description=(
+                "The dimensions ``space`` collapses. Requires ``space``. "
+                "Defaults to the horizontal dimensions of the grid."
+            ),
+            max_length=8,
+            examples=[["lat", "lon"]],
+        ),
+    ] = None,
+    weighting: Annotated[
+        Literal["auto", "cell_area", "cos_lat", "none"],
+        Query(
+            title="Area weighting of the spatial reduction",
+            description=(
+                "``auto`` (default) weights by a cell-area variable of the "
+                "dataset, or by the cosine of a 1D latitude, and refuses "
+                "grids it cannot weight. Requires ``space``."
+            ),
+            examples=["auto"],
+        ),
+    ] = "auto",
+    zarr_format: Annotated[
+        Literal[2, 3],
+        Query(
+            title="Zarr format",
+            description=(
+                "Zarr format of the streamed stores. ``3`` adds ``zarr.json`` "
+                "metadata with sharded arrays, which need far fewer requests "
+                "to be read."
+            ),
+            examples=[3],
+        ),
+    ] = 2,
+    compressor: Annotated[
+        str,
+        Query(
+            title="Compressor",
+            pattern=COMPRESSOR_PATTERN,
+            description=(
+                "Compressor of the streamed chunks: ``default`` keeps the "
+                "compressor of the source, ``none`` ships them uncompressed, "
+                "``auto`` uses Blosc LZ4 for big numeric chunks. Codecs "
+                "``blosc-<cname>``, ``zstd``, ``zlib`` and ``gzip`` take an "
+                "optional level, e.g. ``blosc-zstd:3``."
+            ),
+            examples=["auto"],
+        ),
+    ] = "default",
+    keepbits: Annotated[
+        Optional[int],
+        Query(
+            title="Kept mantissa bits",
+            ge=1,
+            le=52,
+            description=(
+                "Round float data variables to this many mantissa bits "
+                "before compression. Lossy, but compressed chunks get "
+                "several times smaller."
+            ),
+            examples=[10],
+        ),
+    ] = None,
+    keep_information: Annotated[
+        Optional[float],
+        Query(
+            title="Kept information",
+            gt=0,
+            lt=1,
+            description=(
+                "Round float data variables to the mantissa bits that hold "
+                "this fraction of their real information, e.g. ``0.99``. "
+                "Ignored if ``keepbits`` is set."
+            ),
+            examples=[0.99],
+        ),
+    ] = None,
+    short_token: Annotated[
+        bool,
+        Query(
+            title="Short token",
+            description=(
+                "Address the streamed stores by a short hash instead of a "
+                "token that encodes the paths and plans."
+            ),
+        ),
+    ] = False,
     request: Request = Required,
     current_user: TokenPayload = auth.required(),
 ) -> StreamingResponse:
@@ -552,6 +705,17 @@ async def load_data(
             "climatology",
             "min_coverage",
             "dtype",
+            "variables",
+            "isel",
+            "subset_bbox",
+            "space",
+            "space_dims",
+            "weighting",
+            "zarr_format",
+            "compressor",
+            "keepbits",
+            "keep_information",
+            "short_token",
         ),
     )
     _, total_count = await solr_search.init_stream()
@@ -580,12 +744,28 @@ async def load_data(
                         "time_method": time_method,
                         "climatology": climatology,
                         "min_coverage": min_coverage,
-                        "dtype": dtype if time_freq else None,
+                        "dtype": dtype if time_freq or space else None,
+                        "variables": variables,
+                        "isel": isel,
+                        "subset_bbox": subset_bbox,
+                        "space": space,
+                        "space_dims": space_dims if space else None,
+                        "weighting": weighting if space else None,
                     }.items()
                     if v
                 },
             )
             or None,
+            encoding=cast(
+                EncodingDict,
+                {
+                    "zarr_format": zarr_format,
+                    "compressor": compressor,
+                    "keepbits": keepbits,
+                    "keep_information": keep_information,
+                },
+            ),
+            short_token=short_token,
             username=await get_system_username(current_user),
         ),
         status_code=status_code,
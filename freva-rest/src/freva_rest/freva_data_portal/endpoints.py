@@ -1,22 +1,30 @@
 """Definition of endpoints for loading/streaming and manipulating data."""
 
 import time
-from typing import Annotated, Dict, List, Optional, Union, cast
+from typing import Annotated, Dict, List, Optional, cast
 
 import cloudpickle
-from fastapi import HTTPException, Path, Query, Request, status
-from fastapi.responses import HTMLResponse, JSONResponse, Response
+from fastapi import Header, HTTPException, Path, Query, Request, status
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
 from py_oidc_auth import IDToken as TokenPayload
 from pydantic import AnyHttpUrl, BaseModel, Field
 
 from freva_rest.auth import auth, get_system_username
+from freva_rest.databrowser_api.core import Solr
 from freva_rest.logger import logger
 from freva_rest.rest import app, server_config
 from freva_rest.utils.base_utils import (
+    SHORT_TOKEN_PREFIX,
     Cache,
+    EncodingDict,
     ReductionDict,
     add_ttl_key_to_db_and_cache,
-    decode_cache_token,
+    resolve_cache_token,
 )
 from freva_rest.utils.presign_utils import (
     MAX_TTL_SECONDS,
@@ -27,16 +35,24 @@ from freva_rest.utils.presign_utils import (
     verify_token,
 )
 
-from .schema import PresignUrlRequest, PresignUrlResponse, ZarrConversion
+from .schema import (
+    PresignUrlRequest,
+    PresignUrlResponse,
+    ZarrBatchRequest,
+    ZarrConversion,
+)
 from .utils import (
+    BATCH_MEDIA_TYPE,
     STATUS_LOOKUP,
+    ZARR_JSON,
     ZARRAY_JSON,
     ZATTRS_JSON,
     ZGROUP_JSON,
     ZMETADATA_JSON,
     check_read_permission,
+    load_chunk_batch,
     process_zarr_data,
-    publish_datasets,
+    publish_many_datasets,
     read_redis_data,
 )
 
@@ -141,33 +157,50 @@ async def load_files(
                 "time_method": convert.time_method,
                 "climatology": convert.climatology,
                 "min_coverage": convert.min_coverage,
-                "dtype": convert.dtype if convert.time_freq else None,
+                "dtype": (
+                    convert.dtype if convert.time_freq or convert.space else None
+                ),
+                "variables": convert.variables,
+                "isel": convert.isel,
+                "subset_bbox": convert.subset_bbox,
+                "space": convert.space,
+                "space_dims": convert.space_dims if convert.space else None,
+                "weighting": convert.weighting if convert.space else None,
             }.items()
             if v
         },
     )
 
+    time_ranges: Dict[str, str] = {}
+    if convert.aggregate is not None and len(paths) > 1:
+        try:
+            time_ranges = await Solr(server_config).time_ranges(paths)
+        except Exception as error:
+            logger.warning("Could not look up the time ranges: %s", error)
     try:
-
-        async def publish(path: Union[str, List[str]]) -> str:
-            return await publish_datasets(
-                path,
-                aggregation_plan={k: v for k, v in aggregation_plan.items() if v},
-                reduction_plan=reduction_plan or None,
-                ttl_seconds=convert.ttl_seconds,
-                public=convert.public,
-                access_pattern=convert.access_pattern,
-                map_primary_chunksize=convert.map_primary_chunksize,
-                reload=convert.reload,
-                chunk_size=convert.chunk_size,
-                publish=True,
-                username=await get_system_username(current_user),
-            )
-
-        if convert.aggregate is None:
-            urls = [await publish(p) for p in paths]
-        else:
-            urls = [await publish(paths)]
+        urls = await publish_many_datasets(
+            paths if convert.aggregate is None else [paths],
+            aggregation_plan={k: v for k, v in aggregation_plan.items() if v},
+            reduction_plan=reduction_plan or None,
+            ttl_seconds=convert.ttl_seconds,
+            public=convert.public,
+            access_pattern=convert.access_pattern,
+            map_primary_chunksize=convert.map_primary_chunksize,
+            reload=convert.reload,
+            chunk_size=convert.chunk_size,
+            username=await get_system_username(current_user),
+            encoding=cast(
+                EncodingDict,
+                {
+                    "zarr_format": convert.zarr_format,
+                    "compressor": convert.compressor,
+                    "keepbits": convert.keepbits,
+                    "keep_information": convert.keep_information,
+                },
+            ),
+            short_token=convert.short_token,
+            time_ranges=time_ranges,
+        )
         return LoadResponse(urls=urls)
     except HTTPException as error:
         logger.exception(error)
@@ -296,6 +329,119 @@ async def zarr_html_view(
     )
 
 
+_BATCH_DESCRIPTION = (
+    "Fetch several keys of a zarr store with one request. The response is a "
+    "stream of frames, one per requested key. Each frame starts with a "
+    "14 byte big-endian header: the http status of the key (uint16), the "
+    "length of the key (uint32) and the length of the payload (uint64), "
+    "followed by the utf-8 encoded key and the payload. Frames are sent as "
+    "soon as the data is available and do not necessarily follow the order "
+    "of the requested keys."
+)
+
+
+@app.post(
+    "/api/freva-nextgen/data-portal/zarr/{token}.zarr/batch",
+    tags=["Load data"],
+    summary="Fetch multiple zarr keys at once",
+    description=_BATCH_DESCRIPTION,
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {BATCH_MEDIA_TYPE: {}}},
+        401: {"description": "Unauthorised / not a valid token."},
+        403: {"description": "User is not allowed to read the data."},
+        503: {"description": "If the store is not ready (yet)."},
+    },
+)
+async def zarr_batch_data(
+    token: Annotated[
+        str,
+        Path(
+            title="token",
+            description=(
+                "The token that was generated, when task to stream data was created."
+            ),
+        ),
+    ],
+    body: ZarrBatchRequest,
+    timeout: Annotated[
+        int,
+        Query(
+            alias="timeout",
+            title="Cache timeout for getting results.",
+            description="Set a timeout to wait for results.",
+            ge=0,
+            le=1500,
+        ),
+    ] = _LOAD_TIMEOUT,
+    current_user: TokenPayload = auth.required(),
+) -> StreamingResponse:
+    """Serve a batch of zarr keys as a length-prefixed stream."""
+    try:
+        payload = await resolve_cache_token(token)
+        username = await get_system_username(current_user)
+        await check_read_permission(username, payload["path"])
+    except HTTPException:
+        raise
+    except Exception as error:
+        logger.warning("Could not process request for token %s: %s", token, error)
+        raise HTTPException(400, detail="Invalid request.")
+    return StreamingResponse(
+        await load_chunk_batch(token, body.keys, timeout=timeout),
+        media_type=BATCH_MEDIA_TYPE,
+    )
+
+
+@app.post(
+    "/api/freva-nextgen/data-portal/share/{sig}/{token}.zarr/batch",
+    tags=["Load data"],
+    summary="Fetch multiple keys of a shared zarr store at once",
+    description=_BATCH_DESCRIPTION,
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {BATCH_MEDIA_TYPE: {}}},
+        503: {"description": "If the store is not ready (yet)."},
+    },
+)
+async def zarr_batch_data_shared(
+    sig: Annotated[
+        str,
+        Path(
+            title="Signature",
+            description=(
+                "The signature which was created by the /share-zarr endpoint."
+            ),
+        ),
+    ],
+    token: Annotated[
+        str,
+        Path(
+            title="token",
+            description=(
+                "The token that was generated, when task to stream data was created."
+            ),
+        ),
+    ],
+    body: ZarrBatchRequest,
+    timeout: Annotated[
+        int,
+        Query(
+            alias="timeout",
+            title="Cache timeout for getting results.",
+            description="Set a timeout to wait for results.",
+            ge=0,
+            le=1500,
+        ),
+    ] = _LOAD_TIMEOUT,
+) -> StreamingResponse:
+    """Serve a batch of zarr keys of a shared store."""
+    payload = await verify_token(token, sig)
+    return StreamingResponse(
+        await load_chunk_batch(payload["_id"], body.keys, timeout=timeout),
+        media_type=BATCH_MEDIA_TYPE,
+    )
+
+
 @app.get(
     "/api/freva-nextgen/data-portal/zarr/{token}.zarr/{zarr_key:path}",
     tags=["Load data"],
@@ -332,6 +478,14 @@ async def zarr_key_data(
             le=1500,
         ),
     ] = _LOAD_TIMEOUT,
+    byte_range: Annotated[
+        Optional[str],
+        Header(
+            alias="Range",
+            title="Byte range",
+            description="Read only part of a chunk or shard, e.g. `bytes=-16`.",
+        ),
+    ] = None,
     current_user: TokenPayload = auth.required(),
 ) -> Response:
     """
@@ -346,12 +500,21 @@ async def zarr_key_data(
     ``load_zarr_metadata``, and for all other keys we delegate to
     ``load_chunk`` using the parent path as the variable and the final
     segment as the chunk identifier.
+
+    Stores created with ``zarr_format=3`` also serve `zarr.json` and v3
+    chunk keys such as `tas/c/0/0/0`. Those keys address whole shards, use
+    a `Range` header to read parts of them.
     """
-    if zarr_key in (ZMETADATA_JSON, ZGROUP_JSON, ZATTRS_JSON) or zarr_key.endswith(
-        ("/" + ZGROUP_JSON, "/" + ZATTRS_JSON, "/" + ZARRAY_JSON)
+    if zarr_key in (
+        ZMETADATA_JSON,
+        ZGROUP_JSON,
+        ZATTRS_JSON,
+        ZARR_JSON,
+    ) or zarr_key.endswith(
+        ("/" + ZGROUP_JSON, "/" + ZATTRS_JSON, "/" + ZARRAY_JSON, "/" + ZARR_JSON)
     ):
         try:
-            payload = decode_cache_token(token)
+            payload = await resolve_cache_token(token)
             username = await get_system_username(current_user)
             await check_read_permission(username, payload["path"])
         except HTTPException:
@@ -359,7 +522,9 @@ async def zarr_key_data(
         except Exception as error:
             logger.warning("Could not process request for token %s: %s", token, error)
             raise HTTPException(400, detail="Invalid request.")
-    return await process_zarr_data(token, zarr_key, timeout=timeout)
+    return await process_zarr_data(
+        token, zarr_key, timeout=timeout, byte_range=byte_range
+    )
 
 
 @app.get(
@@ -407,6 +572,14 @@ async def zarr_key_data_shared(
             le=1500,
         ),
     ] = _LOAD_TIMEOUT,
+    byte_range: Annotated[
+        Optional[str],
+        Header(
+            alias="Range",
+            title="Byte range",
+            description="Read only part of a chunk or shard, e.g. `bytes=-16`.",
+        ),
+    ] = None,
 ) -> Response:
     """
     Serve arbitrary Zarr metadata or chunk keys for shared datasets.
@@ -416,7 +589,9 @@ async def zarr_key_data_shared(
     the logic is identical to the non-shared catch-all route.
     """
     payload = await verify_token(token, sig)
-    return await process_zarr_data(payload["_id"], zarr_key, timeout=timeout)
+    return await process_zarr_data(
+        payload["_id"], zarr_key, timeout=timeout, byte_range=byte_range
+    )
 
 
 @app.post(
@@ -469,12 +644,18 @@ async def create_presigned_url(
     short-lived links to individual Zarr chunks. Authorisation rules for
     *who may pre-sign which chunk* can be implemented based on `token`.
     """
-    payload = payload_from_url(normalise_path(str(body.path)))
+    path = normalise_path(str(body.path))
+    payload = await payload_from_url(path)
     username = await get_system_username(token)
     await check_read_permission(username, payload["path"])
     ttl = max(MIN_TTL_SECONDS, min(body.ttl_seconds, MAX_TTL_SECONDS))
     res = await add_ttl_key_to_db_and_cache(
-        payload["path"], ttl, payload["assembly"], payload.get("reduce")
+        payload["path"],
+        ttl,
+        payload["assembly"],
+        payload.get("reduce"),
+        payload.get("encoding"),
+        short_token=get_cache_token(path).startswith(SHORT_TOKEN_PREFIX),
     )
     url = f"{server_config.proxy}/api/freva-nextgen/data-portal/share/{res['key']}.zarr"
     return PresignUrlResponse(
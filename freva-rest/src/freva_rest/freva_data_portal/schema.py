@@ -3,8 +3,13 @@
 import time
 from typing import Annotated, List, Literal, Optional, Union
 
-from pydantic import AnyHttpUrl, BaseModel, Field
+from pydantic import AnyHttpUrl, BaseModel, Field, StringConstraints
 
+from ..utils.base_utils import (
+    COMPRESSOR_PATTERN,
+    ISEL_PATTERN,
+    VARIABLE_PATTERN,
+)
 from ..utils.presign_utils import MAX_TTL_SECONDS, MIN_TTL_SECONDS
 
 
@@ -210,6 +215,94 @@ class ZarrConversion(BaseModel):
             examples=["float32"],
         ),
     ] = "float32"
+    variables: Annotated[
+        Optional[
+            List[Annotated[str, StringConstraints(pattern=VARIABLE_PATTERN)]]
+        ],
+        Field(
+            title="Variables to serve",
+            description=(
+                "Serve only these data variables, together with the "
+                "coordinates, bounds, grid mappings and cell measures they "
+                "refer to. The other variables are dropped right after the "
+                "files are opened, before they are aggregated. Files that "
+                "hold none of the variables are left out."
+            ),
+            max_length=64,
+            examples=[["tas"]],
+        ),
+    ] = None
+    isel: Annotated[
+        Optional[List[Annotated[str, StringConstraints(pattern=ISEL_PATTERN)]]],
+        Field(
+            title="Index slices",
+            description=(
+                "Serve only these index ranges, given as "
+                "`dim:start:stop[:step]` with Python slice semantics, e.g. "
+                "`lat:100:200`. Applied before any reduction."
+            ),
+            max_length=8,
+            examples=[["rlat:100:200", "rlon:50:150"]],
+        ),
+    ] = None
+    subset_bbox: Annotated[
+        Optional[List[float]],
+        Field(
+            title="Subset bounding box",
+            description=(
+                "Serve only a region, given as `[lon_min, lon_max, lat_min, "
+                "lat_max]` in degrees. Longitudes are compared modulo 360, so "
+                "`[-20, 40, ...]` also works on a 0-360 grid and "
+                "`lon_min > lon_max` crosses the date line. Curvilinear and "
+                "rotated-pole grids are cut to the smallest index box "
+                "around the region. Applied after `isel` and before any "
+                "reduction."
+            ),
+            min_length=4,
+            max_length=4,
+            examples=[[-20.0, 40.0, 30.0, 70.0]],
+        ),
+    ] = None
+    space: Annotated[
+        Optional[Literal["mean", "sum", "min", "max"]],
+        Field(
+            title="Spatial reduction method",
+            description=(
+                "Collapse the horizontal dimensions into area statistics, "
+                "e.g. `mean` for a field-mean time series. Means and sums "
+                "are area weighted, see `weighting`. Applied after the "
+                "subset and before the temporal reduction."
+            ),
+            examples=["mean"],
+        ),
+    ] = None
+    space_dims: Annotated[
+        Optional[List[str]],
+        Field(
+            title="Spatial dimensions to reduce",
+            description=(
+                "The dimensions `space` collapses, e.g. `[\"lon\"]` for "
+                "zonal statistics. Defaults to the horizontal dimensions "
+                "of the grid."
+            ),
+            max_length=8,
+            examples=[["lat", "lon"]],
+        ),
+    ] = None
+    weighting: Annotated[
+        Literal["auto", "cell_area", "cos_lat", "none"],
+        Field(
+            title="Area weighting of the spatial reduction",
+            description=(
+                "`cell_area` weights by a cell-area variable of the dataset "
+                "(CF `cell_measures`, `areacella`, ...), `cos_lat` by the "
+                "cosine of the latitude, `none` not at all. `auto` (default) "
+                "picks the first that fits the grid and refuses grids it "
+                "cannot weight rather than returning a biased result."
+            ),
+            examples=["auto"],
+        ),
+    ] = "auto"
     public: Annotated[
         bool,
         Field(
@@ -265,6 +358,95 @@ class ZarrConversion(BaseModel):
             examples=[100.5],
         ),
     ] = 16.0
+    zarr_format: Annotated[
+        Literal[2, 3],
+        Field(
+            title="Zarr format",
+            description=(
+                "Zarr format of the served store. With `3` the store "
+                "exposes `zarr.json` metadata and bundles many chunks of an "
+                "array into one shard, which cuts down the number of "
+                "requests a client has to make to read a whole variable. "
+                "Zarr v2 metadata stays available either way."
+            ),
+            examples=[3],
+        ),
+    ] = 2
+    compressor: Annotated[
+        str,
+        Field(
+            title="Compressor",
+            pattern=COMPRESSOR_PATTERN,
+            description=(
+                "Compressor of the served chunks. `default` keeps the "
+                "compressor of the source, `none` serves them uncompressed, "
+                "which costs the least CPU on fast networks, and `auto` "
+                "picks Blosc LZ4 for big numeric chunks. `blosc-<cname>` "
+                "(`blosclz`, `lz4`, `lz4hc`, `zlib`, `zstd`), `zstd`, "
+                "`zlib` and `gzip` take an optional level, e.g. "
+                "`blosc-zstd:3` or `zlib:1`."
+            ),
+            examples=["auto", "blosc-zstd:3"],
+        ),
+    ] = "default"
+    keepbits: Annotated[
+        Optional[int],
+        Field(
+            title="Kept mantissa bits",
+            ge=1,
+            le=52,
+            description=(
+                "Round float data variables to this many mantissa bits "
+                "before they are compressed. The rounding is lossy, "
+                "coordinates keep their full precision."
+            ),
+            examples=[10],
+        ),
+    ] = None
+    keep_information: Annotated[
+        Optional[float],
+        Field(
+            title="Kept information",
+            gt=0,
+            lt=1,
+            description=(
+                "Round float data variables to the mantissa bits that hold "
+                "this fraction of their real information, estimated from "
+                "the first chunk. Ignored if `keepbits` is set."
+            ),
+            examples=[0.99],
+        ),
+    ] = None
+    short_token: Annotated[
+        bool,
+        Field(
+            title="Short token",
+            description=(
+                "Address the store by a short hash instead of a token that "
+                "encodes all paths and plans. Recommended for aggregations "
+                "of many files, whose tokens otherwise grow to kilobytes."
+            ),
+            examples=[True],
+        ),
+    ] = False
+
+
+class ZarrBatchRequest(BaseModel):
+    """Request body for fetching several keys of a zarr store at once."""
+
+    keys: Annotated[
+        List[str],
+        Field(
+            title="Zarr keys",
+            description=(
+                "Keys within the zarr store, as they would be appended to "
+                "the store url, for example `tas/0.0.0` or `tas/.zarray`."
+            ),
+            min_length=1,
+            max_length=1024,
+            examples=[["tas/0.0.0", "tas/1.0.0", "time/0"]],
+        ),
+    ]
 
 
 class PresignUrlRequest(BaseModel):
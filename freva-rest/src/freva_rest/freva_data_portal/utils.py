@@ -4,9 +4,21 @@ import asyncio
 import binascii
 import hashlib
 import json
+import struct
 import uuid
 from enum import Enum
-from typing import Any, Dict, List, Literal, Optional, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
 
 import cloudpickle
 from fastapi import status
@@ -16,11 +28,15 @@ from fastapi.responses import JSONResponse, Response
 from freva_rest.rest import server_config
 from freva_rest.utils.base_utils import (
     Cache,
+    EncodingDict,
     ReductionDict,
     add_ttl_key_to_db_and_cache,
-    decode_cache_token,
+    canonical_encoding,
     encode_cache_token,
+    resolve_cache_token,
+    store_cache_token,
 )
+from freva_rest.utils.exceptions import EmptyError
 
 ZARRAY_JSON = ".zarray"
 ZGROUP_JSON = ".zgroup"
@@ -40,6 +56,25 @@ STATUS_LOOKUP = {
 # Default retry interval in seconds, sent via Retry-After header
 _RETRY_AFTER = 2
 
+PUBLISH_CONCURRENCY = 32
+"""Number of stores whose links are created concurrently when publishing."""
+
+BROKER_CHANNEL = "data-portal"
+"""The Redis list the data-loader reads all messages from in single mode."""
+BROKER_QUEUES = {
+    "access_check": "access",
+    "chunk": "chunk",
+    "chunks": "chunk",
+    "shard": "chunk",
+    "uri": "load",
+}
+"""Dedicated queue of each broker message type."""
+
+BATCH_MEDIA_TYPE = "application/vnd.freva.zarr-batch"
+"""Media type of the length-prefixed multi-key responses."""
+BATCH_FRAME_HEADER = struct.Struct("!HIQ")
+"""Header of each frame: http status, key length and payload length."""
+
 
 class LoadStatus(Enum):
     """Definitions of the load status.
@@ -96,12 +131,30 @@ class LoadStatus(Enum):
         }.get(self.name, "Unknown status.")
 
 
+def broker_queue(message_type: str) -> str:
+    """Get the Redis list a broker message is pushed to.
+
+    Parameters
+    ----------
+    message_type: str
+        The top level key of the message, e.g. ``uri`` or ``access_check``.
+
+    Returns
+    -------
+    str: ``data-portal:<queue>``, or ``data-portal`` if the broker is run
+         in single queue mode.
+    """
+    if server_config.broker_queues == "single":
+        return BROKER_CHANNEL
+    return f"{BROKER_CHANNEL}:{BROKER_QUEUES[message_type]}"
+
+
 async def _query_broker_on_permissions(
     username: str, paths: List[str], timeout: float = 5.0
 ) -> bool:
     request_id = str(uuid.uuid4())
     await Cache.lpush(
-        "data-portal",
+        broker_queue("access_check"),
         json.dumps(
             {
                 "access_check": {
@@ -135,6 +188,39 @@ async def check_read_permission(username: str, paths: List[str]) -> None:
         raise HTTPException(status_code=403, detail="User not allowed to read paths.")
 
 
+def _load_instruction(
+    paths: List[str],
+    token: str,
+    assembly: Optional[Dict[str, Optional[str]]] = None,
+    reduce: Optional[ReductionDict] = None,
+    access_pattern: str = "map",
+    map_primary_chunksize: int = 1,
+    reload: bool = False,
+    chunk_size: float = 16.0,
+    username: Optional[str] = None,
+    encoding: Optional[EncodingDict] = None,
+    time_ranges: Optional[Dict[str, str]] = None,
+) -> bytes:
+    """Create the broker message that instructs the data-loader to load."""
+    return json.dumps(
+        {
+            "uri": {
+                "username": username,
+                "path": paths,
+                "uuid": token,
+                "assembly": assembly or {},
+                "reduce": reduce or {},
+                "access_pattern": access_pattern,
+                "map_primary_chunksize": map_primary_chunksize,
+                "reload": reload,
+                "chunk_size": chunk_size,
+                "encoding": encoding or {},
+                "time_ranges": time_ranges or {},
+            }
+        }
+    ).encode("utf-8")
+
+
 async def _trigger_loading(
     paths: List[str],
     token: str,
@@ -145,6 +231,7 @@ async def _trigger_loading(
     reload: bool = False,
     chunk_size: float = 16.0,
     username: Optional[str] = None,
+    encoding: Optional[EncodingDict] = None,
 ) -> None:
     """Send a loading instruction to the data-loader via Redis.
 
@@ -153,22 +240,19 @@ async def _trigger_loading(
     already been verified (e.g. lazy re-publish from ``read_redis_data``).
     """
     await Cache.lpush(
-        "data-portal",
-        json.dumps(
-            {
-                "uri": {
-                    "username": username,
-                    "path": paths,
-                    "uuid": token,
-                    "assembly": assembly or {},
-                    "reduce": reduce or {},
-                    "access_pattern": access_pattern,
-                    "map_primary_chunksize": map_primary_chunksize,
-                    "reload": reload,
-                    "chunk_size": chunk_size,
-                }
-            }
-        ).encode("utf-8"),
+        broker_queue("uri"),
+        _load_instruction(
+            paths,
+            token,
+            assembly=assembly,
+            reduce=reduce,
+            access_pattern=access_pattern,
+            map_primary_chunksize=map_primary_chunksize,
+            reload=reload,
+            chunk_size=chunk_size,
+            username=username,
+            encoding=encoding,
+        ),
     )
 
 
@@ -184,6 +268,8 @@ async def publish_datasets(
     reload: bool = False,
     chunk_size: float = 16.0,
     username: Optional[str] = None,
+    encoding: Optional[EncodingDict] = None,
+    short_token: bool = False,
 ) -> str:
     """Publish a path on disk for zarr conversion to the broker.
 
@@ -215,6 +301,13 @@ async def publish_datasets(
         Username for filesystem permission checks. If ``None``,
         permission checks are skipped (caller asserts they were
         already performed).
+    encoding: dict, optional
+        How the store is laid out, e.g. ``{"zarr_format": 3}`` to serve
+        zarr v3 metadata with sharded arrays.
+    short_token: bool, default: False
+        Address the store by a short hash of its token. The full token is
+        stored once in the cache and database instead of being sent along
+        with every request, which pays off for stores of many files.
 
     Returns
     -------
@@ -226,9 +319,15 @@ async def publish_datasets(
     norm_paths = [p.replace("file:///", "/") for p in paths]
     if username is not None:
         await check_read_permission(username, norm_paths)
+    encoding = canonical_encoding(encoding)
     token = encode_cache_token(
-        norm_paths, assembly=aggregation_plan, reduce=reduction_plan
+        norm_paths,
+        assembly=aggregation_plan,
+        reduce=reduction_plan,
+        encoding=encoding,
     )
+    if short_token:
+        token = await store_cache_token(token)
     api_path = f"{server_config.proxy}/api/freva-nextgen/data-portal"
     if publish or reload:
         await _trigger_loading(
@@ -241,15 +340,122 @@ async def publish_datasets(
             reload=reload,
             chunk_size=chunk_size,
             username=username,
+            encoding=encoding,
         )
     if public is True:
         res = await add_ttl_key_to_db_and_cache(
-            norm_paths, ttl_seconds, aggregation_plan, reduction_plan
+            norm_paths,
+            ttl_seconds,
+            aggregation_plan,
+            reduction_plan,
+            encoding,
+            short_token=short_token,
         )
         return f"{api_path}/share/{res['key']}.zarr"
     return f"{api_path}/zarr/{token}.zarr"
 
 
+async def publish_many_datasets(
+    path_groups: Sequence[Union[str, List[str]]],
+    public: bool = False,
+    ttl_seconds: float = 86400.0,
+    aggregation_plan: Optional[Dict[str, Optional[str]]] = None,
+    reduction_plan: Optional[ReductionDict] = None,
+    access_pattern: Literal["map", "time_series"] = "map",
+    map_primary_chunksize: int = 1,
+    reload: bool = False,
+    chunk_size: float = 16.0,
+    username: Optional[str] = None,
+    encoding: Optional[EncodingDict] = None,
+    short_token: bool = False,
+    concurrency: int = PUBLISH_CONCURRENCY,
+    time_ranges: Optional[Dict[str, str]] = None,
+) -> List[str]:
+    """Publish many zarr stores with the same options in one go.
+
+    Works like :func:`publish_datasets` with ``publish=True`` for every
+    entry of ``path_groups``, but the read permission of all paths is
+    checked at once and all loading instructions are sent to the broker
+    with a single ``LPUSH``. Public links and short tokens, which need a
+    round-trip each, are created concurrently.
+
+    Parameters
+    ----------
+    path_groups:
+        One entry per store, either a single path or the paths that are
+        aggregated into one store.
+    concurrency: int
+        Maximum number of stores whose links are created at the same time.
+    time_ranges: dict, optional
+        The catalogue time ranges of the paths. They let the data-loader
+        order the files of an aggregation without comparing their time
+        axes, but aren't part of the token.
+
+    See :func:`publish_datasets` for the remaining parameters.
+
+    Returns
+    -------
+    list[str]:
+        The urls of the zarr stores, in the order of ``path_groups``.
+    """
+    await Cache.check_connection()
+    groups = [
+        [p.replace("file:///", "/") for p in (g if isinstance(g, list) else [g])]
+        for g in path_groups
+    ]
+    if username is not None:
+        await check_read_permission(
+            username, list(dict.fromkeys(p for g in groups for p in g))
+        )
+    encoding = canonical_encoding(encoding)
+    api_path = f"{server_config.proxy}/api/freva-nextgen/data-portal"
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    ranges = {
+        p.replace("file:///", "/"): r for p, r in (time_ranges or {}).items()
+    }
+
+    async def _publish(paths: List[str]) -> Tuple[str, bytes]:
+        token = encode_cache_token(
+            paths,
+            assembly=aggregation_plan,
+            reduce=reduction_plan,
+            encoding=encoding,
+        )
+        async with semaphore:
+            if short_token:
+                token = await store_cache_token(token)
+            url = f"{api_path}/zarr/{token}.zarr"
+            if public is True:
+                res = await add_ttl_key_to_db_and_cache(
+                    paths,
+                    ttl_seconds,
+                    aggregation_plan,
+                    reduction_plan,
+                    encoding,
+                    short_token=short_token,
+                )
+                url = f"{api_path}/share/{res['key']}.zarr"
+        message = _load_instruction(
+            paths,
+            token,
+            assembly=aggregation_plan,
+            reduce=reduction_plan,
+            access_pattern=access_pattern,
+            map_primary_chunksize=map_primary_chunksize,
+            reload=reload,
+            chunk_size=chunk_size,
+            username=username,
+            encoding=encoding,
+            time_ranges={p: ranges[p] for p in paths if p in ranges},
+        )
+        return url, message
+
+    published = await asyncio.gather(*(_publish(g) for g in groups))
+    if published:
+        await Cache.lpush(broker_queue("uri"), *(m for _, m in published))
+    return [url for url, _ in published]
+
+
 async def read_redis_data(
     token: str,
     subkey: str = "data",
@@ -273,8 +479,8 @@ async def read_redis_data(
     """
     await Cache.check_connection()
     try:
-        payload = decode_cache_token(token)
-    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError):
+        payload = await resolve_cache_token(token)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, EmptyError):
         raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Invalid path.")
 
     key = token + token_suffix
@@ -290,6 +496,7 @@ async def read_redis_data(
             token,
             assembly=payload["assembly"],
             reduce=payload.get("reduce"),
+            encoding=payload.get("encoding"),
         )
         just_triggered = True
 
@@ -303,6 +510,7 @@ async def read_redis_data(
                 token,
                 assembly=payload["assembly"],
                 reduce=payload.get("reduce"),
+                encoding=payload.get("encoding"),
                 reload=True,
             )
             just_triggered = True
@@ -344,13 +552,121 @@ async def load_chunk(
     """Load a zarr chunk from the cache."""
     detail = {"chunk": {"uuid": _id, "variable": variable, "chunk": chunk}}
     await Cache.check_connection()
-    await Cache.lpush("data-portal", json.dumps(detail).encode("utf-8"))
+    await Cache.lpush(broker_queue("chunk"), json.dumps(detail).encode("utf-8"))
     data: bytes = await read_redis_data(
         _id, "data", token_suffix=f"-{variable}-{chunk}", timeout=timeout
     )
     return Response(data, media_type="application/octet-stream")
 
 
+def encode_batch_frame(key: str, status_code: int, payload: bytes) -> bytes:
+    """Encode one key of a batch response.
+
+    Each frame is a fixed size header (see ``BATCH_FRAME_HEADER``) followed
+    by the utf-8 encoded key and the payload. For anything else than a
+    ``200`` the payload holds a human readable reason.
+    """
+    raw_key = key.encode("utf-8")
+    return (
+        BATCH_FRAME_HEADER.pack(status_code, len(raw_key), len(payload))
+        + raw_key
+        + payload
+    )
+
+
+async def load_chunk_batch(
+    _id: str, keys: List[str], timeout: int = 30
+) -> AsyncIterator[bytes]:
+    """Serve several keys of a zarr store as one length-prefixed stream.
+
+    Metadata keys are answered from the consolidated metadata. Chunks that
+    are already cached are fetched with a single ``MGET``, all the others
+    are sent to the data-loader as one ``chunks`` job and polled for
+    together. Frames are emitted as soon as their data is available, so
+    the order of the frames does not follow the order of ``keys``.
+
+    Parameters
+    ----------
+    _id: str
+        The token of the zarr store.
+    keys: list[str]
+        The zarr keys, e.g. ``tas/0.0.0``.
+    timeout: int
+        Seconds to wait for chunks that are still being encoded. Keys that
+        are not ready by then are reported with a ``503``.
+
+    Raises
+    ------
+    HTTPException:
+        If the store itself isn't ready (yet). This happens before the
+        first frame is produced.
+    """
+    meta: Dict[str, Any] = await read_redis_data(_id, "data", timeout=timeout)
+    frames: List[bytes] = []
+    pending: Dict[str, str] = {}
+    for key in dict.fromkeys(k.lstrip("/") for k in keys):
+        array_path, _, leaf = key.rpartition("/")
+        if key == ZMETADATA_JSON:
+            frames.append(encode_batch_frame(key, 200, json.dumps(meta).encode()))
+        elif key in meta["metadata"]:
+            frames.append(
+                encode_batch_frame(key, 200, json.dumps(meta["metadata"][key]).encode())
+            )
+        elif (
+            f"{array_path}/{ZARRAY_JSON}" in meta["metadata"]
+            and leaf.isascii()
+            and all(p.isdecimal() for p in leaf.split("."))
+        ):
+            pending[f"{_id}-{array_path}-{leaf}"] = key
+        else:
+            frames.append(encode_batch_frame(key, 404, b"Key not found."))
+
+    async def _stream() -> AsyncIterator[bytes]:
+        for frame in frames:
+            yield frame
+        triggered = False
+        npolls, dt = 0.0, 0.2
+        while pending:
+            cache_keys = list(pending)
+            for cache_key, raw in zip(cache_keys, await Cache.mget(cache_keys)):
+                data = cloudpickle.loads(raw) if raw else {}
+                task_status = LoadStatus(data.get("status", LoadStatus.waiting.value))
+                if task_status.retryable:
+                    continue
+                key = pending.pop(cache_key)
+                if task_status == LoadStatus.finished_ok:
+                    yield encode_batch_frame(key, 200, data["data"])
+                else:
+                    reason = data.get("reason") or task_status.detail
+                    yield encode_batch_frame(
+                        key, task_status.response, reason.encode("utf-8")
+                    )
+            if not pending:
+                break
+            if not triggered:
+                missing = [v.rpartition("/") for v in pending.values()]
+                detail = {
+                    "chunks": {
+                        "uuid": _id,
+                        "keys": [{"variable": v, "chunk": c} for (v, _, c) in missing],
+                    }
+                }
+                await Cache.lpush(
+                    broker_queue("chunks"), json.dumps(detail).encode("utf-8")
+                )
+                triggered = True
+            elif npolls >= timeout:
+                break
+            await asyncio.sleep(dt)
+            npolls += dt
+        for key in pending.values():
+            yield encode_batch_frame(
+                key, LoadStatus.processing.response, b"Chunk not ready, please retry."
+            )
+
+    return _stream()
+
+
 async def load_zarr_metadata(
     _id: str, attr: Optional[str] = None, timeout: int = 10
 ) -> JSONResponse:
@@ -370,7 +686,145 @@ async def load_zarr_metadata(
     return JSONResponse(content=meta, status_code=status.HTTP_200_OK)
 
 
-async def process_zarr_data(token: str, zarr_key: str, timeout: int = 10) -> Response:
+async def _zarr_format(token: str) -> int:
+    """Read the zarr format a store was requested with from its token."""
+    try:
+        encoding = (await resolve_cache_token(token)).get("encoding") or {}
+    except (
+        binascii.Error,
+        UnicodeDecodeError,
+        json.JSONDecodeError,
+        KeyError,
+        EmptyError,
+    ):
+        return 2
+    return int(encoding.get("zarr_format", 2))
+
+
+def split_v3_chunk_key(zarr_key: str) -> Optional[Tuple[str, Tuple[int, ...]]]:
+    """Split a zarr v3 chunk key, e.g. ``tas/c/0/1/2``.
+
+    Returns
+    -------
+    tuple[str, tuple[int, ...]], None:
+        The array path and the chunk coordinates, ``None`` if the key isn't
+        a v3 chunk key with the default ``/`` separated encoding.
+    """
+    array_path, sep, coords = f"/{zarr_key}".rpartition("/c/")
+    if not sep:
+        array_path, sep, coords = f"/{zarr_key}".rpartition("/c")
+        if sep and coords:
+            return None
+    array_path = array_path.lstrip("/")
+    parts = coords.split("/") if coords else []
+    if not array_path or not all(p.isascii() and p.isdecimal() for p in parts):
+        return None
+    return array_path, tuple(int(p) for p in parts)
+
+
+def slice_byte_range(data: bytes, byte_range: Optional[str]) -> Response:
+    """Answer a (single) http ``Range`` request on ``data``.
+
+    Sharded v3 clients read the shard index with a suffix range and the
+    inner chunks they need with explicit ranges, both are served from the
+    same assembled shard.
+    """
+    if not byte_range:
+        return Response(data, media_type="application/octet-stream")
+    unit, _, spec = byte_range.partition("=")
+    start_s, sep, end_s = spec.strip().partition("-")
+    size = len(data)
+    try:
+        if unit.strip() != "bytes" or not sep or "," in spec:
+            raise ValueError(byte_range)
+        if not start_s:
+            start, end = max(size - int(end_s), 0), size - 1
+        else:
+            start, end = int(start_s), min(int(end_s or size - 1), size - 1)
+        if start > end or start >= size:
+            raise ValueError(byte_range)
+    except ValueError:
+        raise HTTPException(
+            status_code=416,
+            detail="Invalid byte range.",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return Response(
+        data[start : end + 1],
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type="application/octet-stream",
+        headers={"Content-Range": f"bytes {start}-{end}/{size}"},
+    )
+
+
+async def load_zarr_v3_metadata(
+    _id: str, zarr_key: str = ZARR_JSON, timeout: int = 10
+) -> Dict[str, Any]:
+    """Read the ``zarr.json`` of the store root or one of its nodes."""
+    if await _zarr_format(_id) != 3:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Zarr v3 not enabled for this store.",
+        )
+    try:
+        root: Dict[str, Any] = await read_redis_data(_id, "zarr_json", timeout=timeout)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Zarr v3 is not available for this dataset.",
+        )
+    node_path = zarr_key.removesuffix(ZARR_JSON).strip("/")
+    if not node_path:
+        return root
+    try:
+        return cast(
+            Dict[str, Any], root["consolidated_metadata"]["metadata"][node_path]
+        )
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Key not found {zarr_key}",
+        )
+
+
+async def load_v3_chunk(
+    _id: str, array_path: str, coords: Tuple[int, ...], timeout: int = 30
+) -> bytes:
+    """Load a chunk of a v3 store, assembling it from a shard if needed.
+
+    Arrays with a single inner chunk per shard are not sharded, their v3
+    chunks are the very same objects as the v2 chunks.
+    """
+    meta = await load_zarr_v3_metadata(_id, f"{array_path}/{ZARR_JSON}", timeout)
+    if meta.get("node_type") != "array" or len(coords) != len(meta["shape"]):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Key not found {array_path}/c",
+        )
+    chunk_id = ".".join(map(str, coords)) or "0"
+    if meta["codecs"][0]["name"] != "sharding_indexed":
+        request = {"chunk": {"uuid": _id, "variable": array_path, "chunk": chunk_id}}
+        suffix = f"-{array_path}-{chunk_id}"
+    else:
+        request = {"shard": {"uuid": _id, "variable": array_path, "shard": chunk_id}}
+        suffix = f"-{array_path}/c/{chunk_id.replace('.', '/')}"
+    # Range requests read one shard piece by piece, it is built only once.
+    if "chunk" in request or not await Cache.exists(f"{_id}{suffix}"):
+        await Cache.lpush(
+            broker_queue(next(iter(request))), json.dumps(request).encode("utf-8")
+        )
+    data: bytes = await read_redis_data(
+        _id, "data", token_suffix=suffix, timeout=timeout
+    )
+    return data
+
+
+async def process_zarr_data(
+    token: str,
+    zarr_key: str,
+    timeout: int = 10,
+    byte_range: Optional[str] = None,
+) -> Response:
     """Serve arbitrary Zarr metadata or chunk keys.
 
     Zarr clients access stores by issuing HTTP GET requests on a hierarchy of
@@ -382,11 +836,16 @@ async def process_zarr_data(token: str, zarr_key: str, timeout: int = 10) -> Res
     ``load_zarr_metadata``, and for all other keys we delegate to
     ``load_chunk`` using the parent path as the variable and the final
     segment as the chunk identifier.
+
+    Stores that were requested with ``zarr_format=3`` additionally serve
+    ``zarr.json`` documents and v3 chunk keys (e.g. ``tas/c/0/0/0``), which
+    point to whole shards. ``byte_range`` is the http ``Range`` header of
+    the request, it is honoured for chunk keys.
     """
-    if zarr_key == ZARR_JSON:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Zarr v3 not supported.",
+    if zarr_key == ZARR_JSON or zarr_key.endswith("/" + ZARR_JSON):
+        return JSONResponse(
+            content=await load_zarr_v3_metadata(token, zarr_key, timeout=timeout),
+            status_code=status.HTTP_200_OK,
         )
     if zarr_key == ZMETADATA_JSON:
         return await load_zarr_metadata(token, timeout=timeout)
@@ -404,6 +863,10 @@ async def process_zarr_data(token: str, zarr_key: str, timeout: int = 10) -> Res
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="A group/variable name must precede .zarray or .zattrs",
         )
+    v3_key = split_v3_chunk_key(zarr_key)
+    if v3_key is not None and await _zarr_format(token) == 3:
+        data = await load_v3_chunk(token, *v3_key, timeout=timeout)
+        return slice_byte_range(data, byte_range)
     if "/" not in zarr_key:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -413,4 +876,7 @@ async def process_zarr_data(token: str, zarr_key: str, timeout: int = 10) -> Res
             ),
         )
     array_path, _, leaf = zarr_key.rpartition("/")
-    return await load_chunk(token, array_path, leaf, timeout)
+    response = await load_chunk(token, array_path, leaf, timeout)
+    if byte_range:
+        return slice_byte_range(cast(bytes, response.body), byte_range)
+    return response
@@ -19,6 +19,7 @@ from typing import (
 )
 
 import redis.asyncio as redis
+from cachetools import TTLCache
 from fastapi import HTTPException, status
 from redis.asyncio.retry import Retry
 from redis.backoff import ExponentialBackoff
@@ -41,8 +42,9 @@ class ReductionDict(TypedDict, total=False):
     """Dimension-reduction plan carried in a cache token.
 
     Mixed-typed (unlike ``assembly``) because it carries a boolean, a float
-    and a list of dimension names alongside the vocabulary strings.  Values
-    are JSON-native so the mapping can be embedded verbatim in the token.
+    and lists of variable and dimension names, index slices and bounding box
+    corners alongside the vocabulary strings.  Values are JSON-native so the mapping
+    can be embedded verbatim in the token.
     """
 
     time_freq: str
@@ -50,11 +52,44 @@ class ReductionDict(TypedDict, total=False):
     climatology: bool
     min_coverage: float
     dtype: str
-    # Reserved for spatial reduction; the wire format is final already so
-    # enabling it later needs no token-format change.
+    # Spatial subset: ``dim:start:stop[:step]`` slices and a
+    # ``[lon_min, lon_max, lat_min, lat_max]`` box.
+    isel: List[str]
+    subset_bbox: List[float]
+    # Spatial reduction: field mean/sum/min/max over ``space_dims``.
     space: str
     space_dims: List[str]
     weighting: str
+    # Data variables to keep, applied when the input files are opened.
+    variables: List[str]
+
+
+class EncodingDict(TypedDict, total=False):
+    """How the served store is laid out, carried in a cache token.
+
+    Apart from ``keepbits`` and ``keep_information``, which round float
+    data to fewer mantissa bits, this never changes the values a client
+    reads, only the zarr format of the metadata and the objects the chunks
+    are shipped in.  It is still part of the token because a v2 and a v3
+    store of the same data must not share a cache entry.
+    """
+
+    zarr_format: int
+    compressor: str
+    keepbits: int
+    keep_information: float
+
+
+#: Compressors a client can pick for a store, see :class:`EncodingDict`.
+COMPRESSOR_PATTERN = (
+    r"^(default|none|auto|blosc-(blosclz|lz4|lz4hc|zlib|zstd)(:[0-9])?"
+    r"|(zlib|gzip)(:[0-9])?|zstd(:([1-9]|1[0-9]|2[0-2]))?)$"
+)
+
+#: Index slices of the spatial subset, see :class:`ReductionDict`.
+ISEL_PATTERN = r"^[A-Za-z0-9_]+(:-?[0-9]*){2,3}$"
+#: Names of the selected variables, see :class:`ReductionDict`.
+VARIABLE_PATTERN = r"^[A-Za-z0-9_.\-]{1,128}$"
 
 
 class PresignDict(TypedDict):
@@ -66,6 +101,8 @@ class PresignDict(TypedDict):
     key: str
     assembly: Optional[Dict[str, Optional[str]]]
     reduce: Optional[ReductionDict]
+    encoding: Optional[EncodingDict]
+    short_token: NotRequired[bool]
 
 
 class CacheKwArgs(TypedDict, total=False):
@@ -203,6 +240,7 @@ class CacheTokenPayload(TypedDict):
     exp: float
     assembly: Optional[Dict[str, Optional[str]]]
     reduce: Optional[ReductionDict]
+    encoding: NotRequired[Optional[EncodingDict]]
 
 
 def get_userinfo(
@@ -259,10 +297,11 @@ def sign_token_path(
     expires_at: float,
     assembly: Optional[Dict[str, Optional[str]]],
     reduce: Optional[ReductionDict] = None,
+    encoding: Optional[EncodingDict] = None,
 ) -> Tuple[str, str]:
     """Create a base64 encoded token and a signature of that token."""
     secret = server_config.redis_password
-    token = encode_cache_token(path, expires_at, assembly, reduce)
+    token = encode_cache_token(path, expires_at, assembly, reduce, encoding)
     sig = hmac.new(secret.encode("utf-8"), token.encode("utf-8"), sha256).digest()
     return token, b64url(sig)
 
@@ -305,14 +344,43 @@ def canonical_reduction(
         for key, value in (reduce or {}).items()
         if value and value != REDUCTION_DEFAULTS.get(key, _MISSING)
     }
+    if "variables" in canonical:
+        # Variables are served in the order of the files, not of the request.
+        canonical["variables"] = sorted(set(cast(List[str], canonical["variables"])))
     return cast(Optional[ReductionDict], canonical or None)
 
 
+#: Encoding options that describe the store every client got before the
+#: option existed.
+ENCODING_DEFAULTS: Dict[str, Any] = {"zarr_format": 2, "compressor": "default"}
+
+
+def canonical_encoding(
+    encoding: Optional[EncodingDict],
+) -> Optional[EncodingDict]:
+    """Reduce an encoding to the options that differ from the defaults.
+
+    Works like :func:`canonical_reduction`. Returning ``None`` for the
+    default layout keeps the ``encoding`` key out of the token altogether,
+    so tokens minted before it existed still address the same store.
+    """
+    canonical = {
+        key: value
+        for key, value in (encoding or {}).items()
+        if value and value != ENCODING_DEFAULTS.get(key, _MISSING)
+    }
+    if "keepbits" in canonical:
+        # The worker ignores the information level once the bits are fixed.
+        canonical.pop("keep_information", None)
+    return cast(Optional[EncodingDict], canonical or None)
+
+
 def encode_cache_token(
     path: Union[str, List[str]],
     expires_at: float = 0.0,
     assembly: Optional[Dict[str, Optional[str]]] = None,
     reduce: Optional[ReductionDict] = None,
+    encoding: Optional[EncodingDict] = None,
 ) -> str:
     """Create a URL-safe token that encodes `path`, plan and expiry.
 
@@ -321,6 +389,7 @@ def encode_cache_token(
     The reduction plan is canonicalised (see :func:`canonical_reduction`) so
     that an explicitly-defaulted option and an omitted one produce the same
     token; combined with the sorted keys below this keeps tokens canonical.
+    The same holds for the encoding (see :func:`canonical_encoding`).
     """
     payload = CacheTokenPayload(
         path=path if isinstance(path, list) else [path],
@@ -328,6 +397,9 @@ def encode_cache_token(
         assembly=assembly,
         reduce=canonical_reduction(reduce),
     )
+    canonical = canonical_encoding(encoding)
+    if canonical:
+        payload["encoding"] = canonical
     return b64url(
         json.dumps(payload, separators=(",", ":"), sort_keys=True).encode("utf-8")
     )
@@ -339,18 +411,86 @@ def decode_cache_token(token: str) -> CacheTokenPayload:
     Raises ValueError if token is invalid or expired.
     """
     payload = json.loads(b64url_decode(token))
-    # ``reduce`` is read with .get() so tokens minted before reduction
-    # existed stay decodable.
+    # ``reduce`` and ``encoding`` are read with .get() so tokens minted
+    # before those options existed stay decodable.
     return CacheTokenPayload(
         path=payload["path"],
         exp=payload["exp"],
         assembly=payload["assembly"],
         reduce=payload.get("reduce"),
+        encoding=payload.get("encoding"),
     )
 
 
-async def get_token_from_cache(_id: str) -> Tuple[str, str]:
-    """Get the token and signature from cache.
+#: Prefix of content-addressed (short) cache tokens. Full tokens are base64
+#: encoded JSON objects and hence always start with ``eyJ``.
+SHORT_TOKEN_PREFIX = "h-"
+#: Seconds a short token stays in redis after it was last resolved from
+#: the database.
+SHORT_TOKEN_TTL = 7 * 24 * 3600
+_SHORT_TOKENS: TTLCache[str, str] = TTLCache(maxsize=4096, ttl=3600)
+
+
+def short_cache_token(token: str) -> str:
+    """Derive the content-addressed short form of a full cache token.
+
+    The short token is a hash of the (canonical) full token, publishing the
+    same data with the same plans therefore always yields the same short
+    token.
+    """
+    digest = sha256(token.encode("utf-8")).digest()[:18]
+    return SHORT_TOKEN_PREFIX + b64url(digest)
+
+
+async def store_cache_token(token: str) -> str:
+    """Store a full cache token and return its short form.
+
+    The mapping is persisted in the database and kept in redis for hot
+    lookups, much like the keys of shared links.
+    """
+    short = short_cache_token(token)
+    await Cache.check_connection()
+    if not await Cache.exists(f"token:{short}"):
+        await server_config.mongo_collection_cache_token.replace_one(
+            {"_id": short}, {"_id": short, "token": token}, upsert=True
+        )
+        await Cache.set(f"token:{short}", token, ex=SHORT_TOKEN_TTL)
+    _SHORT_TOKENS[short] = token
+    return short
+
+
+async def resolve_cache_token(token: str) -> CacheTokenPayload:
+    """Decode a full or a short cache token.
+
+    Short tokens are looked up in-process first, then in redis and finally
+    in the database.
+
+    Raises
+    ------
+    EmptyError: If a short token is unknown.
+    """
+    if not token.startswith(SHORT_TOKEN_PREFIX):
+        return decode_cache_token(token)
+    full = _SHORT_TOKENS.get(token)
+    if full is None:
+        await Cache.check_connection()
+        raw = await cast(Awaitable[Optional[bytes]], Cache.get(f"token:{token}"))
+        if raw is None:
+            doc = await server_config.mongo_collection_cache_token.find_one(
+                {"_id": token}
+            )
+            if not doc:
+                raise EmptyError("Unknown zarr token.")
+            full = cast(str, doc["token"])
+            await Cache.set(f"token:{token}", full, ex=SHORT_TOKEN_TTL)
+        else:
+            full = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+        _SHORT_TOKENS[token] = full
+    return decode_cache_token(full)
+
+
+async def get_token_from_cache(_id: str) -> Tuple[str, str, bool]:
+    """Get the token, signature and whether the store uses a short token.
 
     1. Use redis as hot lookup.
     2. Redis has no entries -> MongoDB lookup
@@ -360,7 +500,7 @@ async def get_token_from_cache(_id: str) -> Tuple[str, str]:
     data = json.loads(await cast(Awaitable[Optional[str]], Cache.get(_id)) or "{}")
     token, sig = data.get("token"), data.get("signature")
     if token and sig:
-        return token, sig
+        return token, sig, bool(data.get("short_token"))
     now = datetime.now(timezone.utc)
     doc = cast(
         PresignDict,
@@ -371,19 +511,20 @@ async def get_token_from_cache(_id: str) -> Tuple[str, str]:
     if ttl_remaining.total_seconds() <= 0 or not doc:
         await server_config.mongo_collection_share_key.delete_one({"_id": _id})
         raise EmptyError("The shared link has expired or doesn't exist.")
+    ttl = max(1, int(ttl_remaining.total_seconds()))
     await Cache.set(
         _id,
         json.dumps(
             {
                 "signature": doc["signature"],
                 "token": doc["token"],
+                "short_token": doc.get("short_token", False),
             }
         ),
+        ex=ttl,
     )
-    await Cache.expire(_id, int(ttl_remaining.total_seconds()))
-    ttl = await Cache.ttl(_id)
     logger.debug("Sig %s was added with a new ttl of %i", _id, ttl)
-    return doc["token"], doc["signature"]
+    return doc["token"], doc["signature"], doc.get("short_token", False)
 
 
 async def add_ttl_key_to_db_and_cache(
@@ -391,13 +532,19 @@ async def add_ttl_key_to_db_and_cache(
     ttl_seconds: float,
     assembly: Optional[Dict[str, Optional[str]]] = None,
     reduce: Optional[ReductionDict] = None,
+    encoding: Optional[EncodingDict] = None,
+    short_token: bool = False,
 ) -> PresignDict:
-    """Create an entry of a signature."""
+    """Create an entry of a signature.
+
+    ``short_token`` records that the data of the store lives under the
+    short form of its cache token.
+    """
     await Cache.check_connection()
     expires_in = timedelta(seconds=ttl_seconds)
     expires_at = datetime.now(timezone.utc) + expires_in
     token, signature = sign_token_path(
-        path, expires_at.timestamp(), assembly, reduce
+        path, expires_at.timestamp(), assembly, reduce, encoding
     )
     _id = generate_slug()
     mapping = {
@@ -405,6 +552,8 @@ async def add_ttl_key_to_db_and_cache(
         "token": token,
         "assembly": assembly,
         "reduce": reduce,
+        "encoding": encoding,
+        "short_token": short_token,
     }
     doc = cast(
         Optional[PresignDict],
@@ -416,10 +565,8 @@ async def add_ttl_key_to_db_and_cache(
             {**{"_id": _id, "expires_at": expires_at}, **mapping},
             upsert=True,
         )
-    await Cache.set(_id, json.dumps(mapping))
-    await Cache.expire(_id, expires_in)
-    ttl = await Cache.ttl(_id)
-    logger.debug("Sig %s was added with a ttl of %i", _id, ttl)
+    await Cache.set(_id, json.dumps(mapping), ex=expires_in)
+    logger.debug("Sig %s was added with a ttl of %s", _id, expires_in)
     return PresignDict(
         key=f"{_id}/{generate_names()}",
         expires_at=expires_at,
@@ -427,4 +574,5 @@ async def add_ttl_key_to_db_and_cache(
         signature=signature,
         assembly=assembly,
         reduce=reduce,
+        encoding=encoding,
     )
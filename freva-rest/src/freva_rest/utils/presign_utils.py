@@ -19,6 +19,7 @@ import time
 from hashlib import sha256
 from typing import Any, Dict, Final, cast
 
+from cachetools import TTLCache
 from fastapi import (
     HTTPException,
     status,
@@ -28,9 +29,10 @@ from ..rest import server_config
 from ..utils.base_utils import (
     CacheTokenPayload,
     b64url_decode,
-    decode_cache_token,
     encode_cache_token,
     get_token_from_cache,
+    resolve_cache_token,
+    short_cache_token,
 )
 from ..utils.exceptions import EmptyError
 
@@ -45,6 +47,11 @@ MAX_TTL_SECONDS: Final[int] = int(
     os.environ.get("PRESIGN_URL_MAX_TTL", "432000")
 )  # max 5 days
 MIN_TTL_SECONDS: Final[int] = 60
+#: Share tokens that passed :func:`verify_token`, by slug. Entries are
+#: only used until the share link expires.
+_VERIFIED_TOKENS: TTLCache[str, Dict[str, Any]] = TTLCache(
+    maxsize=4096, ttl=MAX_TTL_SECONDS
+)
 
 
 def get_cache_token(path: str) -> str:
@@ -56,11 +63,11 @@ def get_cache_token(path: str) -> str:
     return ""
 
 
-def payload_from_url(path: str) -> CacheTokenPayload:
+async def payload_from_url(path: str) -> CacheTokenPayload:
     """Get the token payload from a token."""
     try:
-        payload = decode_cache_token(get_cache_token(path))
-    except (json.JSONDecodeError, UnicodeDecodeError):
+        payload = await resolve_cache_token(get_cache_token(path))
+    except (json.JSONDecodeError, UnicodeDecodeError, EmptyError):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="The path does not contain a UUID.",
@@ -69,8 +76,18 @@ def payload_from_url(path: str) -> CacheTokenPayload:
 
 
 async def verify_token(key: str, slug: str) -> Dict[str, str]:
+    """Verify a share link and return the payload of its cache token.
+
+    Verified links are memoised in-process until they expire, so serving a
+    shared store costs no more than a chunk lookup per request.
+    """
+    cached = _VERIFIED_TOKENS.get(slug)
+    if cached is not None:
+        if int(time.time()) < int(cached.get("exp", 0)):
+            return dict(cached)
+        _VERIFIED_TOKENS.pop(slug, None)
     try:
-        token, sig_b64 = await get_token_from_cache(slug)
+        token, sig_b64, short_token = await get_token_from_cache(slug)
         payload_bytes = b64url_decode(token)
         payload = cast(Dict[str, Any], json.loads(payload_bytes))
     except EmptyError as error:
@@ -97,8 +114,12 @@ async def verify_token(key: str, slug: str) -> Dict[str, str]:
         payload.get("path", ""),
         assembly=payload.get("assembly"),
         reduce=payload.get("reduce"),
+        encoding=payload.get("encoding"),
     )
-    return payload
+    if short_token:
+        payload["_id"] = short_cache_token(payload["_id"])
+    _VERIFIED_TOKENS[slug] = payload
+    return dict(payload)
 
 
 def normalise_path(path: str) -> str:
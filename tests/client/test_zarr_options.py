@@ -15,8 +15,10 @@ import pytest
 
 from freva_client.cli.zarr_cli import (
     ReduceDtype,
+    SpaceMethod,
     TimeFrequency,
     TimeMethod,
+    Weighting,
     reduction_options,
 )
 from freva_client.utils.types import ZarrOptions
@@ -162,3 +164,20 @@ class TestReductionOptionsFromCli:
     )
     def test_method_vocabulary_matches_the_worker(self, method: str) -> None:
         assert TimeMethod(method).value == method
+
+    def test_spatial_flags_are_forwarded_without_a_frequency(self) -> None:
+        assert reduction_options(
+            None,
+            None,
+            False,
+            0.0,
+            ReduceDtype.float64,
+            space=SpaceMethod.mean,
+            space_dims=["lon"],
+            weighting=Weighting.cos_lat,
+        ) == {
+            "space": "mean",
+            "space_dims": ["lon"],
+            "weighting": "cos_lat",
+            "dtype": "float64",
+        }
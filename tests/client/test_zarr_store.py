@@ -0,0 +1,162 @@
+"""Tests for the batching zarr store of the client."""
+
+import asyncio
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+import pytest
+import xarray as xr
+from aiohttp import web
+
+from freva_client.utils.zarr_store import (
+    BATCH_FRAME_HEADER,
+    iter_batch_frames,
+    split_chunk_url,
+)
+from freva_client.zarr_utils import batch_store
+
+
+def _frame(key: str, status: int, payload: bytes) -> bytes:
+    raw = key.encode()
+    return BATCH_FRAME_HEADER.pack(status, len(raw), len(payload)) + raw + payload
+
+
+class _Server:
+    """Serve a zarr v2 store from disk, optionally with a batch endpoint."""
+
+    def __init__(self, root: Path, with_batch: bool = True) -> None:
+        self.root = root
+        self.with_batch = with_batch
+        self.batches: List[List[str]] = []
+        self.gets: List[str] = []
+        self.url = ""
+        self._loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    async def _get(self, request: web.Request) -> web.Response:
+        key = request.match_info["key"]
+        self.gets.append(key)
+        path = self.root / key
+        if not path.is_file():
+            raise web.HTTPNotFound()
+        return web.Response(body=path.read_bytes())
+
+    async def _batch(self, request: web.Request) -> web.Response:
+        keys = (await request.json())["keys"]
+        self.batches.append(keys)
+        body = b""
+        for key in reversed(keys):
+            path = self.root / key
+            if path.is_file():
+                body += _frame(key, 200, path.read_bytes())
+            else:
+                body += _frame(key, 404, b"Key not found.")
+        return web.Response(body=body)
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        app = web.Application()
+        if self.with_batch:
+            app.router.add_post("/zarr/test.zarr/batch", self._batch)
+        app.router.add_get("/zarr/test.zarr/{key:.*}", self._get)
+        self._runner = runner = web.AppRunner(app)
+        self._loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        self._loop.run_until_complete(site.start())
+        port = site._server.sockets[0].getsockname()[1]  # type: ignore
+        self.url = f"http://127.0.0.1:{port}/zarr/test.zarr"
+        self._started.set()
+        self._loop.run_forever()
+
+    def __enter__(self) -> "_Server":
+        self._thread.start()
+        self._started.wait(10)
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+@pytest.fixture(scope="module")
+def store_dir(tmp_path_factory: pytest.TempPathFactory) -> Iterator[Path]:
+    """A small zarr v2 store with many tiny chunks."""
+    path = tmp_path_factory.mktemp("zarr") / "test.zarr"
+    dset = xr.Dataset(
+        {"tas": (("time", "x"), np.arange(40, dtype="f4").reshape(20, 2))},
+        coords={"time": np.arange(20), "x": [0, 1]},
+    ).chunk({"time": 1})
+    dset.to_zarr(path, zarr_format=2, consolidated=True)
+    yield path
+
+
+def test_split_chunk_url() -> None:
+    """Only chunk keys of a zarr store are batched."""
+    assert split_chunk_url("http://h/zarr/a.zarr/tas/0.1") == (
+        "http://h/zarr/a.zarr",
+        "tas/0.1",
+    )
+    assert split_chunk_url("http://h/zarr/a.zarr/g/tas/3") == (
+        "http://h/zarr/a.zarr",
+        "g/tas/3",
+    )
+    for url in (
+        "http://h/zarr/a.zarr/.zmetadata",
+        "http://h/zarr/a.zarr/tas/.zarray",
+        "http://h/zarr/a.zarr/0",
+        "http://h/zarr/a.zarr/tas/0.0?timeout=1",
+        "http://h/zarr/a.zarr/tas/c/0/0",
+        "http://h/data/file.nc",
+    ):
+        assert split_chunk_url(url) is None
+
+
+def test_iter_batch_frames() -> None:
+    """Frames are parsed and truncated streams are reported."""
+
+    async def _read(body: bytes) -> List[Tuple[str, int, bytes]]:
+        reader = asyncio.StreamReader()
+        reader.feed_data(body)
+        reader.feed_eof()
+        return [f async for f in iter_batch_frames(reader)]
+
+    body = _frame("tas/0", 200, b"abc") + _frame("tas/1", 503, b"")
+    assert asyncio.run(_read(body)) == [("tas/0", 200, b"abc"), ("tas/1", 503, b"")]
+    with pytest.raises(OSError):
+        asyncio.run(_read(body[:-1] + struct.pack("!H", 1)))
+
+
+def test_batch_store_groups_chunk_reads(store_dir: Path) -> None:
+    """Concurrent chunk reads end up in a few batch requests."""
+    with _Server(store_dir) as server:
+        dset = xr.open_zarr(batch_store(server.url, batch_size=512), chunks=None)
+        values = dset["tas"].isel(x=1).values
+    np.testing.assert_array_equal(values, np.arange(40, dtype="f4")[1::2])
+    tas_batches = [b for b in server.batches if b[0].startswith("tas/")]
+    # zarr itself caps the number of concurrent reads (async.concurrency).
+    assert len(tas_batches) <= 2
+    assert sum(len(b) for b in tas_batches) == 20
+    assert not [k for k in server.gets if k.startswith("tas/") and "." in k[4:]]
+
+
+def test_batch_store_splits_large_batches(store_dir: Path) -> None:
+    """The number of keys per request is capped by ``batch_size``."""
+    with _Server(store_dir) as server:
+        dset = xr.open_zarr(batch_store(server.url, batch_size=4), chunks=None)
+        dset["tas"].load()
+    assert max(len(b) for b in server.batches) <= 4
+
+
+def test_batch_store_falls_back_to_single_requests(store_dir: Path) -> None:
+    """Servers without a batch endpoint are read key by key."""
+    with _Server(store_dir, with_batch=False) as server:
+        dset = xr.open_zarr(batch_store(server.url, headers={"X-Test": "1"}))
+        values: Dict[str, np.ndarray] = {"tas": dset["tas"].values}
+    np.testing.assert_array_equal(
+        values["tas"], np.arange(40, dtype="f4").reshape(20, 2)
+    )
+    assert "tas/0.0" in server.gets
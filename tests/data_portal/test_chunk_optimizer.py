@@ -596,3 +596,52 @@ def test_max_chunks_for_nonexistent_dim_ignored() -> None:
     plan = opt.plan(ds)
 
     assert "nonexistent" not in plan.chunks
+
+
+def _mk_ds_source_chunked() -> xr.Dataset:
+    return xr.Dataset(
+        {
+            "tas": xr.DataArray(
+                da.zeros((100, 180, 360), chunks=(10, 45, 90), dtype=np.float32),
+                dims=("time", "lat", "lon"),
+            )
+        }
+    )
+
+
+def test_plan_aligns_to_dask_chunks() -> None:
+    """Chunks straddling source chunks are snapped to aligned sizes."""
+    ds = _mk_ds_source_chunked()
+    unaligned = ChunkOptimizer(target="64KiB", align_to_source=False).plan(ds)
+    assert unaligned.chunks["lon"] == 64
+    assert unaligned.alignment["lon"] == "unaligned"
+
+    plan = ChunkOptimizer(target="64KiB").plan(ds)
+    assert plan.source_chunks == {"time": 10, "lat": 45, "lon": 90}
+    assert plan.chunks == {"time": 1, "lat": 180, "lon": 90}
+    assert plan.alignment == {"time": "divisor", "lat": "multiple", "lon": "multiple"}
+    # Only the pinned time axis decodes more than it serves.
+    assert plan.read_amplification == 10.0
+    assert plan.read_amplification < unaligned.read_amplification
+    limit = plan.target_bytes * ChunkOptimizer().overshoot_ratio
+    assert plan.estimated_bytes_per_chunk_by_group["time,lat,lon"] <= limit
+
+
+def test_plan_prefers_on_disk_chunks() -> None:
+    """The on-disk chunks of unmodified variables beat the dask chunks."""
+    ds = _mk_ds_source_chunked()
+    ds["tas"].encoding = {
+        "chunksizes": (1, 60, 120),
+        "original_shape": (100, 180, 360),
+    }
+    plan = ChunkOptimizer(target="64KiB").plan(ds)
+    assert plan.source_chunks == {"time": 1, "lat": 60, "lon": 120}
+    # 120 longitudes would overshoot the target, half a disk chunk doesn't.
+    assert plan.chunks == {"time": 1, "lat": 180, "lon": 60}
+    assert plan.alignment == {"time": "multiple", "lat": "multiple", "lon": "divisor"}
+    assert plan.read_amplification == 2.0
+
+    # A subset of the file doesn't have the file's chunk boundaries.
+    subset = ds.isel(lat=slice(5, None))
+    subset["tas"].encoding = ds["tas"].encoding
+    assert ChunkOptimizer(target="64KiB").plan(subset).source_chunks["lat"] == 40
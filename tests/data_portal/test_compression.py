@@ -0,0 +1,121 @@
+"""Tests for the selectable compressors of the served stores."""
+
+import numcodecs
+import numpy as np
+import pytest
+import xarray as xr
+
+from data_portal_worker.compression import (
+    compressor_config,
+    information_keepbits,
+    set_bitround,
+    set_compressor,
+)
+from data_portal_worker.zarr_utils import encode_chunk, jsonify_zmetadata
+
+
+def _metadata() -> dict:
+    dset = xr.Dataset(
+        {
+            "tas": (("time", "lat"), np.random.rand(4, 20000).astype("f4")),
+            "name": (("lat",), np.array([b"a"] * 20000, dtype="S1")),
+        },
+        coords={"time": np.arange(4), "lat": np.arange(20000.0)},
+    ).chunk({"time": 1})
+    return jsonify_zmetadata(dset)
+
+
+@pytest.mark.parametrize(
+    "spec,config",
+    [
+        ("none", None),
+        ("zlib:1", {"id": "zlib", "level": 1}),
+        ("gzip", {"id": "gzip", "level": 1}),
+        ("blosc-zstd:3", {"id": "blosc", "cname": "zstd", "clevel": 3}),
+        ("zstd:9", {"id": "zstd", "level": 9}),
+    ],
+)
+def test_compressor_options(spec: str, config: dict) -> None:
+    """Options translate to the numcodecs configs and round trip chunks."""
+    out = compressor_config(spec)
+    assert out == config or config.items() <= out.items()
+    data = np.arange(1000, dtype="f4")
+    codec = numcodecs.get_codec(out) if out else None
+    raw = encode_chunk(data, compressor=codec)
+    decoded = codec.decode(raw) if codec else raw
+    np.testing.assert_array_equal(np.frombuffer(decoded, dtype="f4"), data)
+
+
+@pytest.mark.parametrize("spec", ["lz4", "blosc", "blosc-snappy", "zlib:10", "zstd:x"])
+def test_invalid_compressor_options(spec: str) -> None:
+    """Unknown codecs and levels out of range are rejected."""
+    with pytest.raises(ValueError):
+        compressor_config(spec)
+
+
+def test_compressor_is_set_on_all_arrays() -> None:
+    """An explicit compressor applies to every array of the store."""
+    meta = _metadata()
+    set_compressor(meta, "none")
+    zarrays = [v for k, v in meta["metadata"].items() if k.endswith(".zarray")]
+    assert len(zarrays) == 4
+    assert all(z["compressor"] is None for z in zarrays)
+
+
+def test_auto_compresses_big_numeric_chunks_with_blosc() -> None:
+    """Auto mode switches big numeric chunks to Blosc LZ4 only."""
+    meta = _metadata()
+    before = meta["metadata"]["time/.zarray"]["compressor"]
+    set_compressor(meta, "auto")
+    assert meta["metadata"]["tas/.zarray"]["compressor"]["cname"] == "lz4"
+    assert meta["metadata"]["lat/.zarray"]["compressor"]["cname"] == "lz4"
+    assert meta["metadata"]["time/.zarray"]["compressor"] == before
+    assert meta["metadata"]["name/.zarray"]["compressor"] == before
+
+
+def _field() -> xr.Dataset:
+    lon = np.linspace(0, 2 * np.pi, 720)
+    smooth = 273.15 + 20 * np.sin(lon)[None, :] + np.arange(6.0)[:, None]
+    noise = np.random.default_rng(0).normal(scale=0.01, size=(6, 720))
+    tas = (smooth + noise).astype("f4")
+    tas[0, :3] = np.nan
+    return xr.Dataset(
+        {
+            "tas": (("time", "lon"), tas, {"missing_value": 1e20}),
+            "count": (("time", "lon"), np.ones((6, 720), dtype="i4")),
+        },
+        coords={"time": np.arange(6.0), "lon": lon},
+    ).chunk({"time": 2})
+
+
+def test_bitround_filters_float_data_variables() -> None:
+    """Float data variables are rounded, coordinates and integers are not."""
+    dset = _field()
+    meta = jsonify_zmetadata(dset)
+    assert set_bitround(meta, {"root": dset}, keepbits=7) == {"tas": 7}
+    zarray = meta["metadata"]["tas/.zarray"]
+    assert zarray["filters"][0] == {"id": "bitround", "keepbits": 7}
+    assert not meta["metadata"]["lon/.zarray"]["filters"]
+    assert not meta["metadata"]["count/.zarray"]["filters"]
+    assert meta["metadata"]["tas/.zattrs"]["missing_value"] != 1e20
+    filters = [numcodecs.get_codec(f) for f in zarray["filters"]]
+    compressor = numcodecs.get_codec(zarray["compressor"])
+    values = dset["tas"].values[:2]
+    encoded = encode_chunk(values, filters=filters, compressor=compressor)
+    rounded = np.frombuffer(compressor.decode(encoded), dtype="f4")
+    np.testing.assert_allclose(rounded.reshape(2, 720), values, rtol=2.0**-7)
+    assert np.isnan(rounded[:3]).all()
+    assert len(encoded) < len(encode_chunk(values, compressor=compressor))
+
+
+def test_bitround_from_the_information_content() -> None:
+    """Bits that only hold noise are dropped, the signal is kept."""
+    dset = _field()
+    # The bits are estimated from the first chunk.
+    keepbits = information_keepbits(dset["tas"].values[:2], 0.99)
+    assert 5 < keepbits < 23
+    meta = jsonify_zmetadata(dset)
+    kept = set_bitround(meta, {"root": dset}, information=0.99)
+    assert kept == {"tas": keepbits}
+    noise = np.random.default_rng(1).random((10, 1000)).astype("f4")
+    assert information_keepbits(noise, 0.99) == 23
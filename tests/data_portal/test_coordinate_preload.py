@@ -26,7 +26,7 @@ bug cannot come back for scaled or offset coordinates either.
 from __future__ import annotations
 
 import itertools
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 import cloudpickle
 import numcodecs
@@ -50,6 +50,12 @@ class _CaptureCache:
         self.values[key] = value
         return True
 
+    def pipeline(self, transaction: bool = True) -> "_CaptureCache":
+        return self
+
+    def execute(self) -> List[Any]:
+        return []
+
 
 def _factory(cache: _CaptureCache) -> DataLoadFactory:
     factory = DataLoadFactory()
@@ -73,11 +79,10 @@ def _serve_on_demand(ds: xr.Dataset, meta: Dict[str, Any], name: str) -> Dict[st
     for idx in itertools.product(*ranges):
         chunk_id = ".".join(map(str, idx)) or "0"
         out[chunk_id] = encode_chunk(
-            get_data_chunk(
-                variable.data, chunk_id, out_shape=arr_meta["chunks"]
-            ).tobytes(),
+            get_data_chunk(variable.data, chunk_id, out_shape=None),
             filters=arr_meta["filters"],
             compressor=compressor,
+            out_shape=arr_meta["chunks"],
         )
     return out
 
@@ -202,3 +207,31 @@ def test_preload_prefixes_group_coordinates() -> None:
     _factory(cache)._preload_coordinate_chunks(token, meta, {"group0": dataset})
 
     assert _preloaded(cache, token, "group0/time")
+
+
+def test_data_chunks_are_warmed_as_configured(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Warm-up caches the leading chunks, and all chunks of small variables."""
+    token = "warm-token"
+    dataset = xr.Dataset(
+        {
+            "tas": (("time",), np.arange(8.0, dtype="float32")),
+            "pr": (("time",), np.arange(8.0)),
+        },
+        coords={"time": np.arange(8)},
+    ).chunk({"time": 2})
+    cache = _CaptureCache()
+    meta = jsonify_zmetadata(dataset)
+    factory = _factory(cache)
+    factory._object_cache[token] = (meta, {"root": dataset})
+
+    assert factory._preload_data_chunks(token, meta, {"root": dataset}) == 0
+
+    monkeypatch.setenv("API_WORKER_PREWARM_CHUNKS", "1")
+    monkeypatch.setenv("API_WORKER_PREWARM_BYTES", "32")
+    monkeypatch.setenv("API_WORKER_PREWARM_BATCH", "2")
+    assert factory._preload_data_chunks(token, meta, {"root": dataset}) == 5
+    assert sorted(_preloaded(cache, token, "tas")) == ["0", "1", "2", "3"]
+    assert list(_preloaded(cache, token, "pr")) == ["0"]
+    assert _preloaded(cache, token, "tas") == _serve_on_demand(dataset, meta, "tas")
@@ -0,0 +1,147 @@
+"""Tests for the lane executor of the data-loader."""
+
+import threading
+import time
+from typing import List
+
+import dask.array as da
+import numpy as np
+import pytest
+
+from data_portal_worker.executor import (
+    DaskExecutor,
+    DaskSettings,
+    LaneExecutor,
+    _lanes_from_env,
+)
+
+
+def _wait(predicate, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def test_important_lanes_run_first() -> None:
+    """A free thread picks the most important lane with queued work."""
+    executor = LaneExecutor({"chunk": 4, "load": 4}, max_workers=1)
+    gate = threading.Event()
+    order: List[str] = []
+    try:
+        executor.submit("load", gate.wait)
+        _wait(lambda: executor.queued == 0)
+        for num in range(3):
+            executor.submit("load", order.append, f"load-{num}")
+        executor.submit("chunk", order.append, "chunk")
+        gate.set()
+        _wait(lambda: len(order) == 4)
+        assert order == ["chunk", "load-0", "load-1", "load-2"]
+    finally:
+        gate.set()
+        executor.shutdown()
+
+
+def test_lane_limits_are_respected() -> None:
+    """A busy lane doesn't take the threads of the other lanes."""
+    executor = LaneExecutor({"chunk": 2, "load": 1}, max_workers=3)
+    gate = threading.Event()
+    done: List[str] = []
+    try:
+        for _ in range(3):
+            executor.submit("load", gate.wait)
+        executor.submit("chunk", done.append, "chunk")
+        _wait(lambda: done == ["chunk"])
+        assert executor.queued == 2
+    finally:
+        gate.set()
+        executor.shutdown()
+
+
+def test_backlog_blocks_and_failures_are_survived() -> None:
+    """The backlog limit applies back pressure, errors don't kill workers."""
+    executor = LaneExecutor({"load": 1}, max_workers=1, max_queued=1)
+    gate = threading.Event()
+    done: List[int] = []
+    try:
+        executor.submit("load", gate.wait)
+        _wait(lambda: executor.queued == 0)
+        executor.submit("load", lambda: 1 / 0)
+        assert executor.wait_for_capacity(timeout=0.05) is False
+        executor.submit("load", done.append, 1)
+        gate.set()
+        assert executor.wait_for_capacity(timeout=2) is True
+        _wait(lambda: done == [1])
+    finally:
+        gate.set()
+        executor.shutdown()
+
+
+def test_lane_limits_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Lane limits can be configured."""
+    monkeypatch.setenv("API_WORKER_LANES", "chunk=32, load=0,foo=3,shard")
+    lanes = _lanes_from_env()
+    assert list(lanes) == ["access", "chunk", "shard", "load", "prefetch"]
+    assert lanes["chunk"] == 32
+    assert lanes["load"] == 1
+    assert lanes["shard"] == 4
+
+
+def test_invalid_executor_limits_fall_back(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Bad thread and backlog settings use the defaults."""
+    monkeypatch.setenv("API_WORKER_THREADS", "many")
+    monkeypatch.setenv("API_WORKER_BACKLOG", "")
+    executor = LaneExecutor({"load": 1})
+    try:
+        assert executor.max_workers >= 1
+        assert executor.max_queued == 1024
+    finally:
+        executor.shutdown()
+
+
+def test_dask_pool_is_shared() -> None:
+    """Concurrent computations together never exceed the pool size."""
+    executor = DaskExecutor(DaskSettings(threads=2))
+    lock = threading.Lock()
+    running = [0]
+    peak: List[int] = []
+
+    def _slow(block: np.ndarray) -> np.ndarray:
+        with lock:
+            running[0] += 1
+            peak.append(running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        return block + 1
+
+    arr = da.zeros(16, chunks=1).map_blocks(_slow)
+    results: List[np.ndarray] = []
+    threads = [
+        threading.Thread(target=lambda: results.extend(executor.compute(arr)))
+        for _ in range(3)
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        executor.shutdown()
+    assert max(peak) == 2
+    assert all((r == 1).all() for r in results) and len(results) == 3
+
+
+def test_dask_settings(monkeypatch: pytest.MonkeyPatch) -> None:
+    """The dask execution is configured by env, chunks are size limited."""
+    monkeypatch.setenv("API_WORKER_DASK_SCHEDULER", "cluster")
+    monkeypatch.setenv("API_WORKER_DASK_THREADS", "4")
+    monkeypatch.setenv("API_WORKER_DASK_MEMORY", "1KiB")
+    settings = DaskSettings.from_env()
+    assert settings == DaskSettings("threads", 4, 1, 1024)
+    executor = DaskExecutor(DaskSettings("synchronous", memory_limit=1024))
+    assert executor.compute(da.ones(128, dtype="f8"))[0].sum() == 128
+    with pytest.raises(MemoryError):
+        executor.compute(da.ones(129, dtype="f8"))
@@ -51,6 +51,31 @@ class InMemoryCache:
             self.expires[key] = ttl
             return True
 
+    def exists(self, key: str) -> int:
+        with self._lock:
+            return int(key in self.values)
+
+    def pipeline(self, transaction: bool = True) -> "InMemoryPipeline":
+        return InMemoryPipeline(self)
+
+
+class InMemoryPipeline:
+    """Buffer commands and apply them to the cache on execute."""
+
+    def __init__(self, cache: InMemoryCache) -> None:
+        self._cache = cache
+        self._commands: list[tuple[str, tuple[Any, ...]]] = []
+
+    def setex(self, key: str, ttl: int, value: Any) -> "InMemoryPipeline":
+        self._commands.append(("setex", (key, ttl, value)))
+        return self
+
+    def execute(self) -> list[Any]:
+        self._cache.executed_pipelines = (
+            getattr(self._cache, "executed_pipelines", 0) + 1
+        )
+        return [getattr(self._cache, cmd)(*args) for cmd, args in self._commands]
+
 
 def _make_queue(cache: InMemoryCache) -> ProcessQueue:
     """Create a ProcessQueue wired to an in-memory cache."""
@@ -156,6 +181,7 @@ class TestAccessCheckBrokerMessages:
         )
 
         reply_key = "access-reply:req-allowed"
+        _wait_for(lambda: reply_key in cache.lists)
         assert json.loads(cache.lists[reply_key][0]) == {"allowed": True}
         assert cache.expires[reply_key] == 30
 
@@ -187,6 +213,7 @@ class TestAccessCheckBrokerMessages:
         )
 
         reply_key = "access-reply:req-denied"
+        _wait_for(lambda: reply_key in cache.lists)
         assert json.loads(cache.lists[reply_key][0]) == {"allowed": False}
         assert cache.expires[reply_key] == 30
 
@@ -272,7 +299,12 @@ class TestUriBrokerMessages:
         )
         assert status["data"] == {"metadata": {".zgroup": {"zarr_format": 2}}}
         assert status["repr_html"] == "<b>dataset</b>"
-        assert cache.get(f"{token}-dset") is not None
+        recipe = json.loads(cache.get(f"{token}-recipe"))
+        assert recipe["paths"] == [str(source)]
+        assert recipe["mtimes"] == [source.stat().st_mtime]
+        assert recipe["assembly"] == {"mode": "merge"}
+        assert recipe["map_primary_chunksize"] == 2
+        assert cache.get(f"{token}-dset") is None
 
     def test_uri_message_applies_the_reduction_plan(
         self,
@@ -355,7 +387,8 @@ class TestUriBrokerMessages:
         assert chunked[0].sizes["time"] == 3
         assert np.issubdtype(chunked[0]["time"].dtype, np.datetime64)
 
-        served = cloudpickle.loads(cache.get(f"{token}-dset"))
+        # Another process opens the very same store from the recipe.
+        _, served = _make_queue(cache).load_object(token)
         assert served["root"].sizes["time"] == 3
 
     def test_uri_message_reports_an_invalid_reduction_as_a_failure(
@@ -430,7 +463,7 @@ class TestUriBrokerMessages:
             StateEnum.finished_permission_denied.value,
         )
         assert "Permission denied" in status["reason"]
-        assert cache.get(f"{token}-dset") is None
+        assert cache.get(f"{token}-recipe") is None
 
     def test_uri_message_does_not_reload_finished_dataset_without_reload_flag(
         self,
@@ -555,7 +588,7 @@ class TestChunkBrokerMessages:
         )
         monkeypatch.setattr(
             "data_portal_worker.load_data.encode_chunk",
-            lambda raw, filters, compressor: b"encoded-chunk",
+            lambda raw, filters, compressor, out_shape: b"encoded-chunk",
         )
 
         _send_broker_message(
@@ -595,6 +628,280 @@ class TestChunkBrokerMessages:
         assert result["status"] == StateEnum.finished_not_found.value
         assert "uuid does not exist" in result["reason"]
 
+    def test_chunk_message_for_changed_source_writes_failed_status(
+        self,
+        tmp_path: Path,
+    ) -> None:
+        """A store isn't opened again once its input files have changed."""
+        cache = InMemoryCache()
+        queue = _make_queue(cache)
+        token = "changed-token"
+        source = tmp_path / "input.nc"
+        source.write_bytes(b"dummy")
+        recipe = {
+            "paths": [str(source)],
+            "mtimes": [source.stat().st_mtime - 60],
+            "assembly": None,
+            "reduce": None,
+            "access_pattern": "map",
+            "map_primary_chunksize": 1,
+            "chunk_size": 16.0,
+        }
+        cache.setex(
+            token,
+            60,
+            cloudpickle.dumps({"status": StateEnum.finished_ok.value, "data": {}}),
+        )
+        cache.setex(f"{token}-recipe", 60, json.dumps(recipe))
+
+        _send_broker_message(
+            queue,
+            {"chunk": {"uuid": token, "variable": "temp", "chunk": "0"}},
+        )
+
+        result = _wait_for_cache_key(cache, f"{token}-temp-0")
+        assert result["status"] == StateEnum.finished_failed.value
+        assert "has changed" in result["reason"]
+
+
+class TestBatchedChunkBrokerMessages:
+    """Broker-driven tests for batched chunk messages."""
+
+    @staticmethod
+    def _cache_dataset(cache: InMemoryCache, token: str) -> None:
+        dataset = xr.Dataset(
+            {"temp": ("x", np.arange(5, dtype="i4"))}
+        ).chunk({"x": 2})
+        metadata = {
+            "metadata": {
+                "temp/.zarray": {
+                    "chunks": [2],
+                    "filters": None,
+                    "compressor": None,
+                }
+            }
+        }
+        cache.setex(
+            token,
+            60,
+            cloudpickle.dumps(
+                {"status": StateEnum.finished_ok.value, "data": metadata}
+            ),
+        )
+        cache.setex(f"{token}-dset", 60, cloudpickle.dumps({"root": dataset}))
+
+    def test_chunks_message_writes_all_chunks_in_one_pipeline(self) -> None:
+        """All chunks of a batch are encoded and written together."""
+        cache = InMemoryCache()
+        queue = _make_queue(cache)
+        token = "batch-token"
+        self._cache_dataset(cache, token)
+
+        _send_broker_message(
+            queue,
+            {
+                "chunks": {
+                    "uuid": token,
+                    "keys": [
+                        {"variable": "temp", "chunk": str(i)} for i in range(3)
+                    ],
+                }
+            },
+        )
+
+        last = _wait_for_cache_key(cache, f"{token}-temp-2")
+        first = _load_pickle(cache.get(f"{token}-temp-0"))
+        assert first["status"] == StateEnum.finished_ok.value
+        assert np.frombuffer(first["data"], dtype="i4").tolist() == [0, 1]
+        # The edge chunk is padded to the full chunk shape.
+        assert len(last["data"]) == 2 * 4
+        assert np.frombuffer(last["data"], dtype="i4")[0] == 4
+        assert cache.executed_pipelines == 1
+
+    def test_chunks_message_isolates_invalid_keys(self) -> None:
+        """One bad key doesn't spoil the other chunks of the batch."""
+        cache = InMemoryCache()
+        queue = _make_queue(cache)
+        token = "batch-bad-key-token"
+        self._cache_dataset(cache, token)
+
+        _send_broker_message(
+            queue,
+            {
+                "chunks": {
+                    "uuid": token,
+                    "keys": [
+                        {"variable": "temp", "chunk": "1"},
+                        {"variable": "temp", "chunk": "9"},
+                        {"variable": "nope", "chunk": "0"},
+                    ],
+                }
+            },
+        )
+
+        _wait_for(lambda: getattr(cache, "executed_pipelines", 0) == 1)
+        good = _load_pickle(cache.get(f"{token}-temp-1"))
+        assert good["status"] == StateEnum.finished_ok.value
+        for key in (f"{token}-temp-9", f"{token}-nope-0"):
+            assert _load_pickle(cache.get(key))["status"] != 0
+
+    def test_chunks_message_for_missing_dataset_fails_every_key(self) -> None:
+        """Without a dataset every key of the batch gets a not-found status."""
+        cache = InMemoryCache()
+        queue = _make_queue(cache)
+        token = "batch-missing-token"
+
+        _send_broker_message(
+            queue,
+            {
+                "chunks": {
+                    "uuid": token,
+                    "keys": [
+                        {"variable": "temp", "chunk": "0"},
+                        {"variable": "temp", "chunk": "1"},
+                    ],
+                }
+            },
+        )
+
+        _wait_for(lambda: getattr(cache, "executed_pipelines", 0) == 1)
+        for chunk in ("0", "1"):
+            result = _load_pickle(cache.get(f"{token}-temp-{chunk}"))
+            assert result["status"] == StateEnum.finished_not_found.value
+
+
+class TestShardBrokerMessages:
+    """Broker-driven tests for zarr v3 stores and their shards."""
+
+    def test_uri_message_with_v3_encoding_writes_zarr_json(
+        self,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Requesting zarr v3 adds the v3 metadata to the status."""
+        cache = InMemoryCache()
+        queue = _make_queue(cache)
+        source = tmp_path / "input.nc"
+        source.write_bytes(b"dummy")
+        token = "load-v3-token"
+        dataset = xr.Dataset({"temp": ("x", np.arange(4, dtype="f4"))}).chunk({"x": 1})
+        monkeypatch.setattr(
+            "data_portal_worker.load_data.user_can_read",
+            lambda path, username: True,
+        )
+        monkeypatch.setattr(
+            "data_portal_worker.load_data.load_data",
+            lambda path: dataset,
+        )
+
+        _send_broker_message(
+            queue,
+            {
+                "uri": {
+                    "path": [str(source)],
+                    "uuid": token,
+                    "access_pattern": "time_series",
+                    "encoding": {"zarr_format": 3},
+                }
+            },
+        )
+
+        status = _wait_for_cached_status(cache, token, StateEnum.finished_ok.value)
+        nodes = status["zarr_json"]["consolidated_metadata"]["metadata"]
+        assert nodes["temp"]["node_type"] == "array"
+        assert status["data"]["metadata"]["temp/.zarray"]["zarr_format"] == 2
+
+    def test_uri_message_with_compressor_sets_the_codec(
+        self,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """The compressor option replaces the codec of every array."""
+        cache = InMemoryCache()
+        queue = _make_queue(cache)
+        source = tmp_path / "input.nc"
+        source.write_bytes(b"dummy")
+        token = "load-compressor-token"
+        dataset = xr.Dataset({"temp": ("x", np.arange(4, dtype="f4"))}).chunk({"x": 1})
+        monkeypatch.setattr(
+            "data_portal_worker.load_data.user_can_read",
+            lambda path, username: True,
+        )
+        monkeypatch.setattr(
+            "data_portal_worker.load_data.load_data",
+            lambda path: dataset,
+        )
+
+        _send_broker_message(
+            queue,
+            {
+                "uri": {
+                    "path": [str(source)],
+                    "uuid": token,
+                    "encoding": {"compressor": "zlib:1"},
+                }
+            },
+        )
+
+        status = _wait_for_cached_status(cache, token, StateEnum.finished_ok.value)
+        zarray = status["data"]["metadata"]["temp/.zarray"]
+        assert zarray["compressor"] == {"id": "zlib", "level": 1}
+
+    def test_shard_message_assembles_the_chunks_of_a_shard(self) -> None:
+        """A shard holds the encoded chunks followed by their index."""
+        cache = InMemoryCache()
+        queue = _make_queue(cache)
+        token = "shard-token"
+        TestBatchedChunkBrokerMessages._cache_dataset(cache, token)
+        cache.setex(
+            token,
+            60,
+            cloudpickle.dumps(
+                {
+                    "status": StateEnum.finished_ok.value,
+                    "data": {
+                        "metadata": {
+                            "temp/.zarray": {
+                                "chunks": [2],
+                                "shape": [5],
+                                "dtype": "<i4",
+                                "filters": None,
+                                "compressor": None,
+                            }
+                        }
+                    },
+                }
+            ),
+        )
+
+        _send_broker_message(
+            queue, {"shard": {"uuid": token, "variable": "temp", "shard": "0"}}
+        )
+
+        result = _wait_for_cache_key(cache, f"{token}-temp/c/0")
+        assert result["status"] == StateEnum.finished_ok.value
+        data, index = result["data"][:-48], result["data"][-48:]
+        assert np.frombuffer(data, dtype="i4").tolist()[:5] == [0, 1, 2, 3, 4]
+        assert np.frombuffer(index, dtype="<u8").tolist() == [0, 8, 8, 8, 16, 8]
+
+    def test_cached_shards_are_not_built_again(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Range requests of one shard don't rebuild it every time."""
+        cache = InMemoryCache()
+        queue = _make_queue(cache)
+        token = "shard-token"
+        cache.setex(f"{token}-temp/c/0", 60, b"cached shard")
+
+        def fail(key: str) -> Any:
+            raise AssertionError("The shard is built again")
+
+        monkeypatch.setattr(queue, "load_object", fail)
+        ProcessQueue.get_zarr_shard.__wrapped__(  # type: ignore[attr-defined]
+            queue, token, "0", "temp"
+        )
+        assert cache.get(f"{token}-temp/c/0") == b"cached shard"
+
 
 class TestMalformedBrokerMessages:
     """Low-level broker message error handling."""
@@ -610,6 +917,53 @@ class TestMalformedBrokerMessages:
         assert cache.lists == {}
 
 
+class TestBrokerQueues:
+    """Broker-driven tests for the queues the daemon listens to."""
+
+    def test_run_for_ever_pops_the_queues_by_priority(
+        self,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Dedicated queues are read first, the legacy queue last."""
+        monkeypatch.setenv("API_WORKER_AFFINITY", "0")
+        cache = InMemoryCache()
+        queue = _make_queue(cache)
+        popped: list[Any] = []
+        message = {
+            "access_check": {
+                "request_id": "req-queue",
+                "username": "alice",
+                "paths": [str(tmp_path)],
+            }
+        }
+
+        def _brpop(keys: list[str], timeout: int = 0) -> tuple[str, bytes]:
+            popped.append(keys)
+            if len(popped) > 1:
+                raise KeyboardInterrupt
+            return keys[0], json.dumps(message).encode("utf-8")
+
+        cache.brpop = _brpop  # type: ignore[attr-defined]
+        monkeypatch.setattr(
+            "data_portal_worker.load_data.CacheScheduler.tick", lambda self: None
+        )
+        monkeypatch.setattr(
+            "data_portal_worker.load_data.user_can_read",
+            lambda path, username: True,
+        )
+
+        queue.run_for_ever("data-portal")
+
+        assert popped[0] == [
+            "data-portal:access",
+            "data-portal:chunk",
+            "data-portal:load",
+            "data-portal",
+        ]
+        _wait_for(lambda: "access-reply:req-queue" in cache.lists)
+
+
 class TestCurrentPermissionEdgeCases:
     """Document current edge cases outside the existing permission test module."""
 
@@ -231,9 +231,11 @@ class TestPreloadCoordinateChunks:
         }
 
         factory._preload_coordinate_chunks("test-token", meta, {"root": ds})
-        assert factory.cache.setex.call_count >= 1
-        key = factory.cache.setex.call_args_list[0][0][0]
+        pipe = factory.cache.pipeline.return_value
+        assert pipe.setex.call_count == 1
+        key = pipe.setex.call_args_list[0][0][0]
         assert key == "test-token-x-0"
+        pipe.execute.assert_called_once()
 
     def test_chunked_coordinates(self) -> None:
         """Dask-backed coordinates produce multiple chunks."""
@@ -259,7 +261,9 @@ class TestPreloadCoordinateChunks:
         }
 
         factory._preload_coordinate_chunks("test-token", meta, {"root": ds})
-        assert factory.cache.setex.call_count >= 1
+        pipe = factory.cache.pipeline.return_value
+        assert pipe.setex.call_count == 4
+        pipe.execute.assert_called_once()
 
     def test_missing_zarray_skipped(self) -> None:
         """Coordinates without a .zarray entry in metadata are skipped."""
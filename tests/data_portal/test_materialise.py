@@ -0,0 +1,92 @@
+"""Tests for the materialised results of reduced stores."""
+
+import base64
+import json
+from pathlib import Path
+
+import dask.array as da
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from data_portal_worker.materialise import (
+    materialise,
+    materialised_dir,
+    open_materialised,
+    should_materialise,
+)
+from data_portal_worker.reducer import reduce_datasets
+
+CLIMATOLOGY = {"time_freq": "monthly", "time_method": "mean", "climatology": True}
+
+
+def _climatology() -> xr.Dataset:
+    time = pd.date_range("2000-01-01", periods=730, freq="D")
+    dset = xr.Dataset(
+        {
+            "tas": (
+                ("time", "lat", "lon"),
+                da.random.random((730, 4, 6), chunks=(100, 4, 6)).astype("f4"),
+            )
+        },
+        coords={"time": time, "lat": np.arange(4.0), "lon": np.arange(6.0)},
+    )
+    reduced = reduce_datasets({"root": dset}, CLIMATOLOGY)["root"]
+    return reduced.chunk({"month": 1, "lat": 2, "lon": 6})
+
+
+def test_results_are_read_from_disk(tmp_path: Path) -> None:
+    """The materialised store has the data of the lazy one, read from disk."""
+    dsets = {"root": _climatology()}
+    target = materialised_dir("token", [1.0], root=str(tmp_path))
+    assert open_materialised(dsets, target) is None
+    # A budget of two blocks forces several batches.
+    materialise(dsets, target, budget=2 * 2 * 6 * 4)
+    opened = open_materialised(dsets, target)
+    assert opened is not None
+    tas = opened["root"]["tas"]
+    assert tas.chunks == dsets["root"]["tas"].chunks
+    assert tas.attrs == dsets["root"]["tas"].attrs
+    assert all("materialised-" in str(k) for k in dict(tas.data.dask))
+    xr.testing.assert_identical(opened["root"].compute(), dsets["root"].compute())
+    assert [p.name for p in tmp_path.iterdir()] == [target.name]
+
+
+def test_other_stores_are_not_served(tmp_path: Path) -> None:
+    """Results don't apply to changed files or to other layouts."""
+    dsets = {"root": _climatology()}
+    target = materialised_dir("token", [1.0], root=str(tmp_path))
+    materialise(dsets, target)
+    assert materialised_dir("token", [2.0], root=str(tmp_path)) != target
+    other = {"root": dsets["root"].isel(lat=slice(0, 2))}
+    assert open_materialised(other, target) is None
+
+
+def test_long_tokens_fit_into_a_file_name(tmp_path: Path) -> None:
+    """Tokens of aggregated stores are longer than a file name may be."""
+    paths = [f"/work/cmip6/CMIP/MPI-M/tas_day_{y}.nc" for y in range(1990, 2000)]
+    token = base64.urlsafe_b64encode(
+        json.dumps({"path": paths, "reduce": CLIMATOLOGY}).encode()
+    ).decode()
+    assert len(token) > 255
+    target = materialised_dir(token, [1.0] * len(paths), root=str(tmp_path))
+    assert len(target.name) < 255
+    assert target != materialised_dir("token", [1.0], root=str(tmp_path))
+    dsets = {"root": _climatology()}
+    assert open_materialised(dsets, target) is None
+    materialise(dsets, target)
+    assert open_materialised(dsets, target) is not None
+
+
+def test_materialise_modes(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Climatologies are materialised by default."""
+    monthly = {"time_freq": "monthly", "time_method": "mean"}
+    assert should_materialise(CLIMATOLOGY)
+    assert not should_materialise(monthly)
+    assert not should_materialise({"dtype": "float32"})
+    assert not should_materialise(None)
+    monkeypatch.setenv("API_WORKER_MATERIALISE", "all")
+    assert should_materialise(monthly)
+    monkeypatch.setenv("API_WORKER_MATERIALISE", "none")
+    assert not should_materialise(CLIMATOLOGY)
@@ -15,3 +15,37 @@ def test_state_enum() -> None:
         raise ValueError("foo")
     except Exception as error:
         assert StateEnum.from_exception(error) == StateEnum.finished_failed.value
+
+
+def test_open_datasets(monkeypatch) -> None:
+    """Files are opened concurrently, once, and failures are isolated."""
+    import threading
+    import time
+
+    import pytest
+    import xarray as xr
+
+    from data_portal_worker.load_data import open_datasets
+
+    opened = []
+    threads = set()
+
+    def _load(path: str) -> xr.Dataset:
+        time.sleep(0.05)
+        opened.append(path)
+        threads.add(threading.get_ident())
+        if path.startswith("bad"):
+            raise FileNotFoundError(path)
+        return xr.Dataset(attrs={"path": path})
+
+    monkeypatch.setattr("data_portal_worker.load_data.load_data", _load)
+    dsets = open_datasets(["a", "b", "a", "c"], max_workers=4)
+    assert [d.attrs["path"] for d in dsets] == ["a", "b", "a", "c"]
+    assert dsets[0] is dsets[2]
+    assert sorted(opened) == ["a", "b", "c"]
+    assert len(threads) > 1
+
+    opened.clear()
+    with pytest.raises(FileNotFoundError, match="bad-1"):
+        open_datasets(["a", "bad-1", "bad-2", "b"], max_workers=2)
+    assert sorted(opened) == ["a", "b", "bad-1", "bad-2"]
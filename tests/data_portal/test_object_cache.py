@@ -0,0 +1,100 @@
+"""Tests for the byte-budgeted object cache of the data-loader."""
+
+import json
+from typing import Any, Dict, Iterator, List
+
+import dask.array as da
+import numpy as np
+import pytest
+import xarray as xr
+
+from data_portal_worker.load_data import DataLoadFactory
+from data_portal_worker.object_cache import ObjectCache, estimate_footprint
+
+
+def _entry(blocks: int) -> Any:
+    dset = xr.Dataset(
+        {"tas": ("x", da.zeros(blocks, chunks=1))}, coords={"x": np.arange(blocks)}
+    )
+    return {"metadata": {".zgroup": {"zarr_format": 2}}}, {"root": dset}
+
+
+def test_footprint_counts_the_graph() -> None:
+    """Bigger graphs and coordinates mean bigger entries."""
+    small, big = estimate_footprint(_entry(10)), estimate_footprint(_entry(1000))
+    assert big > small * 50
+
+
+def test_byte_budget_and_stats() -> None:
+    """Entries are evicted by size, oversized entries aren't cached."""
+    size = estimate_footprint(_entry(100))
+    cache = ObjectCache(maxsize=int(2.5 * size), ttl=60, rss_high=2**62)
+    for key in ("a", "b", "c"):
+        cache[key] = _entry(100)
+    assert list(cache) == ["b", "c"]
+    assert cache.get("b") is not None and cache.get("a") is None
+    cache["huge"] = _entry(1000)
+    assert "huge" not in cache
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["bytes"] == 2 * size
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 1, 1)
+    assert stats["rejections"] == 1
+
+
+def test_memory_pressure_evicts(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Entries are evicted until they cover the RSS above the low watermark."""
+    size = estimate_footprint(_entry(10))
+    rss: Iterator[int] = iter([5 * size] * 3 + [12 * size, 11 * size, 10 * size])
+    monkeypatch.setattr(
+        "data_portal_worker.object_cache.process_rss", lambda: next(rss)
+    )
+    cache = ObjectCache(
+        maxsize=10**9, ttl=60, rss_high=11 * size - 1, rss_low=10 * size
+    )
+    for key in ("a", "b", "c"):
+        cache[key] = _entry(10)
+    assert cache.trim() == 2
+    assert list(cache) == ["c"]
+    assert cache.pressure_evictions == 2
+
+
+def test_memory_that_is_not_given_back(monkeypatch: pytest.MonkeyPatch) -> None:
+    """An RSS that doesn't drop doesn't empty the cache."""
+    monkeypatch.setattr("data_portal_worker.object_cache.process_rss", lambda: 95)
+    cache = ObjectCache(maxsize=10**9, ttl=60, rss_high=90, rss_low=75)
+    for key in ("a", "b", "c", "d", "e"):
+        cache[key] = _entry(10)
+    assert list(cache) == ["b", "c", "d", "e"]
+    assert cache.get("e") is not None
+    assert cache.trim() == 0
+
+
+def test_stats_are_published() -> None:
+    """The statistics of a process are written to the broker."""
+    written: List[Any] = []
+
+    class Cache:
+        def setex(self, key: str, ttl: int, value: str) -> None:
+            written.append((key, ttl, json.loads(value)))
+
+    factory = DataLoadFactory()
+    factory._cache = Cache()  # type: ignore[assignment]
+    factory._object_cache["token"] = _entry(10)
+
+    def _open(key: str) -> Any:
+        factory._object_cache[key] = _entry(10)
+        return factory._object_cache.peek(key)
+
+    factory._open_object = _open  # type: ignore[method-assign]
+    factory.load_object("cold")
+    factory.load_object("cold")
+    factory.report_cache_stats("data-portal:stats:w0", 180)
+    key, ttl, stats = written[0]
+    assert (key, ttl) == ("data-portal:stats:w0", 180)
+    expected: Dict[str, Any] = {
+        "entries": 2,
+        "bytes": 2 * estimate_footprint(_entry(10)),
+        "hits": 1,
+        "misses": 1,
+    }
+    assert {k: stats[k] for k in expected} == expected
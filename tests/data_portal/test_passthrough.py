@@ -0,0 +1,61 @@
+"""Tests for serving the chunks of netCDF4 files as they are stored."""
+
+from pathlib import Path
+from typing import Any, Dict
+
+import numcodecs
+import numpy as np
+import xarray as xr
+
+from data_portal_worker.aggregator import write_grouped_zarr
+from data_portal_worker.backends import load_data
+from data_portal_worker.passthrough import native_references, read_native_chunk
+
+
+def _write(path: Path, **encoding: Any) -> None:
+    xr.Dataset(
+        {"tas": (("time", "lat"), np.random.rand(10, 14).astype("f4"))},
+        coords={"time": np.arange(10), "lat": np.linspace(-90, 90, 14)},
+    ).to_netcdf(path, encoding={"tas": encoding})
+
+
+def _metadata(path: Path) -> Dict[str, Any]:
+    dset = load_data(str(path)).chunk({"time": 4, "lat": 7})
+    return write_grouped_zarr({"root": dset})
+
+
+def test_native_chunks_decode_to_the_data(tmp_path: Path) -> None:
+    """Chunks read from the file decode with the codecs of the metadata."""
+    source = tmp_path / "tas.nc"
+    _write(source, zlib=True, shuffle=True, complevel=4, chunksizes=(4, 7))
+    dset = load_data(str(source))
+    meta = _metadata(source)
+    refs = native_references(str(source), dset, meta)
+    assert list(refs) == ["tas"]
+    zarray = meta["metadata"]["tas/.zarray"]
+    assert zarray["compressor"] == {"id": "zlib", "level": 4}
+    assert zarray["filters"] == [{"id": "shuffle", "elementsize": 4}]
+    compressor = numcodecs.get_codec(zarray["compressor"])
+    shuffle = numcodecs.get_codec(zarray["filters"][0])
+    values = dset["tas"].values
+    for chunk_id, (t, y) in {"0.0": (0, 0), "2.1": (8, 7)}.items():
+        raw = read_native_chunk(refs["tas"], chunk_id)
+        assert raw is not None
+        chunk = np.frombuffer(shuffle.decode(compressor.decode(raw)), dtype="f4")
+        # Readers ignore the padding of edge chunks.
+        part = values[t : t + 4, y : y + 7]
+        np.testing.assert_array_equal(
+            chunk.reshape(4, 7)[: part.shape[0], : part.shape[1]], part
+        )
+
+
+def test_other_layouts_are_encoded(tmp_path: Path) -> None:
+    """Variables with other chunks or without file chunks aren't referenced."""
+    source = tmp_path / "tas.nc"
+    _write(source, zlib=True, chunksizes=(5, 14))
+    assert native_references(str(source), load_data(str(source)), _metadata(source)) == {}
+    contiguous = tmp_path / "contiguous.nc"
+    _write(contiguous)
+    dset = load_data(str(contiguous))
+    assert native_references(str(contiguous), dset, _metadata(contiguous)) == {}
+    assert native_references("https://example.org/tas.nc", dset, {}) == {}
@@ -0,0 +1,98 @@
+"""Tests for the read-ahead of chunks."""
+
+import time
+from typing import Any, Dict, List
+
+import cloudpickle
+import dask.array as da
+import numpy as np
+import xarray as xr
+
+from data_portal_worker.aggregator import write_grouped_zarr
+from data_portal_worker.load_data import DataLoadFactory
+from data_portal_worker.prefetch import Prefetcher, next_chunk_ids
+from data_portal_worker.rechunker import ChunkOptimizer
+
+
+class InlineExecutor:
+    """Run lane tasks right away."""
+
+    def __init__(self) -> None:
+        self.lanes: List[str] = []
+
+    def submit(self, lane: str, func: Any, *args: Any, **kwargs: Any) -> None:
+        self.lanes.append(lane)
+        func(*args, **kwargs)
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.data: Dict[str, bytes] = {}
+        self.writes: List[str] = []
+
+    def setex(self, key: str, ttl: int, value: bytes) -> None:
+        self.data[key] = value
+        self.writes.append(key)
+
+    def exists(self, key: str) -> int:
+        return int(key in self.data)
+
+    def pipeline(self, transaction: bool = True) -> "FakeRedis":
+        return self
+
+    def execute(self) -> List[Any]:
+        return []
+
+
+def test_next_chunk_ids() -> None:
+    """Map readers walk the primary axis, others the chunks in C order."""
+    args = ([10, 4, 4], [2, 2, 2], ["time", "lat", "lon"])
+    assert next_chunk_ids("1.1.0", *args, "map", "time", 2) == ["2.1.0", "3.1.0"]
+    assert next_chunk_ids("4.1.0", *args, "map", "time", 2) == []
+    assert next_chunk_ids("0.0.1", *args, "time_series", "time", 2) == [
+        "0.1.0",
+        "0.1.1",
+    ]
+    assert next_chunk_ids("0", [], [], [], "map", None, 2) == []
+    assert next_chunk_ids("9.0.0", *args, "map", "time", 2) == []
+
+
+def test_budget_and_idle_clients() -> None:
+    """Bookings are capped per token and dropped with an idle client."""
+    prefetcher = Prefetcher(depth=2, budget=3, idle=0.05)
+    assert prefetcher.book("t", [("tas", "0")]) == []
+    assert prefetcher.read("t", ("tas", "0")) is False
+    booked = prefetcher.book("t", [("tas", str(n)) for n in range(1, 6)])
+    assert booked == [("tas", "1"), ("tas", "2"), ("tas", "3")]
+    prefetcher.done("t", [("tas", "1")], [("tas", "2")])
+    assert prefetcher.book("t", [("tas", "4"), ("tas", "5")]) == [("tas", "4")]
+    assert prefetcher.read("t", ("tas", "1")) is True
+    assert prefetcher.read("t", ("tas", "1")) is False
+    time.sleep(0.1)
+    assert prefetcher.active("t") is False
+
+
+def test_chunks_are_read_ahead() -> None:
+    """A read chunk books its successors, which are then served as they are."""
+    dset = ChunkOptimizer(target=512).apply(
+        xr.Dataset(
+            {"tas": (("time", "lat"), da.ones((6, 100), chunks=(1, 100), dtype="f4"))},
+            coords={"time": np.arange(6), "lat": np.arange(100.0)},
+        )
+    )
+    meta = write_grouped_zarr({"root": dset})
+    factory = DataLoadFactory()
+    factory._executor = InlineExecutor()  # type: ignore[assignment]
+    factory._cache = cache = FakeRedis()  # type: ignore[assignment]
+    factory.prefetcher = Prefetcher(depth=2, budget=8)
+    factory._object_cache["token"] = (meta, {"root": dset})
+
+    factory.get_zarr_chunk("token", "0.0", "tas")
+    assert cache.writes == ["token-tas-1.0", "token-tas-2.0", "token-tas-0.0"]
+    assert factory.executor.lanes == ["chunk", "prefetch"]
+    package = cloudpickle.loads(cache.data["token-tas-1.0"])
+    assert package["status"] == 0
+
+    cache.writes.clear()
+    factory.get_zarr_chunk("token", "1.0", "tas")
+    assert cache.writes == ["token-tas-3.0"]
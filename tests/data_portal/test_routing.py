@@ -0,0 +1,163 @@
+"""Tests for the token affinity of chunk requests."""
+
+import json
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from data_portal_worker.load_data import ProcessQueue
+from data_portal_worker.routing import HashRing, TokenRouter
+
+
+class FakeRedis:
+    """The few lists and sorted set commands the router needs."""
+
+    def __init__(self) -> None:
+        self.lists: Dict[str, List[bytes]] = {}
+        self.zsets: Dict[str, Dict[str, float]] = {}
+        self.popped: List[List[str]] = []
+
+    def pipeline(self) -> "FakePipeline":
+        return FakePipeline(self)
+
+    def zadd(self, key: str, mapping: Dict[str, float]) -> int:
+        self.zsets.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    def zremrangebyscore(self, key: str, low: str, high: float) -> int:
+        zset = self.zsets.get(key, {})
+        old = [m for m, score in zset.items() if score <= high]
+        for member in old:
+            zset.pop(member)
+        return len(old)
+
+    def zrange(self, key: str, start: int, end: int) -> List[bytes]:
+        return [m.encode() for m in self.zsets.get(key, {})]
+
+    def zrem(self, key: str, member: str) -> int:
+        return int(self.zsets.get(key, {}).pop(member, None) is not None)
+
+    def lpush(self, key: str, *values: bytes) -> int:
+        for value in values:
+            self.lists.setdefault(key, []).insert(0, value)
+        return len(self.lists[key])
+
+    def expire(self, key: str, ttl: int) -> bool:
+        return True
+
+    def setex(self, key: str, ttl: int, value: Any) -> bool:
+        return True
+
+    def rpoplpush(self, src: str, dst: str) -> Optional[bytes]:
+        if not self.lists.get(src):
+            return None
+        value = self.lists[src].pop()
+        self.lpush(dst, value)
+        return value
+
+    def brpop(self, keys: List[str], timeout: int = 0) -> Any:
+        self.popped.append(keys)
+        for key in keys:
+            if self.lists.get(key):
+                return key.encode(), self.lists[key].pop()
+        raise KeyboardInterrupt
+
+
+class FakePipeline:
+    def __init__(self, cache: FakeRedis) -> None:
+        self._cache = cache
+        self._calls: List[Any] = []
+
+    def __getattr__(self, name: str) -> Any:
+        def _queue(*args: Any) -> "FakePipeline":
+            self._calls.append((getattr(self._cache, name), args))
+            return self
+
+        return _queue
+
+    def execute(self) -> List[Any]:
+        return [func(*args) for func, args in self._calls]
+
+
+def _chunk(token: str) -> bytes:
+    message = {"chunk": {"uuid": token, "variable": "tas", "chunk": "0.0"}}
+    return json.dumps(message).encode()
+
+
+def test_hash_ring_moves_few_keys() -> None:
+    """Only the keys of a new member change their owner."""
+    tokens = [f"token-{num}" for num in range(2000)]
+    ring = HashRing([f"worker-{num}" for num in range(4)])
+    owners = {t: ring.owner(t) for t in tokens}
+    assert min(Counter(owners.values()).values()) > 250
+    bigger = HashRing([f"worker-{num}" for num in range(5)])
+    moved = [t for t in tokens if bigger.owner(t) != owners[t]]
+    assert {bigger.owner(t) for t in moved} == {"worker-4"}
+    assert len(moved) < 700
+    assert HashRing([]).owner("token") is None
+
+
+def test_processes_share_the_tokens() -> None:
+    """Live processes form the ring, chunks go to exactly one of them."""
+    cache = FakeRedis()
+    routers = [TokenRouter(cache, "data-portal", f"w{num}") for num in range(3)]
+    for router in routers + routers:
+        router._last_beat = 0
+        router.tick()
+    assert all(r.ring.members == ["w0", "w1", "w2"] for r in routers)
+    forwarded = [r.forward(_chunk("abc")) for r in routers]
+    owner = routers[0].ring.owner("abc")
+    assert forwarded == [r.member != owner for r in routers]
+    assert len(cache.lists[f"data-portal:chunk:{owner}"]) == 2
+    assert routers[0].forward(b'{"uri": {"uuid": "abc"}}') is False
+    assert routers[0].forward(b"no json") is False
+
+
+def test_leaving_hands_back_the_queue() -> None:
+    """A process that stops returns its queued requests and drops out."""
+    cache = FakeRedis()
+    router = TokenRouter(cache, "data-portal", "w0", ttl=15)
+    router.tick()
+    cache.lpush(router.queue, b"one", b"two")
+    router.leave()
+    assert cache.zsets["data-portal:workers"] == {}
+    assert cache.lists["data-portal:chunk"] == [b"two", b"one"]
+    assert cache.lists[router.queue] == []
+
+
+def test_run_for_ever_forwards_foreign_chunks(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A chunk of a token owned by another process is forwarded."""
+    cache = FakeRedis()
+    # Nobody else heartbeats, the other process must never be dropped.
+    cache.zadd("data-portal:workers", {"other": float("inf")})
+    ring = HashRing(["other", "h:me"])
+    foreign = next(f"t{n}" for n in range(100) if ring.owner(f"t{n}") == "other")
+    cache.lpush("data-portal:chunk", _chunk(foreign))
+    monkeypatch.setattr(
+        "data_portal_worker.load_data.CacheScheduler.tick", lambda self: None
+    )
+    monkeypatch.setattr(
+        "data_portal_worker.routing.current_process",
+        lambda: type("P", (), {"name": "me"})(),
+    )
+    monkeypatch.setattr("data_portal_worker.routing.socket.gethostname", lambda: "h")
+    queue = ProcessQueue()
+    queue._cache = cache  # type: ignore[assignment]
+    callback: List[bytes] = []
+    monkeypatch.setattr(queue, "redis_callback", callback.append)
+
+    queue.run_for_ever("data-portal")
+
+    assert cache.popped[0][:2] == ["data-portal:access", "data-portal:chunk:h:me"]
+    assert callback == []
+    assert cache.lists["data-portal:chunk:other"] == [_chunk(foreign)]
+    assert "h:me" not in cache.zsets["data-portal:workers"]
+
+
+def test_invalid_routed_ttl_falls_back(monkeypatch: pytest.MonkeyPatch) -> None:
+    """A bad queue TTL setting uses the default."""
+    monkeypatch.setenv("API_WORKER_ROUTED_TTL", "soon")
+    assert TokenRouter(FakeRedis(), "data-portal", "w0").routed_ttl == 60
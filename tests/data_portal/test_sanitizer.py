@@ -11,9 +11,12 @@ message type passes through unchanged (or with correct normalisation).
 
 from __future__ import annotations
 
+from typing import Any, Dict
+
 import pytest
 
-from data_portal_worker.sanitizer import (_MAX_CHUNK_SIZE_MIB,
+from data_portal_worker.sanitizer import (_MAX_BATCH_CHUNKS,
+                                          _MAX_CHUNK_SIZE_MIB,
                                           _MAX_MAP_PRIMARY,
                                           _MIN_CHUNK_SIZE_MIB,
                                           _MIN_MAP_PRIMARY, sanitize_message)
@@ -372,6 +375,31 @@ class TestUriAssembly:
             sanitize_message(msg)
 
 
+class TestUriTimeRanges:
+    def test_time_ranges_of_the_input_paths_pass(self) -> None:
+        value = "[1979-01-16T12:00:00Z TO 1979-12-16T12:00:00Z]"
+        msg = {
+            "uri": {
+                **_VALID_URI["uri"],
+                "time_ranges": {"/lustre/data//cmip6/tas.nc": value},
+            }
+        }
+        out = sanitize_message(msg)["uri"]["time_ranges"]
+        assert out == {"/lustre/data/cmip6/tas.nc": value}
+        assert sanitize_message(_VALID_URI)["uri"]["time_ranges"] == {}
+
+    def test_invalid_time_ranges_are_rejected(self) -> None:
+        for bad in (
+            "[2000 TO 2001]",
+            {"/data/other.nc": "[2000 TO 2001]"},
+            {"/lustre/data/cmip6/tas.nc": 2000},
+            {"/lustre/data/cmip6/tas.nc": "x" * 129},
+        ):
+            msg = {"uri": {**_VALID_URI["uri"], "time_ranges": bad}}
+            with pytest.raises(ValueError, match="time_ranges"):
+                sanitize_message(msg)
+
+
 class TestUriReduction:
     """The dimension-reduction plan is mixed-typed, so it has its own rules.
 
@@ -392,12 +420,7 @@ class TestUriReduction:
         msg = {"uri": {**_VALID_URI["uri"], "reduce": plan}}
         assert sanitize_message(msg)["uri"]["reduce"] == plan
 
-    def test_spatial_keys_are_accepted_for_forward_compatibility(self) -> None:
-        """The wire format is final even though the worker rejects these.
-
-        Accepting them here means enabling spatial reduction later needs no
-        change to the broker contract.
-        """
+    def test_spatial_reduction_passes(self) -> None:
         plan = {
             "space": "mean",
             "space_dims": ["lat", "lon"],
@@ -406,6 +429,54 @@ class TestUriReduction:
         msg = {"uri": {**_VALID_URI["uri"], "reduce": plan}}
         assert sanitize_message(msg)["uri"]["reduce"] == plan
 
+    def test_spatial_subset_passes(self) -> None:
+        plan = {
+            "isel": ["rlat:10:20", "rlon::-5:2"],
+            "subset_bbox": [-20, 40.5, 30, 70],
+        }
+        msg = {"uri": {**_VALID_URI["uri"], "reduce": plan}}
+        assert sanitize_message(msg)["uri"]["reduce"] == {
+            "isel": ["rlat:10:20", "rlon::-5:2"],
+            "subset_bbox": [-20.0, 40.5, 30.0, 70.0],
+        }
+
+    @pytest.mark.parametrize(
+        "plan",
+        [
+            {"isel": "lat:1:2"},
+            {"isel": ["lat"]},
+            {"isel": ["lat:1"]},
+            {"isel": ["lat:1:2:3:4"]},
+            {"isel": ["lat:x:2"]},
+            {"isel": ["../lat:1:2"]},
+            {"isel": [f"d{i}:0:1" for i in range(9)]},
+            {"subset_bbox": [0, 1, 2]},
+            {"subset_bbox": [0, 1, 2, "3"]},
+            {"subset_bbox": [0, 1, 2, True]},
+            {"subset_bbox": [0, 1, 2, float("nan")]},
+        ],
+    )
+    def test_malformed_spatial_subset_is_rejected(
+        self, plan: Dict[str, Any]
+    ) -> None:
+        msg = {"uri": {**_VALID_URI["uri"], "reduce": plan}}
+        with pytest.raises(ValueError, match="reduce"):
+            sanitize_message(msg)
+
+    def test_variable_selection_passes(self) -> None:
+        plan = {"variables": ["tas", "time_bnds", "sea-ice.conc"]}
+        msg = {"uri": {**_VALID_URI["uri"], "reduce": plan}}
+        assert sanitize_message(msg)["uri"]["reduce"] == plan
+
+    @pytest.mark.parametrize(
+        "variables",
+        ["tas", [""], ["t as"], ["../tas"], [1], [f"v{i}" for i in range(65)]],
+    )
+    def test_malformed_variable_selection_is_rejected(self, variables: Any) -> None:
+        msg = {"uri": {**_VALID_URI["uri"], "reduce": {"variables": variables}}}
+        with pytest.raises(ValueError, match="reduce"):
+            sanitize_message(msg)
+
     def test_empty_and_null_plans_normalise_to_none(self) -> None:
         for empty in (None, {}, {"time_freq": None}):
             msg = {"uri": {**_VALID_URI["uri"], "reduce": empty}}
@@ -598,6 +669,48 @@ class TestChunkMessage:
             sanitize_message(msg)
 
 
+class TestChunksMessage:
+    def test_valid_batch_passes(self) -> None:
+        out = sanitize_message(
+            {
+                "chunks": {
+                    "uuid": "abc123",
+                    "keys": [
+                        {"variable": "tas", "chunk": "0.0.0"},
+                        {"variable": "grp/tas", "chunk": "1.0.0"},
+                    ],
+                }
+            }
+        )
+        assert out["chunks"]["uuid"] == "abc123"
+        assert [k["chunk"] for k in out["chunks"]["keys"]] == ["0.0.0", "1.0.0"]
+
+    def test_non_dict_payload_is_rejected(self) -> None:
+        with pytest.raises(ValueError, match="JSON object"):
+            sanitize_message({"chunks": ["tas/0.0.0"]})
+
+    def test_empty_key_list_is_rejected(self) -> None:
+        with pytest.raises(ValueError, match="non-empty"):
+            sanitize_message({"chunks": {"uuid": "abc", "keys": []}})
+
+    def test_too_many_keys_are_rejected(self) -> None:
+        keys = [{"variable": "tas", "chunk": "0"}] * (_MAX_BATCH_CHUNKS + 1)
+        with pytest.raises(ValueError, match="exceed"):
+            sanitize_message({"chunks": {"uuid": "abc", "keys": keys}})
+
+    def test_non_dict_entry_is_rejected(self) -> None:
+        with pytest.raises(ValueError, match="JSON objects"):
+            sanitize_message({"chunks": {"uuid": "abc", "keys": ["tas/0"]}})
+
+    def test_invalid_entries_are_rejected(self) -> None:
+        for bad in (
+            {"variable": "../tas", "chunk": "0"},
+            {"variable": "tas", "chunk": "a.0"},
+        ):
+            with pytest.raises(ValueError):
+                sanitize_message({"chunks": {"uuid": "abc", "keys": [bad]}})
+
+
 # ---------------------------------------------------------------------------
 # access_check message validation
 # ---------------------------------------------------------------------------
@@ -885,3 +998,70 @@ class TestUrlPaths:
         msg = {"uri": {**_VALID_URI["uri"], "path": [url]}}
         with pytest.raises(ValueError, match="null byte"):
             sanitize_message(msg)
+
+
+class TestEncodingAndShardMessages:
+    def test_valid_encoding_passes(self) -> None:
+        msg = {"uri": {**_VALID_URI["uri"], "encoding": {"zarr_format": 3}}}
+        assert sanitize_message(msg)["uri"]["encoding"] == {"zarr_format": 3}
+
+    def test_missing_encoding_normalises_to_none(self) -> None:
+        for empty in (None, {}, {"zarr_format": None}):
+            msg = {"uri": {**_VALID_URI["uri"], "encoding": empty}}
+            assert sanitize_message(msg)["uri"]["encoding"] is None
+        assert sanitize_message(_VALID_URI)["uri"]["encoding"] is None
+
+    def test_invalid_encoding_is_rejected(self) -> None:
+        for bad in ("3", {"zarr_format": 4}, {"zarr_format": True}, {"x": 1}):
+            msg = {"uri": {**_VALID_URI["uri"], "encoding": bad}}
+            with pytest.raises(ValueError, match="encoding"):
+                sanitize_message(msg)
+
+    def test_compressor_encoding(self) -> None:
+        for compressor in ("none", "auto", "blosc-lz4", "blosc-zstd:3", "zstd:22"):
+            msg = {"uri": {**_VALID_URI["uri"], "encoding": {"compressor": compressor}}}
+            assert sanitize_message(msg)["uri"]["encoding"] == {
+                "compressor": compressor
+            }
+        for bad in ("blosc", "zlib:10", "zstd:0", "lz4", "zlib:1;rm"):
+            msg = {"uri": {**_VALID_URI["uri"], "encoding": {"compressor": bad}}}
+            with pytest.raises(ValueError, match="compressor"):
+                sanitize_message(msg)
+
+    def test_bitround_encoding(self) -> None:
+        msg = {
+            "uri": {
+                **_VALID_URI["uri"],
+                "encoding": {"keepbits": 7, "keep_information": 0.99},
+            }
+        }
+        assert sanitize_message(msg)["uri"]["encoding"] == {
+            "keepbits": 7,
+            "keep_information": 0.99,
+        }
+        for bad in (
+            {"keepbits": 0},
+            {"keepbits": 53},
+            {"keepbits": 7.5},
+            {"keep_information": 1},
+            {"keep_information": "0.9"},
+            {"keep_information": True},
+        ):
+            msg = {"uri": {**_VALID_URI["uri"], "encoding": bad}}
+            with pytest.raises(ValueError, match="encoding"):
+                sanitize_message(msg)
+
+    def test_valid_shard_passes(self) -> None:
+        out = sanitize_message(
+            {"shard": {"uuid": "abc", "variable": "grp/tas", "shard": "2.0.0"}}
+        )
+        assert out["shard"] == {
+            "uuid": "abc",
+            "variable": "grp/tas",
+            "shard": "2.0.0",
+        }
+
+    def test_invalid_shard_is_rejected(self) -> None:
+        for bad in ({"uuid": "a", "variable": "tas", "shard": "c/0"}, ["tas"]):
+            with pytest.raises(ValueError):
+                sanitize_message({"shard": bad})
@@ -0,0 +1,102 @@
+"""Tests for the persistent cache of file layouts."""
+
+import os
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from data_portal_worker.backends import load_data
+from data_portal_worker.schema_cache import SchemaCache, schema_cache
+
+
+def _write(path: Path, offset: int = 0) -> None:
+    xr.Dataset(
+        {"tas": (("time", "lat"), np.arange(30, dtype="f4").reshape(10, 3) + offset)},
+        coords={
+            "time": ("time", np.arange(10), {"units": "days since 2000-01-01"}),
+            "lat": [1.0, 2.0, 3.0],
+        },
+        attrs={"title": "test"},
+    ).to_netcdf(path)
+
+
+def test_known_files_are_not_opened(tmp_path: Path) -> None:
+    """A cached layout gives the same lazy dataset without opening the file."""
+    source = tmp_path / "tas.nc"
+    _write(source)
+    cache = SchemaCache(str(tmp_path / "schemas.sqlite"))
+    opened: List[str] = []
+
+    def _opener(path: str) -> xr.Dataset:
+        opened.append(path)
+        return load_data(path)
+
+    first = cache.open(str(source), _opener)
+    second = SchemaCache(cache.path.as_posix()).open(str(source), _opener)
+    assert opened == [str(source)]
+    xr.testing.assert_identical(first, second)
+    assert first["tas"].chunks == second["tas"].chunks
+    assert second["tas"].encoding["source"] == first["tas"].encoding["source"]
+    np.testing.assert_array_equal(second["tas"].values, first["tas"].values)
+
+
+def test_changed_files_are_opened_again(tmp_path: Path) -> None:
+    """The layout of a file is only used while size and mtime match."""
+    source = tmp_path / "tas.nc"
+    _write(source)
+    cache = SchemaCache(str(tmp_path / "schemas.sqlite"))
+    opened: List[str] = []
+
+    def _opener(path: str) -> xr.Dataset:
+        opened.append(path)
+        return load_data(path)
+
+    cache.open(str(source), _opener)
+    _write(source, offset=100)
+    os.utime(source, (1, 1))
+    dset = cache.open(str(source), _opener)
+    assert len(opened) == 2
+    assert float(dset["tas"][0, 0]) == 100
+
+
+def test_uncacheable_datasets(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Datasets that aren't lazy and urls are never cached."""
+    source = tmp_path / "tas.nc"
+    source.write_bytes(b"dummy")
+    cache = SchemaCache(str(tmp_path / "schemas.sqlite"))
+    dset = xr.Dataset({"tas": ("x", np.zeros(2))})
+    for path in (str(source), "https://example.org/tas.nc"):
+        assert cache.open(path, lambda p: dset) is dset
+        assert cache.open(path, lambda p: dset) is dset
+    assert cache.conn.execute("SELECT COUNT(*) FROM files").fetchone() == (0,)
+    monkeypatch.setenv("API_SCHEMA_CACHE", "0")
+    assert schema_cache() is None
+
+
+def test_foreign_databases_are_refused(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Only a database of this user, that nobody else can write, is read."""
+    source = tmp_path / "tas.nc"
+    _write(source)
+    cache = SchemaCache(str(tmp_path / "schemas.sqlite"))
+    cache.open(str(source), load_data)
+    assert cache.path.stat().st_mode & 0o777 == 0o600
+    opened: List[str] = []
+
+    def _opener(path: str) -> xr.Dataset:
+        opened.append(path)
+        return load_data(path)
+
+    cache.path.chmod(0o666)
+    shared = SchemaCache(cache.path.as_posix())
+    shared.open(str(source), _opener)
+    shared.open(str(source), _opener)
+    assert len(opened) == 2
+    cache.path.chmod(0o600)
+    monkeypatch.setattr(os, "getuid", lambda: os.stat(source).st_uid + 1)
+    with pytest.raises(PermissionError):
+        SchemaCache(cache.path.as_posix()).conn
@@ -435,6 +435,82 @@ def test_combine_concat_infers_dim_when_opts_none_success() -> None:
     assert out.dims["time"] == 2
 
 
+def _catalogued(ds: xr.Dataset, start: str, end: str) -> xr.Dataset:
+    ds = ds.copy()
+    ds.encoding[aggmod.CATALOGUE_TIME_KEY] = (start, end)
+    return ds
+
+
+def test_parse_time_range() -> None:
+    """Catalogue ranges are parsed into comparable bounds."""
+    assert aggmod.parse_time_range(
+        "[1979-01-16T12:00:00Z TO 1979-12-16T12:00:00Z]"
+    ) == ("1979-01-16T12:00:00", "1979-12-16T12:00:00")
+    assert aggmod.parse_time_range("1979-01-16T12:00:00Z") is None
+    assert aggmod.parse_time_range(None) is None
+
+
+def test_time_concat_orders_by_catalogue_range(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Consecutive files are concatenated without combine_by_coords."""
+    agg = aggmod.DatasetAggregator()
+    monkeypatch.setattr(
+        xr, "combine_by_coords", lambda *a, **k: pytest.fail("generic path")
+    )
+    d1 = _catalogued(_ds_with_time("tas", 0), "2000-01-01", "2000-12-31")
+    d2 = _catalogued(_ds_with_time("tas", 2), "2001-01-01", "2001-12-31")
+    d3 = _catalogued(_ds_with_time("tas", 4), "2002-01-01", "2002-12-31")
+    out = agg.aggregate([d3, d1, d2], job_id="job")["root"]
+    assert out["time"].values.tolist() == list(range(6))
+    assert out["tas"].values.tolist() == list(range(6))
+
+
+def test_time_concat_without_catalogue_ranges() -> None:
+    """Without catalogue ranges the files are ordered by their first step."""
+    agg = aggmod.DatasetAggregator()
+    out = agg._time_concat(
+        [_ds_with_time("tas", 4), _ds_with_time("tas", 0)],
+        aggmod.AggregationOptions(mode="concat", dim="time"),
+    )
+    assert out is not None
+    assert out["time"].values.tolist() == [0, 1, 4, 5]
+
+
+@pytest.mark.parametrize(
+    "second",
+    [
+        _ds_with_time("tas", 1),
+        _ds_with_time("pr", 2),
+        _ds_with_time("tas", 2).assign_coords(time=[3, 2]),
+        _ds_with_time("tas", 2).assign(lev=("lev", [1])),
+    ],
+)
+def test_time_concat_falls_back(second: xr.Dataset) -> None:
+    """Overlapping, unsorted or differing files take the generic path."""
+    agg = aggmod.DatasetAggregator()
+    plan = aggmod.AggregationOptions(mode="auto")
+    assert agg._time_concat([_ds_with_time("tas", 0), second], plan) is None
+
+
+def test_time_concat_falls_back_for_overlapping_ranges() -> None:
+    """Overlapping catalogue ranges and other options aren't concatenated."""
+    agg = aggmod.DatasetAggregator()
+    d1 = _catalogued(_ds_with_time("tas", 0), "2000-01-01", "2001-06-30")
+    d2 = _catalogued(_ds_with_time("tas", 2), "2001-01-01", "2001-12-31")
+    plan = aggmod.AggregationOptions(mode="auto")
+    assert agg._time_concat([d1, d2], plan) is None
+    d1.encoding[aggmod.CATALOGUE_TIME_KEY] = ("2000-01-01", "2000-12-31")
+    assert agg._time_concat([d1, d2], plan) is not None
+    for other in (
+        aggmod.AggregationOptions(mode="merge"),
+        aggmod.AggregationOptions(mode="concat", dim="lat"),
+        aggmod.AggregationOptions(mode="auto", compat="equals"),
+        aggmod.AggregationOptions(mode="auto", group_by="grid"),
+    ):
+        assert agg._time_concat([d1, d2], other) is None
+
+
 def test_html_view() -> None:
     """Test the html view integration."""
     from data_portal_worker.utils import xr_repr_html
@@ -346,18 +346,28 @@ class TestPlanReduction:
         with pytest.raises(redmod.ReductionError, match="no time dimension"):
             redmod.plan_reduction(ds, {"time_freq": "monthly"})
 
+    def test_spatial_reduction_resolves_dims_and_weights(self) -> None:
+        plan = redmod.plan_reduction(_packed_daily(), {"space": "mean"})
+        assert plan.space == redmod.SpaceReduction(
+            method="mean", dims=("lat", "lon"), weighting="cos_lat", weight_var="lat"
+        )
+        assert plan.dtype == "float32"
+        assert plan.removes_spatial_dims
+
     @pytest.mark.parametrize(
-        "options",
+        "options,match",
         [
-            {"space": "mean"},
-            {"space_dims": ["lat", "lon"]},
-            {"weighting": "cos_lat"},
+            ({"space_dims": ["lat", "lon"]}, "require 'space'"),
+            ({"weighting": "cos_lat"}, "require 'space'"),
+            ({"space": "median"}, "Unknown space"),
+            ({"space": "mean", "weighting": "area"}, "Unknown weighting"),
+            ({"space": "mean", "space_dims": ["x"]}, "unknown dimensions x"),
         ],
     )
-    def test_spatial_reduction_is_rejected_until_implemented(
-        self, options: Dict[str, Any]
+    def test_invalid_spatial_options_are_rejected(
+        self, options: Dict[str, Any], match: str
     ) -> None:
-        with pytest.raises(redmod.ReductionError, match="not implemented yet"):
+        with pytest.raises(redmod.ReductionError, match=match):
             redmod.plan_reduction(_packed_daily(), options)
 
 
@@ -377,7 +387,6 @@ class TestPlanDescription:
         assert plan.time.cell_method == "time: mean over monthly"
 
     def test_space_fragment(self) -> None:
-        """Reserved, but the fragment has to be right when it ships."""
         space = redmod.SpaceReduction(
             method="mean", dims=("lat", "lon"), weighting="cos_lat"
         )
@@ -736,15 +745,329 @@ class TestApplyReduction:
         )
         assert out.sizes["time"] == 6
 
-    def test_applying_a_spatial_plan_raises(self) -> None:
-        """Defence in depth: planning rejects it, application does too."""
-        plan = redmod.ReductionPlan(
-            space=redmod.SpaceReduction(
-                method="mean", dims=("lat", "lon"), weighting="none"
+    def test_space_is_reduced_before_time(self) -> None:
+        ds = _packed_daily()
+        plan = redmod.plan_reduction(ds, {"space": "mean", "time_freq": "monthly"})
+        out = redmod.apply_reduction(ds, plan)
+        assert dict(out["tas"].sizes) == {"time": 4}
+        assert out["tas"].attrs["cell_methods"] == (
+            "area: mean time: mean (monthly)"
+        )
+        np.testing.assert_allclose(out["tas"], 10.0, rtol=1e-6)
+
+
+# ---------------------------------------------------------------------------
+# Spatial subsetting
+# ---------------------------------------------------------------------------
+
+
+def _global(lon0: float = 0.0) -> xr.Dataset:
+    """A packed 10 degree global grid, longitudes starting at ``lon0``."""
+    ds = _packed_daily(n=60)
+    values = np.full((60, 18, 36), 100, dtype="int16")
+    return ds.drop_vars(["lat", "lon"]).assign(
+        tas=(("time", "lat", "lon"), values, ds["tas"].attrs),
+        lat=("lat", np.arange(-85.0, 90.0, 10.0), {"units": "degrees_north"}),
+        lon=("lon", np.arange(lon0, lon0 + 360.0, 10.0), {"units": "degrees_east"}),
+    )
+
+
+def _rotated() -> xr.Dataset:
+    """A rotated-pole grid: 1D grid axes, 2D geographic coordinates."""
+    y, x = np.meshgrid(np.arange(10.0), np.arange(12.0), indexing="ij")
+    return xr.Dataset(
+        {
+            "tas": (("rlat", "rlon"), np.zeros((10, 12), dtype="f4")),
+            "lat": (
+                ("rlat", "rlon"),
+                40 + y + 0.1 * x,
+                {"standard_name": "latitude"},
+            ),
+            "lon": (
+                ("rlat", "rlon"),
+                -10 + x + 0.2 * y,
+                {"standard_name": "longitude"},
+            ),
+        },
+        coords={
+            "rlat": ("rlat", np.arange(10.0), {"standard_name": "grid_latitude"}),
+            "rlon": ("rlon", np.arange(12.0), {"standard_name": "grid_longitude"}),
+        },
+    )
+
+
+class TestSpatialSubset:
+    """``isel``/``subset_bbox`` resolve to index selections during planning."""
+
+    def test_bbox_on_a_regular_grid(self) -> None:
+        ds = _global()
+        plan = redmod.plan_reduction(ds, {"subset_bbox": [10, 40, 0, 30]})
+        assert plan.subset is not None and not plan.is_noop
+        out = redmod.apply_reduction(ds, plan)
+        np.testing.assert_array_equal(out["lat"], [5.0, 15.0, 25.0])
+        np.testing.assert_array_equal(out["lon"], [10.0, 20.0, 30.0, 40.0])
+        assert plan.describe() == "subset lat[9:12], lon[1:5]"
+
+    @pytest.mark.parametrize("lon0", [0.0, -180.0])
+    def test_bbox_across_the_seam_runs_eastwards(self, lon0: float) -> None:
+        ds = _global(lon0)
+        plan = redmod.plan_reduction(ds, {"subset_bbox": [340, 20, -90, 90]})
+        out = redmod.apply_reduction(ds, plan)
+        np.testing.assert_array_equal(
+            np.mod(out["lon"], 360), [340.0, 350.0, 0.0, 10.0, 20.0]
+        )
+        assert out.sizes["lat"] == 18
+
+    def test_bbox_on_a_rotated_pole_grid_selects_an_index_box(self) -> None:
+        ds = _rotated()
+        plan = redmod.plan_reduction(ds, {"subset_bbox": [0, 3, 42, 45]})
+        out = redmod.apply_reduction(ds, plan)
+
+        def inside(dset: xr.Dataset) -> xr.DataArray:
+            lat, lon = dset["lat"], dset["lon"]
+            return (lat >= 42) & (lat <= 45) & (lon >= 0) & (lon <= 3)
+
+        # Every matching cell is kept, in the smallest box that holds them.
+        assert int(inside(out).sum()) == int(inside(ds).sum())
+        assert bool(inside(out).any("rlon").all())
+        assert bool(inside(out).any("rlat").all())
+
+    def test_bbox_on_an_unstructured_grid_selects_cells(self) -> None:
+        lat = np.array([-50.0, 10.0, 20.0, 60.0, 15.0])
+        lon = np.array([0.0, 5.0, 200.0, 5.0, 8.0])
+        ds = xr.Dataset(
+            {
+                "tas": (("cell",), np.arange(5.0)),
+                "clat": (("cell",), lat, {"units": "degrees_north"}),
+                "clon": (("cell",), lon, {"units": "degrees_east"}),
+            }
+        )
+        plan = redmod.plan_reduction(ds, {"subset_bbox": [0, 10, 0, 30]})
+        np.testing.assert_array_equal(
+            redmod.apply_reduction(ds, plan)["tas"], [1.0, 4.0]
+        )
+
+    def test_bbox_on_radian_coordinates(self) -> None:
+        lat = np.deg2rad([-50.0, 10.0, 20.0, 60.0, 15.0])
+        lon = np.deg2rad([0.0, 5.0, 200.0, 5.0, 8.0])
+        ds = xr.Dataset(
+            {
+                "tas": (("ncells",), np.arange(5.0)),
+                "clat": (
+                    ("ncells",),
+                    lat,
+                    {"standard_name": "latitude", "units": "radian"},
+                ),
+                "clon": (
+                    ("ncells",),
+                    lon,
+                    {"standard_name": "longitude", "units": "radian"},
+                ),
+            }
+        )
+        plan = redmod.plan_reduction(ds, {"subset_bbox": [0, 10, 0, 30]})
+        np.testing.assert_array_equal(
+            redmod.apply_reduction(ds, plan)["tas"], [1.0, 4.0]
+        )
+
+    def test_isel_is_applied_before_the_bbox(self) -> None:
+        ds = _global()
+        plan = redmod.plan_reduction(
+            ds, {"isel": ["lat:9::2", "lon:0:10"], "subset_bbox": [0, 360, 0, 40]}
+        )
+        out = redmod.apply_reduction(ds, plan)
+        np.testing.assert_array_equal(out["lat"], [5.0, 25.0])
+        assert out.sizes["lon"] == 10
+        assert plan.describe() == "subset lat[9:12:2], lon[0:10]"
+
+    def test_a_subset_alone_is_served_raw_and_lazily(self) -> None:
+        ds = _undecoded(_global()).chunk({"time": 10})
+        out = redmod.apply_reduction(
+            ds, redmod.plan_reduction(ds, {"isel": ["time:0:20"]})
+        )
+        assert out["tas"].dtype == np.dtype("int16")
+        assert out["tas"].chunks is not None
+        assert out.sizes["time"] == 20
+
+    def test_time_reduction_is_planned_on_the_subset(self) -> None:
+        ds = _global()
+        options = {
+            "isel": ["time:0:31"],
+            "subset_bbox": [0, 20, 0, 20],
+            "time_freq": "monthly",
+        }
+        plan = redmod.plan_reduction(ds, options)
+        out = redmod.apply_reduction(ds, plan)
+        assert dict(out["tas"].sizes) == {"time": 1, "lat": 2, "lon": 3}
+        assert out["tas"].dtype == np.dtype("float32")
+
+    @pytest.mark.parametrize(
+        "options,match",
+        [
+            ({"isel": ["lat:1"]}, "Invalid index slice"),
+            ({"isel": ["lat:a:b"]}, "Invalid index slice"),
+            ({"isel": ["level:0:1"]}, "no such dimension"),
+            ({"isel": ["lat:0:1", "lat:2:3"]}, "sliced twice"),
+            ({"isel": ["lat:5:1:-1"]}, "must be positive"),
+            ({"isel": ["lat:5:5"]}, "selects no data"),
+            ({"subset_bbox": [0, 10, 50, 40]}, "must not be larger"),
+            ({"subset_bbox": [0, 10, 50]}, "four values"),
+            ({"subset_bbox": [1, 2, 0, 30]}, "selects no data"),
+        ],
+    )
+    def test_invalid_subsets_are_rejected(
+        self, options: Dict[str, Any], match: str
+    ) -> None:
+        with pytest.raises(redmod.ReductionError, match=match):
+            redmod.plan_reduction(_global(), options)
+
+    def test_bbox_needs_latitude_and_longitude(self) -> None:
+        ds = xr.Dataset({"tas": (("y", "x"), np.zeros((2, 2)))})
+        with pytest.raises(redmod.ReductionError, match="no latitude/longitude"):
+            redmod.plan_reduction(ds, {"subset_bbox": [0, 10, 0, 10]})
+
+
+class TestSpatialReduction:
+    """``space`` collapses the horizontal dimensions into area statistics."""
+
+    def test_cos_lat_weighted_mean(self) -> None:
+        ds = _global()
+        ds["tas"][:, :9] = 50  # 5 K in the southern hemisphere
+        plan = redmod.plan_reduction(ds, {"space": "mean"})
+        out = redmod.apply_reduction(ds, plan)
+        assert dict(out["tas"].sizes) == {"time": 60}
+        assert out["tas"].dtype == np.dtype("float32")
+        assert out["tas"].attrs["cell_methods"] == "area: mean"
+        assert out["tas"].attrs["units"] == "K"
+        np.testing.assert_allclose(out["tas"], 7.5, rtol=1e-5)
+
+    def test_cos_lat_of_a_latitude_in_radians(self) -> None:
+        ds = _global()
+        ds["tas"][:, :3] = 50  # 5 K south of 60S
+        plan = {"space": "mean"}
+        expected = redmod.apply_reduction(ds, redmod.plan_reduction(ds, plan))
+        ds["lat"] = np.deg2rad(ds["lat"]).assign_attrs(
+            standard_name="latitude", units="radian"
+        )
+        out = redmod.apply_reduction(ds, redmod.plan_reduction(ds, plan))
+        np.testing.assert_allclose(out["tas"], expected["tas"], rtol=1e-5)
+
+    def test_cell_area_weights_skip_missing_cells(self) -> None:
+        ds = _packed_daily(fill_first=10)
+        ds["tas"][:, 1, 1] = 200
+        ds["areacella"] = (("lat", "lon"), [[1.0, 1.0], [1.0, 3.0]])
+        out = redmod.apply_reduction(
+            ds, redmod.plan_reduction(ds, {"space": "mean"})
+        )
+        assert "areacella" not in out
+        np.testing.assert_allclose(out["tas"][0], (10 + 10 + 60) / 5, rtol=1e-6)
+        np.testing.assert_allclose(out["tas"][-1], (10 + 10 + 10 + 60) / 6, rtol=1e-6)
+
+    def test_sum_is_weighted_and_extremes_are_not(self) -> None:
+        ds = _packed_daily()
+        ds["tas"][:, 1, 1] = 300
+        ds["areacella"] = (("lat", "lon"), np.full((2, 2), 2.0))
+        results = {
+            method: redmod.apply_reduction(
+                ds, redmod.plan_reduction(ds, {"space": method})
+            )["tas"].values[0]
+            for method in ("sum", "min", "max")
+        }
+        np.testing.assert_allclose(results["sum"], 2 * (3 * 10 + 30), rtol=1e-6)
+        np.testing.assert_allclose(results["min"], 10.0, rtol=1e-6)
+        np.testing.assert_allclose(results["max"], 30.0, rtol=1e-6)
+
+    def test_selected_dims_only(self) -> None:
+        ds = _global()
+        plan = redmod.plan_reduction(ds, {"space": "mean", "space_dims": ["lon"]})
+        assert plan.space is not None and plan.space.weighting == "none"
+        out = redmod.apply_reduction(ds, plan)
+        assert dict(out["tas"].sizes) == {"time": 60, "lat": 18}
+
+    def test_curvilinear_grid_with_explicit_cos_lat(self) -> None:
+        ds = _rotated()
+        plan = redmod.plan_reduction(ds, {"space": "max", "weighting": "cos_lat"})
+        out = redmod.apply_reduction(ds, plan)
+        assert "lat" not in out and "lon" not in out
+        assert out["tas"].shape == ()
+
+    def test_spatial_reduction_stays_lazy(self) -> None:
+        import dask.array as dsa
+
+        def explode(block_info: Any = None) -> Any:
+            raise AssertionError("apply_reduction must not compute chunks")
+
+        arr = dsa.map_blocks(
+            explode,
+            chunks=((30,) * 2, (18,), (36,)),
+            dtype="float32",
+            meta=np.array((), dtype="float32"),
+        )
+        ds = _global().assign(tas=(("time", "lat", "lon"), arr))
+        out = redmod.apply_reduction(
+            ds, redmod.plan_reduction(ds, {"space": "mean"})
+        )
+        assert out["tas"].chunks == ((30, 30),)
+
+
+def _model_output() -> xr.Dataset:
+    """A multi-variable model output file, as opened by the loader."""
+    ds = _packed_daily(n=4)
+    return ds.assign(
+        pr=ds["tas"].copy(),
+        time_bnds=(("time", "bnds"), np.zeros((4, 2))),
+        areacella=(("lat", "lon"), np.ones((2, 2))),
+        crs=((), 0, {"grid_mapping_name": "latitude_longitude"}),
+        lat_2d=(("lat", "lon"), np.zeros((2, 2))),
+    ).pipe(
+        lambda d: d.assign(
+            tas=d["tas"].assign_attrs(
+                cell_measures="area: areacella",
+                grid_mapping="crs",
+                coordinates="lat_2d",
             )
         )
-        with pytest.raises(redmod.ReductionError, match="not implemented yet"):
-            redmod.apply_reduction(_packed_daily(), plan)
+    )
+
+
+class TestSelectVariables:
+    """``variables`` drops what wasn't asked for right after opening."""
+
+    def test_keeps_the_variables_and_what_describes_them(self) -> None:
+        ds = _model_output()
+        ds["time"].attrs["bounds"] = "time_bnds"
+        (out,) = redmod.select_variables([ds], ["tas"])
+        assert set(out.data_vars) == {
+            "tas",
+            "time_bnds",
+            "areacella",
+            "crs",
+            "lat_2d",
+        }
+        assert set(out.coords) == set(ds.coords)
+
+    def test_unrelated_variables_are_dropped(self) -> None:
+        (out,) = redmod.select_variables([_model_output()], ["pr"])
+        assert list(out.data_vars) == ["pr"]
+
+    def test_files_without_the_variables_are_left_out(self) -> None:
+        tas, pr = _packed_daily(), _packed_daily().rename(tas="pr")
+        out = redmod.select_variables([tas, pr, tas], ["tas"])
+        assert len(out) == 2
+        assert all(list(d.data_vars) == ["tas"] for d in out)
+
+    def test_no_selection_keeps_everything(self) -> None:
+        ds = _model_output()
+        assert redmod.select_variables([ds], None)[0] is ds
+
+    def test_unknown_variables_are_an_error(self) -> None:
+        with pytest.raises(redmod.ReductionError, match="not found") as info:
+            redmod.select_variables([_model_output()], ["tas", "uas"])
+        assert info.value.details["missing"] == "uas"
+
+    def test_the_option_does_not_make_a_reduction(self) -> None:
+        plan = redmod.plan_reduction(_packed_daily(), {"variables": ["tas"]})
+        assert plan.is_noop
 
 
 # ---------------------------------------------------------------------------
@@ -834,30 +1157,19 @@ class TestPlanRemovesSpatialDims:
             {"root": _packed_daily()}, {"time_freq": "monthly"}
         )
 
-    def test_true_once_a_spatial_plan_can_be_built(
-        self, monkeypatch: pytest.MonkeyPatch
-    ) -> None:
-        """Pins the contract spatial reduction will rely on.
+    def test_true_for_a_spatial_reduction(self) -> None:
+        """Otherwise a collapsed dataset would be chunked for ``map`` access.
 
-        Without this, a collapsed dataset would be chunked for ``map``
-        access, giving one chunk of a few bytes per time step -- one HTTP
+        That gives one chunk of a few bytes per time step -- one HTTP
         round-trip each.
         """
-        spatial = redmod.ReductionPlan(
-            space=redmod.SpaceReduction(
-                method="mean", dims=("lat", "lon"), weighting="none"
-            )
-        )
-        monkeypatch.setattr(
-            redmod, "plan_reduction", lambda _ds, _options: spatial
-        )
         assert redmod.plan_removes_spatial_dims(
             {"root": _packed_daily()}, {"space": "mean"}
         )
 
 
 class TestWeightResolution:
-    """``_resolve_weights`` is reserved, but its contract is worth pinning.
+    """``_resolve_weights`` decides how a spatial mean is weighted.
 
     An unweighted mean over a regular lat/lon grid is wrong by several kelvin
     for a global field and looks entirely plausible in a plot, so a grid we
@@ -875,7 +1187,7 @@ class TestWeightResolution:
     def test_regular_lat_lon_falls_back_to_cos_lat(self) -> None:
         assert redmod._resolve_weights(_packed_daily(), ["lat", "lon"], "auto") == (
             "cos_lat",
-            None,
+            "lat",
         )
 
     def test_equal_area_grids_need_no_weights(self) -> None:
@@ -885,6 +1197,20 @@ class TestWeightResolution:
         )
         assert redmod._resolve_weights(ds, ["cell"], "auto") == ("none", None)
 
+    def test_unstructured_latitude_is_not_a_cos_lat_axis(self) -> None:
+        ds = xr.Dataset(
+            {
+                "tas": (("time", "cell"), np.zeros((2, 4))),
+                "lat": (("cell",), np.zeros(4), {"units": "degrees_north"}),
+                "lon": (("cell",), np.zeros(4), {"units": "degrees_east"}),
+            },
+            coords={"time": [0, 1]},
+        )
+        assert redmod._resolve_weights(ds, ["cell"], "auto") == ("none", None)
+        ds = ds.rename({"cell": "node"})
+        with pytest.raises(redmod.ReductionError, match="Cannot determine area"):
+            redmod._resolve_weights(ds, ["node"], "auto")
+
     def test_unweightable_grid_is_an_error_not_a_guess(self) -> None:
         ds = xr.Dataset(
             {"tas": (("y", "x"), np.zeros((2, 2)))},
@@ -905,6 +1231,24 @@ class TestWeightResolution:
         with pytest.raises(redmod.ReductionError, match="No cell-area variable"):
             redmod._resolve_weights(_packed_daily(), ["lat", "lon"], "cell_area")
 
+    def test_cell_measures_attribute_names_the_area_variable(self) -> None:
+        ds = _packed_daily()
+        ds["cell_size"] = (("lat", "lon"), np.ones((2, 2)))
+        ds["tas"].attrs["cell_measures"] = "area: cell_size"
+        assert redmod._resolve_weights(ds, ["lat", "lon"], "auto") == (
+            "cell_area",
+            "cell_size",
+        )
+
+    def test_explicit_cos_lat_accepts_a_2d_latitude(self) -> None:
+        ds = _rotated()
+        assert redmod._resolve_weights(ds, ["rlat", "rlon"], "cos_lat") == (
+            "cos_lat",
+            "lat",
+        )
+        with pytest.raises(redmod.ReductionError, match="Cannot determine area"):
+            redmod._resolve_weights(ds, ["rlat", "rlon"], "auto")
+
     def test_explicit_none_is_honoured(self) -> None:
         assert redmod._resolve_weights(_packed_daily(), ["lat", "lon"], "none") == (
             "none",
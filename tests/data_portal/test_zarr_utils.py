@@ -1,16 +1,23 @@
 """Tests for testing the zarr utilities."""
 
 import base64
+import itertools
+import json
+from pathlib import Path
 from unittest.mock import patch
 
 import dask.array as da
+import numcodecs
 import numpy as np
 import pytest
 import xarray as xr
 
-from data_portal_worker.zarr_utils import (encode_chunk, encode_fill_value,
+from data_portal_worker.aggregator import write_grouped_zarr
+from data_portal_worker.zarr_utils import (assemble_shard, create_v3_metadata,
+                                           encode_chunk, encode_fill_value,
                                            extract_dataarray_coords,
-                                           get_data_chunk, normalize_shape)
+                                           get_data_chunk, get_data_chunks,
+                                           normalize_shape, shard_chunk_ids)
 
 
 class DummyCodec:
@@ -62,6 +69,22 @@ def test_encode_chunk_without_filters_or_compressor() -> None:
     np.testing.assert_array_equal(result, data.tobytes())
 
 
+def test_encode_chunk_pads_edge_chunks_in_place() -> None:
+    """Edge chunks are padded with zeros and encoded like the full chunk."""
+    compressor = numcodecs.Zlib()
+    edge = np.arange(6, dtype="f4").reshape(2, 3)[::1, ::2]
+    full = np.zeros((4, 4), dtype="f4")
+    full[:2, :2] = edge
+    first = encode_chunk(edge, compressor=compressor, out_shape=(4, 4))
+    assert first == encode_chunk(full, compressor=compressor)
+    # The next chunk reuses the padding buffer, the first result stays valid.
+    other = encode_chunk(np.ones((1, 1), dtype="f4"), out_shape=(4, 4))
+    assert np.frombuffer(other, dtype="f4").sum() == 1
+    np.testing.assert_array_equal(
+        np.frombuffer(compressor.decode(first), dtype="f4").reshape(4, 4), full
+    )
+
+
 def test_get_data_chunk_numpy() -> None:
     da = xr.DataArray(np.arange(6).reshape(2, 3))
     result = get_data_chunk(da, "0.0", (2, 3))
@@ -108,6 +131,36 @@ def test_get_data_chunk_dask_with_padding() -> None:
     np.testing.assert_array_equal(result[:1, :2], expected[:1, :2])
 
 
+def test_get_data_chunks_computes_and_pads_every_request() -> None:
+
+    darr = da.from_array(np.arange(5), chunks=2)
+    plain = np.arange(3)
+
+    result = get_data_chunks(
+        [(darr, "0", (2,)), (darr, "2", (2,)), (plain, "0", (3,)), (darr, "7", (2,))]
+    )
+
+    np.testing.assert_array_equal(result[0], [0, 1])
+    assert result[1].shape == (2,) and result[1][0] == 4
+    np.testing.assert_array_equal(result[2], [0, 1, 2])
+    assert isinstance(result[3], Exception)
+
+
+def test_get_data_chunks_isolates_failing_blocks() -> None:
+
+    def _boom(block: np.ndarray) -> np.ndarray:
+        if block[0] == 2:
+            raise RuntimeError("bad block")
+        return block
+
+    darr = da.from_array(np.arange(4), chunks=2).map_blocks(_boom)
+
+    result = get_data_chunks([(darr, "0", (2,)), (darr, "1", (2,))])
+
+    np.testing.assert_array_equal(result[0], [0, 1])
+    assert isinstance(result[1], RuntimeError)
+
+
 @patch(
     "data_portal_worker.zarr_utils.encode_zarr_attr_value",
     side_effect=lambda x: f"encoded:{x}",
@@ -236,3 +289,84 @@ def test_normalize_shape() -> None:
     assert normalize_shape(()) == ()
     with pytest.raises(TypeError, match="shape is None"):
         normalize_shape(None)
+
+
+def _write_v3_store(path: Path, dsets: dict) -> None:
+    """Materialise the virtual v3 store the way the data portal serves it."""
+    zmeta = write_grouped_zarr(dsets)
+    root = create_v3_metadata(zmeta)
+    path.mkdir()
+    (path / "zarr.json").write_text(json.dumps(root))
+    for name, meta in root["consolidated_metadata"]["metadata"].items():
+        (path / name).mkdir(parents=True, exist_ok=True)
+        (path / name / "zarr.json").write_text(json.dumps(meta))
+        if meta["node_type"] != "array":
+            continue
+        group, _, var = name.rpartition("/")
+        zarray = zmeta["metadata"][f"{name}/.zarray"]
+        data = dsets[group or "root"][var].variable.data
+        grid = [
+            range(-(-s // c))
+            for s, c in zip(
+                meta["shape"], meta["chunk_grid"]["configuration"]["chunk_shape"]
+            )
+        ]
+        for idx in itertools.product(*grid):
+            chunk_id = ".".join(map(str, idx)) or "0"
+            if meta["codecs"][0]["name"] == "sharding_indexed":
+                ids = shard_chunk_ids(zarray, chunk_id)
+                payload = assemble_shard(
+                    [
+                        (
+                            encode_chunk(
+                                get_data_chunk(data, c, zarray["chunks"]).tobytes(),
+                                compressor=numcodecs.get_codec(zarray["compressor"]),
+                            )
+                            if c
+                            else None
+                        )
+                        for c in ids
+                    ]
+                )
+            else:
+                payload = encode_chunk(
+                    get_data_chunk(data, chunk_id, zarray["chunks"]).tobytes(),
+                    compressor=numcodecs.get_codec(zarray["compressor"]),
+                )
+            key = path / name / "/".join(["c", *map(str, idx)])
+            key.parent.mkdir(parents=True, exist_ok=True)
+            key.write_bytes(payload)
+
+
+def test_v3_sharded_store_round_trip(tmp_path: Path) -> None:
+    """A v3 store assembled from v2 chunks reads back the same data."""
+    values = np.arange(7 * 3 * 4, dtype="f4").reshape(7, 3, 4)
+    values[0, 0, 0] = np.nan
+    dset = xr.Dataset(
+        {"tas": (("time", "lat", "lon"), values, {"units": "K"})},
+        coords={"time": np.arange(7), "lat": [0.0, 1.0, 2.0]},
+        attrs={"title": "test"},
+    ).chunk({"time": 1, "lat": 2})
+    _write_v3_store(tmp_path / "test.zarr", {"root": dset})
+    meta = json.loads((tmp_path / "test.zarr" / "tas" / "zarr.json").read_text())
+    assert meta["codecs"][0]["name"] == "sharding_indexed"
+    assert meta["chunk_grid"]["configuration"]["chunk_shape"] == [7, 2, 4]
+    assert meta["dimension_names"] == ["time", "lat", "lon"]
+    out = xr.open_zarr(tmp_path / "test.zarr", zarr_format=3, consolidated=True)
+    xr.testing.assert_identical(out.load(), dset.load())
+
+
+def test_shard_chunk_ids_marks_missing_chunks() -> None:
+    """Shards at the edge of the array are only partially filled."""
+    zarray = {"chunks": [2, 2], "shape": [3, 3], "dtype": "<f4"}
+    assert shard_chunk_ids(zarray, "0.0") == ["0.0", "1.0"]
+    assert shard_chunk_ids(zarray, "0.1") == ["0.1", "1.1"]
+    with pytest.raises(KeyError):
+        shard_chunk_ids(zarray, "1.0")
+
+
+def test_create_v3_metadata_rejects_unsupported_dtypes() -> None:
+    """Arrays whose v2 chunks can't be reused in v3 are refused."""
+    dset = xr.Dataset({"name": ("x", np.array(["a", "bc"]))})
+    with pytest.raises(ValueError, match="v3"):
+        create_v3_metadata(write_grouped_zarr({"root": dset}))
@@ -5,6 +5,7 @@ and error handling via HTTP against a live test server with a Redis broker.
 """
 
 import re
+import struct
 import time
 from typing import Any, Dict, List, Tuple
 
@@ -409,6 +410,43 @@ class TestZarrChunks:
         assert r.headers.get("content-type", "").startswith("application/octet-stream")
         assert len(r.content) > 0
 
+    def test_batch_fetch_returns_frames(self) -> None:
+        """The batch endpoint answers every key with its own frame."""
+        zarray_key = _first_zarray_key(self.zmeta)
+        var_path = zarray_key.rsplit("/", 1)[0]
+        chunk_id = _origin_chunk_id(self.zmeta["metadata"][zarray_key])
+        keys = [zarray_key, f"{var_path}/{chunk_id}", "no_such_variable/0"]
+
+        r = requests.post(
+            f"{self.base}/batch",
+            json={"keys": keys},
+            headers=self.headers,
+            params={"timeout": 30},
+            timeout=60,
+        )
+        assert r.status_code == 200
+        frames: Dict[str, Tuple[int, bytes]] = {}
+        body, pos = r.content, 0
+        while pos < len(body):
+            status, key_len, size = struct.unpack_from("!HIQ", body, pos)
+            pos += 14
+            key = body[pos : pos + key_len].decode()
+            pos += key_len
+            frames[key] = (status, body[pos : pos + size])
+            pos += size
+        assert set(frames) == set(keys)
+        assert frames[zarray_key][0] == 200
+        assert frames[f"{var_path}/{chunk_id}"][0] == 200
+        assert len(frames[f"{var_path}/{chunk_id}"][1]) > 0
+        assert frames["no_such_variable/0"][0] == 404
+
+    def test_batch_fetch_requires_keys(self) -> None:
+        """An empty batch is rejected."""
+        r = requests.post(
+            f"{self.base}/batch", json={"keys": []}, headers=self.headers, timeout=10
+        )
+        assert r.status_code == 422
+
     def test_nonexistent_variable_returns_404(self) -> None:
         """Requesting .zarray for a missing variable returns 404."""
         r = requests.get(
@@ -6,21 +6,43 @@ payloads are still encoded exactly as the production code expects.
 """
 
 import json
+import re
+import time
 from typing import Any
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import cloudpickle
+import httpx
 import pytest
 from fastapi import HTTPException
 
-from freva_rest.freva_data_portal.utils import LoadStatus, read_redis_data
+from freva_rest.freva_data_portal.utils import (
+    LoadStatus,
+    broker_queue,
+    process_zarr_data,
+    publish_many_datasets,
+    read_redis_data,
+    slice_byte_range,
+    split_v3_chunk_key,
+)
+from freva_rest.utils import base_utils, presign_utils
 from freva_rest.utils.base_utils import (
+    COMPRESSOR_PATTERN,
+    ISEL_PATTERN,
     REDUCTION_DEFAULTS,
+    SHORT_TOKEN_PREFIX,
+    VARIABLE_PATTERN,
     b64url,
+    b64url_decode,
+    canonical_encoding,
     canonical_reduction,
     decode_cache_token,
     encode_cache_token,
+    resolve_cache_token,
+    short_cache_token,
+    sign_token_path,
 )
+from freva_rest.utils.exceptions import EmptyError
 
 pytestmark = [pytest.mark.portal_endpoints, pytest.mark.rest, pytest.mark.asyncio]
 
@@ -78,6 +100,7 @@ class TestReadRedisData:
             token,
             assembly=assembly,
             reduce=None,
+            encoding=None,
         )
 
     async def test_failed_metadata_entry_triggers_reload(self) -> None:
@@ -110,6 +133,7 @@ class TestReadRedisData:
             token,
             assembly=assembly,
             reduce=None,
+            encoding=None,
             reload=True,
         )
 
@@ -142,6 +166,7 @@ class TestReadRedisData:
             token,
             assembly=None,
             reduce=reduce,
+            encoding=None,
         )
 
     async def test_failed_reduced_entry_reloads_with_the_plan(self) -> None:
@@ -169,6 +194,7 @@ class TestReadRedisData:
             token,
             assembly=None,
             reduce=reduce,
+            encoding=None,
             reload=True,
         )
 
@@ -347,6 +373,32 @@ class TestCacheTokenIdentity:
         assert payload["reduce"] == reduce
         assert payload["path"] == ["/work/daily.nc"]
 
+    def test_spatial_subset_round_trips_through_the_token(self) -> None:
+        reduce = {"isel": ["lat:100:200"], "subset_bbox": [-20.0, 40.0, 30.0, 70.0]}
+        token = encode_cache_token(["/work/daily.nc"], assembly=None, reduce=reduce)
+        assert decode_cache_token(token)["reduce"] == reduce
+        for valid in ("lat:100:200", "rlon::-3", "cell:0:100:2"):
+            assert re.match(ISEL_PATTERN, valid)
+        for invalid in ("lat", "lat:1", "lat:a:b", "lat:1:2:3:4", "la t:1:2"):
+            assert not re.match(ISEL_PATTERN, invalid)
+
+    def test_spatial_reduction_round_trips_through_the_token(self) -> None:
+        reduce = {"space": "mean", "space_dims": ["lon"], "weighting": "auto"}
+        token = encode_cache_token(["/work/daily.nc"], assembly=None, reduce=reduce)
+        assert decode_cache_token(token)["reduce"] == {
+            "space": "mean",
+            "space_dims": ["lon"],
+        }
+
+    def test_variable_selection_is_canonical(self) -> None:
+        """The variables are served in file order, the request order is noise."""
+        path = ["/work/model_output.nc"]
+        token = encode_cache_token(path, reduce={"variables": ["tas", "pr", "tas"]})
+        assert token == encode_cache_token(path, reduce={"variables": ["pr", "tas"]})
+        assert decode_cache_token(token)["reduce"] == {"variables": ["pr", "tas"]}
+        assert re.match(VARIABLE_PATTERN, "sea-ice.conc")
+        assert not re.match(VARIABLE_PATTERN, "../tas")
+
     def test_legacy_tokens_without_a_plan_still_decode(self) -> None:
         """Tokens minted before reduction existed must keep working."""
         legacy = b64url(
@@ -359,3 +411,425 @@ class TestCacheTokenIdentity:
         payload = decode_cache_token(legacy)
         assert payload["reduce"] is None
         assert payload["path"] == ["/work/daily.nc"]
+
+
+class TestCacheTokenEncoding:
+    """The store encoding is part of the cache token."""
+
+    def test_default_encoding_leaves_the_token_unchanged(self) -> None:
+        """v2 stores keep the tokens they had before the option existed."""
+        path = ["/work/daily.nc"]
+        assert encode_cache_token(path, encoding={"zarr_format": 2}) == (
+            encode_cache_token(path)
+        )
+        assert "encoding" not in json.loads(b64url_decode(encode_cache_token(path)))
+
+    def test_v3_stores_get_their_own_token(self) -> None:
+        path = ["/work/daily.nc"]
+        token = encode_cache_token(path, encoding={"zarr_format": 3})
+        assert token != encode_cache_token(path)
+        assert decode_cache_token(token)["encoding"] == {"zarr_format": 3}
+        assert decode_cache_token(encode_cache_token(path))["encoding"] is None
+
+    def test_compressor_is_part_of_the_token(self) -> None:
+        """Stores with another compressor don't share a cache entry."""
+        path = ["/work/daily.nc"]
+        default = {"zarr_format": 2, "compressor": "default"}
+        assert encode_cache_token(path, encoding=default) == encode_cache_token(path)
+        token = encode_cache_token(path, encoding={"compressor": "blosc-lz4"})
+        assert token != encode_cache_token(path)
+        assert decode_cache_token(token)["encoding"] == {"compressor": "blosc-lz4"}
+
+    def test_unset_rounding_leaves_the_token_unchanged(self) -> None:
+        path = ["/work/daily.nc"]
+        unset = {"keepbits": None, "keep_information": None}
+        assert encode_cache_token(path, encoding=unset) == encode_cache_token(path)
+        token = encode_cache_token(path, encoding={"keepbits": 10})
+        assert decode_cache_token(token)["encoding"] == {"keepbits": 10}
+
+    def test_keepbits_override_the_information_level(self) -> None:
+        """Requests that round to the same bits share one store."""
+        path = ["/work/daily.nc"]
+        both = {"keepbits": 10, "keep_information": 0.99}
+        assert canonical_encoding(both) == {"keepbits": 10}
+        assert encode_cache_token(path, encoding=both) == (
+            encode_cache_token(path, encoding={"keepbits": 10})
+        )
+        token = encode_cache_token(path, encoding={"keep_information": 0.99})
+        assert decode_cache_token(token)["encoding"] == {"keep_information": 0.99}
+
+    def test_compressor_pattern(self) -> None:
+        for valid in ("default", "none", "auto", "blosc-zstd:3", "zlib:1", "zstd:22"):
+            assert re.match(COMPRESSOR_PATTERN, valid)
+        for invalid in ("blosc", "lz4", "zlib:10", "zstd:0", "zstd:23", "auto "):
+            assert not re.match(COMPRESSOR_PATTERN, invalid)
+
+
+class TestZarrV3Keys:
+    """Parsing of v3 chunk keys and byte ranges."""
+
+    @pytest.mark.parametrize(
+        "key, expected",
+        [
+            ("tas/c/0/1/2", ("tas", (0, 1, 2))),
+            ("group0/tas/c/3", ("group0/tas", (3,))),
+            ("tas/c", ("tas", ())),
+            ("tas/0.1.2", None),
+            ("tas/c/x", None),
+            ("c/0", None),
+        ],
+    )
+    def test_split_v3_chunk_key(self, key: str, expected: Any) -> None:
+        assert split_v3_chunk_key(key) == expected
+
+    @pytest.mark.parametrize(
+        "byte_range, body, content_range",
+        [
+            ("bytes=0-3", b"0123", "bytes 0-3/10"),
+            ("bytes=-4", b"6789", "bytes 6-9/10"),
+            ("bytes=8-", b"89", "bytes 8-9/10"),
+        ],
+    )
+    def test_slice_byte_range(
+        self, byte_range: str, body: bytes, content_range: str
+    ) -> None:
+        response = slice_byte_range(b"0123456789", byte_range)
+        assert response.status_code == 206
+        assert response.body == body
+        assert response.headers["content-range"] == content_range
+
+    def test_unsatisfiable_range_is_rejected(self) -> None:
+        with pytest.raises(HTTPException) as error:
+            slice_byte_range(b"0123", "bytes=10-20")
+        assert error.value.status_code == 416
+
+    async def test_range_requests_of_a_shard_build_it_once(self) -> None:
+        utils = "freva_rest.freva_data_portal.utils"
+        meta = {
+            "node_type": "array",
+            "shape": [8],
+            "codecs": [{"name": "sharding_indexed"}],
+        }
+        built: set = set()
+
+        async def lpush(queue: str, message: bytes) -> int:
+            built.add(json.loads(message)["shard"]["shard"])
+            return 1
+
+        async def exists(key: str) -> int:
+            return int(key == "token-tas/c/0" and "0" in built)
+
+        with patch(f"{utils}._zarr_format", new=AsyncMock(return_value=3)), patch(
+            f"{utils}.load_zarr_v3_metadata", new=AsyncMock(return_value=meta)
+        ), patch(f"{utils}.Cache.exists", new=exists), patch(
+            f"{utils}.Cache.lpush", new=AsyncMock(side_effect=lpush)
+        ) as push, patch(
+            f"{utils}.read_redis_data", new=AsyncMock(return_value=b"0123456789")
+        ):
+            index = await process_zarr_data("token", "tas/c/0", byte_range="bytes=-4")
+            inner = await process_zarr_data("token", "tas/c/0", byte_range="bytes=0-3")
+        assert (index.body, inner.body) == (b"6789", b"0123")
+        assert push.await_count == 1
+
+
+class TestShortCacheTokens:
+    """Content-addressed short tokens resolve to the full token."""
+
+    @pytest.fixture(autouse=True)
+    def _clear_memo(self) -> Any:
+        base_utils._SHORT_TOKENS.clear()
+        yield
+        base_utils._SHORT_TOKENS.clear()
+
+    def test_short_token_is_a_stable_hash(self) -> None:
+        paths = [f"/work/file_{i:05d}.nc" for i in range(2000)]
+        token = encode_cache_token(paths, assembly={"mode": "concat"})
+        short = short_cache_token(token)
+        assert short == short_cache_token(token)
+        assert short.startswith(SHORT_TOKEN_PREFIX)
+        assert len(short) < 32 < len(token)
+        assert short != short_cache_token(encode_cache_token(paths[1:]))
+        assert not token.startswith(SHORT_TOKEN_PREFIX)
+
+    async def test_full_tokens_need_no_lookup(self) -> None:
+        token = encode_cache_token("/work/daily.nc")
+        with patch.object(base_utils.Cache, "get", new=AsyncMock()) as get:
+            payload = await resolve_cache_token(token)
+        assert payload["path"] == ["/work/daily.nc"]
+        get.assert_not_awaited()
+
+    async def test_short_token_falls_back_to_the_database(self) -> None:
+        token = encode_cache_token(["/work/a.nc", "/work/b.nc"])
+        short = short_cache_token(token)
+        config = MagicMock()
+        config.mongo_collection_cache_token.find_one = AsyncMock(
+            return_value={"_id": short, "token": token}
+        )
+        with patch.object(
+            base_utils.Cache, "check_connection", new=AsyncMock()
+        ), patch.object(
+            base_utils.Cache, "get", new=AsyncMock(return_value=None)
+        ) as get, patch.object(
+            base_utils.Cache, "set", new=AsyncMock()
+        ) as cache_set, patch.object(
+            base_utils, "server_config", config
+        ):
+            payload = await resolve_cache_token(short)
+            # The second lookup is served from memory.
+            assert await resolve_cache_token(short) == payload
+        assert payload["path"] == ["/work/a.nc", "/work/b.nc"]
+        get.assert_awaited_once_with(f"token:{short}")
+        cache_set.assert_awaited_once()
+
+    async def test_unknown_short_token_is_rejected(self) -> None:
+        config = MagicMock()
+        config.mongo_collection_cache_token.find_one = AsyncMock(return_value=None)
+        with patch.object(
+            base_utils.Cache, "check_connection", new=AsyncMock()
+        ), patch.object(
+            base_utils.Cache, "get", new=AsyncMock(return_value=None)
+        ), patch.object(
+            base_utils, "server_config", config
+        ):
+            with pytest.raises(EmptyError):
+                await resolve_cache_token(SHORT_TOKEN_PREFIX + "unknown")
+            with pytest.raises(HTTPException) as error:
+                await read_redis_data(SHORT_TOKEN_PREFIX + "unknown")
+        assert error.value.status_code == 400
+
+
+class TestShareTokenVerification:
+    """Verified share links are memoised until they expire."""
+
+    @pytest.fixture(autouse=True)
+    def _clear_memo(self) -> Any:
+        presign_utils._VERIFIED_TOKENS.clear()
+        yield
+        presign_utils._VERIFIED_TOKENS.clear()
+
+    async def test_verified_links_are_memoised(self) -> None:
+        token, sig = sign_token_path("/work/daily.nc", time.time() + 60, None)
+        with patch.object(
+            presign_utils,
+            "get_token_from_cache",
+            new=AsyncMock(return_value=(token, sig, False)),
+        ) as lookup:
+            first = await presign_utils.verify_token("name", "slug")
+            first["_id"] = "tampered"
+            second = await presign_utils.verify_token("name", "slug")
+        lookup.assert_awaited_once_with("slug")
+        assert second["_id"] == encode_cache_token("/work/daily.nc")
+
+    async def test_short_token_links_resolve_to_the_short_key(self) -> None:
+        token, sig = sign_token_path("/work/daily.nc", time.time() + 60, None)
+        with patch.object(
+            presign_utils,
+            "get_token_from_cache",
+            new=AsyncMock(return_value=(token, sig, True)),
+        ):
+            payload = await presign_utils.verify_token("name", "slug")
+        assert payload["_id"] == short_cache_token(
+            encode_cache_token("/work/daily.nc")
+        )
+
+    async def test_expired_links_are_verified_again(self) -> None:
+        token, sig = sign_token_path("/work/daily.nc", time.time() - 1, None)
+        presign_utils._VERIFIED_TOKENS["slug"] = {"exp": time.time() - 1}
+        with patch.object(
+            presign_utils,
+            "get_token_from_cache",
+            new=AsyncMock(return_value=(token, sig, False)),
+        ):
+            with pytest.raises(HTTPException) as error:
+                await presign_utils.verify_token("name", "slug")
+        assert error.value.status_code == 403
+        assert "slug" not in presign_utils._VERIFIED_TOKENS
+
+
+class TestPublishManyDatasets:
+    """Publishing many stores needs one permission check and one LPUSH."""
+
+    async def test_one_permission_check_and_one_push(self) -> None:
+        paths = [f"/work/file_{i}.nc" for i in range(50)]
+        with patch(
+            "freva_rest.freva_data_portal.utils.Cache.check_connection",
+            new=AsyncMock(return_value=None),
+        ), patch(
+            "freva_rest.freva_data_portal.utils.check_read_permission",
+            new=AsyncMock(return_value=None),
+        ) as check, patch(
+            "freva_rest.freva_data_portal.utils.Cache.lpush",
+            new=AsyncMock(return_value=50),
+        ) as lpush:
+            urls = await publish_many_datasets(
+                ["file:///work/file_0.nc"] + paths[1:],
+                username="janedoe",
+                encoding={"zarr_format": 3},
+            )
+        check.assert_awaited_once_with("janedoe", paths)
+        lpush.assert_awaited_once()
+        queue, *messages = lpush.await_args.args
+        assert queue == "data-portal:load"
+        uris = [json.loads(m)["uri"] for m in messages]
+        assert [u["path"] for u in uris] == [[p] for p in paths]
+        for url, uri in zip(urls, uris):
+            assert url.endswith(f"/zarr/{uri['uuid']}.zarr")
+            assert uri["encoding"] == {"zarr_format": 3}
+        assert urls[0].endswith(
+            f"/{encode_cache_token(paths[:1], encoding={'zarr_format': 3})}.zarr"
+        )
+
+    async def test_aggregated_paths_make_one_store(self) -> None:
+        with patch(
+            "freva_rest.freva_data_portal.utils.Cache.check_connection",
+            new=AsyncMock(return_value=None),
+        ), patch(
+            "freva_rest.freva_data_portal.utils.Cache.lpush",
+            new=AsyncMock(return_value=1),
+        ) as lpush:
+            urls = await publish_many_datasets(
+                [["/work/a.nc", "/work/b.nc"]], aggregation_plan={"mode": "auto"}
+            )
+        assert len(urls) == 1
+        message = json.loads(lpush.await_args.args[1])["uri"]
+        assert message["path"] == ["/work/a.nc", "/work/b.nc"]
+        assert message["assembly"] == {"mode": "auto"}
+
+    async def test_time_ranges_are_sent_but_not_tokenised(self) -> None:
+        ranges = {
+            "/work/a.nc": "[2000-01-01T00:00:00Z TO 2000-12-31T00:00:00Z]",
+            "/work/other.nc": "[2001-01-01T00:00:00Z TO 2001-12-31T00:00:00Z]",
+        }
+        with patch(
+            "freva_rest.freva_data_portal.utils.Cache.check_connection",
+            new=AsyncMock(return_value=None),
+        ), patch(
+            "freva_rest.freva_data_portal.utils.Cache.lpush",
+            new=AsyncMock(return_value=1),
+        ) as lpush:
+            urls = await publish_many_datasets(
+                [["/work/a.nc", "/work/b.nc"]],
+                aggregation_plan={"mode": "auto"},
+                time_ranges=ranges,
+            )
+        message = json.loads(lpush.await_args.args[1])["uri"]
+        assert message["time_ranges"] == {"/work/a.nc": ranges["/work/a.nc"]}
+        token = encode_cache_token(
+            ["/work/a.nc", "/work/b.nc"], assembly={"mode": "auto"}
+        )
+        assert urls[0].endswith(f"/zarr/{token}.zarr")
+
+
+class TestTimeRanges:
+    """Catalogue time ranges that order the files of an aggregation."""
+
+    async def test_ranges_are_looked_up_in_posted_batches(self) -> None:
+        from freva_rest.databrowser_api.core import Solr
+        from freva_rest.rest import server_config
+
+        paths = [f"/work/cmip6/{'x' * 200}/tas_{y}.nc" for y in range(2000, 2005)]
+        docs = {
+            p: f"[{y}-01-01T00:00:00Z TO {y}-12-31T00:00:00Z]"
+            for y, p in zip(range(2000, 2005), paths)
+            if y != 2003
+        }
+
+        def _response(url: str, data: Any) -> httpx.Response:
+            found = [
+                {"file": p, "time": [docs[p]]}
+                for p in docs
+                if p.rsplit("/", 1)[-1] in data["q"]
+            ]
+            return httpx.Response(200, json={"response": {"docs": found}})
+
+        solr = Solr(server_config)
+        solr.batch_size = 2
+        with patch.object(
+            httpx.AsyncClient, "post", new=AsyncMock(side_effect=_response)
+        ) as post:
+            ranges = await solr.time_ranges(["file://" + paths[0]] + paths[1:])
+        assert post.await_count == 3
+        assert all(len(c.args[0]) < 200 for c in post.await_args_list)
+        assert ranges == {
+            "file://" + paths[0]: docs[paths[0]],
+            **{p: docs[p] for p in paths[1:] if p in docs},
+        }
+
+    async def test_failed_lookups_are_skipped(self) -> None:
+        from freva_rest.databrowser_api.core import Solr
+        from freva_rest.rest import server_config
+
+        with patch.object(
+            httpx.AsyncClient,
+            "post",
+            new=AsyncMock(return_value=httpx.Response(431, text="too large")),
+        ):
+            assert await Solr(server_config).time_ranges(["/work/a.nc"]) == {}
+
+    async def test_convert_looks_up_the_ranges_of_aggregations(self) -> None:
+        from freva_rest.freva_data_portal import endpoints
+        from freva_rest.freva_data_portal.schema import ZarrConversion
+
+        ranges = {"file:///work/a.nc": "[2000-01-01T00:00:00Z TO 2000-12-31T00:00:00Z]"}
+        with patch.object(
+            endpoints.Solr, "time_ranges", new=AsyncMock(return_value=ranges)
+        ) as lookup, patch.object(
+            endpoints, "get_system_username", new=AsyncMock(return_value="jane")
+        ), patch.object(
+            endpoints, "publish_many_datasets", new=AsyncMock(return_value=["u"])
+        ) as publish:
+            await endpoints.load_files(
+                ZarrConversion(
+                    path=["file:///work/a.nc", "/work/b.nc"], aggregate="auto"
+                ),
+                current_user=None,
+            )
+            lookup.assert_awaited_once_with(["file:///work/a.nc", "/work/b.nc"])
+            assert publish.await_args.kwargs["time_ranges"] == ranges
+            lookup.side_effect = HTTPException(status_code=503)
+            await endpoints.load_files(
+                ZarrConversion(path=["/work/a.nc", "/work/b.nc"], aggregate="auto"),
+                current_user=None,
+            )
+            assert publish.await_args.kwargs["time_ranges"] == {}
+            await endpoints.load_files(
+                ZarrConversion(path=["/work/a.nc", "/work/b.nc"]),
+                current_user=None,
+            )
+            assert lookup.await_count == 2
+
+    async def test_file_urls_match_their_paths(self) -> None:
+        time_range = "[2000-01-01T00:00:00Z TO 2000-12-31T00:00:00Z]"
+        with patch(
+            "freva_rest.freva_data_portal.utils.Cache.check_connection",
+            new=AsyncMock(return_value=None),
+        ), patch(
+            "freva_rest.freva_data_portal.utils.Cache.lpush",
+            new=AsyncMock(return_value=1),
+        ) as lpush:
+            await publish_many_datasets(
+                [["file:///work/a.nc", "/work/b.nc"]],
+                aggregation_plan={"mode": "auto"},
+                time_ranges={"file:///work/a.nc": time_range},
+            )
+        message = json.loads(lpush.await_args.args[1])["uri"]
+        assert message["time_ranges"] == {"/work/a.nc": time_range}
+
+
+class TestBrokerQueues:
+    """Broker messages go to one queue per message type."""
+
+    def test_messages_are_routed_by_type(self) -> None:
+        assert broker_queue("access_check") == "data-portal:access"
+        assert broker_queue("chunk") == "data-portal:chunk"
+        assert broker_queue("chunks") == "data-portal:chunk"
+        assert broker_queue("shard") == "data-portal:chunk"
+        assert broker_queue("uri") == "data-portal:load"
+
+    def test_single_queue_mode(self) -> None:
+        with patch(
+            "freva_rest.freva_data_portal.utils.server_config.broker_queues",
+            "single",
+        ):
+            assert broker_queue("access_check") == "data-portal"
+            assert broker_queue("uri") == "data-portal"